@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""
+Container for vectorised geodesic computations on the WGS84 ellipsoid
+Functions:
+    inverse - Vincenty inverse problem (distance and azimuths) for arrays of points
+    distance_to_refs - distances / azimuths from many points to one or more reference points
+    position_errors - per-epoch 2D / 3D errors of positions against a reference position
+"""
+# Import required packages
+from typing import Tuple
+import numpy as np
+
+from GNSS import wgs84
+
+
+def inverse(lat1, lon1, lat2, lon2, tolerance: float = 1e-12, max_iter: int = 200) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    inverse solves the geodesic inverse problem with Vincenty's formulae for broadcastable arrays of
+    points (decimal degrees).
+    Output: distance - geodesic distance (m)
+            az12 - forward azimuth at point 1 (degrees in [0, 360[)
+            az21 - forward azimuth at point 2 (degrees in [0, 360[)
+    Nearly antipodal point pairs for which the iteration does not converge are returned as NaN.
+    Algorithm from:
+        Vincenty, T., Direct and inverse solutions of geodesics on the ellipsoid with application
+            of nested equations, Survey Review 23(176), 88-93, 1975
+    """
+    a = wgs84.WGS84.a
+    f = wgs84.WGS84.f
+    b = (1. - f) * a
+
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*[np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2)])
+
+    # reduced latitudes and difference in longitude
+    U1 = np.arctan((1. - f) * np.tan(lat1))
+    U2 = np.arctan((1. - f) * np.tan(lat2))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+    L = lon2 - lon1
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    for _ in range(max_iter):
+        sinLam, cosLam = np.sin(lam), np.cos(lam)
+        sinSigma = np.sqrt((cosU2 * sinLam)**2 + (cosU1 * sinU2 - sinU1 * cosU2 * cosLam)**2)
+        cosSigma = sinU1 * sinU2 + cosU1 * cosU2 * cosLam
+        sigma = np.arctan2(sinSigma, cosSigma)
+
+        # coincident points give sinSigma == 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sinAlpha = np.where(sinSigma == 0., 0., cosU1 * cosU2 * sinLam / sinSigma)
+            cos2Alpha = 1. - sinAlpha**2
+            # equatorial lines give cos2Alpha == 0
+            cos2SigmaM = np.where(cos2Alpha == 0., 0., cosSigma - 2. * sinU1 * sinU2 / cos2Alpha)
+
+        C = f / 16. * cos2Alpha * (4. + f * (4. - 3. * cos2Alpha))
+        lamPrev = lam
+        lam = L + (1. - C) * f * sinAlpha * (sigma + C * sinSigma * (cos2SigmaM + C * cosSigma * (-1. + 2. * cos2SigmaM**2)))
+
+        converged = np.abs(lam - lamPrev) <= tolerance
+        if converged.all():
+            break
+
+    u2 = cos2Alpha * (a**2 - b**2) / b**2
+    A = 1. + u2 / 16384. * (4096. + u2 * (-768. + u2 * (320. - 175. * u2)))
+    B = u2 / 1024. * (256. + u2 * (-128. + u2 * (74. - 47. * u2)))
+    deltaSigma = B * sinSigma * (cos2SigmaM + B / 4. * (cosSigma * (-1. + 2. * cos2SigmaM**2) - B / 6. * cos2SigmaM * (-3. + 4. * sinSigma**2) * (-3. + 4. * cos2SigmaM**2)))
+
+    distance = b * A * (sigma - deltaSigma)
+    az12 = np.degrees(np.arctan2(cosU2 * sinLam, cosU1 * sinU2 - sinU1 * cosU2 * cosLam)) % 360.
+    az21 = np.degrees(np.arctan2(cosU1 * sinLam, -sinU1 * cosU2 + cosU1 * sinU2 * cosLam)) % 360.
+
+    distance = np.where(converged, distance, np.nan)
+    az12 = np.where(converged, az12, np.nan)
+    az21 = np.where(converged, az21, np.nan)
+
+    return distance, az12, az21
+
+
+def distance_to_refs(lla: np.ndarray, refs_lla: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    distance_to_refs computes in a single array call the geodesic distance and forward azimuth from each of the
+    N points lla (N,2+) to each of the M reference points refs_lla (M,2+), both in decimal degrees
+    Output: distance (N,M) in m, azimuth (N,M) in degrees
+    """
+    lla = np.atleast_2d(np.asarray(lla, dtype=float))
+    refs_lla = np.atleast_2d(np.asarray(refs_lla, dtype=float))
+
+    distance, az12, _ = inverse(lla[:, 0, np.newaxis], lla[:, 1, np.newaxis], refs_lla[np.newaxis, :, 0], refs_lla[np.newaxis, :, 1])
+
+    return distance, az12
+
+
+def position_errors(lla: np.ndarray, ref_lla) -> dict:
+    """
+    position_errors returns per-epoch errors of the positions lla (N,3) (lat, lon, ellH) against the reference
+    position ref_lla (lat, lon, ellH) as a dict of arrays:
+        'Dist2D' - geodesic (horizontal) distance (m)
+        'Azim' - azimuth from reference to position (degrees)
+        'DeltaH' - height difference (m)
+        'Dist3D' - slant distance between the ECEF positions (m)
+    """
+    lla = np.atleast_2d(np.asarray(lla, dtype=float))
+    ref_lla = np.asarray(ref_lla, dtype=float)
+
+    distance, azim, _ = inverse(ref_lla[0], ref_lla[1], lla[:, 0], lla[:, 1])
+
+    wgs = wgs84.WGS84()
+    dxyz = wgs.lla2ecefArray(lla) - wgs.lla2ecefArray(ref_lla)
+
+    return {'Dist2D': distance,
+            'Azim': azim,
+            'DeltaH': lla[:, 2] - ref_lla[2],
+            'Dist3D': np.linalg.norm(dxyz, axis=1)}
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""
+Container for local reference frame quantities tied to a reference position
+Classes:
+    RefFrame - ECEF/ENU rotation, radii of curvature and UTM parameters of a reference position
+Functions:
+    get_ref_frame - returns the (LRU cached) RefFrame for a reference position
+"""
+# Import required packages
+import functools
+import numpy as np
+
+from GNSS import wgs84
+
+# number of reference frames kept in the cache
+REF_FRAME_CACHE_SIZE = 32
+
+
+class RefFrame:
+    """
+    Reference-frame quantities computed once for a reference position (lat, lon, ellH) in
+    (decimal degrees, decimal degrees, m). Instances are shared through get_ref_frame and are read-only.
+    """
+
+    def __init__(self, lat: float, lon: float, ellH: float):
+        wgs = wgs84.WGS84()
+
+        self.lla = np.array([lat, lon, ellH])
+        self.ecef = wgs.lla2ecefArray(self.lla)[0]
+
+        latRad = np.radians(lat)
+        lonRad = np.radians(lon)
+        sinLat, cosLat = np.sin(latRad), np.cos(latRad)
+        sinLon, cosLon = np.sin(lonRad), np.cos(lonRad)
+
+        # rotation from ECEF differences to local east, north, up
+        self.Recef2enu = np.array([[-sinLon, cosLon, 0.],
+                                   [-sinLat * cosLon, -sinLat * sinLon, cosLat],
+                                   [cosLat * cosLon, cosLat * sinLon, sinLat]])
+
+        # meridian and prime vertical radii of curvature
+        w = np.sqrt(1. - (wgs.e * sinLat)**2)
+        self.M = wgs.a * (1. - wgs.e**2) / w**3
+        self.N = wgs.a / w
+        self.cosLat = cosLat
+
+        # UTM coordinates and zone of the reference position
+        utm, zones, letters, k = wgs.lla2utmArray(self.lla)
+        self.utm = utm[0]
+        self.utmZone = int(zones[0])
+        self.utmLetter = str(letters[0])
+        self.utmScale = float(k[0])
+
+        for arr in (self.lla, self.ecef, self.Recef2enu, self.utm):
+            arr.setflags(write=False)
+
+    def ecef2enu(self, ecef: np.ndarray) -> np.ndarray:
+        """
+        ecef2enu converts (N,3) ECEF positions into (N,3) east, north, up differences wrt the reference position
+        """
+        ecef = np.atleast_2d(np.asarray(ecef, dtype=float))
+        return (ecef - self.ecef) @ self.Recef2enu.T
+
+    def lla2enu(self, lla: np.ndarray) -> np.ndarray:
+        """
+        lla2enu converts (N,3) geodetic positions into (N,3) east, north, up differences wrt the reference position
+        """
+        return self.ecef2enu(wgs84.WGS84().lla2ecefArray(lla))
+
+    def sigmaLLH2ENU(self, sdLat, sdLon, sdH=0.) -> np.ndarray:
+        """
+        sigmaLLH2ENU scales standard deviations of latitude / longitude (decimal degrees) to metres in east, north
+        and returns them with the height standard deviation as an (N,3) array
+        """
+        sdE = np.radians(np.asarray(sdLon, dtype=float)) * (self.N + self.lla[2]) * self.cosLat
+        sdN = np.radians(np.asarray(sdLat, dtype=float)) * (self.M + self.lla[2])
+        sdE, sdN, sdU = np.broadcast_arrays(sdE, sdN, np.asarray(sdH, dtype=float))
+
+        return np.column_stack((np.ravel(sdE), np.ravel(sdN), np.ravel(sdU)))
+
+
+@functools.lru_cache(maxsize=REF_FRAME_CACHE_SIZE)
+def _cached_ref_frame(lat: float, lon: float, ellH: float) -> RefFrame:
+    return RefFrame(lat=lat, lon=lon, ellH=ellH)
+
+
+def get_ref_frame(lat: float, lon: float, ellH: float = 0.) -> RefFrame:
+    """
+    get_ref_frame returns the RefFrame for the reference position, reusing a cached one when the position
+    is the same to 1e-9 degrees / 1 mm. The least recently used frames are evicted from the cache.
+    """
+    return _cached_ref_frame(round(float(lat), 9), round(float(lon), 9), round(float(ellH), 3))
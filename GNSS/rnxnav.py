@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+"""
+Container for RINEX v3 broadcast navigation functions
+Functions:
+    read_rnx3_nav - reads Keplerian (GPS / Galileo) ephemerides into a dataframe
+    gps_seconds - converts datetimes to continuous GPS seconds
+    select_ephemerides - selects for each SV / epoch the closest healthy ephemeris
+    sat_pos_clk - vectorised broadcast orbit and clock evaluation
+"""
+# Import required packages
+import numpy as np
+import pandas as pd
+
+from GNSS import gpstime
+
+# gravitational constants used by the broadcast ephemerides (m^3/s^2)
+dMu = {'G': 3.986005e14,
+       'E': 3.986004418e14}
+OMEGA_E = 7.2921151467e-5        # Earth rotation rate (rad/s)
+F_REL = -4.442807633e-10         # relativistic clock constant (s/m^1/2)
+
+# maximum age of an ephemeris wrt its Toe before it is considered invalid (s)
+dMaxAge = {'G': 7200. + 1800.,
+           'E': 14400.}
+
+# names of the broadcast orbit fields following the SV / epoch in a RINEX v3 record
+eph_fields = ['af0', 'af1', 'af2',
+              'IODE', 'Crs', 'deltaN', 'M0',
+              'Cuc', 'e', 'Cus', 'sqrtA',
+              'Toe', 'Cic', 'OMEGA0', 'Cis',
+              'i0', 'Crc', 'omega', 'OMEGADOT',
+              'IDOT', 'codes', 'week', 'L2P',
+              'accuracy', 'health', 'TGD', 'IODC',
+              'TransTime', 'fitInterval']
+
+# number of lines per navigation record for each satellite system
+dRecordLines = {'G': 8, 'E': 8, 'C': 8, 'J': 8, 'I': 8, 'R': 4, 'S': 4}
+
+GPS_EPOCH = np.datetime64('1980-01-06T00:00:00')
+
+
+def _parse_floats(line: str, start: int, count: int) -> list:
+    """
+    parses count floats of 19 characters (D or E exponent) starting at column start
+    """
+    values = []
+    for i in range(count):
+        field = line[start + i * 19:start + (i + 1) * 19].strip().replace('D', 'E').replace('d', 'e')
+        values.append(float(field) if field else np.nan)
+    return values
+
+
+def gps_seconds(dts) -> np.ndarray:
+    """
+    gps_seconds converts (an array of) datetimes in GPS time to continuous seconds since the GPS epoch
+    """
+    dts = np.asarray(dts, dtype='datetime64[ns]')
+    return (dts - GPS_EPOCH) / np.timedelta64(1, 's')
+
+
+def read_rnx3_nav(nav_file: str, gnsss: str = 'GE') -> pd.DataFrame:
+    """
+    read_rnx3_nav reads the Keplerian broadcast ephemerides for the selected GNSSs from a RINEX v3 navigation file
+    and returns them as a dataframe with one row per record, the absolute epochs 'toc' and 'toe' expressed
+    in continuous GPS seconds
+    """
+    records = []
+    sv_names = []
+    tocs = []
+
+    with open(nav_file, 'r') as fnav:
+        # skip the header
+        for line in fnav:
+            if 'END OF HEADER' in line:
+                break
+
+        lines = fnav.read().splitlines()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if len(line.strip()) == 0:
+            i += 1
+            continue
+
+        satsys = line[0]
+        nr_lines = dRecordLines.get(satsys, 8)
+
+        if satsys in gnsss and satsys in dMu:
+            block = lines[i:i + nr_lines]
+            values = _parse_floats(block[0], 23, 3)
+            for orbit_line in block[1:]:
+                values += _parse_floats(orbit_line.ljust(80), 4, 4)
+
+            sv_names.append(line[0:3].replace(' ', '0'))
+            tocs.append('{y:s}-{mo:s}-{d:s}T{h:s}:{mi:s}:{s:s}'.format(y=line[4:8], mo=line[9:11], d=line[12:14], h=line[15:17], mi=line[18:20], s=line[21:23]))
+            records.append(values[:len(eph_fields)])
+
+        i += nr_lines
+
+    dfEph = pd.DataFrame(records, columns=eph_fields)
+    dfEph.insert(0, 'SV', sv_names)
+    dfEph.insert(1, 'gnss', dfEph['SV'].str[0])
+
+    # absolute times of clock and ephemeris reference
+    dfEph['toc'] = gps_seconds(np.array(tocs, dtype='datetime64[s]'))
+    dfEph['toe'] = dfEph['week'] * gpstime.SECSINWEEK + dfEph['Toe']
+
+    return dfEph.sort_values(['SV', 'toe']).reset_index(drop=True)
+
+
+def select_ephemerides(dfEph: pd.DataFrame, svs: list, t: np.ndarray) -> np.ndarray:
+    """
+    select_ephemerides returns an (nSV, nT) array with for each SV and epoch the row index in dfEph of the
+    healthy ephemeris with the closest Toe, or -1 when none is available within its maximum age
+    """
+    idx = np.full((len(svs), len(t)), -1, dtype=int)
+
+    healthy = dfEph[dfEph['health'] == 0]
+    dGroups = {sv: dfSV for sv, dfSV in healthy.groupby('SV')}
+    for i, sv in enumerate(svs):
+        if sv not in dGroups:
+            continue
+        toes = dGroups[sv]['toe'].to_numpy()
+        rows = dGroups[sv].index.to_numpy()
+
+        # candidate ephemerides just before and just after each epoch
+        pos = np.searchsorted(toes, t)
+        before = np.clip(pos - 1, 0, len(toes) - 1)
+        after = np.clip(pos, 0, len(toes) - 1)
+        closest = np.where(np.abs(t - toes[before]) <= np.abs(t - toes[after]), before, after)
+
+        valid = np.abs(t - toes[closest]) <= dMaxAge[sv[0]]
+        idx[i] = np.where(valid, rows[closest], -1)
+
+    return idx
+
+
+def sat_pos_clk(dfEph: pd.DataFrame, svs: list, t: np.ndarray, relativistic: bool = True):
+    """
+    sat_pos_clk evaluates the broadcast orbits and clocks of the SVs at the epochs t (continuous GPS seconds)
+    in a single vectorised pass (IS-GPS-200 / Galileo OS-ICD)
+    Output: xyz - (nSV, nT, 3) ECEF positions (m), NaN where no valid ephemeris is available
+            clk - (nSV, nT) satellite clock offsets (s), including the periodic relativistic correction
+                  F·e·sqrtA·sin(E) unless relativistic is False (the convention of IGS SP3 / clock products)
+    """
+    t = np.asarray(t, dtype=float)
+    idx = select_ephemerides(dfEph=dfEph, svs=svs, t=t)
+    valid = idx >= 0
+    rows = np.where(valid, idx, 0)
+
+    def field(name: str) -> np.ndarray:
+        return dfEph[name].to_numpy(dtype=float)[rows]
+
+    mu = np.array([dMu[sv[0]] for sv in svs])[:, np.newaxis]
+    tt = np.broadcast_to(t, rows.shape)
+
+    A = field('sqrtA')**2
+    e = field('e')
+    tk = tt - field('toe')
+
+    # mean and eccentric anomaly
+    n = np.sqrt(mu / A**3) + field('deltaN')
+    M = field('M0') + n * tk
+    E = M.copy()
+    for _ in range(10):
+        E = M + e * np.sin(E)
+
+    # argument of latitude, radius and inclination with harmonic corrections
+    v = np.arctan2(np.sqrt(1. - e**2) * np.sin(E), np.cos(E) - e)
+    phi = v + field('omega')
+    sin2phi = np.sin(2. * phi)
+    cos2phi = np.cos(2. * phi)
+    u = phi + field('Cus') * sin2phi + field('Cuc') * cos2phi
+    r = A * (1. - e * np.cos(E)) + field('Crs') * sin2phi + field('Crc') * cos2phi
+    inc = field('i0') + field('IDOT') * tk + field('Cis') * sin2phi + field('Cic') * cos2phi
+
+    # position in orbital plane and corrected longitude of ascending node
+    xp = r * np.cos(u)
+    yp = r * np.sin(u)
+    Omega = field('OMEGA0') + (field('OMEGADOT') - OMEGA_E) * tk - OMEGA_E * field('Toe')
+
+    xyz = np.stack((xp * np.cos(Omega) - yp * np.cos(inc) * np.sin(Omega),
+                    xp * np.sin(Omega) + yp * np.cos(inc) * np.cos(Omega),
+                    yp * np.sin(inc)), axis=-1)
+
+    # satellite clock, with the periodic relativistic correction when requested
+    dt = tt - field('toc')
+    clk = field('af0') + field('af1') * dt + field('af2') * dt**2
+    if relativistic:
+        clk += F_REL * e * field('sqrtA') * np.sin(E)
+
+    xyz[~valid] = np.nan
+    clk[~valid] = np.nan
+
+    return xyz, clk
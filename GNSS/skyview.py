@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+"""
+Container for predicted sky-view and DOP computations based on broadcast ephemerides
+Functions:
+    time_grid - creates the epochs (continuous GPS seconds) for the prediction
+    azel - vectorised azimuth / elevation of satellites seen from a site
+    predict_skyview - azimuth / elevation for all SVs over a time grid
+    predict_dops - predicted #SVs and xDOP per constellation mix and elevation mask
+"""
+# Import required packages
+from datetime import datetime
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+from GNSS import wgs84
+from GNSS import rnxnav
+
+
+def time_grid(start: datetime, end: datetime, interval: float = 300.) -> np.ndarray:
+    """
+    time_grid returns the epochs between start and end (both GPS time, end included) at the interval (s),
+    expressed in continuous GPS seconds
+    """
+    t_start = rnxnav.gps_seconds(np.datetime64(start))
+    t_end = rnxnav.gps_seconds(np.datetime64(end))
+
+    return np.arange(t_start, t_end + interval / 2., interval)
+
+
+def azel(site_lla: Tuple[float, float, float], sat_xyz: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    azel returns the azimuth and elevation (degrees) of the satellite positions sat_xyz (..., 3) in ECEF
+    as seen from site_lla (lat, lon, ellH)
+    """
+    lat, lon = np.radians(site_lla[0]), np.radians(site_lla[1])
+    site_xyz = np.array(wgs84.WGS84().lla2ecef(site_lla))
+
+    # rotation from ECEF to local east, north, up
+    Recef2enu = np.array([[-np.sin(lon), np.cos(lon), 0.],
+                          [-np.sin(lat) * np.cos(lon), -np.sin(lat) * np.sin(lon), np.cos(lat)],
+                          [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]])
+
+    enu = np.einsum('ij,...j->...i', Recef2enu, sat_xyz - site_xyz)
+    horizontal = np.hypot(enu[..., 0], enu[..., 1])
+
+    az = np.degrees(np.arctan2(enu[..., 0], enu[..., 1])) % 360.
+    el = np.degrees(np.arctan2(enu[..., 2], horizontal))
+
+    return az, el
+
+
+def predict_skyview(nav_files: list, site_lla: Tuple[float, float, float], start: datetime, end: datetime, interval: float = 300., gnsss: str = 'GE') -> pd.DataFrame:
+    """
+    predict_skyview computes the azimuth and elevation of every SV present in the navigation files on the time grid
+    [start, end] in one vectorised pass and returns a tidy dataframe (DT, PRN, az, el) for the epochs where the SV has
+    a valid ephemeris and is above the horizon
+    """
+    dfEph = pd.concat([rnxnav.read_rnx3_nav(nav_file=nav_file, gnsss=gnsss) for nav_file in nav_files], ignore_index=True)
+    dfEph = dfEph.drop_duplicates(subset=['SV', 'toe', 'IODE']).sort_values(['SV', 'toe']).reset_index(drop=True)
+
+    svs = sorted(dfEph['SV'].unique())
+    t = time_grid(start=start, end=end, interval=interval)
+
+    sat_xyz, _ = rnxnav.sat_pos_clk(dfEph=dfEph, svs=svs, t=t)
+    az, el = azel(site_lla=site_lla, sat_xyz=sat_xyz)
+
+    dfSkyView = pd.DataFrame({'DT': np.tile(rnxnav.GPS_EPOCH + (t * 1e9).astype('timedelta64[ns]'), len(svs)),
+                              'PRN': pd.Categorical(np.repeat(svs, len(t)), categories=svs),
+                              'az': az.ravel(),
+                              'el': el.ravel()})
+
+    return dfSkyView[dfSkyView['el'] >= 0.].reset_index(drop=True)
+
+
+def predict_dops(dfSkyView: pd.DataFrame, gnss_mixes: list = None, masks: tuple = (5, 10, 15)) -> pd.DataFrame:
+    """
+    predict_dops calculates for each epoch in dfSkyView the predicted number of SVs and the HDOP, VDOP, PDOP and GDOP
+    for each constellation mix (eg ['E', 'G', 'EG']) and elevation mask. A single receiver clock is estimated, as done
+    by RTKLib, and xDOP values are NaN for epochs with less than 4 SVs
+    """
+    if gnss_mixes is None:
+        gnsss = sorted(dfSkyView['PRN'].astype(str).str[0].unique())
+        gnss_mixes = gnsss + ([''.join(gnsss)] if len(gnsss) > 1 else [])
+
+    # arrange the sky view as (epoch x SV) matrices
+    dfAz = dfSkyView.pivot(index='DT', columns='PRN', values='az')
+    dfEl = dfSkyView.pivot(index='DT', columns='PRN', values='el')
+    svs_gnss = np.array([str(prn)[0] for prn in dfEl.columns])
+
+    az = np.radians(dfAz.to_numpy(dtype=float))
+    el = np.radians(dfEl.to_numpy(dtype=float))
+    el_deg = np.where(np.isnan(el), -90., np.degrees(el))
+
+    # design matrix of direction cosines and clock for all epochs and SVs (nT, nSV, 4)
+    G = np.stack((np.cos(el) * np.sin(az), np.cos(el) * np.cos(az), np.sin(el), np.ones_like(el)), axis=-1)
+    G = np.nan_to_num(G)
+
+    lst_dfs = []
+    for gnss_mix in gnss_mixes:
+        in_mix = np.isin(svs_gnss, list(gnss_mix))
+
+        for mask in masks:
+            W = (in_mix[np.newaxis, :] & (el_deg >= mask)).astype(float)
+            nr_svs = W.sum(axis=1).astype(int)
+
+            # normal matrices for all epochs, regularised where too few SVs are present
+            N = np.einsum('tsi,ts,tsj->tij', G, W, G)
+            solvable = nr_svs >= 4
+            N[~solvable] = np.eye(4)
+            Q = np.linalg.inv(N)
+            Qdiag = np.diagonal(Q, axis1=1, axis2=2).copy()
+            Qdiag[~solvable] = np.nan
+
+            lst_dfs.append(pd.DataFrame({'DT': dfEl.index,
+                                         'gnss': gnss_mix,
+                                         'mask': mask,
+                                         '#SVs': nr_svs,
+                                         'HDOP': np.sqrt(Qdiag[:, 0] + Qdiag[:, 1]),
+                                         'VDOP': np.sqrt(Qdiag[:, 2]),
+                                         'PDOP': np.sqrt(Qdiag[:, 0] + Qdiag[:, 1] + Qdiag[:, 2]),
+                                         'GDOP': np.sqrt(Qdiag.sum(axis=1))}))
+
+    return pd.concat(lst_dfs, ignore_index=True)
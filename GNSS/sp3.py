@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""
+Container for precise orbit and clock (SP3-c/d) functions
+Classes:
+    SP3 - satellite positions and clocks of an SP3 product as (epoch, SV, xyz+clk) arrays
+Functions:
+    read_sp3 - reads an SP3-c/d file
+    orbit_clock_differences - compares broadcast orbits / clocks against the precise product
+"""
+# Import required packages
+from typing import Tuple
+import numpy as np
+
+from GNSS import rnxnav
+
+# values used in SP3 files for missing / bad positions and clocks
+SP3_BAD_CLOCK = 999999.
+
+
+class SP3:
+    """
+    Precise satellite positions (m) and clocks (s) on the product epochs
+        epochs - (nE,) epochs in continuous GPS seconds
+        svs - (nSV,) SV names
+        data - (nE, nSV, 4) array with x, y, z and clock, NaN when missing
+    """
+
+    def __init__(self, epochs: np.ndarray, svs: list, data: np.ndarray):
+        self.epochs = epochs
+        self.svs = list(svs)
+        self.data = data
+
+    def windows(self, t: np.ndarray, order: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        windows returns for each requested epoch the first index of the order-point interpolation window,
+        centred on t where possible, together with the (nT, order) Lagrange basis weights. Both only depend
+        on the common epoch grid and are shared by all SVs.
+        """
+        t = np.asarray(t, dtype=float)
+        order = min(order, len(self.epochs))
+
+        start = np.searchsorted(self.epochs, t) - order // 2
+        start = np.clip(start, 0, len(self.epochs) - order)
+
+        # nodes (nT, order) and Lagrange basis weights evaluated at t
+        nodes = self.epochs[start[:, np.newaxis] + np.arange(order)]
+        dt = t[:, np.newaxis] - nodes
+        weights = np.ones(nodes.shape)
+        for j in range(order):
+            for m in range(order):
+                if m != j:
+                    weights[:, j] *= dt[:, m] / (nodes[:, j] - nodes[:, m])
+
+        return start, weights
+
+    def interpolate(self, t: np.ndarray, svs: list = None, order: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        interpolate returns the positions (nSV, nT, 3) by Lagrange interpolation of the given order and the clocks
+        (nSV, nT) by linear interpolation at the epochs t (continuous GPS seconds). Results are NaN when a sample in
+        the SV's window is missing or when t lies outside the product span.
+        """
+        t = np.asarray(t, dtype=float)
+        if svs is None:
+            svs = self.svs
+        sv_idx = np.array([self.svs.index(sv) if sv in self.svs else -1 for sv in svs])
+
+        # padding column of NaN used for SVs not in the product
+        data = np.concatenate((self.data, np.full((len(self.epochs), 1, 4), np.nan)), axis=1)
+        sv_idx = np.where(sv_idx < 0, data.shape[1] - 1, sv_idx)
+
+        # positions: gather the windows of all SVs at once (nT, order, nSV, 3) and weight them
+        start, weights = self.windows(t=t, order=order)
+        order = weights.shape[1]
+        window_xyz = data[start[:, np.newaxis] + np.arange(order)][:, :, sv_idx, :3]
+        xyz = np.einsum('tk,tksc->stc', weights, window_xyz)
+
+        # clocks: linear interpolation between the surrounding epochs
+        right = np.clip(np.searchsorted(self.epochs, t), 1, len(self.epochs) - 1)
+        left = right - 1
+        frac = (t - self.epochs[left]) / (self.epochs[right] - self.epochs[left])
+        clk = (data[left][:, sv_idx, 3] * (1. - frac)[:, np.newaxis] + data[right][:, sv_idx, 3] * frac[:, np.newaxis]).T
+
+        outside = (t < self.epochs[0]) | (t > self.epochs[-1])
+        xyz[:, outside, :] = np.nan
+        clk[:, outside] = np.nan
+
+        return xyz, clk
+
+
+def read_sp3(sp3_file: str) -> SP3:
+    """
+    read_sp3 reads the position and clock records of an SP3-c or SP3-d file
+    """
+    epochs = []
+    records = []
+
+    with open(sp3_file, 'r') as fsp3:
+        for line in fsp3:
+            if line.startswith('*'):
+                # epoch header line
+                fields = line[1:].split()
+                sec = float(fields[5])
+                epochs.append(np.datetime64('{y:04d}-{mo:02d}-{d:02d}T{h:02d}:{mi:02d}:{s:02d}'.format(y=int(fields[0]), mo=int(fields[1]), d=int(fields[2]), h=int(fields[3]), mi=int(fields[4]), s=int(sec))) + np.timedelta64(int(round((sec % 1) * 1e6)), 'us'))
+            elif line.startswith('P') and epochs:
+                # position (km) and clock (microsec) record
+                values = [float(line[4 + i * 14:4 + (i + 1) * 14]) for i in range(4)]
+                records.append((len(epochs) - 1, line[1:4].replace(' ', '0'), values))
+            elif line.startswith('EOF'):
+                break
+
+    svs = sorted(set(rec[1] for rec in records))
+    dSVIdx = {sv: i for i, sv in enumerate(svs)}
+
+    data = np.full((len(epochs), len(svs), 4), np.nan)
+    for epoch_idx, sv, values in records:
+        data[epoch_idx, dSVIdx[sv]] = values
+
+    # missing positions are given as 0 and missing clocks as 999999.999999
+    data[np.all(data[:, :, :3] == 0., axis=2)] = np.nan
+    data[:, :, 3] = np.where(data[:, :, 3] >= SP3_BAD_CLOCK, np.nan, data[:, :, 3])
+
+    # convert to m and s
+    data[:, :, :3] *= 1000.
+    data[:, :, 3] *= 1e-6
+
+    return SP3(epochs=rnxnav.gps_seconds(np.array(epochs, dtype='datetime64[us]')), svs=svs, data=data)
+
+
+def orbit_clock_differences(sp3: SP3, dfEph, t: np.ndarray, svs: list = None) -> dict:
+    """
+    orbit_clock_differences compares the broadcast orbits and clocks (dfEph, see rnxnav.read_rnx3_nav) with the
+    precise product at the epochs t for all SVs in one pass and returns a dict of (nSV, nT) arrays:
+        'dX', 'dY', 'dZ' - broadcast minus precise ECEF position (m)
+        'dRadial' - radial component of the position difference (m)
+        'd3D' - 3D position difference (m)
+        'dClk' - broadcast minus precise clock (s)
+    Note that broadcast orbits refer to the antenna phase centre and SP3 orbits to the centre of mass. The SP3
+    clocks exclude the periodic relativistic correction, so the broadcast clocks are evaluated without it as well.
+    """
+    if svs is None:
+        svs = sorted(set(sp3.svs) & set(dfEph['SV']))
+
+    xyz_prec, clk_prec = sp3.interpolate(t=t, svs=svs)
+    xyz_brdc, clk_brdc = rnxnav.sat_pos_clk(dfEph=dfEph, svs=svs, t=t, relativistic=False)
+
+    dxyz = xyz_brdc - xyz_prec
+    radial = xyz_prec / np.linalg.norm(xyz_prec, axis=-1, keepdims=True)
+
+    return {'SVs': svs,
+            'dX': dxyz[..., 0],
+            'dY': dxyz[..., 1],
+            'dZ': dxyz[..., 2],
+            'dRadial': np.sum(dxyz * radial, axis=-1),
+            'd3D': np.linalg.norm(dxyz, axis=-1),
+            'dClk': clk_brdc - clk_prec}
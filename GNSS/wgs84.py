@@ -7,12 +7,19 @@ Classes:
         lla2ecef
         ecef2lla
     WGS84 - constant parameters for GPS class
+        lla2utmArray / utm2llaArray - vectorised UTM projection for (N,3) arrays
+        projectTrack - UTM coordinates of a track in the zone of its first position
 """
 # Import required packages
 from math import sqrt, sin, cos, tan, atan, atan2
 from numpy import array, dot
+import numpy as np
+import pandas as pd
 import GNSS.geo as geo
 
+# latitude bands used for the UTM zone letters (8 degrees each, X band extends to 84N)
+UTM_LETTERS = 'CDEFGHJKLMNPQRSTUVWXX'
+
 
 class WGS84:
     """
@@ -54,6 +61,23 @@ class WGS84:
         # Return the ecef coordinates
         return (x, y, z)
 
+    def lla2ecefArray(self, lla):
+        """
+        Convert arrays of lat, lon, alt to Earth-centered, Earth-fixed coordinates.
+        Input: lla - (N,3) array of (lat, lon, alt) in (decimal degrees, decimal degees, m)
+        Output: ecef - (N,3) array of (x, y, z) in (m, m, m)
+        """
+        lla = np.atleast_2d(np.asarray(lla, dtype=float))
+        lat = np.radians(lla[:, 0])
+        lon = np.radians(lla[:, 1])
+        alt = lla[:, 2]
+        # Calculate length of the normal to the ellipsoid
+        N = self.a / np.sqrt(1 - (self.e * np.sin(lat))**2)
+
+        return np.column_stack(((N + alt) * np.cos(lat) * np.cos(lon),
+                                (N + alt) * np.cos(lat) * np.sin(lon),
+                                (N * (1 - self.e**2) + alt) * np.sin(lat)))
+
     def lla2gcc(self, lla, geoOrigin=''):
         """
         lla2gcc converts
@@ -290,6 +314,187 @@ class WGS84:
         else:
             return 'Z'
 
+    def _krugerCoefficients(self):
+        """
+        Returns the third flattening and the Krueger series coefficients used by the
+        vectorised Transverse Mercator projection (Karney 2011, 3rd order in n)
+        """
+        n = self.f / (2. - self.f)
+        A = self.a / (1. + n) * (1. + n**2 / 4. + n**4 / 64.)
+        alpha = (n / 2. - 2. * n**2 / 3. + 5. * n**3 / 16.,
+                 13. * n**2 / 48. - 3. * n**3 / 5.,
+                 61. * n**3 / 240.)
+        beta = (n / 2. - 2. * n**2 / 3. + 37. * n**3 / 96.,
+                n**2 / 48. + n**3 / 15.,
+                17. * n**3 / 480.)
+        delta = (2. * n - 2. * n**2 / 3. - 2. * n**3,
+                 7. * n**2 / 3. - 8. * n**3 / 5.,
+                 56. * n**3 / 15.)
+        return n, A, alpha, beta, delta
+
+    def utmZoneNumbers(self, lat, lon):
+        """
+        Returns the UTM zone numbers for arrays of lat, lon (decimal degrees),
+        taking the Norway and Svalbard exceptions into account
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+
+        # wrap longitude into [-180, 180[ before determining the zone
+        lon = (lon + 180.) % 360. - 180.
+        zones = (np.floor((lon + 180.) / 6.) + 1).astype(int)
+
+        # special zone for Norway
+        zones = np.where((56. <= lat) & (lat < 64.) & (3. <= lon) & (lon < 12.), 32, zones)
+
+        # special zones for Svalbard
+        svalbard = (72. <= lat) & (lat < 84.)
+        zones = np.where(svalbard & (0. <= lon) & (lon < 9.), 31, zones)
+        zones = np.where(svalbard & (9. <= lon) & (lon < 21.), 33, zones)
+        zones = np.where(svalbard & (21. <= lon) & (lon < 33.), 35, zones)
+        zones = np.where(svalbard & (33. <= lon) & (lon < 42.), 37, zones)
+
+        return zones
+
+    def utmLetterDesignators(self, lat):
+        """
+        Returns the latitude zone letters for an array of latitudes (decimal degrees),
+        'Z' is returned for latitudes outside the UTM limits [-80, 84[
+        """
+        lat = np.asarray(lat, dtype=float)
+        idx = np.floor((lat + 80.) / 8.).astype(int)
+        letters = np.array(list(UTM_LETTERS))[np.clip(idx, 0, len(UTM_LETTERS) - 1)]
+
+        return np.where((lat >= -80.) & (lat < 84.), letters, 'Z')
+
+    def lla2utmArray(self, lla, zone=None, northern=None):
+        """
+        Converts arrays of lat, lon, alt to Universal Transverse Mercator coordinates
+        Input: lla - (N,3) array of (lat, lon, alt) in (decimal degrees, decimal degrees, m)
+            zone - None for selecting the zone per point, or an integer (or array) forcing the zone
+            northern - None for selecting the hemisphere per point, or a boolean forcing it
+        Output: utm - (N,3) array of (easting, northing, upping) in (m, m, m)
+            zones - (N,) array of zone numbers
+            letters - (N,) array of zone letters
+            k - (N,) array of point scale factors
+        Algorithm from:
+            Karney, C. F. F., Transverse Mercator with an accuracy of a few nanometers,
+                J. Geodesy 85(8), 475-485, 2011
+        """
+        lla = np.atleast_2d(np.asarray(lla, dtype=float))
+        lat, lon, alt = lla[:, 0], lla[:, 1], lla[:, 2]
+
+        # determine zone numbers and letters
+        if zone is None:
+            zones = self.utmZoneNumbers(lat, lon)
+        else:
+            zones = np.broadcast_to(np.asarray(zone, dtype=int), lat.shape).copy()
+        letters = self.utmLetterDesignators(lat)
+        if northern is None:
+            northern = lat >= 0.
+        northern = np.broadcast_to(np.asarray(northern, dtype=bool), lat.shape)
+
+        # longitude of central meridian, wrapped so that a forced zone is valid across the antimeridian
+        lonOrigin = (zones - 1) * 6. - 180. + 3.
+        dLon = np.radians((lon - lonOrigin + 180.) % 360. - 180.)
+        latRad = np.radians(lat)
+
+        k0 = 0.9996
+        n, A, alpha, _, _ = self._krugerCoefficients()
+
+        # conformal latitude
+        t = np.sinh(np.arctanh(np.sin(latRad)) - self.e * np.arctanh(self.e * np.sin(latRad)))
+        xiP = np.arctan2(t, np.cos(dLon))
+        etaP = np.arctanh(np.sin(dLon) / np.sqrt(1. + t**2))
+
+        xi = xiP.copy()
+        eta = etaP.copy()
+        sigma = np.ones_like(xiP)
+        tau = np.zeros_like(xiP)
+        for j, alpha_j in enumerate(alpha, start=1):
+            xi += alpha_j * np.sin(2 * j * xiP) * np.cosh(2 * j * etaP)
+            eta += alpha_j * np.cos(2 * j * xiP) * np.sinh(2 * j * etaP)
+            sigma += 2 * j * alpha_j * np.cos(2 * j * xiP) * np.cosh(2 * j * etaP)
+            tau += 2 * j * alpha_j * np.sin(2 * j * xiP) * np.sinh(2 * j * etaP)
+
+        easting = 500000. + k0 * A * eta
+        northing = k0 * A * xi + np.where(northern, 0., 10000000.)
+
+        # point scale factor
+        k = k0 * A / self.a * np.sqrt((1. + ((1. - n) / (1. + n) * np.tan(latRad))**2) * (sigma**2 + tau**2) / (t**2 + np.cos(dLon)**2))
+
+        utm = np.column_stack((easting, northing, alt))
+        return utm, zones, letters, k
+
+    def utm2llaArray(self, utm, zones, northern):
+        """
+        Converts arrays of UTM coordinates back to lat, lon, alt
+        Input: utm - (N,3) array of (easting, northing, upping) in (m, m, m)
+            zones - zone number(s) of the UTM coordinates
+            northern - boolean(s) indicating northern hemisphere, or zone letter(s)
+        Output: lla - (N,3) array of (lat, lon, alt) in (decimal degrees, decimal degrees, m)
+        """
+        utm = np.atleast_2d(np.asarray(utm, dtype=float))
+        easting, northing, alt = utm[:, 0], utm[:, 1], utm[:, 2]
+
+        zones = np.broadcast_to(np.asarray(zones, dtype=int), easting.shape)
+        northern = np.asarray(northern)
+        if northern.dtype.kind in ('U', 'S', 'O'):
+            northern = np.char.upper(northern.astype(str)) >= 'N'
+        northern = np.broadcast_to(northern.astype(bool), easting.shape)
+
+        k0 = 0.9996
+        _, A, _, beta, delta = self._krugerCoefficients()
+
+        xi = (northing - np.where(northern, 0., 10000000.)) / (k0 * A)
+        eta = (easting - 500000.) / (k0 * A)
+
+        xiP = xi.copy()
+        etaP = eta.copy()
+        for j, beta_j in enumerate(beta, start=1):
+            xiP -= beta_j * np.sin(2 * j * xi) * np.cosh(2 * j * eta)
+            etaP -= beta_j * np.cos(2 * j * xi) * np.sinh(2 * j * eta)
+
+        # conformal latitude and its conversion to geodetic latitude
+        chi = np.arcsin(np.sin(xiP) / np.cosh(etaP))
+        latRad = chi.copy()
+        for j, delta_j in enumerate(delta, start=1):
+            latRad += delta_j * np.sin(2 * j * chi)
+
+        lonOrigin = (zones - 1) * 6. - 180. + 3.
+        lon = lonOrigin + np.degrees(np.arctan2(np.sinh(etaP), np.cos(xiP)))
+        lon = (lon + 180.) % 360. - 180.
+
+        return np.column_stack((np.degrees(latRad), lon, alt))
+
+    def lla2utmFrame(self, lla, zone=None, northern=None) -> pd.DataFrame:
+        """
+        Converts arrays of lat, lon, alt to a dataframe with the UTM coordinates
+        Input: lla - (N,3) array of (lat, lon, alt) in (decimal degrees, decimal degrees, m)
+            zone, northern - see lla2utmArray
+        Output: dataframe with columns UTM.E, UTM.N, UTM.Z (zone number) and UTM.L (categorical zone letter)
+        """
+        utm, zones, letters, _ = self.lla2utmArray(lla, zone=zone, northern=northern)
+
+        return pd.DataFrame({'UTM.E': utm[:, 0],
+                             'UTM.N': utm[:, 1],
+                             'UTM.Z': zones,
+                             'UTM.L': pd.Categorical(letters, categories=sorted(set(UTM_LETTERS + 'Z')))})
+
+    def projectTrack(self, df, columns=('UTM.E', 'UTM.N', 'UTM.Z', 'UTM.L')) -> int:
+        """
+        Adds the UTM coordinates of a track to its dataframe, the full track being projected in the UTM zone of its first position
+        Input: df - dataframe with columns lat, lon, ellH in (decimal degrees, decimal degrees, m)
+            columns - UTM columns (of lla2utmFrame) added to df
+        Output: zone number the track is projected in
+        """
+        zone = int(self.utmZoneNumbers(df['lat'].iloc[0], df['lon'].iloc[0]))
+        dfUTM = self.lla2utmFrame(df[['lat', 'lon', 'ellH']].to_numpy(), zone=zone)
+        for col in columns:
+            df[col] = dfUTM[col].to_numpy()
+
+        return zone
+
     def decimalDegrees2DMS(self, value, type):
         """
         Converts a Decimal Degree Value into
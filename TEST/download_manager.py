@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+"""
+download_manager exercises ampyutils.amdownload against local stand-in servers: an HTTP server supporting range
+requests and keep-alive, and an FTP server when pyftpdlib is installed. It checks the concurrent download, the
+reuse of connections, the mirror cache, resuming of partial files and the size / checksum verification. Exits with
+a non-zero code on a failure.
+"""
+
+import sys
+import os
+import argparse
+import hashlib
+import logging
+import tempfile
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from termcolor import colored
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ampyutils import amdownload  # noqa: E402
+
+
+class RangeHTTPRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serves files with keep-alive and single 'bytes=<start>-' range requests, counting connections and requests
+    """
+    protocol_version = 'HTTP/1.1'
+    stats = {'connections': 0, 'requests': 0}
+
+    def setup(self):
+        super().setup()
+        self.stats['connections'] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.stats['requests'] += 1
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, 'rb') as fin:
+            data = fin.read()
+
+        start = 0
+        if self.headers.get('Range'):
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */{size:d}'.format(size=len(data)))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {start:d}-{end:d}/{size:d}'.format(start=start, end=len(data) - 1, size=len(data)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+
+def start_http_server(root: str) -> tuple:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(RangeHTTPRequestHandler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{port:d}'.format(port=server.server_address[1])
+
+
+def start_ftp_server(root: str, size_cmd: bool = True) -> tuple:
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    logging.getLogger('pyftpdlib').addHandler(logging.NullHandler())
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(root)
+    handler = type('Handler', (FTPHandler,), {'authorizer': authorizer})
+    if not size_cmd:
+        # a server not implementing SIZE answers it with a 500 error
+        handler.proto_cmds = {cmd: info for cmd, info in FTPHandler.proto_cmds.items() if cmd != 'SIZE'}
+    server = ThreadedFTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, kwargs={'handle_exit': False}, daemon=True).start()
+    return server, 'ftp://127.0.0.1:{port:d}'.format(port=server.address[1])
+
+
+def check(ok: bool, msg: str) -> bool:
+    print('{res:s} {msg:s}'.format(res=colored('OK  ', 'green') if ok else colored('FAIL', 'red'), msg=msg))
+    return ok
+
+
+def run_checks(base_url: str, root: str, work: str, nr_files: int, max_connections: int, stats: dict = None) -> bool:
+    """
+    run_checks downloads the files served from root through base_url and verifies the behaviour of the manager
+    """
+    ok = True
+    names = ['prod{nr:02d}.rnx.gz'.format(nr=nr) for nr in range(nr_files)]
+    mirror = os.path.join(work, 'mirror')
+    local = os.path.join(work, 'local')
+    products = [amdownload.Product(url='{base:s}/pub/{name:s}'.format(base=base_url, name=name), local=os.path.join(local, name), checksum='md5:' + hashlib.md5(open(os.path.join(root, 'pub', name), 'rb').read()).hexdigest()) for name in names]
+
+    # concurrent download over a bounded pool of connections
+    with amdownload.DownloadManager(mirror_dir=mirror, max_connections=max_connections) as manager:
+        results = manager.fetch_all(products)
+    ok &= check(all(res.error is None and not res.cached for res in results), 'downloaded {nr:d} files'.format(nr=nr_files))
+    ok &= check(all(open(res.local, 'rb').read() == open(os.path.join(root, 'pub', os.path.basename(res.local)), 'rb').read() for res in results), 'local copies identical to the served files')
+    if stats is not None:
+        ok &= check(stats['connections'] <= max_connections, '{nr:d} connections used for {req:d} requests (max {max:d})'.format(nr=stats['connections'], req=stats['requests'], max=max_connections))
+
+    # files in the mirror are not fetched again
+    requests = stats['requests'] if stats is not None else None
+    with amdownload.DownloadManager(mirror_dir=mirror, max_connections=max_connections) as manager:
+        results = manager.fetch_all(products)
+    ok &= check(all(res.cached for res in results), 'second run served from the mirror')
+    if stats is not None:
+        ok &= check(stats['requests'] == requests, 'no requests sent for mirrored files')
+
+    # resume a partial download
+    mirror_file = results[0].mirror
+    data = open(mirror_file, 'rb').read()
+    os.remove(mirror_file)
+    with open(mirror_file + '.part', 'wb') as fpart:
+        fpart.write(data[:len(data) // 3])
+    with amdownload.DownloadManager(mirror_dir=mirror) as manager:
+        res = manager.fetch(products[0])
+    ok &= check(res.error is None and res.resumed and open(mirror_file, 'rb').read() == data, 'partial file resumed')
+
+    # a wrong checksum is rejected and the file is not kept
+    os.remove(mirror_file)
+    with amdownload.DownloadManager(mirror_dir=mirror) as manager:
+        res = manager.fetch(products[0]._replace(checksum='md5:' + '0' * 32))
+    ok &= check(res.error is not None and not os.path.exists(mirror_file), 'checksum mismatch detected')
+
+    # a missing file is reported, not retried
+    with amdownload.DownloadManager(mirror_dir=mirror) as manager:
+        res = manager.fetch(amdownload.Product(url=base_url + '/pub/missing.gz'))
+    ok &= check(isinstance(res.error, amdownload.DownloadError), 'missing file reported')
+
+    return ok
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=os.path.basename(__file__) + ' tests the download manager against local servers')
+    parser.add_argument('-n', '--number', help='number of files served (default 12)', type=int, default=12)
+    parser.add_argument('-c', '--connections', help='maximum connections per server (default 4)', type=int, default=4)
+    parser.add_argument('-s', '--size', help='size of the served files in bytes (default 2000000)', type=int, default=2000000)
+    args = parser.parse_args(argv[1:])
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'server')
+        os.makedirs(os.path.join(root, 'pub'))
+        for nr in range(args.number):
+            with open(os.path.join(root, 'pub', 'prod{nr:02d}.rnx.gz'.format(nr=nr)), 'wb') as fout:
+                fout.write(os.urandom(args.size))
+
+        print(colored('HTTP stand-in server', 'yellow'))
+        server, base_url = start_http_server(root)
+        ok &= run_checks(base_url, root, os.path.join(tmp, 'http'), args.number, args.connections, stats=RangeHTTPRequestHandler.stats)
+        server.shutdown()
+
+        try:
+            server, base_url = start_ftp_server(root)
+        except ImportError:
+            print(colored('FTP stand-in server skipped (pyftpdlib not installed)', 'yellow'))
+        else:
+            print(colored('FTP stand-in server', 'yellow'))
+            ok &= run_checks(base_url, root, os.path.join(tmp, 'ftp'), args.number, args.connections)
+            server.close_all()
+
+            # a server without the SIZE command still serves the files, verified by their checksum
+            server, base_url = start_ftp_server(root, size_cmd=False)
+            name = os.path.join(root, 'pub', 'prod00.rnx.gz')
+            with amdownload.DownloadManager(mirror_dir=os.path.join(tmp, 'ftp-nosize')) as manager:
+                res = manager.fetch(amdownload.Product(url=base_url + '/pub/prod00.rnx.gz', checksum='md5:' + hashlib.md5(open(name, 'rb').read()).hexdigest()))
+            ok &= check(res.error is None and open(res.mirror, 'rb').read() == open(name, 'rb').read(), 'downloaded from a server without SIZE')
+            server.close_all()
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
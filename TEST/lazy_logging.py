@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+lazy_logging checks that the diagnostic dumps of am_config / amutils (dataframe head/tail and info, JSON of a dict)
+are only formatted when a handler writes them, and that quiet (batch) mode suppresses them. Reports the time spent
+with the diagnostics written and skipped. Exits with a non-zero code on a failure.
+"""
+
+import sys
+import os
+import argparse
+import logging
+import time
+import pandas as pd
+import numpy as np
+from termcolor import colored
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import am_config as amc  # noqa: E402
+from ampyutils import amutils  # noqa: E402
+
+
+def check(ok: bool, msg: str) -> bool:
+    print('{res:s} {msg:s}'.format(res=colored('OK  ', 'green') if ok else colored('FAIL', 'red'), msg=msg))
+    return ok
+
+
+def make_logger(name: str, level: int) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = logging.NullHandler()
+    handler.setLevel(level)
+    logger.addHandler(handler)
+    return logger
+
+
+def dump_all(df: pd.DataFrame, dInfo: dict, logger: logging.Logger) -> float:
+    start = time.perf_counter()
+    amutils.logHeadTailDataFrame(logger=logger, callerName='lazy_logging', df=df, dfName='df')
+    amc.logDataframeInfo(df=df, dfName='df', callerName='lazy_logging', logger=logger)
+    amc.logJSON(obj=dInfo, objName='dInfo', callerName='lazy_logging', logger=logger)
+    return time.perf_counter() - start
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=os.path.basename(__file__) + ' tests the deferred diagnostic logging')
+    parser.add_argument('-n', '--number', help='number of rows of the dataframe (default 1000000)', type=int, default=1000000)
+    args = parser.parse_args(argv[1:])
+
+    ok = True
+    df = pd.DataFrame(np.random.rand(args.number, 8))
+    dInfo = {'key{nr:d}'.format(nr=nr): list(range(20)) for nr in range(5000)}
+
+    verbose = make_logger('lazy_logging.verbose', logging.DEBUG)
+    silent = make_logger('lazy_logging.silent', logging.WARNING)
+
+    ok &= check(amc.diagnosticsEnabled(logger=verbose, level=logging.DEBUG), 'diagnostics enabled for a DEBUG handler')
+    ok &= check(not amc.diagnosticsEnabled(logger=silent, level=logging.INFO), 'diagnostics disabled for a WARNING handler')
+
+    calls = []
+    amc.logDiagnostic(logger=silent, msgFunc=lambda: calls.append(1) or 'message')
+    ok &= check(calls == [], 'message not built when not written')
+    amc.logDiagnostic(logger=verbose, msgFunc=lambda: calls.append(1) or 'message')
+    ok &= check(calls == [1], 'message built when written')
+
+    secs_written = dump_all(df=df, dInfo=dInfo, logger=verbose)
+    secs_skipped = dump_all(df=df, dInfo=dInfo, logger=silent)
+    print('     diagnostics written {written:.4f} s, skipped {skipped:.6f} s'.format(written=secs_written, skipped=secs_skipped))
+    ok &= check(secs_skipped < secs_written, 'skipped diagnostics cost less than written ones')
+
+    amc.setQuiet(True)
+    ok &= check(not amc.diagnosticsEnabled(logger=verbose, level=logging.DEBUG), 'quiet mode disables the diagnostics')
+    amc.setQuiet(False)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
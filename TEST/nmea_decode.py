@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""
+nmea_decode checks ampyutils.nmeautils on synthetic NMEA streams: the date of GGA / GST sentences past midnight
+before the RMC of the new day (within a batch and across batches), the batched checksum validation and the GSV
+satellites of NMEA 4.10 sentences ending with a signal ID. Exits with a non-zero code on a failure.
+"""
+
+import sys
+import os
+import io
+import argparse
+import functools
+import operator
+import numpy as np
+from termcolor import colored
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ampyutils import nmeautils  # noqa: E402
+
+
+def sentence(body: str, valid: bool = True) -> bytes:
+    """
+    sentence returns the NMEA sentence of body with its checksum (a wrong one when not valid)
+    """
+    checksum = functools.reduce(operator.xor, body.encode('ascii'), 0) ^ (0 if valid else 0x5a)
+    return '${body:s}*{chk:02X}'.format(body=body, chk=checksum).encode('ascii')
+
+
+def gga(hhmmss: str) -> bytes:
+    return sentence('GPGGA,{time:s},5050.6280,N,00423.5680,E,4,12,0.8,110.0,M,46.0,M,1.0,0000'.format(time=hhmmss))
+
+
+def gst(hhmmss: str) -> bytes:
+    return sentence('GPGST,{time:s},0.5,0.02,0.01,45.0,0.015,0.012,0.030'.format(time=hhmmss))
+
+
+def rmc(hhmmss: str, ddmmyy: str) -> bytes:
+    return sentence('GPRMC,{time:s},A,5050.6280,N,00423.5680,E,0.0,0.0,{date:s},,,D'.format(time=hhmmss, date=ddmmyy))
+
+
+def midnight_stream() -> list:
+    """
+    midnight_stream returns sentences passing midnight of 31/12/2019 before the RMC of 01/01/2020 is received
+    """
+    sentences = [rmc('235958.00', '311219')]
+    for hhmmss in ('235959.00', '000000.00', '000001.00'):
+        sentences += [gga(hhmmss), gst(hhmmss)]
+    return sentences + [rmc('000002.00', '010120'), gga('000002.00')]
+
+
+def check(ok: bool, msg: str) -> bool:
+    print('{res:s} {msg:s}'.format(res=colored('OK  ', 'green') if ok else colored('FAIL', 'red'), msg=msg))
+    return ok
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=os.path.basename(__file__) + ' tests the NMEA decoding on synthetic streams')
+    parser.add_argument('-b', '--batch', help='decode batch size for the check across batches (default 3)', type=int, default=3)
+    args = parser.parse_args(argv[1:])
+
+    ok = True
+    expected = np.array(['2019-12-31T23:59:59', '2020-01-01T00:00:00', '2020-01-01T00:00:01', '2020-01-01T00:00:02'], dtype='datetime64[ns]')
+
+    # GGA / GST past midnight get the date of the new day before its RMC
+    dNMEA, date, _ = nmeautils.decode_nmea(midnight_stream())
+    ok &= check(np.array_equal(dNMEA['GGA']['DT'], expected) and date == '010120', 'GGA dates past midnight within a batch')
+    ok &= check(np.array_equal(dNMEA['GST']['DT'], expected[:3]), 'GST dates past midnight within a batch')
+
+    ingestor = nmeautils.NMEAIngestor(batch_size=args.batch)
+    for line in midnight_stream():
+        ingestor.feed(line + b'\r\n')
+    dCols = ingestor.columns()
+    ok &= check(len(ingestor.decoded) > 1 and np.array_equal(dCols['GGA']['DT'], expected), 'GGA dates past midnight across batches')
+
+    # sentences with a wrong or missing checksum are dropped
+    sentences = [rmc('120000.00', '130520'), gga('120000.00'), sentence('GPGGA,120001.00,5050.6280,N,00423.5680,E,4,12,0.8,110.0,M,46.0,M,1.0,0000', valid=False), gga('120002.00'), b'$GPGGA,120003.00,,,,,0,00,,,M,,M,,', b'garbage']
+    ok &= check(nmeautils.nmea_checksums_ok(sentences).tolist() == [True, True, False, True, False, False], 'batched checksum validation')
+    dNMEA, _, _ = nmeautils.decode_nmea(sentences)
+    ok &= check(len(dNMEA['GGA']['DT']) == 2 and len(dNMEA['RMC']['DT']) == 1, 'sentences with a wrong checksum dropped')
+
+    # NMEA 4.10 GSV sentences end with a signal ID after the satellites
+    stream = b'\r\n'.join([rmc('120000.00', '130520'),
+                           sentence('GPGSV,2,1,07,01,40,083,46,02,17,308,41,12,07,344,39,14,22,228,45,1'),
+                           sentence('GPGSV,2,2,07,15,60,120,44,24,12,040,38,33,35,200,42,1'),
+                           sentence('GAGSV,1,1,02,11,30,100,40,12,50,200,,7')]) + b'\r\n'
+    dGSV = nmeautils.read_nmea(io.BytesIO(stream))['GSV']
+    ok &= check(dGSV['PRN'].tolist() == ['G01', 'G02', 'G12', 'G14', 'G15', 'G24', 'S20', 'E11', 'E12'], 'GSV satellites with a trailing signal ID')
+    ok &= check(np.isnan(dGSV['SNR'][-1]) and dGSV['SNR'][3] == 45., 'GSV SNR values')
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
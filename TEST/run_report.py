@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""
+run_report exercises ampyutils.amprofile: stages recorded by the context manager and the stage_timer decorator,
+the rows / throughput taken from arguments and returned dataframes, the JSON run report and the cProfile hook.
+Exits with a non-zero code on a failure.
+"""
+
+import sys
+import os
+import json
+import argparse
+import tempfile
+import pandas as pd
+import numpy as np
+from termcolor import colored
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ampyutils import amprofile  # noqa: E402
+
+
+@amprofile.stage_timer()
+def parse_stage(nr_rows: int) -> pd.DataFrame:
+    return pd.DataFrame({'x': np.random.rand(nr_rows), 'y': np.random.rand(nr_rows)})
+
+
+@amprofile.stage_timer(name='stats', rows='dfPos')
+def stats_stage(dfPos: pd.DataFrame) -> dict:
+    return {'mean': dfPos.mean().to_dict()}
+
+
+def check(ok: bool, msg: str) -> bool:
+    print('{res:s} {msg:s}'.format(res=colored('OK  ', 'green') if ok else colored('FAIL', 'red'), msg=msg))
+    return ok
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=os.path.basename(__file__) + ' tests the stage instrumentation and run report')
+    parser.add_argument('-n', '--number', help='number of rows processed (default 200000)', type=int, default=200000)
+    args = parser.parse_args(argv[1:])
+
+    ok = True
+
+    # without an active report the decorated functions just run
+    df = parse_stage(10)
+    ok &= check(amprofile.active_report() is None and df.shape[0] == 10, 'decorated function runs without a report')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report_name = os.path.join(tmp, 'test.pos.run.json')
+        report = amprofile.RunReport(name='run_report', profiler='cprofile')
+
+        df = parse_stage(args.number)
+        stats_stage(dfPos=df)
+        stats_stage(df)
+        with report.stage('block') as probe:
+            probe.rows = df.shape[0] // 2
+
+        dReport = report.write(report_name=report_name)
+        ok &= check(amprofile.active_report() is None, 'report deactivated after writing')
+        ok &= check(os.path.isfile(report_name) and json.load(open(report_name)) == json.loads(json.dumps(dReport)), 'report written as JSON')
+        ok &= check([stage['name'] for stage in dReport['stages']] == ['{mod:s}.parse_stage'.format(mod=__name__), 'stats', 'stats', 'block'], 'stages recorded in order')
+        ok &= check(dReport['totals']['stats'] == {'calls': 2, 'wall': dReport['totals']['stats']['wall'], 'cpu': dReport['totals']['stats']['cpu'], 'rows': 2 * args.number}, 'totals per stage name')
+        ok &= check(all(stage['rows'] for stage in dReport['stages']) and all(stage['throughput'] > 0 for stage in dReport['stages']), 'rows and throughput per stage')
+        ok &= check(dReport['peak_rss'] is None or dReport['peak_rss'] > 0, 'peak RSS {rss!s} MB'.format(rss=dReport['peak_rss']))
+        ok &= check(dReport['profile'] is not None and os.path.isfile(dReport['profile']), 'cProfile output {prof!s}'.format(prof=os.path.basename(dReport['profile'] or '')))
+
+        for stage, total in dReport['totals'].items():
+            print('     {stage:<25s} {calls:3d} calls {wall:8.4f} s wall {cpu:8.4f} s cpu {rows:>10d} rows'.format(stage=stage, **total))
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
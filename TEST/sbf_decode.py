@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""
+sbf_decode checks sbf.sbf_blocks.read_sbf on synthetic SBF files: the decoded PVTGeodetic / DOP values, the
+zero-length columns (with the same names and types as decoded ones) of requested block types that are absent from
+the file or of an empty file, and the resync after a corrupt block holding a false sync. Exits with a non-zero code
+on a failure.
+"""
+
+import sys
+import os
+import argparse
+import binascii
+import struct
+import tempfile
+import numpy as np
+from termcolor import colored
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sbf import sbf_blocks  # noqa: E402
+
+
+def sbf_block(blk_num: int, rev: int, body: bytes) -> bytes:
+    """
+    sbf_block wraps body (the block without its 8 byte header) into an SBF block with a valid CRC
+    """
+    body += bytes(-(len(body) + 8) % 4)
+    id_length = struct.pack('<HH', blk_num | (rev << 13), len(body) + 8)
+    crc = binascii.crc_hqx(id_length + body, 0)
+    return b'$@' + struct.pack('<H', crc) + id_length + body
+
+
+def pvtgeodetic(tow_ms: int, wnc: int, lat: float, lon: float, ellH: float) -> bytes:
+    body = struct.pack('<IHBBddd', tow_ms, wnc, 4, 0, np.radians(lat), np.radians(lon), ellH)
+    body += struct.pack('<fffff', 47., 0., 0., 0., 0.) + struct.pack('<df', 0., 0.) + struct.pack('<BBBB', 0, 0, 12, 0)
+    body += bytes(4) + struct.pack('<I', 0) + bytes(6) + struct.pack('<HH', 150, 250) + bytes(4)
+    return sbf_block(sbf_blocks.SBF_BLOCK_NUMS['PVTGeodetic'], 2, body)
+
+
+def dop(tow_ms: int, wnc: int, pdop: float) -> bytes:
+    body = struct.pack('<IHBB', tow_ms, wnc, 12, 0) + struct.pack('<HHHH', int(pdop * 100), 120, 90, 150) + struct.pack('<ff', 3., 5.)
+    return sbf_block(sbf_blocks.SBF_BLOCK_NUMS['DOP'], 0, body)
+
+
+def corrupt_block(false_length: int) -> bytes:
+    """
+    corrupt_block returns a PVTGeodetic block with a CRC error whose payload holds a false sync of an unrequested
+    block type announcing false_length bytes
+    """
+    false_sync = b'$@' + struct.pack('<HHH', 0, 5999, false_length)
+    block = bytearray(sbf_block(sbf_blocks.SBF_BLOCK_NUMS['PVTGeodetic'], 2, bytes(16) + false_sync + bytes(64)))
+    block[2] ^= 0xff
+    return bytes(block)
+
+
+def check(ok: bool, msg: str) -> bool:
+    print('{res:s} {msg:s}'.format(res=colored('OK  ', 'green') if ok else colored('FAIL', 'red'), msg=msg))
+    return ok
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=os.path.basename(__file__) + ' tests the SBF block decoding on synthetic files')
+    parser.add_argument('-n', '--number', help='number of epochs written (default 25)', type=int, default=25)
+    parser.add_argument('-b', '--batch', help='decode batch size (default 10)', type=int, default=10)
+    args = parser.parse_args(argv[1:])
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        # file with PVTGeodetic and DOP blocks only
+        sbf_name = os.path.join(tmp, 'pvt_dop.sbf')
+        with open(sbf_name, 'wb') as fsbf:
+            for epoch in range(args.number):
+                fsbf.write(pvtgeodetic(tow_ms=epoch * 1000, wnc=2086, lat=50.8 + epoch * 1e-6, lon=4.4, ellH=150.))
+                fsbf.write(dop(tow_ms=epoch * 1000, wnc=2086, pdop=1.5))
+
+        dSBF = sbf_blocks.read_sbf(sbf_name, batch_size=args.batch)
+        ok &= check(set(dSBF) == set(sbf_blocks.SBF_BLOCK_NUMS), 'all requested block types returned')
+        ok &= check(len(dSBF['PVTGeodetic']['TOW']) == args.number and np.allclose(dSBF['PVTGeodetic']['lat'], 50.8 + np.arange(args.number) * 1e-6), 'PVTGeodetic decoded over several batches')
+        ok &= check(np.allclose(dSBF['PVTGeodetic']['HAccuracy'], 1.5) and np.allclose(dSBF['DOP']['PDOP'], 1.5), 'accuracy and DOP values')
+        ok &= check(all(len(values) == 0 for name in ('MeasEpoch', 'ChannelStatus') for values in dSBF[name].values()), 'absent MeasEpoch / ChannelStatus give zero-length columns')
+
+        # an empty file gives zero-length columns of the same names and types as decoded blocks
+        empty_name = os.path.join(tmp, 'empty.sbf')
+        open(empty_name, 'wb').close()
+        dEmpty = sbf_blocks.read_sbf(empty_name)
+        ok &= check(all(len(values) == 0 for dCols in dEmpty.values() for values in dCols.values()), 'empty file gives zero-length columns')
+        for name in ('PVTGeodetic', 'DOP'):
+            ok &= check({col: values.dtype for col, values in dEmpty[name].items()} == {col: values.dtype for col, values in dSBF[name].items()}, '{name:s} empty columns typed as decoded ones'.format(name=name))
+
+        # a corrupt block with a false sync in its payload does not hide the valid blocks following it
+        corrupt_name = os.path.join(tmp, 'corrupt.sbf')
+        with open(corrupt_name, 'wb') as fsbf:
+            fsbf.write(corrupt_block(false_length=2048))
+            for epoch in range(args.number):
+                fsbf.write(pvtgeodetic(tow_ms=epoch * 1000, wnc=2086, lat=50.8, lon=4.4, ellH=150.))
+                fsbf.write(dop(tow_ms=epoch * 1000, wnc=2086, pdop=1.5))
+        dCorrupt = sbf_blocks.read_sbf(corrupt_name, blocks=['PVTGeodetic'], batch_size=args.batch)
+        ok &= check(len(dCorrupt['PVTGeodetic']['TOW']) == args.number, 'valid blocks after a corrupt block with a false sync')
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
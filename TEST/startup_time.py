@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""
+startup_time measures the start-up time of the command line entry points (running --help) and checks that importing
+them does not load the plotting, skyfield or geodesy stacks. Exits with a non-zero code on a regression.
+"""
+
+import sys
+import os
+import argparse
+import subprocess
+import time
+from termcolor import colored
+
+# entry points checked, relative to the repository root
+lst_entry_points = ['pyrtkplot.py', 'glab_msg_output.py', 'rnx_obs_tabular.py', 'glabdb_parse_coords.py', 'pos2movavg.py']
+
+# modules that may only be loaded by the stage that uses them
+lst_heavy_modules = ['matplotlib', 'seaborn', 'skyfield', 'geopy', 'utm', 'webcolors', 'tabulate', 'plot', 'glab_plot']
+
+# imports the entry point as a module and prints the heavy modules that got loaded
+check_code = """
+import sys
+sys.argv = ['{name:s}', '--help']
+import {module:s}
+print(' '.join(sorted(set(mod.split('.')[0] for mod in sys.modules) & set({heavy!r}))))
+"""
+
+
+def treatCmdOpts(argv: list):
+    """
+    Treats the command line options
+    """
+    helpTxt = os.path.basename(__file__) + ' measures the start-up time of the command line entry points'
+
+    parser = argparse.ArgumentParser(description=helpTxt)
+    parser.add_argument('-r', '--repeat', help='number of runs per entry point (default 5)', type=int, default=5)
+    parser.add_argument('-m', '--max_seconds', help='maximum allowed best start-up time in seconds (default 1.5)', type=float, default=1.5)
+
+    args = parser.parse_args(argv[1:])
+
+    return args.repeat, args.max_seconds
+
+
+def main(argv):
+    repeat, max_seconds = treatCmdOpts(argv)
+
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root_dir, os.environ.get('PYTHONPATH', '')]))
+
+    regressions = 0
+    for entry_point in lst_entry_points:
+        # heavy modules loaded at import time
+        module = os.path.splitext(entry_point)[0]
+        proc = subprocess.run([sys.executable, '-c', check_code.format(name=entry_point, module=module, heavy=lst_heavy_modules)], cwd=root_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if proc.returncode != 0:
+            print('{ep:s}: {err:s}'.format(ep=colored(entry_point, 'red'), err=proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import failed'))
+            regressions += 1
+            continue
+        loaded = proc.stdout.strip()
+
+        # best wall time of running the entry point with --help
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, entry_point, '--help'], cwd=root_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+
+        ok = (loaded == '') and (best <= max_seconds)
+        regressions += not ok
+        print('{ep:25s} best {best:6.3f} s  median {med:6.3f} s  heavy modules: {heavy:s}'.format(ep=colored(entry_point, 'green' if ok else 'red'), best=best, med=sorted(timings)[len(timings) // 2], heavy=loaded if loaded else '-'))
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":  # Only run if this file is called directly
+    main(sys.argv)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+"""
+ubx_decode checks uBlox.ubx_parser on synthetic UBX streams: the decoded NAV-PVT / NAV-SAT / RXM-RAWX values, the
+resync after a frame with a wrong checksum, and false syncs (of requested and unrequested messages) announcing
+lengths that run past the following frames or past the end of the stream. Exits with a non-zero code on a failure.
+"""
+
+import sys
+import os
+import io
+import argparse
+import struct
+import numpy as np
+from termcolor import colored
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from uBlox import ubx_parser  # noqa: E402
+
+
+def ubx_frame(name: str, payload: bytes) -> bytes:
+    """
+    ubx_frame wraps payload into a UBX frame of message name with a valid checksum
+    """
+    msg_cls, msg_id = ubx_parser.dUBXMessages[name]
+    body = ubx_parser.UBX_HEADER.pack(msg_cls, msg_id, len(payload)) + payload
+    return ubx_parser.UBX_SYNC + body + bytes(ubx_parser.ubx_checksum(body))
+
+
+def nav_pvt(itow_ms: int, lat: float, lon: float, height: float) -> bytes:
+    pvt = np.zeros(1, dtype=ubx_parser.NAV_PVT_DTYPE)
+    pvt['iTOW'], pvt['year'], pvt['month'], pvt['day'], pvt['hour'] = itow_ms, 2020, 5, 13, 12
+    pvt['fixType'], pvt['flags'], pvt['numSV'] = 3, 0x01, 12
+    pvt['lat'], pvt['lon'], pvt['height'] = round(lat * 1e7), round(lon * 1e7), round(height * 1000)
+    pvt['hAcc'], pvt['vAcc'], pvt['pDOP'] = 1500, 2500, 150
+    return ubx_frame('NAV-PVT', pvt.tobytes())
+
+
+def nav_sat(itow_ms: int, svs: list) -> bytes:
+    sats = np.zeros(len(svs), dtype=ubx_parser.NAV_SAT_DTYPE)
+    sats['gnssId'], sats['svId'] = [gnss_id for gnss_id, _ in svs], [sv_id for _, sv_id in svs]
+    sats['cno'], sats['elev'], sats['flags'] = 40, 45, 0x0c
+    return ubx_frame('NAV-SAT', struct.pack('<IBBH', itow_ms, 1, len(svs), 0) + sats.tobytes())
+
+
+def rxm_rawx(rcv_tow: float, week: int, svs: list) -> bytes:
+    hdr = np.zeros(1, dtype=ubx_parser.RXM_RAWX_HEADER_DTYPE)
+    hdr['rcvTow'], hdr['week'], hdr['leapS'], hdr['numMeas'] = rcv_tow, week, 18, len(svs)
+    meas = np.zeros(len(svs), dtype=ubx_parser.RXM_RAWX_DTYPE)
+    meas['gnssId'], meas['svId'] = [gnss_id for gnss_id, _ in svs], [sv_id for _, sv_id in svs]
+    meas['prMes'], meas['trkStat'] = 2.2e7, 0x01
+    return ubx_frame('RXM-RAWX', hdr.tobytes() + meas.tobytes())
+
+
+def false_sync(name: str, length: int) -> bytes:
+    """
+    false_sync returns the header of a frame of message name announcing length bytes, without payload
+    """
+    return ubx_parser.UBX_SYNC + ubx_parser.UBX_HEADER.pack(*ubx_parser.dUBXMessages.get(name, (0x0a, 0x04)), length)
+
+
+def epochs(number: int) -> bytes:
+    svs = [(0, 5), (2, 11), (6, 3)]
+    return b''.join(nav_pvt(itow_ms=epoch * 1000, lat=50.8 + epoch * 1e-6, lon=4.4, height=150.) + nav_sat(itow_ms=epoch * 1000, svs=svs) + rxm_rawx(rcv_tow=epoch, week=2105, svs=svs) for epoch in range(number))
+
+
+def check(ok: bool, msg: str) -> bool:
+    print('{res:s} {msg:s}'.format(res=colored('OK  ', 'green') if ok else colored('FAIL', 'red'), msg=msg))
+    return ok
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=os.path.basename(__file__) + ' tests the UBX framing and decoding on synthetic streams')
+    parser.add_argument('-n', '--number', help='number of epochs written (default 25)', type=int, default=25)
+    parser.add_argument('-c', '--chunk', help='read chunk size (default 100)', type=int, default=100)
+    args = parser.parse_args(argv[1:])
+
+    ok = True
+
+    dUBX = ubx_parser.read_ubx(io.BytesIO(epochs(args.number)), chunk_size=args.chunk)
+    ok &= check(len(dUBX['NAV-PVT']['iTOW']) == args.number and np.allclose(dUBX['NAV-PVT']['lat'], 50.8 + np.arange(args.number) * 1e-6), 'NAV-PVT decoded over several chunks')
+    ok &= check(np.allclose(dUBX['NAV-PVT']['ellH'], 150.) and np.allclose(dUBX['NAV-PVT']['hAcc'], 1.5) and np.allclose(dUBX['NAV-PVT']['pDOP'], 1.5), 'NAV-PVT height, accuracy and PDOP')
+    ok &= check(dUBX['NAV-SAT']['PRN'][:3].tolist() == ['G05', 'E11', 'R03'] and len(dUBX['NAV-SAT']['PRN']) == 3 * args.number, 'NAV-SAT PRNs')
+    ok &= check(len(dUBX['RXM-RAWX']['PRN']) == 3 * args.number and np.allclose(dUBX['RXM-RAWX']['prMes'], 2.2e7), 'RXM-RAWX measurements')
+
+    dfPos = ubx_parser.nav_pvt_pos(dPVT=dUBX['NAV-PVT'])
+    ok &= check(dfPos.shape[0] == args.number and (dfPos['Q'] == 5).all() and 'UTM.E' in dfPos.columns, 'NAV-PVT positions with UTM coordinates')
+
+    # a frame with a wrong checksum is dropped, the following frames are kept
+    corrupt = bytearray(nav_pvt(itow_ms=0, lat=0., lon=0., height=0.))
+    corrupt[-1] ^= 0xff
+    framer = ubx_parser.UBXStream(msg_ids={ubx_parser.dUBXMessages['NAV-PVT']})
+    frames = framer.feed(bytes(corrupt) + epochs(args.number), eof=True)
+    ok &= check(len(frames) == args.number and framer.bad_checksum == 1, 'frame with a wrong checksum dropped')
+
+    # false syncs announcing lengths past the following frames do not hide them
+    for name, msg in (('NAV-PVT', 'a requested'), ('UNKNOWN', 'an unrequested')):
+        dFalse = ubx_parser.read_ubx(io.BytesIO(false_sync(name=name, length=4000) + epochs(args.number)), messages=['NAV-PVT'], chunk_size=args.chunk)
+        ok &= check(len(dFalse['NAV-PVT']['iTOW']) == args.number, 'false sync of {msg:s} message before valid frames'.format(msg=msg))
+
+    # a false sync running past the end of the stream does not drop the trailing frames
+    dTail = ubx_parser.read_ubx(io.BytesIO(epochs(args.number) + false_sync(name='NAV-PVT', length=60000) + epochs(args.number)), chunk_size=args.chunk)
+    ok &= check(len(dTail['NAV-PVT']['iTOW']) == 2 * args.number and len(dTail['RXM-RAWX']['PRN']) == 6 * args.number, 'frames after a false sync at the end of the stream')
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -5,6 +5,9 @@ import io
 import pandas as pd
 import inspect
 import tempfile
+import threading
+import types
+from contextlib import contextmanager
 from typing import Tuple
 from termcolor import colored
 import json
@@ -12,10 +15,8 @@ import json
 from ampyutils import amutils
 
 
-# global used variables by passing as module
-dRTK = {}  # contains settings maily put by CLI arguments
+# global used variables by passing as module (dRTK and dSettings are the current Session, see below)
 dGNSSs = {}  # dict with SatSyst and numeric value for lookup
-dSettings = {}  # dict containing the values to be used in the template
 dConv = {}  # dict for the conversion from Binary to RINEX
 cBaseName = ''  # colored version of main script
 dLogLevel = {'CRITICAL': 50,
@@ -25,6 +26,10 @@ dLogLevel = {'CRITICAL': 50,
              'DEBUG': 10,
              'NOTSET': 0}
 
+# quiet (batch) mode: console logging limited to warnings and no diagnostic dumps, also set by the environment
+# variable AM_QUIET (eg for runs started by the pipeline)
+quiet = os.environ.get('AM_QUIET', '').lower() in ('1', 'true', 'yes')
+
 # dictionary of GNSS systems
 dGNSSs = {'G': 'GPS NavSTAR',
           'R': 'Glonass',
@@ -54,6 +59,89 @@ E_OSERROR = 10
 E_FAILURE = 99
 
 
+class Session(dict):
+    """
+    Session holds the state of one processing run: the settings mainly put by CLI arguments and the results (the
+    session itself, formerly the global dRTK) and the values used in the templates (settings, formerly dSettings).
+    Functions get the session passed explicitly so that sessions can be processed concurrently.
+    """
+
+    def __init__(self, *args, settings: dict = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.settings = {} if settings is None else settings
+
+
+# session used by a thread inside session_scope, else the session of the process
+_thread_session = threading.local()
+_process_session = Session()
+
+
+def current_session() -> Session:
+    """
+    current_session returns the session of the calling thread (see session_scope), else the one of the process
+    """
+    return getattr(_thread_session, 'session', _process_session)
+
+
+def get_session(dRtk: dict = None) -> dict:
+    """
+    get_session returns dRtk when passed explicitly, else the current session
+    """
+    return current_session() if dRtk is None else dRtk
+
+
+@contextmanager
+def session_scope(session: Session):
+    """
+    session_scope makes session the current one (amc.dRTK) of the calling thread, eg for a batch worker running code
+    that still uses the global
+    """
+    previous = getattr(_thread_session, 'session', None)
+    _thread_session.session = session
+    try:
+        yield session
+    finally:
+        if previous is None:
+            del _thread_session.session
+        else:
+            _thread_session.session = previous
+
+
+class _ConfigModule(types.ModuleType):
+    """
+    compatibility shim keeping amc.dRTK and amc.dSettings as aliases of the current session
+    """
+
+    @property
+    def dRTK(self) -> Session:
+        return current_session()
+
+    @dRTK.setter
+    def dRTK(self, value: dict):
+        """
+        a Session replaces the current one as is, a plain dict is copied into a new Session (so later changes to the
+        dict are not seen through amc.dRTK) which keeps the settings of the session it replaces
+        """
+        global _process_session
+
+        session = value if isinstance(value, Session) else Session(value, settings=current_session().settings)
+        if hasattr(_thread_session, 'session'):
+            _thread_session.session = session
+        else:
+            _process_session = session
+
+    @property
+    def dSettings(self) -> dict:
+        return current_session().settings
+
+    @dSettings.setter
+    def dSettings(self, value: dict):
+        current_session().settings = value
+
+
+sys.modules[__name__].__class__ = _ConfigModule
+
+
 def createLoggers(baseName: str, dir=dir, logLevels: str = ['INFO', 'DEBUG']) -> Tuple[logging.Logger, str]:
     """
     create logging for python and returns temporary file name
@@ -67,9 +155,9 @@ def createLoggers(baseName: str, dir=dir, logLevels: str = ['INFO', 'DEBUG']) ->
 
     fh.setLevel(dLogLevel[logLevels[1]])
 
-    # create console handler with a higher log level
+    # create console handler with a higher log level (at least WARNING in quiet mode)
     ch = logging.StreamHandler()
-    ch.setLevel(dLogLevel[logLevels[0]])
+    ch.setLevel(max(dLogLevel[logLevels[0]], logging.WARNING) if quiet else dLogLevel[logLevels[0]])
 
     # create formatter and add it to the handlers
     formatter = logging.Formatter('%(levelname)s: %(message)s')
@@ -83,10 +171,58 @@ def createLoggers(baseName: str, dir=dir, logLevels: str = ['INFO', 'DEBUG']) ->
     return pyLogger, tmp_log_name
 
 
+def setQuiet(enable: bool = True):
+    """
+    setQuiet switches the quiet (batch) mode on or off, to be called before createLoggers
+    """
+    global quiet
+
+    quiet = enable
+
+
+def diagnosticsEnabled(logger: logging.Logger, level: int = logging.DEBUG) -> bool:
+    """
+    diagnosticsEnabled checks whether a diagnostic message at level reaches a handler of logger (so it is worth
+    formatting), never in quiet mode
+    """
+    if quiet or not logger.isEnabledFor(level):
+        return False
+
+    # the levels of the handlers decide what gets written, the logger itself is mostly at DEBUG
+    current = logger
+    while current is not None:
+        if any(level >= handler.level for handler in current.handlers):
+            return True
+        if not current.propagate:
+            return False
+        current = current.parent
+
+    return logging.lastResort is not None and level >= logging.lastResort.level
+
+
+def logDiagnostic(logger: logging.Logger, msgFunc, level: int = logging.DEBUG):
+    """
+    logDiagnostic logs the message created by calling msgFunc, which is only called when the message is written
+    """
+    if diagnosticsEnabled(logger=logger, level=level):
+        logger.log(level, msgFunc())
+
+
+def logJSON(obj, objName: str, callerName: str, logger: logging.Logger, level: int = logging.INFO, default=None):
+    """
+    logJSON logs obj as indented JSON, the dump is only made when the message is written
+    """
+    if diagnosticsEnabled(logger=logger, level=level):
+        logger.log(level, '{func:s}: {name:s} =\n{json!s}'.format(func=callerName, name=objName, json=json.dumps(obj, sort_keys=False, indent=4, default=default)))
+
+
 def logDataframeInfo(df: pd.DataFrame, dfName: str, callerName: str, logger: logging.Logger):
     """
     lofDataframeInfo logs the info of a dataframe from log level DEBUG
     """
+    if not diagnosticsEnabled(logger=logger, level=logging.DEBUG):
+        return
+
     buf = io.StringIO()
     df.info(buf=buf)
     logger.debug('{func:s}: {name:s} info = {info!s}'.format(func=callerName, name=dfName, info=buf.getvalue()))
@@ -98,7 +234,7 @@ def lineno():
     return inspect.currentframe().f_back.f_lineno
 
 
-def get_title_info(logger: logging.Logger) -> Tuple[str, str]:
+def get_title_info(logger: logging.Logger, dRtk: dict = None) -> Tuple[str, str]:
     """
     get_title_info gets basic info from the gLab['INFO'] dict for the plot
     """
@@ -117,10 +253,10 @@ def get_title_info(logger: logging.Logger) -> Tuple[str, str]:
     # rx_geod = amc.dRTK['INFO']['rx_geod']
 
     # extract from collected information
-    dInfo = dRTK['INFO']
+    dInfo = get_session(dRtk)['INFO']
 
     # print('Info = {!s}'.format(dInfo))
-    logger.info('{func:s}: dInfo =\n{json!s}'.format(func=cFuncName, json=json.dumps(dInfo, sort_keys=False, indent=4, default=amutils.DT_convertor)))
+    logJSON(obj=dInfo, objName='dInfo', callerName=cFuncName, logger=logger, default=amutils.DT_convertor)
 
     marker = dInfo['rx']['marker']
     gnss = dInfo['rx']['gnss']
@@ -0,0 +1,150 @@
+import os
+import sys
+import gzip
+import shutil
+import subprocess
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from termcolor import colored
+
+import am_config as amc
+from ampyutils import location
+
+__author__ = 'amuls'
+
+# codecs run in-process by zlib (gzip / gunzip) and codecs run by an external program (Hatanaka compression)
+INPROCESS_CODECS = ('gzip', 'gunzip')
+EXTERNAL_CODECS = ('rnx2crz', 'crz2rnx')
+
+GZIP_LEVEL = 6  # default level of the gzip program
+COMPRESS_CHUNK_SIZE = 1024 * 1024
+
+# result of a (de)compression: file sizes before / after, ratio compressed / uncompressed size, duration and error
+CompressResult = namedtuple('CompressResult', ['codec', 'src', 'dst', 'size_in', 'size_out', 'ratio', 'seconds', 'error'])
+
+
+def codec_output(codec: str, src: str) -> str:
+    """
+    codec_output returns the name of the file created by the codec from src (as named by gzip, rnx2crz, ...)
+    """
+    if codec == 'gzip':
+        return src + '.gz'
+    if codec == 'gunzip':
+        return src[:-3] if src.endswith('.gz') else src[:-2]
+    if codec == 'rnx2crz':
+        # RINEX v3 names (.rnx) or RINEX v2 names (ending on 'O')
+        return src[:-4] + '.crx.gz' if src.endswith('.rnx') else src[:-1] + 'D.Z'
+    if codec == 'crz2rnx':
+        return src[:-7] + '.rnx' if src.endswith('.crx.gz') else src[:-3] + 'O'
+    raise ValueError('unknown codec {codec:s}'.format(codec=codec))
+
+
+def _zlib_codec(codec: str, src: str, dst: str, level: int):
+    """
+    _zlib_codec (de)compresses src into dst in-process, keeping the time stamp and removing src as gzip does
+    """
+    stat = os.stat(src)
+    tmp_dst = '{dst:s}.{pid:d}'.format(dst=dst, pid=os.getpid())
+
+    try:
+        if codec == 'gzip':
+            with open(src, 'rb') as fin, open(tmp_dst, 'wb') as fraw, gzip.GzipFile(filename=os.path.basename(src), mode='wb', compresslevel=level, fileobj=fraw, mtime=stat.st_mtime) as fout:
+                shutil.copyfileobj(fin, fout, COMPRESS_CHUNK_SIZE)
+        else:
+            with gzip.open(src, 'rb') as fin, open(tmp_dst, 'wb') as fout:
+                shutil.copyfileobj(fin, fout, COMPRESS_CHUNK_SIZE)
+
+        os.utime(tmp_dst, (stat.st_atime, stat.st_mtime))
+        os.replace(tmp_dst, dst)
+    finally:
+        if os.path.exists(tmp_dst):
+            os.remove(tmp_dst)
+
+    os.remove(src)
+
+
+def run_codec(codec: str, src: str, prog: str = None, level: int = GZIP_LEVEL) -> CompressResult:
+    """
+    run_codec runs codec on file src (in-process or by the external program prog) and returns its CompressResult
+    """
+    dst = codec_output(codec, src)
+    start = time.perf_counter()
+
+    try:
+        size_in = os.path.getsize(src)
+        if codec in INPROCESS_CODECS:
+            _zlib_codec(codec=codec, src=src, dst=dst, level=level)
+        else:
+            args = [prog, '-f', '-d', src] if codec == 'rnx2crz' else [prog, '-f', src]
+            proc = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if proc.returncode != 0:
+                raise OSError('{prog:s} returned error code {code:d}: {err:s}'.format(prog=os.path.basename(prog), code=proc.returncode, err=proc.stderr.decode(errors='replace').strip()))
+        size_out = os.path.getsize(dst)
+    except (OSError, EOFError, ValueError) as e:
+        return CompressResult(codec=codec, src=src, dst=dst, size_in=None, size_out=None, ratio=None, seconds=time.perf_counter() - start, error=e)
+
+    ratio = min(size_in, size_out) / max(size_in, size_out, 1)
+    return CompressResult(codec=codec, src=src, dst=dst, size_in=size_in, size_out=size_out, ratio=ratio, seconds=time.perf_counter() - start, error=None)
+
+
+class CompressionService:
+    """
+    Runs the (de)compression of files on a pool of workers sized to the number of cores. gzip / gunzip run in-process
+    (zlib releases the GIL), the Hatanaka codecs run their external program located on first use.
+    """
+
+    def __init__(self, workers: int = None, level: int = GZIP_LEVEL, progs: dict = None, logger: logging.Logger = None):
+        self.workers = workers or os.cpu_count()
+        self.level = level
+        self.progs = dict(progs) if progs is not None else {}
+        self.logger = logger
+
+    def _prog(self, codec: str) -> str:
+        if codec not in self.progs:
+            self.progs[codec] = location.locateProg(codec, self.logger)
+        return self.progs[codec]
+
+    def run(self, jobs: list) -> list:
+        """
+        run (de)compresses the (codec, file) jobs concurrently and returns their CompressResult in the same order
+        """
+        for codec, _ in jobs:
+            if codec not in INPROCESS_CODECS + EXTERNAL_CODECS:
+                raise ValueError('unknown codec {codec:s}'.format(codec=codec))
+        progs = [self._prog(codec) if codec in EXTERNAL_CODECS else None for codec, _ in jobs]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(jobs)))) as executor:
+            futures = [executor.submit(run_codec, codec, src, prog, self.level) for (codec, src), prog in zip(jobs, progs)]
+
+        results = [future.result() for future in futures]
+        if self.logger is not None:
+            report_compression(results=results, logger=self.logger)
+
+        return results
+
+
+def report_compression(results: list, logger: logging.Logger):
+    """
+    report_compression logs the sizes, ratio and timing per file
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    for res in results:
+        if res.error is None:
+            logger.info('{func:s}: {codec:>7s} {src:s} -> {dst:s}: {size_in:d} -> {size_out:d} bytes (ratio {ratio:.3f}) in {secs:.2f} s'.format(codec=res.codec, src=os.path.basename(res.src), dst=colored(os.path.basename(res.dst), 'green'), size_in=res.size_in, size_out=res.size_out, ratio=res.ratio, secs=res.seconds, func=cFuncName))
+        else:
+            logger.error('{func:s}: {codec:>7s} {src:s} failed: {err!s}'.format(codec=res.codec, src=colored(os.path.basename(res.src), 'red'), err=res.error, func=cFuncName))
+
+
+def compress_files(jobs: list, logger: logging.Logger, progs: dict = None, workers: int = None) -> list:
+    """
+    compress_files runs the (codec, file) jobs on a CompressionService and exits when a job failed
+    """
+    results = CompressionService(workers=workers, progs=progs, logger=logger).run(jobs)
+
+    if any(res.error is not None for res in results):
+        sys.exit(amc.E_FAILURE)
+
+    return results
@@ -1,65 +1,333 @@
-import urllib
-# import requests
+import os
+import sys
+import ftplib
+import hashlib
+import http.client
+import logging
+import shutil
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from termcolor import colored
 
+__author__ = 'amuls'
 
-def download_file(url, localName):
+# local mirror of the downloaded products, organised as <mirror>/<server>/<remote path>
+MIRROR_DIR = os.path.join(os.path.expanduser('~'), 'RxTURP', 'BEGPIOS', 'mirror')
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_CONNECTIONS = 4
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_TIMEOUT = 60
+
+# product to download: remote url, optional local copy and optional checksum as 'algorithm:hexdigest' (eg 'md5:...')
+Product = namedtuple('Product', ['url', 'local', 'checksum'])
+Product.__new__.__defaults__ = (None, None)
+
+# outcome of a download: mirror file, size, whether it came from the mirror / was resumed, and the error if failed
+DownloadResult = namedtuple('DownloadResult', ['url', 'mirror', 'local', 'size', 'cached', 'resumed', 'error'])
+
+
+class DownloadError(IOError):
     """
-    download_file downloads a requested url from a server and stores the information locally
+    A download failure that is not solved by retrying (eg file not found on the server)
     """
-    # handle proxy if needed
-    # proxyExist = ping('proxy.intra.ma.ac.be')
-    # print('ping = {!s}'.format(proxyExist))
-    # if proxyExist:
-    proxy = urllib.request.ProxyHandler({'http': 'proxy.intra.mil.be'})
-    opener = urllib.request.build_opener(proxy)
-    remote = opener.open(url)
-    # else:
-    #     url_request = urllib.request.Request(url)
-    #     remote = urllib.request.urlopen(url_request)
 
-    # open local file
-    fdLocal = open(localName, 'wb')
 
-    chunk_size = 1024
+def file_checksum(file_name: str, algorithm: str) -> str:
+    """
+    file_checksum returns the hex digest of the file using the hashlib algorithm
+    """
+    digest = hashlib.new(algorithm)
+    with open(file_name, 'rb') as fin:
+        for chunk in iter(lambda: fin.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    data = remote.read(chunk_size)
-    while data:
-        fdLocal.write(data)
-        data = remote.read(chunk_size)
-    fdLocal.close()
-    remote.close()
 
-    # print('done download')
+def checksum_ok(file_name: str, checksum: str) -> bool:
+    """
+    checksum_ok verifies the file against a checksum 'algorithm:hexdigest', true when no checksum is given
+    """
+    if checksum is None:
+        return True
+    algorithm, hexdigest = checksum.split(':', 1)
+    return file_checksum(file_name, algorithm) == hexdigest.lower()
+
+
+class FTPConnection:
+    """
+    A logged in FTP (or FTPS) connection in binary mode
+    """
+
+    def __init__(self, parts, user: str, passwd: str, timeout: float):
+        self.ftp = ftplib.FTP_TLS(timeout=timeout) if parts.scheme == 'ftps' else ftplib.FTP(timeout=timeout)
+        self.ftp.connect(parts.hostname, parts.port or 21)
+        self.ftp.login(user=parts.username or user, passwd=parts.password or passwd)
+        if parts.scheme == 'ftps':
+            self.ftp.prot_p()
+        self.ftp.voidcmd('TYPE I')
 
-    # # download_file('ftp://gssc.esa.int/gnss/data/daily/2019/100/BRUX00BEL_R_20191000000_01D_EN.rnx.gz')
+    def fetch(self, parts, fout, offset: int) -> int:
+        """
+        fetch appends the remote file from offset on to fout and returns the size of the remote file (None if unknown)
+        """
+        # the url path is relative to the login directory
+        path = parts.path.lstrip('/')
+        try:
+            size = self.ftp.size(path)
+        except ftplib.error_perm as e:
+            # only 550 means the file is missing, servers without SIZE (500 / 502) still serve it by RETR
+            if str(e).startswith('550'):
+                raise DownloadError('{path:s}: {err!s}'.format(path=path, err=e))
+            size = None
 
-    # try:
-    #     r = requests.get(url, stream=True)
-    #     print('r = %s' % type(r))
-    #     with open('/tmp/BRUX.nav.gz', 'wb') as f:
-    #         for chunk in r.iter_content(chunk_size=1024):
-    #             if chunk:  # filter out keep-alive new chunks
-    #                 f.write(chunk)
-    #                 f.flush()
-    #                 # f.flush() commented by recommendation from J.F.Sebastian
-    #                 os.fsync(f)
-    # except (requests.exceptions.ConnectionError):
-    #     sys.stderr.write('Connection to NORAD could not be established.\n')
+        if size is not None and offset > size:
+            fout.truncate(0)
+            offset = 0
+        if size is None or offset < size:
+            self.ftp.retrbinary('RETR {path:s}'.format(path=path), fout.write, blocksize=DOWNLOAD_CHUNK_SIZE, rest=offset if offset > 0 else None)
 
-    # print('done download 2')
+        return size
 
+    def close(self):
+        try:
+            self.ftp.quit()
+        except Exception:
+            self.ftp.close()
 
-def ping(host: str) -> bool:
+
+class HTTPConnection:
     """
-    Returns True if host responds to a ping request
+    A persistent (keep-alive) HTTP(S) connection, optionally through a proxy
     """
-    import subprocess
-    import platform
 
-    # Ping parameters as function of OS
-    ping_str = "-n 1" if platform.system().lower() == "windows" else "-c 1"
-    args = "ping " + " " + ping_str + " " + host
-    need_sh = False if platform.system().lower() == "windows" else True
+    def __init__(self, parts, proxy: str, timeout: float):
+        self.proxied = proxy is not None and parts.scheme == 'http'
+        if parts.scheme == 'https':
+            self.conn = http.client.HTTPSConnection(proxy or parts.netloc, timeout=timeout)
+            if proxy is not None:
+                self.conn.set_tunnel(parts.netloc)
+        else:
+            self.conn = http.client.HTTPConnection(proxy or parts.netloc, timeout=timeout)
+
+    def fetch(self, parts, fout, offset: int) -> int:
+        """
+        fetch appends the remote file from offset on to fout using a range request and returns the size of the
+        remote file (None if unknown)
+        """
+        headers = {'Range': 'bytes={offset:d}-'.format(offset=offset)} if offset > 0 else {}
+        self.conn.request('GET', parts.geturl() if self.proxied else parts.path, headers=headers)
+        resp = self.conn.getresponse()
+
+        if resp.status == 416:
+            # range starts at the end, the partial file is complete
+            resp.read()
+            return offset
+        if resp.status == 206:
+            size = int(resp.getheader('Content-Range').rsplit('/', 1)[1])
+        elif resp.status == 200:
+            # server ignored the range request, restart from scratch
+            fout.truncate(0)
+            size = int(resp.getheader('Content-Length')) if resp.getheader('Content-Length') else None
+        else:
+            resp.read()
+            raise DownloadError('{url:s}: HTTP {status:d} {reason:s}'.format(url=parts.geturl(), status=resp.status, reason=resp.reason))
+
+        for chunk in iter(lambda: resp.read(DOWNLOAD_CHUNK_SIZE), b''):
+            fout.write(chunk)
+
+        return size
+
+    def close(self):
+        self.conn.close()
+
+
+class ConnectionPool:
+    """
+    Keeps the open connections per server for reuse, with at most max_connections connections to a server in use
+    """
+
+    def __init__(self, max_connections: int, user: str, passwd: str, proxy: str, timeout: float):
+        self.max_connections = max_connections
+        self.user = user
+        self.passwd = passwd
+        self.proxy = proxy
+        self.timeout = timeout
+
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.slots = {}
+
+    def _open(self, parts):
+        if parts.scheme in ('ftp', 'ftps'):
+            return FTPConnection(parts=parts, user=self.user, passwd=self.passwd, timeout=self.timeout)
+        if parts.scheme in ('http', 'https'):
+            return HTTPConnection(parts=parts, proxy=self.proxy, timeout=self.timeout)
+        raise DownloadError('unsupported protocol {scheme:s}'.format(scheme=parts.scheme))
+
+    @contextmanager
+    def connection(self, parts):
+        """
+        connection lends an (idle or new) connection to the server of parts, a connection that raised is discarded
+        """
+        key = (parts.scheme, parts.hostname, parts.port, parts.username)
+        with self.lock:
+            slot = self.slots.setdefault(key, threading.Semaphore(self.max_connections))
+            idle = self.idle.setdefault(key, [])
+
+        with slot:
+            with self.lock:
+                conn = idle.pop() if idle else None
+            if conn is None:
+                conn = self._open(parts)
+
+            try:
+                yield conn
+            except BaseException:
+                conn.close()
+                raise
+
+            with self.lock:
+                idle.append(conn)
+
+    def close(self):
+        with self.lock:
+            for conns in self.idle.values():
+                for conn in conns:
+                    conn.close()
+            self.idle = {}
+
+
+class DownloadManager:
+    """
+    Downloads products concurrently over a pool of persistent FTP / HTTP connections into a local mirror. Products
+    present in the mirror are never fetched again, interrupted downloads are resumed from the partial file and
+    downloads are verified against the remote size and the optional checksum.
+    """
+
+    def __init__(self, mirror_dir: str = MIRROR_DIR, max_connections: int = MAX_CONNECTIONS, max_workers: int = None, user: str = 'anonymous', passwd: str = '', proxy: str = None, timeout: float = DOWNLOAD_TIMEOUT, retries: int = DOWNLOAD_RETRIES, logger: logging.Logger = None):
+        self.mirror_dir = mirror_dir
+        self.max_workers = max_workers or 2 * max_connections
+        self.retries = retries
+        self.logger = logger
+        self.pool = ConnectionPool(max_connections=max_connections, user=user, passwd=passwd, proxy=proxy, timeout=timeout)
+
+        self.lock = threading.Lock()
+        self.mirror_locks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+
+    def _log(self, level: int, msg: str):
+        if self.logger is not None:
+            self.logger.log(level, msg)
+
+    def mirror_path(self, url: str) -> str:
+        parts = urlsplit(url)
+        return os.path.join(self.mirror_dir, parts.hostname, parts.path.lstrip('/'))
+
+    def _download(self, parts, mirror: str, checksum: str) -> bool:
+        """
+        _download fetches the remote file into mirror, resuming a partial download, and returns whether it resumed
+        """
+        cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+        part = mirror + '.part'
+        os.makedirs(os.path.dirname(mirror), exist_ok=True)
+        resumed = os.path.isfile(part) and os.path.getsize(part) > 0
+
+        for attempt in range(1, self.retries + 1):
+            offset = os.path.getsize(part) if os.path.isfile(part) else 0
+            try:
+                with self.pool.connection(parts) as conn, open(part, 'ab') as fout:
+                    size = conn.fetch(parts=parts, fout=fout, offset=offset)
+                break
+            except DownloadError:
+                raise
+            except (OSError, EOFError, ftplib.Error, http.client.HTTPException) as e:
+                self._log(logging.WARNING, '{func:s}: attempt {nr:d} downloading {url:s} failed: {err!s}'.format(nr=attempt, url=parts.geturl(), err=e, func=cFuncName))
+                if attempt == self.retries:
+                    raise
+                resumed = True
+
+        if size is not None and os.path.getsize(part) != size:
+            raise IOError('{url:s}: downloaded {nr:d} of {size:d} bytes'.format(url=parts.geturl(), nr=os.path.getsize(part), size=size))
+        if not checksum_ok(part, checksum):
+            os.remove(part)
+            raise IOError('{url:s}: checksum mismatch'.format(url=parts.geturl()))
+
+        os.replace(part, mirror)
+        return resumed
+
+    def fetch(self, product: Product) -> DownloadResult:
+        """
+        fetch makes the product available in the mirror (downloading it when absent) and links or copies it to its
+        local name when given. Errors are returned in the result.
+        """
+        cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+        mirror = self.mirror_path(product.url)
+        with self.lock:
+            mirror_lock = self.mirror_locks.setdefault(mirror, threading.Lock())
+
+        cached = resumed = False
+        try:
+            with mirror_lock:
+                cached = os.path.isfile(mirror) and checksum_ok(mirror, product.checksum)
+                if cached:
+                    self._log(logging.INFO, '{func:s}: {url:s} found in mirror'.format(url=colored(product.url, 'green'), func=cFuncName))
+                else:
+                    self._log(logging.INFO, '{func:s}: downloading {url:s}'.format(url=colored(product.url, 'green'), func=cFuncName))
+                    resumed = self._download(parts=urlsplit(product.url), mirror=mirror, checksum=product.checksum)
+
+            if product.local is not None:
+                install_file(src=mirror, dst=product.local)
+        except Exception as e:
+            self._log(logging.ERROR, '{func:s}: downloading {url:s} failed: {err!s}'.format(url=colored(product.url, 'red'), err=e, func=cFuncName))
+            return DownloadResult(url=product.url, mirror=mirror, local=product.local, size=None, cached=cached, resumed=resumed, error=e)
+
+        return DownloadResult(url=product.url, mirror=mirror, local=product.local, size=os.path.getsize(mirror), cached=cached, resumed=resumed, error=None)
+
+    def fetch_all(self, products: list) -> list:
+        """
+        fetch_all fetches the products concurrently and returns their results in the same order
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self.fetch, products))
+
+
+def install_file(src: str, dst: str):
+    """
+    install_file makes dst a hard link to src, or a copy when linking is not possible (eg another file system)
+    """
+    if os.path.isfile(dst) and os.path.samefile(src, dst):
+        return
+
+    dst_dir = os.path.dirname(os.path.abspath(dst))
+    os.makedirs(dst_dir, exist_ok=True)
+    tmp_dst = '{dst:s}.{pid:d}.{tid:d}'.format(dst=dst, pid=os.getpid(), tid=threading.get_ident())
+    try:
+        os.link(src, tmp_dst)
+    except OSError:
+        shutil.copyfile(src, tmp_dst)
+    os.replace(tmp_dst, dst)
+
+
+def download_file(url, localName, proxy=None):
+    """
+    download_file downloads a requested url from a server and stores the information locally
+    """
+    with DownloadManager(proxy=proxy) as manager:
+        result = manager.fetch(Product(url=url, local=localName))
 
-    # Ping
-    return (subprocess.call(args, shell=need_sh) == 0)
+    if result.error is not None:
+        raise result.error
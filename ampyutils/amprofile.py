@@ -0,0 +1,233 @@
+import sys
+import os
+import time
+import json
+import logging
+import inspect
+import functools
+import platform
+from collections import namedtuple
+from contextlib import contextmanager
+from termcolor import colored
+
+try:
+    import resource
+except ImportError:  # not available on Windows, peak RSS is then not reported
+    resource = None
+
+__author__ = 'amuls'
+
+# profilers that can be hooked into a run (pyinstrument is optional)
+PROFILERS = ('cprofile', 'pyinstrument')
+
+# statistics of one stage: wall and CPU time (s), rows processed, rows per wall second, peak RSS of the process at
+# the end of the stage and its increase by the stage (MB)
+StageStats = namedtuple('StageStats', ['name', 'wall', 'cpu', 'rows', 'throughput', 'peak_rss', 'rss_increase'])
+
+# the report stages are recorded in by the stage_timer decorator
+_active_report = None
+
+
+def peak_rss() -> float:
+    """
+    peak_rss returns the peak resident set size of the process in MB (None when not available)
+    """
+    if resource is None:
+        return None
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in kB elsewhere
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def rows_of(obj) -> int:
+    """
+    rows_of returns the number of rows of a dataframe / array / sequence, or of the first one in a returned tuple
+    """
+    if obj is None:
+        return None
+    if hasattr(obj, 'shape'):
+        return obj.shape[0] if len(obj.shape) > 0 else None
+    if isinstance(obj, tuple):
+        return next((nr for nr in (rows_of(item) for item in obj) if nr is not None), None)
+    if isinstance(obj, list):
+        return len(obj)
+    return None
+
+
+class StageProbe:
+    """
+    Handed out by RunReport.stage, the stage sets rows to the number of rows it processed
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = None
+
+
+class RunReport:
+    """
+    Collects the timing and memory statistics of the stages of a run and writes them as a JSON report. Optionally
+    the run is profiled by cProfile or pyinstrument, the profile is written next to the report.
+    """
+
+    def __init__(self, name: str, logger: logging.Logger = None, profiler: str = None, activate: bool = True):
+        global _active_report
+
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError('unknown profiler {prof:s}'.format(prof=profiler))
+
+        self.name = name
+        self.logger = logger
+        self.stages = []
+        self.start_time = time.time()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+        self.profiler = profiler
+        self._profiler = None
+        if profiler == 'cprofile':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif profiler == 'pyinstrument':
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self._profiler.start()
+
+        if activate:
+            _active_report = self
+
+    @contextmanager
+    def stage(self, name: str, rows: int = None):
+        """
+        stage records the wall / CPU time, rows and peak RSS of the code run in its block
+        """
+        probe = StageProbe(name=name)
+        probe.rows = rows
+        rss0 = peak_rss()
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+
+        try:
+            yield probe
+        finally:
+            wall = time.perf_counter() - wall0
+            cpu = time.process_time() - cpu0
+            rss = peak_rss()
+            self.add_stage(StageStats(name=name, wall=wall, cpu=cpu, rows=probe.rows, throughput=probe.rows / wall if probe.rows and wall > 0 else None, peak_rss=rss, rss_increase=rss - rss0 if rss is not None else None))
+
+    def add_stage(self, stats: StageStats):
+        """
+        add_stage adds the statistics of a stage to the report
+        """
+        self.stages.append(stats)
+
+        if self.logger is not None:
+            cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+            self.logger.debug('{func:s}: stage {stage:s} took {wall:.3f} s (cpu {cpu:.3f} s), rows {rows!s}, peak RSS {rss!s} MB'.format(func=cFuncName, stage=colored(stats.name, 'green'), wall=stats.wall, cpu=stats.cpu, rows=stats.rows, rss=None if stats.peak_rss is None else round(stats.peak_rss, 1)))
+
+    def summary(self) -> dict:
+        """
+        summary returns the report as a dict: run information, the stages in order and the totals per stage name
+        """
+        totals = {}
+        for stats in self.stages:
+            total = totals.setdefault(stats.name, {'calls': 0, 'wall': 0., 'cpu': 0., 'rows': 0})
+            total['calls'] += 1
+            total['wall'] += stats.wall
+            total['cpu'] += stats.cpu
+            total['rows'] += stats.rows or 0
+
+        return {'run': self.name,
+                'start': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.start_time)),
+                'python': platform.python_version(),
+                'host': platform.node(),
+                'wall': time.perf_counter() - self._wall0,
+                'cpu': time.process_time() - self._cpu0,
+                'peak_rss': peak_rss(),
+                'profiler': self.profiler,
+                'stages': [stats._asdict() for stats in self.stages],
+                'totals': totals}
+
+    def stop_profiler(self, report_name: str) -> str:
+        """
+        stop_profiler stops the profiler and writes its output next to the report, returns the name of the profile
+        """
+        if self._profiler is None:
+            return None
+
+        base_name = os.path.splitext(report_name)[0]
+        if self.profiler == 'cprofile':
+            self._profiler.disable()
+            prof_name = base_name + '.prof'
+            self._profiler.dump_stats(prof_name)
+        else:
+            self._profiler.stop()
+            prof_name = base_name + '.html'
+            with open(prof_name, 'w') as fout:
+                fout.write(self._profiler.output_html())
+        self._profiler = None
+
+        return prof_name
+
+    def write(self, report_name: str) -> dict:
+        """
+        write writes the report (and the profile when profiling) and logs the time spent per stage
+        """
+        global _active_report
+
+        prof_name = self.stop_profiler(report_name=report_name)
+        dReport = self.summary()
+        dReport['profile'] = prof_name
+
+        with open(report_name, 'w') as fout:
+            json.dump(dReport, fout, ensure_ascii=False, indent=4)
+
+        if _active_report is self:
+            _active_report = None
+
+        if self.logger is not None:
+            cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+            for stage, total in sorted(dReport['totals'].items(), key=lambda item: item[1]['wall'], reverse=True):
+                self.logger.info('{func:s}: {stage:<40s} {calls:3d} calls {wall:8.3f} s wall {cpu:8.3f} s cpu {rows:>10d} rows'.format(func=cFuncName, stage=stage, **total))
+            self.logger.info('{func:s}: run took {wall:.3f} s (cpu {cpu:.3f} s), report in {report:s}'.format(func=cFuncName, wall=dReport['wall'], cpu=dReport['cpu'], report=colored(report_name, 'green')))
+            if prof_name is not None:
+                self.logger.info('{func:s}: {prof:s} profile in {name:s}'.format(func=cFuncName, prof=self.profiler, name=colored(prof_name, 'green')))
+
+        return dReport
+
+
+def active_report() -> RunReport:
+    """
+    active_report returns the report stages are recorded in (None when the run is not instrumented)
+    """
+    return _active_report
+
+
+def stage_timer(name: str = None, rows: str = None):
+    """
+    stage_timer decorates a parse / statistics / plot function so that its calls are recorded as a stage in the active
+    report. The rows processed are taken from the argument named rows, else from the returned dataframe.
+    """
+    def decorator(func):
+        stage_name = name or '{mod:s}.{func:s}'.format(mod=func.__module__.split('.')[-1], func=func.__name__)
+        signature = inspect.signature(func) if rows is not None else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            report = _active_report
+            if report is None:
+                return func(*args, **kwargs)
+
+            with report.stage(stage_name) as probe:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    probe.rows = rows_of(signature.bind(*args, **kwargs).arguments.get(rows))
+                else:
+                    probe.rows = rows_of(result)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -4,7 +4,6 @@ import sys
 import errno
 import os
 from termcolor import colored
-import webcolors
 import gzip
 import shutil
 import logging
@@ -12,11 +11,10 @@ from pandas import DataFrame
 import subprocess
 from datetime import datetime
 from typing import Tuple
-import matplotlib._color_data as mcd
+from collections import namedtuple
 import enum
 import numpy as np
 import pandas as pd
-from tabulate import tabulate
 
 from ampyutils import exeprogram
 from GNSS import gpstime
@@ -24,6 +22,10 @@ import am_config as amc
 
 __author__ = 'amuls'
 
+# subprocess run by run_subprocesses: unique name, program with its arguments and names of the jobs to run after
+SubprocessJob = namedtuple('SubprocessJob', ['name', 'args', 'after'])
+SubprocessJob.__new__.__defaults__ = ((),)
+
 
 # Enum for size units
 class SIZE_UNIT(enum.Enum):
@@ -142,6 +144,10 @@ def printHeadTailDataFrame(df: pd.DataFrame, name: str, index: str = True, head:
     :param index: display the index of the dataframe or not
     :type: bool
     """
+    # nothing is printed in quiet (batch) mode
+    if amc.quiet:
+        return
+
     if df.shape[0] <= (head + tail):
         print('\n   ...  %s (size %d)\n%s' % (colored(name, 'green'), df.shape[0], df.to_string(index=index)))
     else:
@@ -151,10 +157,11 @@ def printHeadTailDataFrame(df: pd.DataFrame, name: str, index: str = True, head:
 
 
 def pprint_df(dframe: pd.DataFrame, tablefmt: str = 'simple'):
+    from tabulate import tabulate
     print(tabulate(dframe, headers='keys', tablefmt=tablefmt, showindex=False))
 
 
-def logHeadTailDataFrame(logger: logging.Logger, callerName: str, df: DataFrame, dfName: str = 'DataFrame', head: int = 10, tail: int = 10, index: bool = True):
+def logHeadTailDataFrame(logger: logging.Logger, callerName: str, df: DataFrame, dfName: str = 'DataFrame', head: int = 10, tail: int = 10, index: bool = True, level: int = logging.INFO):
     """
     logHeadTailDataFrame logs the head first/tail last rows of the dataframe df
 
@@ -168,16 +175,22 @@ def logHeadTailDataFrame(logger: logging.Logger, callerName: str, df: DataFrame,
     :type tail: int
     :param index: display th eindex of the dataframe or not
     :type: bool
+    :param level: log level of the head / tail, the dtypes are logged at DEBUG
+    :type: int
     """
     # cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    print('{func:s}: dataframe {dfname:s} dtypes\n{dtypes!s}'.format(dtypes=df.dtypes, dfname=colored(dfName, 'green'), func=callerName))
+    # the dataframe is only formatted when a handler writes the message
+    amc.logDiagnostic(logger=logger, msgFunc=lambda: '{func:s}: dataframe {dfname:s} dtypes\n{dtypes!s}'.format(dtypes=df.dtypes, dfname=colored(dfName, 'green'), func=callerName))
+
+    if not amc.diagnosticsEnabled(logger=logger, level=level):
+        return
 
     if df.shape[0] <= (head + tail):
-        logger.info('{func:s}: dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.to_string(index=index)))
+        logger.log(level, '{func:s}: dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.to_string(index=index)))
     else:
-        logger.info('{func:s}: head of dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.head(n=head).to_string(index=index)))
-        logger.info('{func:s}: tail of dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.tail(n=tail).to_string(index=index)))
+        logger.log(level, '{func:s}: head of dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.head(n=head).to_string(index=index)))
+        logger.log(level, '{func:s}: tail of dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.tail(n=tail).to_string(index=index)))
 
 
 def get_spaced_colors(n):
@@ -205,6 +218,8 @@ def closest_colour(requested_colour):
     :returns min_colours: closest normalised color
     :rtype min_colours: tuple
     """
+    import webcolors
+
     min_colours = {}
     for key, name in webcolors.css3_hex_to_names.items():
         r_c, g_c, b_c = webcolors.hex_to_rgb(key)
@@ -226,6 +241,8 @@ def get_colour_name(requested_colour):
     :returns closest_name: normalised name of closest color
     :rtype closest_name: string
     """
+    import webcolors
+
     try:
         closest_name = actual_name = webcolors.rgb_to_name(requested_colour)
     except ValueError:
@@ -364,6 +381,38 @@ def run_subprocess(sub_proc: list, logger: logging.Logger):
         sys.exit(amc.E_OSERROR)
 
 
+def run_subprocesses(jobs: list, logger: logging.Logger, workers: int = None) -> dict:
+    """
+    run_subprocesses runs the SubprocessJobs with exeprogram.run_many on at most workers (default number of cores)
+    processes, a job starting once the jobs it comes after succeeded. All failures are reported together before
+    exiting. Returns the duration in seconds per job name.
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    names = [job.name for job in jobs]
+    for job in jobs:
+        if set(job.after) - set(names):
+            raise ValueError('job {job:s} comes after unknown jobs {after!s}'.format(job=job.name, after=sorted(set(job.after) - set(names))))
+
+    for job in jobs:
+        logger.info('{func:s}: job {job:s}\n{proc:s}'.format(job=job.name, proc=colored(' '.join(str(arg) for arg in job.args), 'blue'), func=cFuncName))
+
+    try:
+        results = exeprogram.run_many(cmds=[job.args for job in jobs], logger=logger, max_concurrent=workers, after=[[names.index(name) for name in job.after] for job in jobs], stdout_level=logging.DEBUG)
+    except OSError as e:
+        # executable not found
+        logger.error('{func:s}: could not run {proc:s}: {err!s}'.format(func=cFuncName, proc=str(jobs[0].args[0]), err=e))
+        sys.exit(amc.E_OSERROR)
+
+    failures = [(name, result) for name, result in zip(names, results) if result.returncode != 0]
+    for name, result in failures:
+        logger.error('{func:s}: {job:s} {err:s}'.format(job=colored(name, 'red'), err='not run since a job it comes after failed' if result.returncode is None else 'returned error code {code:d}'.format(code=result.returncode), func=cFuncName))
+    if failures:
+        sys.exit(amc.E_SBF2RIN_ERRCODE)
+
+    return {name: result.elapsed for name, result in zip(names, results) if result.start is not None}
+
+
 def DT_convertor(o):
     if isinstance(o, datetime):
         return o.__str__()
@@ -373,7 +422,8 @@ def create_colormap_font(nrcolors: int, font_size: int) -> Tuple[list, dict]:
     """
     create_colormap_font creates a colormap for the number entered and returns a color list and dict with fonts for title and axes
     """
-    # get the color names
+    # get the color names (matplotlib is only loaded when plotting)
+    import matplotlib._color_data as mcd
     color_names = [name for name in mcd.XKCD_COLORS]
     color_step = len(color_names) // nrcolors
     color_used = color_names[::color_step]
@@ -4,7 +4,8 @@ from termcolor import colored
 import sys
 import logging
 import os
-import utm
+from GNSS import wgs84
+from GNSS import refframe
 
 import am_config as amc
 
@@ -13,7 +14,7 @@ def addDeltaUTM(enuRefPt, dfLLH, logger: logging.Logger):
     """
     addDeltaUTM adds the dfference of current position compared to reference location
 
-    :param enuRefPt: (lat,lon) coordinates of reference point
+    :param enuRefPt: (lat,lon,ellH) coordinates of reference point
     :type enuRefPt: dictionary
     :param dfLLH: geodetic coordinates of current point
     :type dfLLH: dataframe
@@ -25,9 +26,15 @@ def addDeltaUTM(enuRefPt, dfLLH, logger: logging.Logger):
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
     # calculate UTM coordiantes of valid positions
-    dfLLH['UTM.E'], dfLLH['UTM.N'], dfLLH['UTM.Z'], dfLLH['UTM.L'] = utm.from_latlon(dfLLH['lat'].to_numpy(), dfLLH['lon'].to_numpy())
+    # project the full track in one call, keeping it in the UTM zone of its first position
+    wgs84.WGS84().projectTrack(dfLLH)
     logger.info('{func:s} ... transformed to UTM coordiantes'.format(func=cFuncName))
 
+    # add the ENU offsets wrt the reference point using its cached reference frame
+    refFrame = refframe.get_ref_frame(enuRefPt['lat'], enuRefPt['lon'], enuRefPt['ellH'])
+    enu = refFrame.lla2enu(dfLLH[['lat', 'lon', 'ellH']].to_numpy())
+    dfLLH['dE'], dfLLH['dN'], dfLLH['dU'] = enu[:, 0], enu[:, 1], enu[:, 2]
+
     # mean delta UTM coordinates
     meanUTM = {}
     meanUTM['UTM.E'] = dfLLH['UTM.E'].mean()
@@ -1,7 +1,12 @@
 import sys
+import os
 from termcolor import colored
 import subprocess
 import time
+import asyncio
+import logging
+import re
+from collections import namedtuple
 
 __author__ = 'amuls'
 
@@ -17,6 +22,14 @@ E_DIR_NOT_EXIST = 7
 E_OSERROR = 10
 E_FAILURE = 99
 
+# result of a program run by run_async: command, exit status (None when killed on timeout / cancel or not run),
+# start time (epoch s), elapsed wall time (s) and timed_out flag
+ProcResult = namedtuple('ProcResult', ['cmd', 'returncode', 'start', 'elapsed', 'timed_out'])
+
+# line separators used when streaming the output pipes (progress output uses carriage returns)
+RE_LINE_SEP = re.compile(rb'\r\n|\r|\n')
+PIPE_CHUNK_SIZE = 65536
+
 
 def exeProg(prog, argsProg, verbose=False):
     """
@@ -98,42 +111,200 @@ def runProg(prog, optProg, verbose=False):
             sys.exit(E_FAILURE)
 
 
+async def _stream_lines(stream: asyncio.StreamReader, on_line):
+    """
+    _stream_lines reads a pipe in chunks and passes each complete line (split at CR and/or LF) to on_line
+    """
+    pending = b''
+    while True:
+        chunk = await stream.read(PIPE_CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = RE_LINE_SEP.split(pending + chunk)
+        pending = lines.pop()
+        for line in lines:
+            if line:
+                on_line(line.decode(encoding='UTF-8', errors='replace'))
+    if pending:
+        on_line(pending.decode(encoding='UTF-8', errors='replace'))
+
+
+def _log_line(logger: logging.Logger, level: int, prefix: str):
+    """
+    returns a callback logging a line of program output at level
+    """
+    return lambda line: logger.log(level, '{prefix:s}: {line:s}'.format(prefix=prefix, line=line))
+
+
+async def run_async(cmd, logger: logging.Logger = None, timeout: float = None, shell: bool = False, cwd: str = None, on_stdout=None, on_stderr=None, stdout_level: int = logging.INFO, stderr_level: int = logging.INFO) -> ProcResult:
+    """
+    run_async runs an external program and streams both its stdout and stderr line by line to the logger (or to the
+    on_stdout / on_stderr callbacks) while it runs, so that neither pipe can fill up
+
+    :param cmd: program with its arguments (list) or command line (str) when shell is True
+    :param timeout: maximum run time in seconds, the program is killed when exceeded
+    :returns: ProcResult with exit status and timings
+    """
+    strargs = [str(arg) for arg in cmd] if not shell else cmd
+    prog = os.path.basename(strargs[0]) if not shell else cmd.split()[0]
+
+    if on_stdout is None:
+        on_stdout = _log_line(logger, stdout_level, prog) if logger is not None else (lambda line: None)
+    if on_stderr is None:
+        on_stderr = _log_line(logger, stderr_level, prog) if logger is not None else (lambda line: None)
+
+    t_start = time.time()
+    t_nought = time.perf_counter()
+    if shell:
+        proc = await asyncio.create_subprocess_shell(cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, cwd=cwd)
+    else:
+        proc = await asyncio.create_subprocess_exec(*strargs, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, cwd=cwd)
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(asyncio.gather(_stream_lines(proc.stdout, on_stdout), _stream_lines(proc.stderr, on_stderr), proc.wait()), timeout=timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        proc.kill()
+        await proc.wait()
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
+
+    returncode = None if timed_out else proc.returncode
+    result = ProcResult(cmd=cmd, returncode=returncode, start=t_start, elapsed=time.perf_counter() - t_nought, timed_out=timed_out)
+
+    if logger is not None:
+        if timed_out:
+            logger.error('{prog:s}: killed after timeout of {tmo:.1f} s'.format(prog=colored(prog, 'red'), tmo=timeout))
+        elif returncode != 0:
+            logger.error('{prog:s}: returned exit status {rc:d} after {dt:.2f} s'.format(prog=colored(prog, 'red'), rc=returncode, dt=result.elapsed))
+        else:
+            logger.info('{prog:s}: finished in {dt:.2f} s'.format(prog=colored(prog, 'green'), dt=result.elapsed))
+
+    return result
+
+
+def job_order(after: list) -> list:
+    """
+    job_order returns the indices of the commands with every command after the ones it waits for (after gives per
+    command the indices of those commands), raises ValueError on an unknown index or a cycle
+    """
+    order = []
+    visiting = set()
+    visited = set()
+
+    def visit(nr: int):
+        if nr in visited:
+            return
+        if nr in visiting:
+            raise ValueError('dependency cycle through command {nr:d}'.format(nr=nr))
+        visiting.add(nr)
+        for dep in after[nr]:
+            if not 0 <= dep < len(after):
+                raise ValueError('command {nr:d} waits for unknown command {dep:d}'.format(nr=nr, dep=dep))
+            visit(dep)
+        visiting.discard(nr)
+        visited.add(nr)
+        order.append(nr)
+
+    for nr in range(len(after)):
+        visit(nr)
+    return order
+
+
+async def run_many_async(cmds: list, logger: logging.Logger = None, max_concurrent: int = None, timeout: float = None, shell: bool = False, after: list = None, stdout_level: int = logging.INFO, stderr_level: int = logging.INFO) -> list:
+    """
+    run_many_async runs the commands concurrently with at most max_concurrent (default the number of cores) running
+    at the same time and returns their ProcResults in the order of cmds. after optionally gives per command the
+    indices of the commands it waits for, a command is not run (returncode None, not timed out) when one of those
+    did not succeed. Dependency cycles are rejected before any command runs.
+    """
+    after = [list(deps) for deps in after] if after is not None else [[] for _ in cmds]
+    order = job_order(after)
+
+    semaphore = asyncio.Semaphore(max_concurrent or os.cpu_count() or 1)
+    tasks = {}
+
+    async def run_limited(nr: int):
+        deps = await asyncio.gather(*[tasks[dep] for dep in after[nr]])
+        if any(dep.returncode != 0 for dep in deps):
+            return ProcResult(cmd=cmds[nr], returncode=None, start=None, elapsed=0., timed_out=False)
+        async with semaphore:
+            return await run_async(cmd=cmds[nr], logger=logger, timeout=timeout, shell=shell, stdout_level=stdout_level, stderr_level=stderr_level)
+
+    for nr in order:
+        tasks[nr] = asyncio.ensure_future(run_limited(nr))
+
+    return await asyncio.gather(*[tasks[nr] for nr in range(len(cmds))])
+
+
+def _run_coroutine(coro):
+    """
+    runs a coroutine to completion on a new event loop
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def run_cmd(cmd, logger: logging.Logger = None, timeout: float = None, shell: bool = False, cwd: str = None) -> ProcResult:
+    """
+    run_cmd runs an external program with run_async and waits for its completion
+    """
+    return _run_coroutine(run_async(cmd=cmd, logger=logger, timeout=timeout, shell=shell, cwd=cwd))
+
+
+def run_many(cmds: list, logger: logging.Logger = None, max_concurrent: int = None, timeout: float = None, shell: bool = False, after: list = None, stdout_level: int = logging.INFO, stderr_level: int = logging.INFO) -> list:
+    """
+    run_many runs the commands concurrently (see run_many_async) and waits for all of them to complete
+    """
+    return _run_coroutine(run_many_async(cmds=cmds, logger=logger, max_concurrent=max_concurrent, timeout=timeout, shell=shell, after=after, stdout_level=stdout_level, stderr_level=stderr_level))
+
+
+def subProcessLogStdErr(command: str, logger: logging.Logger, timeout: float = None) -> int:
+    """
+    subProcessLogStdErr runs the command line and logs its stdout and stderr while it runs
+
+    :returns: exit status of the command
+    """
+    return run_cmd(cmd=command, logger=logger, timeout=timeout, shell=True).returncode
+
+
+def _display(line: str):
+    sys.stdout.write(line + '\n')
+    sys.stdout.flush()
+
+
 def subProcessDisplayStdErr(cmd, verbose=False):
     """
     subProcessDisplayStdErr runs the cmd and displays in real time the stderr of this process
 
     :param cmd: contains the program to run with its arguments
     :type cmd: string
+    :returns: exit status of cmd
     """
-    sub_process = subprocess.Popen(cmd, close_fds=True, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    result = run_cmd(cmd=cmd, shell=True) if not verbose else _run_coroutine(run_async(cmd=cmd, shell=True, on_stderr=_display))
 
-    while sub_process.poll() is None:
-        out = sub_process.stderr.read(1)
-        if verbose:
-            sys.stdout.write(out.decode(encoding='UTF-8'))
-            sys.stdout.flush()
-
-    if verbose:
-        sys.stdout.write('\n')
+    return result.returncode
 
 
 def subProcessDisplayStdOut(cmd, verbose=False):
     """
-    subProcessDisplayStdErr runs the cmd and displays in real time the stderr of this process
+    subProcessDisplayStdOut runs the cmd and displays in real time the stdout of this process
 
     :param cmd: contains the program to run with its arguments
     :type cmd: string
+    :returns: exit status of cmd
     """
     if verbose:
         print('   Executing cmd: %s' % cmd)
 
-    sub_process = subprocess.Popen(cmd, close_fds=True, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    while sub_process.poll() is None:
-        out = sub_process.stdout.read(1)
-        if verbose:
-            sys.stdout.write(out.decode(encoding='UTF-8'))
-            sys.stdout.flush()
+    result = run_cmd(cmd=cmd, shell=True) if not verbose else _run_coroutine(run_async(cmd=cmd, shell=True, on_stdout=_display))
 
-    if verbose:
-        sys.stdout.write('\n')
+    return result.returncode
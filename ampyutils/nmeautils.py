@@ -1,4 +1,27 @@
+import functools
+import queue
+import threading
+import numpy as np
+from datetime import datetime, timedelta
 
+# size of the chunks read from a file or stream and maximum number of chunks waiting to be decoded
+NMEA_CHUNK_SIZE = 65536
+NMEA_MAX_PENDING = 16
+
+# number of sentences collected before they are decoded into columns
+NMEA_DECODE_BATCH = 50000
+
+# decoded sentences and their number of fields (without the address field)
+dNMEAFields = {'GGA': 14, 'RMC': 12, 'GSA': 18, 'GSV': 19, 'GST': 8}
+
+# system letter per talker for the PRNs in GSV
+dNMEATalkers = {'GP': 'G', 'GL': 'R', 'GA': 'E', 'GB': 'C', 'BD': 'C', 'GQ': 'J', 'GI': 'I'}
+
+# RTKLib solution quality Q per GGA quality indicator (0 invalid and 6 dead reckoning are not mapped)
+dGGA2RTKQual = {1: 5, 2: 4, 4: 1, 5: 2}
+
+# decrease of the time of day (s) taken as a passage of midnight before the RMC of the new day is received
+NMEA_DAY_ROLLOVER = 43200.
 
 
 def findTimeFields(parseNMEAs, fieldsNMEA):
@@ -29,3 +52,347 @@ def findTimeFields(parseNMEAs, fieldsNMEA):
     # print('timeFieldsIndices {!s}'.format(timeFieldsIndices))
 
     return timeFieldsIndices
+
+
+def nmea_checksums_ok(sentences: list) -> np.ndarray:
+    """
+    nmea_checksums_ok validates the checksum (XOR of the characters between '$' and '*') of a list of sentences
+    (bytes) at once and returns a boolean array
+    """
+    if len(sentences) == 0:
+        return np.zeros(0, dtype=bool)
+
+    stars = np.array([sentence.rfind(b'*') for sentence in sentences])
+    expected = np.array([_checksum_field(sentence[star + 1:]) if star > 0 else -1 for sentence, star in zip(sentences, stars)])
+
+    chars = np.array(sentences, dtype=bytes)
+    chars = chars.view(np.uint8).reshape(len(sentences), chars.dtype.itemsize)
+    cols = np.arange(chars.shape[1])
+    xor = np.bitwise_xor.reduce(np.where((cols >= 1) & (cols < stars[:, np.newaxis]), chars, 0), axis=1)
+
+    return (chars[:, 0] == ord('$')) & (expected == xor)
+
+
+def _checksum_field(field: bytes) -> int:
+    """
+    _checksum_field returns the value of the two hex digits following the '*', -1 when invalid
+    """
+    try:
+        return int(field, 16) if len(field) == 2 else -1
+    except ValueError:
+        return -1
+
+
+def _floats(values: list) -> np.ndarray:
+    """
+    _floats converts a list of numeric strings into floats, empty or invalid fields becoming NaN
+    """
+    arr = np.array(values, dtype=object)
+    try:
+        arr[arr == ''] = 'nan'
+        return arr.astype(np.float64)
+    except ValueError:
+        return np.array([_float(value) for value in values], dtype=np.float64)
+
+
+def _float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _degrees(values: list, hemispheres: list) -> np.ndarray:
+    """
+    _degrees converts NMEA (d)ddmm.mmmm coordinates into decimal degrees, negative for S and W
+    """
+    dm = _floats(values)
+    degrees = np.floor(dm / 100.) + np.mod(dm, 100.) / 60.
+    return np.where(np.isin(np.array(hemispheres, dtype=object), ['S', 'W']), -degrees, degrees)
+
+
+def _datetimes(dates: list, times: list) -> np.ndarray:
+    """
+    _datetimes combines NMEA dates (ddmmyy) and times (hhmmss.ss) into datetime64, NaT when either is missing
+    """
+    ddmmyy = _floats(dates)
+    hhmmss = _floats(times)
+    valid = ~np.isnan(ddmmyy) & ~np.isnan(hhmmss)
+
+    dt = np.full(len(dates), np.datetime64('NaT'), dtype='datetime64[ns]')
+    ddmmyy = ddmmyy[valid].astype(np.int64)
+    hhmmss = hhmmss[valid]
+
+    day = (2000 + ddmmyy % 100 - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (ddmmyy // 100 % 100 - 1).astype('timedelta64[M]')
+    day = day.astype('datetime64[D]') + (ddmmyy // 10000 - 1).astype('timedelta64[D]')
+    secs = (hhmmss // 10000) * 3600. + (hhmmss // 100 % 100) * 60. + np.mod(hhmmss, 100.)
+    dt[valid] = day.astype('datetime64[ns]') + np.round(secs * 1e9).astype('timedelta64[ns]')
+
+    return dt
+
+
+def _columns(rows: list, nr_fields: int) -> list:
+    """
+    _columns transposes the field lists (starting with the address field) of sentences of the same type into
+    nr_fields columns of data fields
+    """
+    nr_fields += 1
+    if len(rows) == 0:
+        return [[] for _ in range(nr_fields - 1)]
+    return list(zip(*[row if len(row) == nr_fields else (row + [''] * nr_fields)[:nr_fields] for row in rows]))[1:]
+
+
+@functools.lru_cache(maxsize=1024)
+def _gsv_prn(talker: str, svid: str) -> str:
+    """
+    _gsv_prn converts the satellite number of a GSV sentence into a PRN as used in RINEX
+    """
+    try:
+        nr = int(svid)
+    except ValueError:
+        return ''
+
+    gnss = dNMEATalkers.get(talker, 'G')
+    if gnss == 'G' and 33 <= nr <= 64:
+        gnss, nr = 'S', nr - 13
+    elif gnss == 'G' and 65 <= nr <= 96:
+        gnss, nr = 'R', nr - 64
+    return '{gnss:s}{nr:02d}'.format(gnss=gnss, nr=nr)
+
+
+def _seconds_of_day(hhmmss: str) -> float:
+    """
+    _seconds_of_day converts an NMEA time (hhmmss.ss) into seconds of the day, NaN when empty or invalid
+    """
+    try:
+        value = float(hhmmss)
+    except ValueError:
+        return np.nan
+    return (value // 10000) * 3600. + (value // 100 % 100) * 60. + value % 100
+
+
+def _next_day(ddmmyy: str) -> str:
+    """
+    _next_day returns the NMEA date (ddmmyy) following ddmmyy, or ddmmyy itself when invalid
+    """
+    try:
+        return (datetime.strptime(ddmmyy, '%d%m%y') + timedelta(days=1)).strftime('%d%m%y')
+    except ValueError:
+        return ddmmyy
+
+
+def decode_nmea(sentences: list, date: str = '', time: str = '') -> tuple:
+    """
+    decode_nmea decodes a batch of GGA, RMC, GSA, GSV and GST sentences (bytes) with a valid checksum into a dict
+    of columns per sentence type. Sentences without a date (or without a time for GSA / GSV) get the last one
+    seen before them, starting from date / time. The carried date is moved to the next day when the time of day
+    of a GGA / GST goes back by more than NMEA_DAY_ROLLOVER, ie when midnight passes before the RMC of the new day
+    is received. Returns the columns and the last date and time.
+    """
+    dRows = {nmea_type: [] for nmea_type in dNMEAFields}
+    dDates = {nmea_type: [] for nmea_type in dNMEAFields}
+    dTimes = {nmea_type: [] for nmea_type in dNMEAFields}
+
+    # convert the valid sentences without '$' and checksum in one go
+    text = b'\n'.join(sentence[1:sentence.rfind(b'*')] for sentence, ok in zip(sentences, nmea_checksums_ok(sentences)) if ok).decode('ascii', errors='replace')
+
+    for sentence in text.split('\n') if text else []:
+        fields = sentence.split(',')
+        nmea_type = fields[0][2:]
+        rows = dRows.get(nmea_type)
+        if rows is None:
+            continue
+
+        if nmea_type == 'RMC':
+            date = fields[9] if len(fields) > 9 else ''
+        elif nmea_type in ('GGA', 'GST') and date and _seconds_of_day(time) - _seconds_of_day(fields[1]) > NMEA_DAY_ROLLOVER:
+            date = _next_day(date)
+        if nmea_type in ('GGA', 'RMC', 'GST'):
+            time = fields[1]
+
+        rows.append(fields)
+        dDates[nmea_type].append(date)
+        dTimes[nmea_type].append(time)
+
+    dNMEA = {}
+
+    gga = _columns(dRows['GGA'], dNMEAFields['GGA'])
+    dNMEA['GGA'] = {'DT': _datetimes(dDates['GGA'], gga[0]),
+                    'lat': _degrees(gga[1], gga[2]),
+                    'lon': _degrees(gga[3], gga[4]),
+                    'quality': np.nan_to_num(_floats(gga[5])).astype(np.int8),
+                    'numSV': np.nan_to_num(_floats(gga[6])).astype(np.int16),
+                    'HDOP': _floats(gga[7]),
+                    'alt': _floats(gga[8]),
+                    'undulation': _floats(gga[10]),
+                    'age': _floats(gga[12])}
+    dNMEA['GGA']['ellH'] = dNMEA['GGA']['alt'] + np.nan_to_num(dNMEA['GGA']['undulation'])
+
+    rmc = _columns(dRows['RMC'], dNMEAFields['RMC'])
+    dNMEA['RMC'] = {'DT': _datetimes(rmc[8], rmc[0]),
+                    'status': np.array(rmc[1], dtype='<U1'),
+                    'lat': _degrees(rmc[2], rmc[3]),
+                    'lon': _degrees(rmc[4], rmc[5]),
+                    'speed': _floats(rmc[6]) * 1852. / 3600.,
+                    'course': _floats(rmc[7]),
+                    'mode': np.array(rmc[11], dtype='<U1')}
+
+    gsa = _columns(dRows['GSA'], dNMEAFields['GSA'])
+    dNMEA['GSA'] = {'DT': _datetimes(dDates['GSA'], dTimes['GSA']),
+                    'mode': np.array(gsa[0], dtype='<U1'),
+                    'fixType': np.nan_to_num(_floats(gsa[1])).astype(np.int8),
+                    'numSV': np.sum(np.array(gsa[2:14], dtype=object).reshape(12, -1) != '', axis=0).astype(np.int16),
+                    'PDOP': _floats(gsa[14]),
+                    'HDOP': _floats(gsa[15]),
+                    'VDOP': _floats(gsa[16])}
+
+    # one row per satellite in view
+    gsv_rows, gsv_dates, gsv_times = [], [], []
+    for fields, gsv_date, gsv_time in zip(dRows['GSV'], dDates['GSV'], dTimes['GSV']):
+        for idx in range(4, len(fields) - 3, 4):
+            gsv_rows.append(['', _gsv_prn(fields[0][:2], fields[idx])] + fields[idx + 1:idx + 4])
+            gsv_dates.append(gsv_date)
+            gsv_times.append(gsv_time)
+    gsv = _columns(gsv_rows, 4)
+    dNMEA['GSV'] = {'DT': _datetimes(gsv_dates, gsv_times),
+                    'PRN': np.array(gsv[0], dtype='<U3'),
+                    'elev': _floats(gsv[1]),
+                    'azim': _floats(gsv[2]),
+                    'SNR': _floats(gsv[3])}
+
+    gst = _columns(dRows['GST'], dNMEAFields['GST'])
+    dNMEA['GST'] = {'DT': _datetimes(dDates['GST'], gst[0]),
+                    'rms': _floats(gst[1]),
+                    'sdMajor': _floats(gst[2]),
+                    'sdMinor': _floats(gst[3]),
+                    'orient': _floats(gst[4]),
+                    'sdLat': _floats(gst[5]),
+                    'sdLon': _floats(gst[6]),
+                    'sdAlt': _floats(gst[7])}
+
+    return dNMEA, date, time
+
+
+class NMEAIngestor:
+    """
+    Collects NMEA sentences from bytes fed as they arrive and decodes them in batches into columns (see decode_nmea).
+        date - date (ddmmyy) used for the sentences before the first RMC sentence
+    """
+
+    def __init__(self, batch_size: int = NMEA_DECODE_BATCH, date: str = ''):
+        self.batch_size = batch_size
+        self.date = date
+        self.time = ''
+        self.buf = b''
+        self.pending = []
+        self.decoded = []
+
+    def feed(self, data: bytes):
+        lines = (self.buf + data).split(b'\n')
+        self.buf = lines.pop()
+        self.pending.extend(line.strip() for line in lines if line.strip())
+
+        if len(self.pending) >= self.batch_size:
+            self._decode()
+
+    def _decode(self):
+        dNMEA, self.date, self.time = decode_nmea(self.pending, date=self.date, time=self.time)
+        self.decoded.append(dNMEA)
+        self.pending = []
+
+    def columns(self) -> dict:
+        if self.buf.strip():
+            self.pending.append(self.buf.strip())
+            self.buf = b''
+        if len(self.pending) > 0 or len(self.decoded) == 0:
+            self._decode()
+
+        return {nmea_type: {col: np.concatenate([dNMEA[nmea_type][col] for dNMEA in self.decoded]) for col in self.decoded[0][nmea_type]} for nmea_type in dNMEAFields}
+
+
+def iter_chunks(stream, chunk_size: int = NMEA_CHUNK_SIZE, max_pending: int = NMEA_MAX_PENDING):
+    """
+    iter_chunks yields the chunks read from a binary file object, socket or serial port by a reader thread. At most
+    max_pending chunks are queued, so the reader blocks (and the sender is throttled) when decoding lags behind.
+    """
+    read = stream.read if hasattr(stream, 'read') else stream.recv
+    chunks = queue.Queue(maxsize=max_pending)
+
+    def reader():
+        try:
+            while True:
+                chunk = read(chunk_size)
+                chunks.put(chunk)
+                if not chunk:
+                    break
+        except Exception as e:
+            chunks.put(e)
+
+    threading.Thread(target=reader, daemon=True).start()
+
+    while True:
+        chunk = chunks.get()
+        if isinstance(chunk, Exception):
+            raise chunk
+        if not chunk:
+            break
+        yield chunk
+
+
+def read_nmea(source, date: str = '', chunk_size: int = NMEA_CHUNK_SIZE) -> dict:
+    """
+    read_nmea decodes the GGA, RMC, GSA, GSV and GST sentences from an NMEA file name, binary file object, socket
+    or serial port into a dict of columns per sentence type
+    """
+    ingestor = NMEAIngestor(date=date)
+
+    if isinstance(source, str):
+        with open(source, 'rb') as fnmea:
+            for chunk in iter_chunks(fnmea, chunk_size=chunk_size):
+                ingestor.feed(chunk)
+    else:
+        for chunk in iter_chunks(source, chunk_size=chunk_size):
+            ingestor.feed(chunk)
+
+    return ingestor.columns()
+
+
+def is_nmea_file(file_name: str) -> bool:
+    """
+    is_nmea_file checks whether the file starts with an NMEA sentence (eg RTKLib solutions in NMEA format)
+    """
+    with open(file_name, 'rb') as fnmea:
+        return fnmea.read(1) == b'$'
+
+
+def nmea_pos(dNMEA: dict, leap_secs: int = 18):
+    """
+    nmea_pos converts the decoded GGA positions into a dataframe with the columns of a parsed RTKLib pos file (see
+    parse_rtkpos_file.parsePosFile), keeping the epochs with a position fix. Standard deviations are taken from
+    the GST sentences of the same epoch, the UTC times are converted to GPS week / time of week using leap_secs.
+    """
+    import pandas as pd
+    from GNSS import rnxnav
+
+    gga = dNMEA['GGA']
+    valid = np.isin(gga['quality'], list(dGGA2RTKQual)) & ~np.isnan(gga['lat']) & ~np.isnat(gga['DT'])
+
+    gps_secs = rnxnav.gps_seconds(gga['DT'][valid]) + leap_secs
+
+    dfPos = pd.DataFrame({'WNC': (gps_secs // 604800).astype(np.int64), 'TOW': np.mod(gps_secs, 604800.),
+                          'lat': gga['lat'][valid], 'lon': gga['lon'][valid], 'ellH': gga['ellH'][valid],
+                          'Q': [dGGA2RTKQual[quality] for quality in gga['quality'][valid]], 'ns': gga['numSV'][valid],
+                          'sdn': np.nan, 'sde': np.nan, 'sdu': np.nan, 'sdne': 0., 'sdeu': 0., 'sdun': 0.,
+                          'age': gga['age'][valid], 'ratio': np.nan, 'DT': gga['DT'][valid]})
+
+    # standard deviations of the epochs with a GST sentence
+    gst = dNMEA['GST']
+    idx = np.searchsorted(gst['DT'], dfPos['DT'].to_numpy())
+    found = idx < len(gst['DT'])
+    found[found] = gst['DT'][idx[found]] == dfPos['DT'].to_numpy()[found]
+    for col, gst_col in (('sdn', 'sdLat'), ('sde', 'sdLon'), ('sdu', 'sdAlt')):
+        sd = np.full(dfPos.shape[0], np.nan)
+        sd[found] = gst[gst_col][idx[found]]
+        dfPos[col] = sd
+
+    return dfPos
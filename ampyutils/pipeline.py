@@ -0,0 +1,207 @@
+import sys
+import os
+import glob
+import json
+import hashlib
+import asyncio
+import logging
+from termcolor import colored
+
+from ampyutils import exeprogram
+
+__author__ = 'amuls'
+
+# status of a stage after running the pipeline
+ST_UPTODATE = 'up-to-date'
+ST_DONE = 'done'
+ST_FAILED = 'failed'
+ST_BLOCKED = 'blocked'
+
+
+class Stage:
+    """
+    A pipeline stage running an external command
+        name - unique name of the stage (eg '19134:rinex')
+        cmd - program with its arguments
+        inputs / outputs - (absolute) file names or glob patterns read / written by the stage, a stage without
+                           outputs is never up-to-date
+        deps - names of the stages that must be completed before this one
+        lock - name of a shared resource (eg a database file) the stage needs exclusive access to
+        cwd - working directory of the command
+    """
+
+    def __init__(self, name: str, cmd: list, inputs: list = (), outputs: list = (), deps: list = (), lock: str = None, cwd: str = None):
+        self.name = name
+        self.cmd = [str(arg) for arg in cmd]
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.lock = lock
+        self.cwd = cwd
+
+
+def expand_files(patterns: list) -> list:
+    """
+    expand_files returns the sorted existing files matching the file names / glob patterns
+    """
+    files = set()
+    for pattern in patterns:
+        files.update(fname for fname in glob.glob(os.path.expanduser(pattern)) if os.path.isfile(fname))
+    return sorted(files)
+
+
+def fingerprint(patterns: list, extra: list = ()) -> str:
+    """
+    fingerprint returns a hash over the names, sizes and modification times of the files matching patterns and the
+    extra strings (eg the command line)
+    """
+    sha = hashlib.sha1()
+    for item in extra:
+        sha.update(item.encode('utf-8'))
+        sha.update(b'\0')
+    for fname in expand_files(patterns):
+        fstat = os.stat(fname)
+        sha.update('{name:s}|{size:d}|{mtime:d}\n'.format(name=os.path.abspath(fname), size=fstat.st_size, mtime=fstat.st_mtime_ns).encode('utf-8'))
+    return sha.hexdigest()
+
+
+class Pipeline:
+    """
+    A DAG of stages. Stages whose inputs, command and outputs did not change since their last successful run (as
+    recorded in the state file) are skipped, the others are run as soon as their dependencies completed, with at most
+    a given number of stages running concurrently.
+    """
+
+    def __init__(self, state_file: str, logger: logging.Logger):
+        self.state_file = state_file
+        self.logger = logger
+        self.stages = {}
+
+        try:
+            with open(state_file) as fstate:
+                self.state = json.load(fstate)
+        except (IOError, ValueError):
+            self.state = {}
+
+    def add(self, stage: Stage) -> Stage:
+        if stage.name in self.stages:
+            raise ValueError('duplicate stage {name:s}'.format(name=stage.name))
+        self.stages[stage.name] = stage
+        return stage
+
+    def topological_order(self) -> list:
+        """
+        topological_order returns the stage names with every stage after its dependencies
+        """
+        order = []
+        visiting = set()
+        visited = set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError('dependency cycle through stage {name:s}'.format(name=name))
+            if name not in self.stages:
+                raise ValueError('unknown stage {name:s}'.format(name=name))
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def is_uptodate(self, stage: Stage) -> bool:
+        """
+        is_uptodate checks that the outputs exist and that inputs, command and outputs match the last successful run
+        """
+        prev = self.state.get(stage.name)
+        if prev is None or not stage.outputs or len(expand_files(stage.outputs)) == 0:
+            return False
+        return prev['inputs'] == fingerprint(stage.inputs, stage.cmd) and prev['outputs'] == fingerprint(stage.outputs)
+
+    def store_state(self):
+        """
+        store_state writes the fingerprints of the successful stages to the state file (atomically)
+        """
+        cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+        try:
+            tmp_state_file = '{state:s}.{pid:d}'.format(state=self.state_file, pid=os.getpid())
+            with open(tmp_state_file, 'w') as fstate:
+                json.dump(self.state, fstate, indent=2, sort_keys=True)
+            os.replace(tmp_state_file, self.state_file)
+        except IOError as e:
+            self.logger.warning('{func:s}: could not store pipeline state {state:s}: {err!s}'.format(state=self.state_file, err=e, func=cFuncName))
+
+    async def _run_stage(self, stage: Stage, force: bool, done: dict, events: dict, semaphore: asyncio.Semaphore, locks: dict):
+        cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+        for dep in stage.deps:
+            await events[dep].wait()
+
+        try:
+            if any(done[dep] in (ST_FAILED, ST_BLOCKED) for dep in stage.deps):
+                self.logger.warning('{func:s}: stage {name:s} blocked by a failed dependency'.format(name=colored(stage.name, 'red'), func=cFuncName))
+                done[stage.name] = ST_BLOCKED
+                return
+
+            if not force and self.is_uptodate(stage):
+                self.logger.info('{func:s}: stage {name:s} is up-to-date'.format(name=colored(stage.name, 'green'), func=cFuncName))
+                done[stage.name] = ST_UPTODATE
+                return
+
+            async with semaphore:
+                lock = locks[stage.lock] if stage.lock is not None else None
+                if lock is not None:
+                    await lock.acquire()
+                try:
+                    in_fp = fingerprint(stage.inputs, stage.cmd)
+                    self.logger.info('{func:s}: running stage {name:s}'.format(name=colored(stage.name, 'blue'), func=cFuncName))
+                    result = await exeprogram.run_async(cmd=stage.cmd, logger=self.logger, cwd=stage.cwd, stdout_level=logging.DEBUG, stderr_level=logging.DEBUG)
+                finally:
+                    if lock is not None:
+                        lock.release()
+
+            if result.returncode == 0:
+                done[stage.name] = ST_DONE
+                self.state[stage.name] = {'inputs': in_fp, 'outputs': fingerprint(stage.outputs), 'elapsed': round(result.elapsed, 3)}
+            else:
+                done[stage.name] = ST_FAILED
+                self.state.pop(stage.name, None)
+        finally:
+            events[stage.name].set()
+
+    async def run_async(self, workers: int = None, force: bool = False) -> dict:
+        """
+        run_async runs the pipeline and returns the status of each stage
+        """
+        order = self.topological_order()
+
+        done = {}
+        events = {name: asyncio.Event() for name in order}
+        semaphore = asyncio.Semaphore(workers or os.cpu_count() or 1)
+        locks = {stage.lock: asyncio.Lock() for stage in self.stages.values() if stage.lock is not None}
+
+        try:
+            await asyncio.gather(*[self._run_stage(stage=self.stages[name], force=force, done=done, events=events, semaphore=semaphore, locks=locks) for name in order])
+        finally:
+            self.store_state()
+
+        return {name: done.get(name, ST_BLOCKED) for name in order}
+
+    def run(self, workers: int = None, force: bool = False) -> dict:
+        """
+        run runs the pipeline (see run_async) and waits for its completion
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            return loop.run_until_complete(self.run_async(workers=workers, force=force))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import argparse
+from termcolor import colored
+from shutil import copyfile
+
+import am_config as amc
+from ampyutils import pipeline
+
+__author__ = 'amuls'
+
+
+lst_logging_choices = ['CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG', 'NOTSET']
+lst_rxtypes = ['ASTX', 'BEGP']
+
+# root of the receiver data and directory of the python scripts run by the stages
+dir_rxturp = os.path.join(os.path.expanduser('~'), 'RxTURP', 'BEGPIOS')
+dir_scripts = os.path.dirname(os.path.abspath(__file__))
+
+# marker of the raw SBF files and of the RINEX files per receiver type
+dRawMarker = {'ASTX': 'SEPT', 'BEGP': 'BEGP'}
+
+# RINEX marker, RINEX navigation extension, rtkp directory and rnx2rtkp gnss per GNSS for ASTX
+dASTXGNSS = {'Galileo': ('GALI', 'E', 'gal'),
+             'GPS Navstar': ('GPSN', 'N', 'gps'),
+             'Combined EG': ('COMB', 'P', 'com')}
+# IGS navigation file name parts per GNSS for ASTX
+dIGSNav = {'Galileo': ('BRUX', 'BEL', 'E'),
+           'GPS Navstar': ('BRUX', 'BEL', 'G'),
+           'Combined EG': ('BRDC', 'IGS', 'M')}
+
+# gLAB runs: marker and list of (gnss argument(s), gnss name in output file, pseudo-range codes)
+dGLABRuns = {'ASTX': ('COMB', [(['E'], 'E', ['C1C', 'C5Q']),
+                               (['G'], 'G', ['C1C', 'C1W', 'C2L', 'C2W', 'C5Q']),
+                               (['E', 'G'], 'EG', ['C1C', 'C5Q'])]),
+             'BEGP': ('GPRS', [(['E'], 'E', ['C1A', 'C6A'])])}
+
+
+class logging_action(argparse.Action):
+    def __call__(self, parser, namespace, log_actions, option_string=None):
+        for log_action in log_actions:
+            if log_action not in lst_logging_choices:
+                raise argparse.ArgumentError(self, "log_actions must be in {logoptions!s}".format(logoptions='|'.join(lst_logging_choices)))
+        setattr(namespace, self.dest, log_actions)
+
+
+class doy_action(argparse.Action):
+    def __call__(self, parser, namespace, doy, option_string=None):
+        if not 1 <= doy <= 366:
+            raise argparse.ArgumentError(self, 'day-of-year must be in [1..366]')
+        setattr(namespace, self.dest, doy)
+
+
+def treatCmdOpts(argv: list):
+    """
+    Treats the command line options
+    """
+    baseName = os.path.basename(__file__)
+    amc.cBaseName = colored(baseName, 'yellow')
+
+    helpTxt = baseName + ' runs the daily processing (SBF, RINEX, obstab, gLAB, rnx2rtkp, plots) for a range of DOYs, skipping up-to-date stages'
+
+    # create the parser for command line arguments
+    parser = argparse.ArgumentParser(description=helpTxt)
+    parser.add_argument('-y', '--year', help='Year (4 digits)', required=True, type=int)
+    parser.add_argument('-s', '--startdoy', help='first day-of-year', required=True, type=int, action=doy_action)
+    parser.add_argument('-e', '--enddoy', help='last day-of-year', required=True, type=int, action=doy_action)
+    parser.add_argument('-r', '--rxtype', help='Receiver type (one of {choices:s})'.format(choices='|'.join(lst_rxtypes)), required=True, type=str, choices=lst_rxtypes)
+
+    parser.add_argument('-w', '--workers', help='number of stages run concurrently (default number of cores)', required=False, type=int, default=os.cpu_count())
+    parser.add_argument('-f', '--force', help='run all stages, also the up-to-date ones (default False)', action='store_true', required=False, default=False)
+    parser.add_argument('-q', '--quiet', help='run the stages in quiet (batch) mode without diagnostic dumps (default False)', action='store_true', required=False, default=False)
+
+    parser.add_argument('-l', '--logging', help='specify logging level console/file (two of {choices:s}, default {choice:s})'.format(choices='|'.join(lst_logging_choices), choice=colored(' '.join(lst_logging_choices[3:5]), 'green')), nargs=2, required=False, default=lst_logging_choices[3:5], action=logging_action)
+
+    # drop argv[0]
+    args = parser.parse_args(argv[1:])
+
+    # return arguments
+    return args.year, args.startdoy, args.enddoy, args.rxtype, args.workers, args.force, args.quiet, args.logging
+
+
+def script(name: str) -> list:
+    """
+    returns the command for running a python script of this repository
+    """
+    return [sys.executable, os.path.join(dir_scripts, name)]
+
+
+def add_day_stages(pipe: pipeline.Pipeline, year: int, doy: int, rxtype: str):
+    """
+    add_day_stages adds the stages for processing a DOY of the receiver, mirroring the scripts prepare-daily-sbf.sh,
+    prepare-daily-rinex.sh, prepare-daily-obstab.sh, process-daily-rinex.sh, glab-process.sh and plot-daily-posstat.sh
+    """
+    YY = '{yy:02d}'.format(yy=year % 100)
+    DOY = '{doy:03d}'.format(doy=doy)
+    YYDOY = YY + DOY
+
+    dir_raw = os.path.join(dir_rxturp, rxtype, YYDOY)
+    dir_rnx = os.path.join(dir_rxturp, rxtype, 'rinex', YYDOY)
+    dir_glab = os.path.join(dir_rnx, 'glab')
+    dir_igs = os.path.join(dir_rxturp, 'igs', YYDOY)
+
+    # the gLAB and rnx2rtkp stages decompress the same RINEX / IGS files of the day and remove them afterwards
+    lock_rnx = '{yydoy:s}:rnx'.format(yydoy=YYDOY)
+
+    # daily SBF file from the (six-)hourly SBF files, overwritten since the pipeline decides when it is out of date
+    daily_sbf = '{marker:s}{doy:s}0.{yy:s}_'.format(marker=dRawMarker[rxtype], doy=DOY, yy=YY)
+    sbf = pipe.add(pipeline.Stage(name='{yydoy:s}:sbf'.format(yydoy=YYDOY),
+                                  cmd=script('pysbfdaily.py') + ['--dir={dir:s}'.format(dir=dir_raw), '--overwrite'],
+                                  inputs=[os.path.join(dir_raw, '{marker:s}{doy:s}[!0].{yy:s}_'.format(marker=dRawMarker[rxtype], doy=DOY, yy=YY))],
+                                  outputs=[os.path.join(dir_raw, daily_sbf)]))
+
+    # RINEX conversion and gfzrnx splitting per GNSS
+    rinex = pipe.add(pipeline.Stage(name='{yydoy:s}:rinex'.format(yydoy=YYDOY),
+                                    cmd=script('gfzrnx_convbin.py') + ['--dir={dir:s}'.format(dir=dir_raw), '--file={sbf:s}'.format(sbf=daily_sbf), '--rinexdir={dir:s}'.format(dir=dir_rnx), '--binary=SBF'],
+                                    inputs=sbf.outputs,
+                                    outputs=[os.path.join(dir_rnx, '*{doy:s}0.{yy:s}D.Z'.format(doy=DOY, yy=YY)), os.path.join(dir_rnx, '*{doy:s}0.{yy:s}?.gz'.format(doy=DOY, yy=YY))],
+                                    deps=[sbf.name]))
+
+    # observation tabular analysis against the TLE predictions
+    pipe.add(pipeline.Stage(name='{yydoy:s}:obstab'.format(yydoy=YYDOY),
+                            cmd=script('rnx_obs_tabular.py') + ['--dir={dir:s}'.format(dir=dir_rnx), '--gnss', 'E', 'G'],
+                            inputs=rinex.outputs,
+                            outputs=[os.path.join(dir_rnx, 'gfzrnx', '*', 'obs_arcs.csv')],
+                            deps=[rinex.name]))
+
+    # gLAB processing, parsing of its output with update of the statistics DB and plots
+    marker, lst_runs = dGLABRuns[rxtype]
+    for gnss_args, gnss_name, prcodes in lst_runs:
+        for prcode in prcodes:
+            glab_out = '{marker:s}-{gnss:s}-{code:s}.out.gz'.format(marker=marker, gnss=gnss_name, code=prcode)
+            glab = pipe.add(pipeline.Stage(name='{yydoy:s}:glab:{gnss:s}:{code:s}'.format(yydoy=YYDOY, gnss=gnss_name, code=prcode),
+                                           cmd=script('glab_processing.py') + ['-y', year, '-d', doy, '-r', rxtype, '-g'] + gnss_args + ['-m', marker, '-p', prcode],
+                                           inputs=rinex.outputs,
+                                           outputs=[os.path.join(dir_glab, glab_out)],
+                                           deps=[rinex.name],
+                                           lock=lock_rnx))
+            pipe.add(pipeline.Stage(name='{yydoy:s}:glabout:{gnss:s}:{code:s}'.format(yydoy=YYDOY, gnss=gnss_name, code=prcode),
+                                    cmd=script('glab_msg_output.py') + ['-r', dir_glab, '-s', 5, '-f', glab_out],
+                                    inputs=glab.outputs,
+                                    outputs=[os.path.join(dir_glab, 'png', '{out:s}*.png'.format(out=glab_out.replace('.', '-')))],
+                                    deps=[glab.name],
+                                    lock='glabdb'))
+
+    # rnx2rtkp processing and plotting of the positions
+    if rxtype == 'ASTX':
+        for gnss, (rnx_marker, nav_ext, rtkp_gnss) in dASTXGNSS.items():
+            rover_obs = '{marker:s}{doy:s}0.{yy:s}D.Z'.format(marker=rnx_marker, doy=DOY, yy=YY)
+            rover_nav = os.path.join(dir_rnx, '{marker:s}{doy:s}0.{yy:s}{ext:s}.Z'.format(marker=rnx_marker, doy=DOY, yy=YY, ext=nav_ext))
+            igs_nav = os.path.join(dir_igs, '{name:s}00{country:s}_R_{yyyy:d}{doy:s}0000_01D_{ext:s}N.rnx.gz'.format(name=dIGSNav[gnss][0], country=dIGSNav[gnss][1], yyyy=year, doy=DOY, ext=dIGSNav[gnss][2]))
+            dir_pos = os.path.join(dir_rnx, 'rtkp', gnss)
+            rover_pos = '{marker:s}{doy:s}0-{yy:s}O.pos'.format(marker=rnx_marker, doy=DOY, yy=YY)
+
+            rtkp = pipe.add(pipeline.Stage(name='{yydoy:s}:rtkp:{gnss:s}'.format(yydoy=YYDOY, gnss=rnx_marker),
+                                           cmd=script('pyrtkproc.py') + ['--dir={dir:s}'.format(dir=dir_rnx), '--roverobs={obs:s}'.format(obs=rover_obs), '--freq=4', '--cutoff=5', '-e', rover_nav, igs_nav, '--gnss={gnss:s}'.format(gnss=rtkp_gnss)],
+                                           inputs=[os.path.join(dir_rnx, rover_obs), rover_nav, igs_nav],
+                                           outputs=[os.path.join(dir_pos, rover_pos)],
+                                           deps=[rinex.name],
+                                           lock=lock_rnx,
+                                           cwd=dir_rnx))
+            pipe.add(pipeline.Stage(name='{yydoy:s}:rtkplot:{gnss:s}'.format(yydoy=YYDOY, gnss=rnx_marker),
+                                    cmd=script('pyrtkplot.py') + ['--dir={dir:s}'.format(dir=dir_pos), '--file={pos:s}'.format(pos=rover_pos)],
+                                    inputs=rtkp.outputs,
+                                    outputs=[os.path.join(dir_pos, 'png', '{pos:s}-*.png'.format(pos=os.path.splitext(rover_pos)[0]))],
+                                    deps=[rtkp.name]))
+
+
+def main(argv):
+    """
+    daily_pipeline runs the daily processing stages for a range of DOYs as a DAG, running independent days and
+    stages in parallel and skipping stages whose inputs and outputs did not change since their last run
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    # treat command line options
+    year, start_doy, end_doy, rxtype, workers, force, quiet, logLevels = treatCmdOpts(argv)
+
+    # create logging for better debugging
+    logger, log_name = amc.createLoggers(os.path.basename(__file__), dir='.', logLevels=logLevels)
+
+    # the scripts run by the stages inherit the quiet (batch) mode through the environment
+    if quiet:
+        os.environ['AM_QUIET'] = '1'
+
+    # the pipeline state is kept per receiver type
+    pipe = pipeline.Pipeline(state_file=os.path.join(dir_rxturp, rxtype, 'pipeline-state.json'), logger=logger)
+    for doy in range(start_doy, end_doy + 1):
+        add_day_stages(pipe=pipe, year=year, doy=doy, rxtype=rxtype)
+
+    logger.info('{func:s}: running {nr:d} stages for {rx:s} DOYs {start:d}..{end:d} with {workers:d} workers'.format(nr=len(pipe.stages), rx=colored(rxtype, 'green'), start=start_doy, end=end_doy, workers=workers, func=cFuncName))
+    dStatus = pipe.run(workers=workers, force=force)
+
+    # report the status of the stages
+    retCode = amc.E_SUCCESS
+    for name, status in dStatus.items():
+        logger.info('{func:s}:    {name:40s} {status:s}'.format(name=name, status=colored(status, 'red' if status in (pipeline.ST_FAILED, pipeline.ST_BLOCKED) else 'green'), func=cFuncName))
+        if status in (pipeline.ST_FAILED, pipeline.ST_BLOCKED):
+            retCode = amc.E_FAILURE
+
+    # copy temp log file to the receiver directory
+    copyfile(log_name, os.path.join(dir_rxturp, rxtype, 'daily_pipeline.log'))
+    os.remove(log_name)
+
+    sys.exit(retCode)
+
+
+if __name__ == "__main__":  # Only run if this file is called directly
+    main(sys.argv)
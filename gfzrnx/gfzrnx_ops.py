@@ -5,9 +5,10 @@ import json
 import logging
 from datetime import datetime
 import tempfile
+from typing import Tuple
 
 import am_config as amc
-from ampyutils import amutils
+from ampyutils import amutils, amcompress
 
 __author__ = 'amuls'
 
@@ -146,101 +147,59 @@ def rnxobs_statistics_file(dTmpRnx: dict, logger: logging.Logger):
     pass
 
 
-def gnss_rinex_creation(dTmpRnx: dict, logger: logging.Logger):
+def gnss_rinex_creation(dTmpRnx: dict, logger: logging.Logger, workers: int = None):
     """
-    gnss_rinex_creation creates the RINEX observation/navigation files per satsys
+    gnss_rinex_creation creates the RINEX observation/navigation files per satsys and the tabular observation files.
+    The gfzrnx jobs run concurrently, a tabular observation job starting once its RINEX observation file is created.
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    for rnx_type in ('obs', 'nav'):
-        # if we have both systems GPS Galileo then we only create the COMB files
-        print('{!s}'.format(amc.dRTK['rnx']['gnss']['select']))
-        if 'M' in amc.dRTK['rnx']['gnss']['select']:
-            logger.info('{func:s}: creating COMB file'.format(func=cFuncName))
-
-            satsys2create = 'M'
-        else:
-            satsys2create = amc.dRTK['rnx']['gnss']['select']
+    # if we have both systems GPS Galileo then we only create the COMB files
+    if 'M' in amc.dRTK['rnx']['gnss']['select']:
+        logger.info('{func:s}: creating COMB file'.format(func=cFuncName))
+        satsys2create = 'M'
+    else:
+        satsys2create = amc.dRTK['rnx']['gnss']['select']
 
+    jobs = []
+    crux_files = []
+    for rnx_type in ('obs', 'nav'):
         # create the corresponding RINEX Obs/Nav file for each individual satellite system
         for _, satsys in enumerate(satsys2create):
-            # determin ethe name of the RINEX file to be created
+            # determine the name of the RINEX file to be created
             amc.dRTK['rnx']['gnss'][satsys][rnx_type] = '{marker:s}{doy:03d}0.{yy:02d}{ext:s}'.format(marker=amc.dRTK['rnx']['gnss'][satsys]['marker'], doy=amc.dRTK['rnx']['times']['DoY'], yy=amc.dRTK['rnx']['times']['yy'], ext=amc.dRnx_ext[satsys][rnx_type])
+            rnx_file = os.path.join(amc.dRTK['rinexDir'], amc.dRTK['rnx']['gnss'][satsys][rnx_type])
+            job_name = '{satsys:s}-{type:s}'.format(satsys=satsys, type=rnx_type)
 
             if rnx_type == 'obs':
-                out_dir = tempfile.gettempdir()
-                dTmpRnx[amc.dRTK['rnx']['gnss'][satsys]['marker']] = os.path.join(out_dir, amc.dRTK['rnx']['gnss'][satsys][rnx_type])
+                dTmpRnx[amc.dRTK['rnx']['gnss'][satsys]['marker']] = os.path.join(tempfile.gettempdir(), amc.dRTK['rnx']['gnss'][satsys][rnx_type])
 
                 # create a CRUX file to correct the header info for this satsys
-                crux_file = create_crux(satsys=satsys, logger=logger)
+                crux_files.append(create_crux(satsys=satsys, logger=logger))
 
-                rnxobs_file = os.path.join(amc.dRTK['rinexDir'], amc.dRTK['rnx']['gnss'][satsys][rnx_type])
-
-                args4GFZRNX = [amc.dRTK['bin']['GFZRNX'], '-finp', os.path.join(out_dir, amc.dRTK['rnx']['gnss'][satsys][rnx_type]), '-f', '-fout', rnxobs_file, '-crux', crux_file, '-hded']
-
-                # create the RINEX OBSfile for this satsys in final dir for NAV and temporay dir for OBS
-                args4GFZRNX = [amc.dRTK['bin']['GFZRNX'],
-                               '-finp', dTmpRnx[rnx_type],
-                               '-fout', rnxobs_file,
-                               '-crux', crux_file,
-                               '-satsys', amc.dRTK['rnx']['gnss'][satsys]['satsys'],
-                               '-f', '-chk', '-kv']
-                logger.info('{func:s}: creating RINEX file {name:s}'.format(name=colored(amc.dRTK['rnx']['gnss'][satsys][rnx_type], 'green'), func=cFuncName))
-
-                # perform the RINEX creation
-                amutils.run_subprocess(sub_proc=args4GFZRNX, logger=logger)
-
-                os.remove(crux_file)
+                # create the RINEX OBS file for this satsys
+                args4GFZRNX = [amc.dRTK['bin']['GFZRNX'], '-finp', dTmpRnx[rnx_type], '-fout', rnx_file, '-crux', crux_files[-1], '-satsys', amc.dRTK['rnx']['gnss'][satsys]['satsys'], '-f', '-chk', '-kv']
+                jobs.append(amutils.SubprocessJob(name=job_name, args=args4GFZRNX))
 
                 # create ASCII SV plot file
                 # amc.dRTK['rnx']['gnss'][satsys]['prns'] = create_svs_ascii_plot(satsys=satsys, rnx_type=rnx_type, logger=logger)
 
-                # create the tabular observation file
-                amc.dRTK['rnx']['gnss'][satsys]['obstab'] = create_tabular_observation(satsys=satsys, rnx_type=rnx_type, logger=logger)
+                # create the tabular observation files once the RINEX OBS file exists
+                amc.dRTK['rnx']['gnss'][satsys]['obstab'], obstab_jobs = create_tabular_observation(satsys=satsys, rnx_type=rnx_type, logger=logger, after=(job_name,))
+                jobs += obstab_jobs
             else:
-                out_dir = amc.dRTK['rinexDir']
-
-                # create the RINEX NAV file for this satsys in final dir for NAV and temporay dir for OBS
-                args4GFZRNX = [amc.dRTK['bin']['GFZRNX'],
-                               '-finp', dTmpRnx[rnx_type],
-                               '-fout', os.path.join(out_dir, amc.dRTK['rnx']['gnss'][satsys][rnx_type]),
-                               '-satsys', amc.dRTK['rnx']['gnss'][satsys]['satsys'],
-                               '-f', '-chk', '-kv']
-
-                logger.info('{func:s}: creating RINEX file {name:s}'.format(name=colored(amc.dRTK['rnx']['gnss'][satsys][rnx_type], 'green'), func=cFuncName))
+                # create the RINEX NAV file for this satsys
+                args4GFZRNX = [amc.dRTK['bin']['GFZRNX'], '-finp', dTmpRnx[rnx_type], '-fout', rnx_file, '-satsys', amc.dRTK['rnx']['gnss'][satsys]['satsys'], '-f', '-chk', '-kv']
+                jobs.append(amutils.SubprocessJob(name=job_name, args=args4GFZRNX))
 
-                # perform the RINEX creation
-                amutils.run_subprocess(sub_proc=args4GFZRNX, logger=logger)
+            logger.info('{func:s}: creating RINEX file {name:s}'.format(name=colored(amc.dRTK['rnx']['gnss'][satsys][rnx_type], 'green'), func=cFuncName))
 
-            # # when RINEX OBS adjust the headers by editing via CRUX file
-            # if rnx_type == 'obs':
-            #     # create a CRUX file to correct the header info for this satsys
-            #     crux_file = create_crux(satsys=satsys, logger=logger)
-
-            #     rnxobs_file = os.path.join(amc.dRTK['rinexDir'], amc.dRTK['rnx']['gnss'][satsys][rnx_type])
-            #     args4GFZRNX = [amc.dRTK['bin']['GFZRNX'], '-finp', os.path.join(out_dir, amc.dRTK['rnx']['gnss'][satsys][rnx_type]), '-f', '-fout', rnxobs_file, '-crux', crux_file]
-
-            #     # perform the RINEX header correction
-            #     amutils.run_subprocess(sub_proc=args4GFZRNX, logger=logger)
-            #     # remove temporary file created
-            #     os.remove(crux_file)
-
-            #     # only create these infos when we have no mixed observations file
-            #     # if satsys != 'M':
-            #     # create e ASCII display of visibility of the SVs in the observation file
-            #     amc.dRTK['rnx']['gnss'][satsys]['prns'] = create_svs_ascii_plot(satsys=satsys, rnx_type=rnx_type, logger=logger)
-
-            #     # create the tabular observation file
-            #     amc.dRTK['rnx']['gnss'][satsys]['obstab'] = create_tabular_observation(satsys=satsys, rnx_type=rnx_type, logger=logger)
-            #     # else:
-            #     #     # perform conversion for GALILEO and GPSN apart
-            #     #     # create e ASCII display of visibility of the SVs in the observation file
-            #     #     amc.dRTK['rnx']['gnss']['E']['prns'] = create_svs_ascii_plot(satsys='E', rnx_type=rnx_type, logger=logger)
-
-            #     #     # create the tabular observation file
-            #     #     amc.dRTK['rnx']['gnss']['E']['obstab'] = create_tabular_observation(satsys='E', rnx_type=rnx_type, logger=logger)
-
-    pass
+    # perform the RINEX and tabular observation creation
+    try:
+        amutils.run_subprocesses(jobs=jobs, logger=logger, workers=workers)
+    finally:
+        for crux_file in crux_files:
+            os.remove(crux_file)
 
 
 def create_crux(satsys: str, logger: logging.Logger) -> str:
@@ -275,9 +234,10 @@ def create_crux(satsys: str, logger: logging.Logger) -> str:
     return crux_name
 
 
-def create_tabular_observation(satsys: str, rnx_type: str, logger: logging.Logger) -> dict:
+def create_tabular_observation(satsys: str, rnx_type: str, logger: logging.Logger, after: tuple = ()) -> Tuple[dict, list]:
     """
-    create_tabular_observation creates a tabular view of all observables for all SVs in RINEX obs file
+    create_tabular_observation returns the names of the tabular views of all observables for all SVs in RINEX obs file
+    and the gfzrnx jobs (run after the jobs in after) creating them
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
@@ -287,31 +247,21 @@ def create_tabular_observation(satsys: str, rnx_type: str, logger: logging.Logge
     dobs_tab = {}
     if satsys != 'M':
         dobs_tab[satsys] = amc.dRTK['rnx']['gnss'][satsys][rnx_type].replace('.', '-') + '.obstab'
-
-        args4GFZRNX = [amc.dRTK['bin']['GFZRNX'], '-f', '-finp', os.path.join(amc.dRTK['rinexDir'], amc.dRTK['rnx']['gnss'][satsys][rnx_type]), '-fout', os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss'][satsys]['marker'], dobs_tab[satsys]), '-tab_obs', '-satsys', satsys]
-
-        logger.info('{func:s}: Creating observation tabular output {obstab:s}'.format(obstab=colored(dobs_tab[satsys], 'green'), func=cFuncName))
-
-        # run the program
-        # gfzrnx -finp GALI1340.19O -tab_obs -satsys E  2> /dev/null -fout /tmp/E-ALL.t
-        amutils.run_subprocess(sub_proc=args4GFZRNX, logger=logger)
     else:
         # create a file for GALI and one for GPSN from COMB RNX OBS file
         for sat_syst, sat_syst_name in zip(['E', 'G'], ['GALI', 'GPSN']):
             dobs_tab[sat_syst] = sat_syst_name + amc.dRTK['rnx']['gnss'][satsys][rnx_type].replace('.', '-')[4:] + '.obstab'
 
-            print('dobs_tab[sat_syst] = {!s}'.format(dobs_tab[sat_syst]))
-
-            args4GFZRNX = [amc.dRTK['bin']['GFZRNX'], '-f', '-finp', os.path.join(amc.dRTK['rinexDir'], amc.dRTK['rnx']['gnss'][satsys][rnx_type]), '-fout', os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss'][satsys]['marker'], dobs_tab[sat_syst]), '-tab_obs', '-satsys', sat_syst]
-
-            logger.info('{func:s}: Creating observation tabular output {obstab:s}'.format(obstab=colored(dobs_tab[sat_syst], 'green'), func=cFuncName))
+    jobs = []
+    for sat_syst, obstab in dobs_tab.items():
+        # gfzrnx -finp GALI1340.19O -tab_obs -satsys E  2> /dev/null -fout /tmp/E-ALL.t
+        args4GFZRNX = [amc.dRTK['bin']['GFZRNX'], '-f', '-finp', os.path.join(amc.dRTK['rinexDir'], amc.dRTK['rnx']['gnss'][satsys][rnx_type]), '-fout', os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss'][satsys]['marker'], obstab), '-tab_obs', '-satsys', sat_syst]
+        jobs.append(amutils.SubprocessJob(name='{satsys:s}-obstab'.format(satsys=sat_syst), args=args4GFZRNX, after=after))
 
-            # run the program
-            # gfzrnx -finp GALI1340.19O -tab_obs -satsys E  2> /dev/null -fout /tmp/E-ALL.t
-            amutils.run_subprocess(sub_proc=args4GFZRNX, logger=logger)
+        logger.info('{func:s}: Creating observation tabular output {obstab:s}'.format(obstab=colored(obstab, 'green'), func=cFuncName))
 
-    # return the created files name
-    return dobs_tab
+    # return the created files name and the jobs creating them
+    return dobs_tab, jobs
 
 
 # def create_svs_ascii_plot(satsys: str, rnx_type: str, logger: logging.Logger) -> str:
@@ -404,79 +354,30 @@ def create_tabular_observation(satsys: str, rnx_type: str, logger: logging.Logge
 def compress_rinex_obsnav(logger: logging.Logger):
     """
     compress_rinex_obsnav compresses using Hatanaka & UNIX compress the observation file, while using 'gzip' for navigation full files
+    and the obstab files. All files are compressed in parallel.
     """
-    # compress also the full observation file
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    if 'M' in amc.dRTK['rnx']['gnss']['select']:
-        obs_cmp = '{obs:s}D.Z'.format(obs=amc.dRTK['rnx']['gnss']['M']['obs'][:-1])
-        args4RNX2CRZ = [amc.dRTK['bin']['RNX2CRZ'], '-f', '-d', os.path.join(amc.dRTK['rinexDir'], amc.dRTK['rnx']['gnss']['M']['obs'])]
-
-        logger.info('{func:s}: Compressing RINEX observation {rnx:s}'.format(rnx=colored(obs_cmp, 'green'), func=cFuncName))
-
-        # run the program
-        amutils.run_subprocess(sub_proc=args4RNX2CRZ, logger=logger)
-        logger.info('\n')
-        # store its name in dict
-        amc.dRTK['rnx']['gnss']['M']['obs'] = obs_cmp
+    # collect the files to compress per satellite system, with the combined 'M' system replacing the individual ones
+    lst_satsys = ['M'] if 'M' in amc.dRTK['rnx']['gnss']['select'] else amc.dRTK['rnx']['gnss']['select']
 
-        # compress the full navigation file
-        nav_cmp = '{nav:s}.Z'.format(nav=amc.dRTK['rnx']['gnss']['M']['nav'])
-        args4GZIP = [amc.dRTK['bin']['GZIP'], '-f', os.path.join(amc.dRTK['rinexDir'], amc.dRTK['rnx']['gnss']['M']['nav'])]
+    jobs = []
+    targets = []
+    for satsys in lst_satsys:
+        dGNSS = amc.dRTK['rnx']['gnss'][satsys]
 
-        logger.info('{func:s}: Compressing RINEX observation {rnx:s}'.format(rnx=colored(nav_cmp, 'green'), func=cFuncName))
+        jobs.append(('rnx2crz', os.path.join(amc.dRTK['rinexDir'], dGNSS['obs'])))
+        targets.append((dGNSS, 'obs'))
+        jobs.append(('gzip', os.path.join(amc.dRTK['rinexDir'], dGNSS['nav'])))
+        targets.append((dGNSS, 'nav'))
 
-        # run the program
-        amutils.run_subprocess(sub_proc=args4GZIP, logger=logger)
-        # store its name in dict
-        amc.dRTK['rnx']['gnss']['M']['nav'] = nav_cmp
+        for obstab_GNSS, obstab_fname in dGNSS['obstab'].items():
+            jobs.append(('gzip', os.path.join(amc.dRTK['gfzrnxDir'], dGNSS['marker'], obstab_fname)))
+            targets.append((dGNSS['obstab'], obstab_GNSS))
 
-        # gzip obstab files
-        for obstab_GNSS, obstab_fname in amc.dRTK['rnx']['gnss']['M']['obstab'].items():
-
-            args4GZIP = [amc.dRTK['bin']['GZIP'], '-f', os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss']['M']['marker'], obstab_fname)]
-
-            logger.info('{func:s}: Compressing observation tabular file {rnx:s}'.format(rnx=colored(obstab_fname, 'green'), func=cFuncName))
-
-            # run the program
-            amutils.run_subprocess(sub_proc=args4GZIP, logger=logger)
-
-            amc.dRTK['rnx']['gnss']['M']['obstab'][obstab_GNSS] = obstab_fname + '.gz'
-
-    else:
-        for _, satsys in enumerate(amc.dRTK['rnx']['gnss']['select']):
-            obs_cmp = '{obs:s}D.Z'.format(obs=amc.dRTK['rnx']['gnss'][satsys]['obs'][:-1])
-            args4RNX2CRZ = [amc.dRTK['bin']['RNX2CRZ'], '-f', '-d', os.path.join(amc.dRTK['rinexDir'], amc.dRTK['rnx']['gnss'][satsys]['obs'])]
+    logger.info('{func:s}: Compressing {nr:d} RINEX observation, navigation and observation tabular files'.format(nr=len(jobs), func=cFuncName))
+    results = amcompress.compress_files(jobs=jobs, progs={'rnx2crz': amc.dRTK['bin']['RNX2CRZ']}, logger=logger)
 
-            logger.info('{func:s}: Compressing RINEX observation {rnx:s}'.format(rnx=colored(obs_cmp, 'green'), func=cFuncName))
-
-            # run the program
-            amutils.run_subprocess(sub_proc=args4RNX2CRZ, logger=logger)
-            logger.info('\n')
-            # store its name in dict
-            amc.dRTK['rnx']['gnss'][satsys]['obs'] = obs_cmp
-
-            # compress the full navigation file
-            nav_cmp = '{nav:s}.Z'.format(nav=amc.dRTK['rnx']['gnss'][satsys]['nav'])
-            args4GZIP = [amc.dRTK['bin']['GZIP'], '-f', os.path.join(amc.dRTK['rinexDir'], amc.dRTK['rnx']['gnss'][satsys]['nav'])]
-
-            logger.info('{func:s}: Compressing RINEX observation {rnx:s}'.format(rnx=colored(nav_cmp, 'green'), func=cFuncName))
-
-            # run the program
-            amutils.run_subprocess(sub_proc=args4GZIP, logger=logger)
-            # store its name in dict
-            amc.dRTK['rnx']['gnss'][satsys]['nav'] = nav_cmp
-
-            # gzip obstab files
-            for obstab_GNSS, obstab_fname in amc.dRTK['rnx']['gnss'][satsys]['obstab'].items():
-
-                args4GZIP = [amc.dRTK['bin']['GZIP'], '-f', os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss'][satsys]['marker'], obstab_fname)]
-
-                logger.info('{func:s}: Compressing observation tabular file {rnx:s}'.format(rnx=colored(obstab_fname, 'green'), func=cFuncName))
-
-                # run the program
-                amutils.run_subprocess(sub_proc=args4GZIP, logger=logger)
-
-                amc.dRTK['rnx']['gnss'][satsys]['obstab'][obstab_GNSS] = obstab_fname + '.gz'
-
-    pass
+    # store the names of the compressed files in dict
+    for (dTarget, key), res in zip(targets, results):
+        dTarget[key] = os.path.basename(res.dst)
@@ -2,33 +2,101 @@ import sys
 import os
 import logging
 from termcolor import colored
+import re
 import pandas as pd
-from typing import Tuple
-from datetime import datetime
-from datetimerange import DateTimeRange
+from typing import Tuple, Iterator
 import numpy as np
 
 import am_config as amc
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 
 __author__ = 'amuls'
 
+# columns of a gfzrnx obstab file that are not observables, other unknown columns are read as categories
+OBSTAB_TIME_COLS = ['DATE', 'TIME']
+OBSTAB_PRN_COL = 'PRN'
+# RINEX v3 observable codes (eg C1C, L5Q, S7X) and their dtypes, float32 does not resolve code / phase values
+RE_OBSERVABLE = re.compile(r'^[CLDS][1-9][A-Z]$')
+dObsDtypes = {'C': np.float64, 'L': np.float64, 'D': np.float32, 'S': np.float32}
 
-def read_obs_tabular(gnss: str, logger: logging.Logger) -> pd.DataFrame:
+
+def obstab_schema(obstab_file: str, observables: list = None) -> Tuple[list, dict]:
+    """
+    obstab_schema reads the header of an obstab file and returns the columns to load and their dtypes. Observables
+    are read as float (float32 for doppler / signal strength) and restricted to the requested observables if given,
+    DATE / TIME / PRN and other columns as categories.
+    """
+    columns = pd.read_csv(obstab_file, sep=r'\s+', nrows=0).columns.tolist()
+
+    usecols = []
+    dtypes = {}
+    for col in columns:
+        if RE_OBSERVABLE.match(col):
+            if observables is None or col in observables:
+                usecols.append(col)
+                dtypes[col] = dObsDtypes[col[0]]
+        else:
+            usecols.append(col)
+            dtypes[col] = 'category'
+
+    return usecols, dtypes
+
+
+def _obstab_datetime(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    replaces the categorical DATE and TIME columns by a DATE_TIME column. The datetimes are assembled from the
+    (few) unique dates and times, which are fixed-width YYYY-MM-DD and HH:MM:SS.fffffff fields.
+    """
+    dates = pd.to_datetime(df['DATE'].cat.categories, format='%Y-%m-%d').to_numpy()
+    times = pd.to_timedelta(df['TIME'].cat.categories).to_numpy()
+
+    date_time = dates[df['DATE'].cat.codes.to_numpy()] + times[df['TIME'].cat.codes.to_numpy()]
+    df = df.drop(columns=OBSTAB_TIME_COLS)
+    df.insert(0, 'DATE_TIME', date_time)
+
+    return df
+
+
+def load_obstab(obstab_file: str, observables: list = None) -> pd.DataFrame:
+    """
+    load_obstab reads a gfzrnx tabular observation file (possibly compressed) with a fixed schema. Only the requested
+    observables are loaded when observables is given.
+    """
+    usecols, dtypes = obstab_schema(obstab_file=obstab_file, observables=observables)
+
+    df = pd.read_csv(obstab_file, sep=r'\s+', usecols=usecols, dtype=dtypes, engine='c')
+
+    return _obstab_datetime(df)
+
+
+def iter_obstab(obstab_file: str, chunksize: int = 1000000, observables: list = None) -> Iterator[pd.DataFrame]:
+    """
+    iter_obstab iterates over a gfzrnx tabular observation file in chunks of chunksize rows with the same schema
+    as load_obstab. The categories of the PRN column can differ between chunks.
+    """
+    usecols, dtypes = obstab_schema(obstab_file=obstab_file, observables=observables)
+
+    for df_chunk in pd.read_csv(obstab_file, sep=r'\s+', usecols=usecols, dtype=dtypes, engine='c', chunksize=chunksize):
+        yield _obstab_datetime(df_chunk)
+
+
+@amprofile.stage_timer()
+def read_obs_tabular(gnss: str, logger: logging.Logger, observables: list = None, dRtk: dict = None) -> pd.DataFrame:
     """
     read_obs_tabular reads the observation data into a dataframe
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
     # check that th erequested OBSTAB file is present
-    gnss_obstab = os.path.join(amc.dRTK['options']['rnx_dir'], 'gfzrnx', amc.dRTK['json']['rnx']['gnss'][gnss]['marker'], amc.dRTK['json']['rnx']['gnss'][gnss]['obstab'])
+    gnss_obstab = os.path.join(dRtk['options']['rnx_dir'], 'gfzrnx', dRtk['json']['rnx']['gnss'][gnss]['marker'], dRtk['json']['rnx']['gnss'][gnss]['obstab'])
 
     print('gnss_obstab = {!s}'.format(gnss_obstab))
 
     # df = pd.read_csv('gnss_obstab')
     logger.info('{func:s}: reading observation tabular file {obstab:s} (be patient)'.format(obstab=colored(gnss_obstab, 'green'), func=cFuncName))
     try:
-        df = pd.read_csv(gnss_obstab, parse_dates=[['DATE', 'TIME']], delim_whitespace=True)
+        df = load_obstab(obstab_file=gnss_obstab, observables=observables)
     except FileNotFoundError as e:
         logger.critical('{func:s}: Error = {err!s}'.format(err=e, func=cFuncName))
         sys.exit(amc.E_FILE_NOT_EXIST)
@@ -36,109 +104,124 @@ def read_obs_tabular(gnss: str, logger: logging.Logger) -> pd.DataFrame:
     return df
 
 
-def rise_set_times(prn: str, df_obstab: pd.DataFrame, nomint_multi: int, logger: logging.Logger) -> Tuple[int, list, list, list]:
+def obs_arcs(df_obstab: pd.DataFrame, nomint_multi: int, logger: logging.Logger) -> pd.DataFrame:
     """
-    rise_set_times determines observed rise and set times for PRN
+    obs_arcs segments the observations of all PRNs into arcs in a single pass and returns a tidy arcs table with
+    columns PRN, arc, start, end, count and nom_interval. An arc starts where the gap with the previous observation
+    of the PRN exceeds nomint_multi times its nominal (median) interval. The gap column (s) is added to df_obstab.
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # index the rows for this PRN
-    prn_loc = df_obstab.loc[df_obstab['PRN'] == prn].index
-    # logger.info('{func:s}: Data for {prn:s} are at indices\n{idx!s}'.format(prn=colored(prn, 'green'), idx=prn_loc, func=cFuncName))
+    # sort by PRN and time, keeping the original index labels to attach the gaps
+    df_sorted = df_obstab[['PRN', 'DATE_TIME']].sort_values(['PRN', 'DATE_TIME'], kind='mergesort')
+    grp_prn = df_sorted.groupby('PRN', sort=False, observed=True)
+
+    # gaps between consecutive observations and nominal interval per PRN
+    gap = grp_prn['DATE_TIME'].diff().dt.total_seconds()
+    nom_interval = gap.groupby(df_sorted['PRN'], sort=False, observed=True).transform('median')
 
-    # create a df_prn only using these rows
-    df_prn = df_obstab.iloc[prn_loc]
-    # amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_prn, dfName='df_prn[{:s}]'.format(prn), head=30)
+    # arc numbering within each PRN
+    arc_start = gap.isna() | (gap > nomint_multi * nom_interval)
+    arc = arc_start.astype(int).groupby(df_sorted['PRN'], sort=False, observed=True).cumsum() - 1
 
-    # determine the datetime gaps for this PRN
-    df_prn['gap'] = (df_prn['DATE_TIME'] - df_prn['DATE_TIME'].shift(1)).astype('timedelta64[s]')
-    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_prn, dfName='df_prn[{:s}]'.format(prn))
+    df_obstab['gap'] = gap
 
-    # find the nominal time interval of observations
-    nominal_interval = df_prn['gap'].median()
-    # find the indices where the interval is bigger than nominal_interval
-    # idx_arc_start = df_prn[(df_prn['gap'] > nomint_multi * nominal_interval) | (df_prn['gap'].isna())].index.tolist()
-    idx_arc_start = [df_prn.index[0]] + df_prn[df_prn['gap'] > nomint_multi * nominal_interval].index.tolist()
-    idx_arc_end = df_prn[df_prn['gap'].shift(-1) > nomint_multi * nominal_interval].index.tolist() + [df_prn.index[-1]]
+    df_arcs = pd.DataFrame({'PRN': df_sorted['PRN'], 'arc': arc, 'DATE_TIME': df_sorted['DATE_TIME'], 'nom_interval': nom_interval})
+    grp_arcs = df_arcs.groupby(['PRN', 'arc'], sort=True, observed=True)
+    df_arcs = pd.DataFrame({'start': grp_arcs['DATE_TIME'].min(),
+                            'end': grp_arcs['DATE_TIME'].max(),
+                            'count': grp_arcs['DATE_TIME'].size(),
+                            'nom_interval': grp_arcs['nom_interval'].first()}).reset_index()
 
-    # find the number of observations for each arc
-    obs_arc_count = []
-    for arc_start, arc_end in zip(idx_arc_start, idx_arc_end):
-        obs_arc_count.append(prn_loc.get_loc(arc_end) - prn_loc.get_loc(arc_start) + 1)
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_arcs, dfName='df_arcs')
 
-    # get the corresponding data time info
-    df_tmp = df_prn.loc[idx_arc_start][['DATE_TIME']]
-    # lst_time = [datetime.strptime(dt.strftime('%H:%M:%S'), '%H:%M:%S').time() for dt in df_tmp['DATE_TIME']]
-    # df_tmp.loc[:, 'time'] = lst_time
+    return df_arcs
 
-    # dt_arc_start = pd.to_datetime(df_tmp['DATE_TIME']).tolist()
 
-    dt_arc_start = [datetime.strptime(dt.strftime('%H:%M:%S'), '%H:%M:%S').time() for dt in df_tmp['DATE_TIME']]
-    print('dt_arc_start = {!s}'.format(dt_arc_start))
+def prn_arcs(prn: str, df_arcs: pd.DataFrame, logger: logging.Logger) -> Tuple[float, list, list, list]:
+    """
+    prn_arcs returns for PRN from the arcs table the nominal observation interval and the lists of arc start / end
+    times and number of observations per arc
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    df_tmp = df_prn.loc[idx_arc_end][['DATE_TIME']]
-    # dt_arc_end = pd.to_datetime(df_tmp['DATE_TIME']).tolist()
-    dt_arc_end = [datetime.strptime(dt.strftime('%H:%M:%S'), '%H:%M:%S').time() for dt in df_tmp['DATE_TIME']]
-    print('dt_arc_end = {!s}'.format(dt_arc_end))
+    df_prn = df_arcs[df_arcs['PRN'] == prn]
 
-    logger.info('{func:s}:    nominal observation interval for {prn:s} = {tint:f}'.format(prn=colored(prn, 'green'), tint=nominal_interval, func=cFuncName))
-    # logger.info('{func:s}:    {prn:s} rises at:\n{arcst!s}'.format(prn=colored(prn, 'green'), arcst=df_prn.loc[idx_arc_end][['DATE_TIME', 'PRN', 'gap']], func=cFuncName))
-    # logger.info('{func:s}:    {prn:s} sets at:\n{arcend!s}'.format(prn=colored(prn, 'green'), arcend=df_prn.loc[idx_arc_end][['DATE_TIME', 'PRN', 'gap']], func=cFuncName))
+    nominal_interval = df_prn['nom_interval'].iloc[0]
+    dt_arc_start = df_prn['start'].dt.floor('s').dt.time.tolist()
+    dt_arc_end = df_prn['end'].dt.floor('s').dt.time.tolist()
+    obs_arc_count = df_prn['count'].tolist()
 
+    logger.info('{func:s}:    nominal observation interval for {prn:s} = {tint:f}'.format(prn=colored(prn, 'green'), tint=nominal_interval, func=cFuncName))
     for i, (stdt, enddt) in enumerate(zip(dt_arc_start, dt_arc_end)):
         logger.info('{func:s}:       arc[{nr:d}]: {stdt:s} -> {enddt:s}'.format(nr=i, stdt=colored(stdt.strftime('%H:%M:%S'), 'yellow'), enddt=colored(enddt.strftime('%H:%M:%S'), 'yellow'), func=cFuncName))
 
-    # copy the gap column for this PRN into original df
-    df_obstab.loc[df_prn.index, 'gap'] = df_prn['gap']
-
     return nominal_interval, dt_arc_start, dt_arc_end, obs_arc_count
 
 
+def _time_seconds(times) -> np.ndarray:
+    """
+    converts a sequence of datetime.time to seconds since midnight
+    """
+    return np.array([t.hour * 3600 + t.minute * 60 + t.second for t in times], dtype=float)
+
+
+def _tidy_arcs(df_rs: pd.DataFrame, col_start: str, col_end: str) -> pd.DataFrame:
+    """
+    flattens the per-PRN lists of arc start / end times into a tidy dataframe with columns PRN, arc, start, end
+    (seconds since midnight)
+    """
+    nr_arcs = df_rs[col_start].map(len).to_numpy(dtype=int)
+    lst_start = [t for arcs in df_rs[col_start] for t in arcs]
+    lst_end = [t for arcs in df_rs[col_end] for t in arcs]
+
+    return pd.DataFrame({'PRN': np.repeat(df_rs.index.to_numpy(), nr_arcs),
+                         'arc': np.concatenate([np.arange(n) for n in nr_arcs]) if len(nr_arcs) else np.array([], dtype=int),
+                         'start': _time_seconds(lst_start),
+                         'end': _time_seconds(lst_end)})
+
+
 def intersect_arcs(df_rs: pd.DataFrame, logger: logging.Logger) -> Tuple[int, pd.DataFrame]:
     """
-    intersect_arcs determines which observation intervals belong to which TLE interval
+    intersect_arcs determines which observation intervals belong to which TLE interval. The TLE arcs of all PRNs are
+    sorted on (PRN, rise) so that a single searchsorted finds for each observed arc the last TLE arc rising before it
+    ends, which is its intersecting TLE arc when that one sets after the observed arc starts.
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # number of arcs according to observations
-    nr_arcs_obs = []
-    for prn in df_rs.index:
-        # find maximum number of arcs in observations
-        nr_arcs_obs.append(longest(df_rs.loc[prn]['obs_arc_count']))
-    logger.info('{func:s}:     number of observed arcs per prn: {arcs!s}'.format(arcs=nr_arcs_obs, func=cFuncName))
-
-    # find number of ars per PRN from TLE
-    nr_arcs_tle = []
-    for prn in df_rs.index:
-        # find maximum number of arcs in observations
-        nr_arcs_tle.append(longest(df_rs.loc[prn]['tle_arc_count']))
-    nr_arcs = max(nr_arcs_tle)
-    logger.info('{func:s}:    number of predicted arcs per prn: {arcs!s}'.format(arcs=nr_arcs_tle, func=cFuncName))
-
-    # make the arcs fit together by comparing the start / end dates between observed and TLEs
-    df_rs['intersect'] = pd.Series(dtype=object)
-
-    J2000 = datetime(2000, 1, 1)
-    for i_prn, prn in enumerate(df_rs.index):
-        logger.info('{func:s}: PRN {prn:s}'.format(prn=prn, func=cFuncName))
-        prn_intersect = [np.nan] * nr_arcs_obs[i_prn]
-
-        for i_tle, (tle_rise, tle_set) in enumerate(zip(df_rs.loc[prn]['tle_rise'], df_rs.loc[prn]['tle_set'])):
-            tle_range = DateTimeRange(datetime.combine(J2000, tle_rise), datetime.combine(J2000, tle_set))
-            tle_range.start_time_format = '%H:%M:%S'
-            tle_range.end_time_format = '%H:%M:%S'
-            logger.info('{func:s}:    tle_range = {tler!s}'.format(tler=tle_range, func=cFuncName))
-            for i_obs, (obs_start, obs_end) in enumerate(zip(df_rs.loc[prn]['obs_rise'], df_rs.loc[prn]['obs_set'])):
-                obs_range = DateTimeRange(datetime.combine(J2000, obs_start), datetime.combine(J2000, obs_end))
-                obs_range.start_time_format = '%H:%M:%S'
-                obs_range.end_time_format = '%H:%M:%S'
-                logger.info('{func:s}:       obs_range = {obsr!s}  intersect = {int!s}'.format(obsr=obs_range, int=tle_range.is_intersection(obs_range), func=cFuncName))
-
-                if tle_range.is_intersection(obs_range):
-                    prn_intersect[i_obs] = i_tle
-
-        # store in the itersection column
-        df_rs.loc[prn, 'intersect'] = prn_intersect
+    df_obs = _tidy_arcs(df_rs=df_rs, col_start='obs_rise', col_end='obs_set')
+    df_tle = _tidy_arcs(df_rs=df_rs, col_start='tle_rise', col_end='tle_set')
+
+    nr_arcs_obs = df_rs['obs_rise'].map(len)
+    nr_arcs_tle = df_rs['tle_rise'].map(len)
+    nr_arcs = int(nr_arcs_tle.max()) if len(nr_arcs_tle) else 0
+    logger.info('{func:s}:     number of observed arcs per prn: {arcs!s}'.format(arcs=nr_arcs_obs.tolist(), func=cFuncName))
+    logger.info('{func:s}:    number of predicted arcs per prn: {arcs!s}'.format(arcs=nr_arcs_tle.tolist(), func=cFuncName))
+
+    # make time keys unique over the PRNs by offsetting each PRN by 2 days
+    prn_code = {prn: i for i, prn in enumerate(df_rs.index)}
+    day_offset = 2 * 86400.
+    obs_prn = df_obs['PRN'].map(prn_code).to_numpy(dtype=float)
+    tle_prn = df_tle['PRN'].map(prn_code).to_numpy(dtype=float)
+
+    df_obs['intersect'] = np.nan
+    if len(df_tle):
+        df_tle = df_tle.assign(key=tle_prn * day_offset + df_tle['start'].to_numpy()).sort_values('key', kind='mergesort')
+        tle_prn = df_tle['PRN'].map(prn_code).to_numpy(dtype=float)
+
+        # last TLE arc of the same PRN rising before (or at) the end of the observed arc
+        idx = np.searchsorted(df_tle['key'].to_numpy(), obs_prn * day_offset + df_obs['end'].to_numpy(), side='right') - 1
+        idx_ok = np.clip(idx, 0, None)
+        intersects = (idx >= 0) & (tle_prn[idx_ok] == obs_prn) & (df_tle['end'].to_numpy()[idx_ok] >= df_obs['start'].to_numpy())
+        df_obs.loc[intersects, 'intersect'] = df_tle['arc'].to_numpy()[idx_ok[intersects]]
+
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_obs, dfName='df_obs')
+
+    # store per PRN the TLE arc each observed arc belongs to
+    dIntersect = {prn: [] for prn in df_rs.index}
+    for prn, lst_intersect in df_obs.groupby('PRN', sort=False)['intersect']:
+        dIntersect[prn] = [np.nan if np.isnan(i_tle) else int(i_tle) for i_tle in lst_intersect]
+    df_rs['intersect'] = pd.Series(dIntersect)
 
     return nr_arcs, df_rs
 
@@ -149,40 +232,32 @@ def rearrange_arcs(nr_arcs: int, df_rs: pd.DataFrame, logger: logging.Logger) ->
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # create an empty dataframe for collecting the information per arc
-    lst_arcs = ['Arc{:d}_obs'.format(i) for i in range(nr_arcs)] + ['Arc{:d}_tle'.format(i) for i in range(nr_arcs)] + ['Arc{:d}_%'.format(i) for i in range(nr_arcs)]
-    df_arcs = pd.DataFrame(columns=['PRN'] + lst_arcs)
-
-    # determine the observations vs predicted per arc
-    for i_prn, prn in enumerate(df_rs.index):
-        nr_arc_obs = []
-        nr_arc_tle = []
+    prns = df_rs.index.to_numpy()
 
-        for i_arc in range(nr_arcs):
-            # determine the observations done per arc
-            lst_obs2sum = [i for i in range(len(df_rs.loc[prn]['intersect'])) if df_rs.loc[prn]['intersect'][i] == i_arc]
+    # observed counts summed per (PRN, intersecting TLE arc)
+    nr_obs = df_rs['obs_arc_count'].map(len).to_numpy(dtype=int)
+    df_obs = pd.DataFrame({'PRN': np.repeat(prns, nr_obs),
+                           'arc': [i_tle for lst in df_rs['intersect'] for i_tle in lst],
+                           'count': [cnt for lst in df_rs['obs_arc_count'] for cnt in lst]}).dropna(subset=['arc'])
+    arr_obs = np.zeros((len(prns), nr_arcs))
+    if len(df_obs):
+        obs_sum = df_obs.groupby(['PRN', 'arc'])['count'].sum()
+        prn_idx = pd.Index(prns).get_indexer(obs_sum.index.get_level_values('PRN'))
+        np.add.at(arr_obs, (prn_idx, obs_sum.index.get_level_values('arc').to_numpy(dtype=int)), obs_sum.to_numpy(dtype=float))
 
-            lst_prn_obs = [df_rs.loc[prn]['obs_arc_count'][index] for index in lst_obs2sum]
-            nr_arc_obs.append(sum(lst_prn_obs))
+    # predicted counts per TLE arc, 0 for arcs not predicted for the PRN
+    arr_tle = np.zeros((len(prns), nr_arcs))
+    for i_prn, tle_counts in enumerate(df_rs['tle_arc_count']):
+        arr_tle[i_prn, :len(tle_counts)] = tle_counts
 
-            # determine the predicted number of observations by TLE
-            if i_arc < len(df_rs.loc[prn]['tle_arc_count']):
-                nr_arc_tle.append(int(df_rs.loc[prn]['tle_arc_count'][i_arc]))
-            else:
-                nr_arc_tle.append(0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        arr_perc = np.where(arr_tle > 0, arr_obs / arr_tle, np.nan)
 
-        # add to dataframe
-        a_series = pd.Series([prn] + nr_arc_obs + nr_arc_tle, index=df_arcs.columns[:7])
-        df_arcs = df_arcs.append(a_series, ignore_index=True)
-
-        # determine the percentage of observations
-        nr_arc_perc = [float(obs) / float(tle) if tle > 0 else np.nan for obs, tle in zip(nr_arc_obs, nr_arc_tle)]
-        df_arcs.iloc[i_prn, 7:] = nr_arc_perc
+    df_arcs = pd.concat([pd.DataFrame({'PRN': prns}),
+                         pd.DataFrame(arr_obs.astype(int), columns=['Arc{:d}_obs'.format(i) for i in range(nr_arcs)]),
+                         pd.DataFrame(arr_tle.astype(int), columns=['Arc{:d}_tle'.format(i) for i in range(nr_arcs)]),
+                         pd.DataFrame(arr_perc, columns=['Arc{:d}_%'.format(i) for i in range(nr_arcs)])], axis=1)
 
     logger.info('{func:s}: number of observations vs TLE predicted\n{nrobs!s}'.format(nrobs=df_arcs, func=cFuncName))
 
     return df_arcs
-
-
-def longest(a):
-    return max(len(a), *map(longest, a)) if isinstance(a, list) and a else 0
@@ -3,9 +3,9 @@ import sys
 import os
 import logging
 import re
-import json
 from typing import Tuple
 
+import am_config as amc
 from ampyutils import amutils
 from glab import glab_constants as glc
 from GNSS import wgs84
@@ -49,7 +49,7 @@ def parse_glab_info(glab_info: str, logger: logging.Logger) -> dict:
     dInfo['summary'] = parse_glab_info_summary(glab_lines=glab_info_lines, dSummary=glc.dgLab['parse']['summary'])
 
     # report
-    logger.info('{func:s}: Information summary =\n{json!s}'.format(func=cFuncName, json=json.dumps(dInfo, sort_keys=False, indent=4, default=amutils.DT_convertor)))
+    amc.logJSON(obj=dInfo, objName='Information summary', callerName=cFuncName, logger=logger, default=amutils.DT_convertor)
 
     # create common start of line for logging into database
     svs_codes = dInfo['filter']['meas'][:dInfo['filter']['meas'].index(' StdDev')]
@@ -7,10 +7,10 @@ import tempfile
 import datetime as dt
 from datetime import datetime
 import numpy as np
-import utm
 
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 from glab import glab_constants as glc
+from GNSS import wgs84
 import am_config as amc
 
 __author__ = 'amuls'
@@ -23,11 +23,13 @@ def make_datetime(year: int, doy: int, t: datetime.time) -> dt.datetime:
     return dt.datetime.strptime('{!s} {!s} {!s}'.format(year, doy, t.strftime('%H:%M:%S')), '%Y %j %H:%M:%S')
 
 
-def parse_glab_output(glab_output: tempfile._TemporaryFileWrapper, logger: logging.Logger) -> pd.DataFrame:
+@amprofile.stage_timer()
+def parse_glab_output(glab_output: tempfile._TemporaryFileWrapper, logger: logging.Logger, dRtk: dict = None) -> pd.DataFrame:
     """
     parse_glab_output parses the OUTPUT section of the glab out file
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
     logger.info('{func:s}: Parsing gLab OUTPUT section {file:s} ({info:s})'.format(func=cFuncName, file=glab_output.name, info=colored('be patient', 'red')))
 
@@ -49,10 +51,10 @@ def parse_glab_output(glab_output: tempfile._TemporaryFileWrapper, logger: loggi
     df_output.loc[df_output['dt_diff'] > dtMean, '#SVs'] = np.nan
     df_output.loc[df_output['dt_diff'] > dtMean, 'PDOP'] = np.nan
 
-    # add UTM coordinates
-    df_output['UTM.E'], df_output['UTM.N'], _, _ = utm.from_latlon(df_output['lat'].to_numpy(), df_output['lon'].to_numpy())
+    # add UTM coordinates, projecting the full track in the UTM zone of its first position
+    wgs84.WGS84().projectTrack(df_output, columns=('UTM.E', 'UTM.N'))
 
-    logger.info('{func:s}: df_output info\n{dtypes!s}'.format(dtypes=df_output.info(), func=cFuncName))
-    amutils.printHeadTailDataFrame(df=df_output, name='OUTPUT section of {name:s}'.format(name=amc.dRTK['glab_out']), index=False)
+    amc.logDataframeInfo(df=df_output, dfName='df_output', callerName=cFuncName, logger=logger)
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_output, dfName='OUTPUT section of {name:s}'.format(name=dRtk['glab_out']), index=False, level=logging.DEBUG)
 
     return df_output
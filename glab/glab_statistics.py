@@ -3,14 +3,13 @@ from termcolor import colored
 import sys
 import os
 import logging
-import json
-import math
 import numpy as np
 from typing import Tuple
 
+import am_config as amc
 from ampyutils import amutils
 from glab import glab_constants as glc
-from GNSS import wgs84
+from GNSS import refframe
 
 __author__ = 'amuls'
 
@@ -90,7 +89,7 @@ def statistics_dopbin(df_dop_enu: pd.DataFrame, logger: logging.Logger) -> dict:
 
     dStats_dop = {}
 
-    amutils.printHeadTailDataFrame(df=df_dop_enu, name='df_dop_enu')
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_dop_enu, dfName='df_dop_enu', level=logging.DEBUG)
 
     # go over all PDOP bins and plot according to the markersBin defined
     for i in range(len(glc.dop_bins) - 1):
@@ -123,7 +122,7 @@ def statistics_dopbin(df_dop_enu: pd.DataFrame, logger: logging.Logger) -> dict:
             logger.debug('{func:s}: in {bin:s} statistics for {crd:s} are {stat!s}'.format(func=cFuncName, bin=bin_PDOP, crd=dENU, stat=dENU_stats))
 
     # report to the user
-    logger.info('{func:s}: dStats_dop =\n{json!s}'.format(func=cFuncName, json=json.dumps(dStats_dop, sort_keys=False, indent=4, default=amutils.DT_convertor)))
+    amc.logJSON(obj=dStats_dop, objName='dStats_dop', callerName=cFuncName, logger=logger, default=amutils.DT_convertor)
 
     return dStats_dop
 
@@ -136,24 +135,23 @@ def statistics_coordinates(df_crd: pd.DataFrame, logger: logging.Logger) -> dict
 
     logger.info('{func:s}: calculating coordinate statistics'.format(func=cFuncName))
 
-    # init class WGS84
-    wgs_84 = wgs84.WGS84()
-
-    amutils.printHeadTailDataFrame(df=df_crd, name='df_crd', index=False)
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_crd, dfName='df_crd', index=False, level=logging.DEBUG)
     dStat = {}
     for crd in (glc.dgLab['OUTPUT']['llh'] + glc.dgLab['OUTPUT']['dENU'] + glc.dgLab['OUTPUT']['UTM']):
         dStat[crd] = {}
 
-    # make sure to have the wavg for latitude since it is used for converting the stddev of geodetic coordinates into meter
-    dStat['lat']['wavg'] = amutils.wavg(df_crd, 'lat', 'dN0')
+    # the wavg geodetic coordinates are needed for converting the stddev of geodetic coordinates into meter
     for llh, sdENU in zip(glc.dgLab['OUTPUT']['llh'], glc.dgLab['OUTPUT']['sdENU']):
         dStat[llh]['wavg'] = amutils.wavg(df_crd, llh, sdENU)
-        if llh == 'lat':
-            dStat[llh]['sdwavg'] = math.radians(amutils.stddev(df_crd[llh], dStat['lat']['wavg'])) * wgs_84.a
-        elif llh == 'lon':
-            dStat[llh]['sdwavg'] = math.radians(amutils.stddev(df_crd[llh], dStat['lat']['wavg'])) * wgs_84.a * math.cos(math.radians(dStat['lat']['wavg']))
-        else:
-            dStat[llh]['sdwavg'] = amutils.stddev(df_crd[llh], dStat[llh]['wavg'])
+    llh_wavg = [dStat[llh]['wavg'] for llh in glc.dgLab['OUTPUT']['llh']]
+
+    # scale the geodetic stddevs using the radii of curvature at the (cached) wavg position
+    ref_frame = refframe.get_ref_frame(*llh_wavg)
+    sdE, sdN, sdU = ref_frame.sigmaLLH2ENU(sdLat=amutils.stddev(df_crd['lat'], llh_wavg[0]),
+                                           sdLon=amutils.stddev(df_crd['lon'], llh_wavg[1]),
+                                           sdH=amutils.stddev(df_crd['ellH'], llh_wavg[2]))[0]
+    for llh, sdwavg in zip(glc.dgLab['OUTPUT']['llh'], (sdN, sdE, sdU)):
+        dStat[llh]['sdwavg'] = sdwavg
 
     for dENU, sdENU in zip(glc.dgLab['OUTPUT']['dENU'], glc.dgLab['OUTPUT']['sdENU']):
         dStat[dENU]['wavg'] = amutils.wavg(df_crd, dENU, sdENU)
@@ -178,6 +176,6 @@ def statistics_coordinates(df_crd: pd.DataFrame, logger: logging.Logger) -> dict
         except KeyError:
             dStat[crd]['sdkf'] = np.nan
 
-    logger.info('{func:s}: OUTPUT statistics information =\n{json!s}'.format(func=cFuncName, json=json.dumps(dStat, sort_keys=False, indent=4, default=amutils.DT_convertor)))
+    amc.logJSON(obj=dStat, objName='OUTPUT statistics information', callerName=cFuncName, logger=logger, default=amutils.DT_convertor)
 
     return dStat
@@ -9,11 +9,12 @@ import am_config as amc
 __author__ = 'amuls'
 
 
-def db_parse_gnss_codes(db_name: str, crd_types: list, logger: logging.Logger) -> str:
+def db_parse_gnss_codes(db_name: str, crd_types: list, logger: logging.Logger, dRtk: dict = None) -> str:
     """
     db_parse_gnss_codes parses the database file and keeps the lines according to a specific GNSSs and prcodes, keeping only the lines specified in the crd list
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
     logger.info('{func:s}: parsing database file {file:s}'.format(func=cFuncName, file=colored(db_name, 'green')))
 
@@ -24,42 +25,44 @@ def db_parse_gnss_codes(db_name: str, crd_types: list, logger: logging.Logger) -
     # determine the keys for the temp dict to create
     keys = ['year', 'doy', 'gnss', 'marker', 'prcode', 'crd_type']
 
-    with open(amc.dRTK['options']['glab_db']) as inf, open(tmp_csvdb_name, 'w') as outf:
+    with open(dRtk['options']['glab_db']) as inf, open(tmp_csvdb_name, 'w') as outf:
         for line in inf:
             # print(line.split(','))
 
             dLine = dict(zip(keys, line.split(',')))
 
             # check whether this line is to be selected
-            if check_vailidity_line(line_dict=dLine, crd_types=crd_types):
+            if check_vailidity_line(line_dict=dLine, crd_types=crd_types, dRtk=dRtk):
                 outf.write(line)
 
     return tmp_csvdb_name
 
 
-def check_vailidity_line(line_dict: dict, crd_types: list) -> bool:
+def check_vailidity_line(line_dict: dict, crd_types: list, dRtk: dict = None) -> bool:
     """
     check_vailidity_line checks whether this line is within the selected YYYY/DOYs, GNSS, prcodes and Coordinate type
     """
+    dRtk = amc.get_session(dRtk)
+
     # check on year
-    if not int(line_dict['year']) == amc.dRTK['options']['yyyy']:
+    if not int(line_dict['year']) == dRtk['options']['yyyy']:
         return False
 
     # check DOY in selected range
-    if not int(line_dict['doy']) in range(amc.dRTK['options']['doy_begin'], amc.dRTK['options']['doy_last'] + 1):
+    if not int(line_dict['doy']) in range(dRtk['options']['doy_begin'], dRtk['options']['doy_last'] + 1):
         return False
 
     # check for selected GNSS
-    if not line_dict['gnss'] in amc.dRTK['options']['gnsss']:
+    if not line_dict['gnss'] in dRtk['options']['gnsss']:
         return False
 
     # check for the marker (if calue is not None)
-    if amc.dRTK['options']['markers'][0] != 'None':
-        if not line_dict['marker'] in amc.dRTK['options']['markers']:
+    if dRtk['options']['markers'][0] != 'None':
+        if not line_dict['marker'] in dRtk['options']['markers']:
             return False
 
     # check for the prcode
-    if not any(prcode in line_dict['prcode'] for prcode in amc.dRTK['options']['prcodes']):
+    if not any(prcode in line_dict['prcode'] for prcode in dRtk['options']['prcodes']):
         return False
 
     # check for the crd_type
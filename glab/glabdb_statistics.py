@@ -3,8 +3,8 @@ import os
 from termcolor import colored
 import logging
 import pandas as pd
-import json
 
+import am_config as amc
 from glab import glab_constants as glc
 from ampyutils import amutils
 
@@ -43,6 +43,6 @@ def crd_statistics(crds: list, prcodes: list, df_crds: pd.DataFrame, logger: log
             dStats[crd][prcode]['max'] = df_crd_prcode['mean'].max()
             dStats[crd][prcode]['min'] = df_crd_prcode['mean'].min()
 
-    logger.info('{func:s}: Statistics for {crd:s} =\n{json!s}'.format(crd=','.join(glc.dgLab['OUTPUT'][crds]), func=cFuncName, json=json.dumps(dStats, sort_keys=False, indent=4, default=amutils.DT_convertor)))
+    amc.logJSON(obj=dStats, objName='Statistics for {crd:s}'.format(crd=','.join(glc.dgLab['OUTPUT'][crds])), callerName=cFuncName, logger=logger, default=amutils.DT_convertor)
 
     return dStats
@@ -11,10 +11,9 @@ import pandas as pd
 from shutil import copyfile
 
 import am_config as amc
-from ampyutils import amutils, location, exeprogram
+from ampyutils import amutils, amcompress, amprofile
 from glab import glab_constants as glc
 from glab import glab_split_outfile, glab_parser_output, glab_parser_info, glab_statistics, glab_updatedb
-from glab_plot import glab_plot_output_enu, glab_plot_output_stats
 
 __author__ = 'amuls'
 
@@ -76,6 +75,8 @@ def treatCmdOpts(argv):
 
     parser.add_argument('-p', '--plots', help='displays interactive plots (default True)', action='store_true', required=False, default=False)
     # parser.add_argument('-o', '--overwrite', help='overwrite intermediate files (default False)', action='store_true', required=False)
+    parser.add_argument('--quiet', help='quiet (batch) mode: console limited to warnings, no diagnostic dumps (default False)', action='store_true', required=False, default=False)
+    parser.add_argument('--profile', help='profile the run and write the profile next to the run report (one of {choices:s}, default no profiling)'.format(choices='|'.join(amprofile.PROFILERS)), required=False, default=None, choices=amprofile.PROFILERS)
 
     parser.add_argument('-l', '--logging', help='specify logging level console/file (two of {choices:s}, default {choice:s})'.format(choices='|'.join(lst_logging_choices), choice=colored(' '.join(lst_logging_choices[3:5]), 'green')), nargs=2, required=False, default=lst_logging_choices[3:5], action=logging_action)
 
@@ -83,7 +84,7 @@ def treatCmdOpts(argv):
     args = parser.parse_args(argv[1:])
 
     # return arguments
-    return args.rootdir, args.file, args.scale, args.center, args.db, args.plots, args.logging
+    return args.rootdir, args.file, args.scale, args.center, args.db, args.plots, args.quiet, args.profile, args.logging
 
 
 def check_arguments(logger: logging.Logger) -> int:
@@ -151,11 +152,15 @@ def main(argv) -> bool:
     # pd.options.display.float_format = "{:,.3f}".format
 
     # treat command line options
-    dir_root, glab_cmp_out, scale_enu, center_enu, db_cvs, show_plot, log_levels = treatCmdOpts(argv)
+    dir_root, glab_cmp_out, scale_enu, center_enu, db_cvs, show_plot, quiet, profiler, log_levels = treatCmdOpts(argv)
 
     # create logging for better debugging
+    amc.setQuiet(quiet or amc.quiet)
     logger, log_name = amc.createLoggers(os.path.basename(__file__), dir=dir_root, logLevels=log_levels)
 
+    # record timing and memory usage of the parse / statistics / plot stages
+    report = amprofile.RunReport(name=os.path.basename(__file__), logger=logger, profiler=profiler)
+
     # store cli parameters
     amc.dRTK = {}
     amc.dRTK['dir_root'] = dir_root
@@ -178,24 +183,18 @@ def main(argv) -> bool:
 
     # glab_updatedb.db_update_line(db_name=amc.dRTK['dgLABng']['db'], line_id='2019,134', info_line='2019,134,new thing whole line for ', logger=logger)
 
-    # get location of progs used
-    amc.dRTK['progs'] = {}
-    amc.dRTK['progs']['gunzip'] = location.locateProg('gunzip', logger)
-    amc.dRTK['progs']['gzip'] = location.locateProg('gzip', logger)
-
     # uncompress the "out" file
-    runGUNZIP = '{prog:s} -f -v {zip:s}'.format(prog=amc.dRTK['progs']['gunzip'], zip=os.path.join(amc.dRTK['dir_root'], amc.dRTK['glab_cmp_out']))
-    logger.info('{func:s}: Uncompressing file {cmp:s}:\n{cmd:s}'.format(func=cFuncName, cmd=colored(runGUNZIP, 'green'), cmp=colored(amc.dRTK['glab_cmp_out'], 'green')))
-
-    # run the program
-    exeprogram.subProcessDisplayStdErr(cmd=runGUNZIP, verbose=True)
+    logger.info('{func:s}: Uncompressing file {cmp:s}'.format(func=cFuncName, cmp=colored(amc.dRTK['glab_cmp_out'], 'green')))
+    with report.stage('gunzip'):
+        amcompress.compress_files(jobs=[('gunzip', os.path.join(amc.dRTK['dir_root'], amc.dRTK['glab_cmp_out']))], logger=logger)
 
     # get name of uncompressed file
     amc.dRTK['glab_out'] = amc.dRTK['glab_cmp_out'][:-3]
 
     # split gLABs out file in parts
     glab_msgs = glc.dgLab['messages'][0:2]  # INFO & OUTPUT messages needed
-    dglab_tmpfiles = glab_split_outfile.split_glab_outfile(msgs=glab_msgs, glab_outfile=amc.dRTK['glab_out'], logger=logger)
+    with report.stage('split_glab_outfile'):
+        dglab_tmpfiles = glab_split_outfile.split_glab_outfile(msgs=glab_msgs, glab_outfile=amc.dRTK['glab_out'], logger=logger)
 
     # read in the INFO messages from INFO temp file
     amc.dRTK['INFO'] = glab_parser_info.parse_glab_info(glab_info=dglab_tmpfiles['INFO'], logger=logger)
@@ -203,15 +202,13 @@ def main(argv) -> bool:
     # glab_updatedb.db_update_line(db_name=amc.dRTK['dgLABng']['db'], line_id=amc.dRTK['INFO']['db_lineID'], info_line=amc.dRTK['INFO']['db_lineID'], logger=logger)
 
     # read in the OUTPUT messages from OUTPUT temp file
-    df_output = glab_parser_output.parse_glab_output(glab_output=dglab_tmpfiles['OUTPUT'], logger=logger)
+    df_output = glab_parser_output.parse_glab_output(glab_output=dglab_tmpfiles['OUTPUT'], logger=logger, dRtk=amc.dRTK)
     # save df_output as CSV file
     amc.dRTK['dgLABng']['pos'] = store_to_cvs(df=df_output, ext='pos', logger=logger, index=False)
 
     # compress the stored CVS file
-    runGZIP = '{prog:s} -f -v {zip:s}'.format(prog=amc.dRTK['progs']['gzip'], zip=os.path.join(amc.dRTK['dir_root'], amc.dRTK['dgLABng']['dir_glab'], amc.dRTK['dgLABng']['pos']))
-    logger.info('{func:s}: Compressing file {cmp:s}:\n{cmd:s}'.format(func=cFuncName, cmd=colored(runGZIP, 'green'), cmp=colored(amc.dRTK['dgLABng']['pos'], 'green')))
-    # run the program
-    exeprogram.subProcessDisplayStdErr(cmd=runGZIP, verbose=True)
+    logger.info('{func:s}: Compressing file {cmp:s}'.format(func=cFuncName, cmp=colored(amc.dRTK['dgLABng']['pos'], 'green')))
+    amcompress.compress_files(jobs=[('gzip', os.path.join(amc.dRTK['dir_root'], amc.dRTK['dgLABng']['dir_glab'], amc.dRTK['dgLABng']['pos']))], logger=logger)
 
     # calculate statitics gLAB OUTPUT messages
     amc.dRTK['dgLABng']['stats'], dDB_crds = glab_statistics.statistics_glab_outfile(df_outp=df_output, logger=logger)
@@ -226,29 +223,30 @@ def main(argv) -> bool:
     glab_updatedb.db_sort(db_name=amc.dRTK['dgLABng']['db'], logger=logger)
     # sys.exit(2)
 
-    # plot the gLABs OUTPUT messages
+    # plot the gLABs OUTPUT messages, the plotting stack is only loaded here
+    from glab_plot import glab_plot_output_enu, glab_plot_output_stats
+
     # - position ENU and PDOP plots
-    glab_plot_output_enu.plot_glab_position(dfCrd=df_output, scale=scale_enu, showplot=show_plot, logger=logger)
+    glab_plot_output_enu.plot_glab_position(dfCrd=df_output, scale=scale_enu, showplot=show_plot, logger=logger, dRtk=amc.dRTK)
     # - scatter plot of EN per dop bind
-    glab_plot_output_enu.plot_glab_scatter(dfCrd=df_output, scale=scale_enu, center=center_enu, showplot=show_plot, logger=logger)
+    glab_plot_output_enu.plot_glab_scatter(dfCrd=df_output, scale=scale_enu, center=center_enu, showplot=show_plot, logger=logger, dRtk=amc.dRTK)
     # - scatter plot of EN per dop bind (separate)
-    glab_plot_output_enu.plot_glab_scatter_bin(dfCrd=df_output, scale=scale_enu, center=center_enu, showplot=show_plot, logger=logger)
+    glab_plot_output_enu.plot_glab_scatter_bin(dfCrd=df_output, scale=scale_enu, center=center_enu, showplot=show_plot, logger=logger, dRtk=amc.dRTK)
     # - plot the DOP parameters
-    glab_plot_output_enu.plot_glab_xdop(dfCrd=df_output, showplot=show_plot, logger=logger)
+    glab_plot_output_enu.plot_glab_xdop(dfCrd=df_output, showplot=show_plot, logger=logger, dRtk=amc.dRTK)
     # - plot the ENU box plots per DOP bin
-    glab_plot_output_stats.plot_glab_statistics(df_dopenu=df_output[glc.dgLab['OUTPUT']['XDOP'] + glc.dgLab['OUTPUT']['dENU']], scale=scale_enu, showplot=show_plot, logger=logger)
+    glab_plot_output_stats.plot_glab_statistics(df_dopenu=df_output[glc.dgLab['OUTPUT']['XDOP'] + glc.dgLab['OUTPUT']['dENU']], scale=scale_enu, showplot=show_plot, logger=logger, dRtk=amc.dRTK)
 
     # report to the user
-    logger.info('{func:s}: Project information =\n{json!s}'.format(func=cFuncName, json=json.dumps(amc.dRTK, sort_keys=False, indent=4, default=amutils.DT_convertor)))
+    amc.logJSON(obj=amc.dRTK, objName='Project information', callerName=cFuncName, logger=logger, default=amutils.DT_convertor)
 
     # sort the glab_output_db
     glab_updatedb.db_sort(db_name=amc.dRTK['dgLABng']['db'], logger=logger)
 
     # recompress the "out" file
-    runGZIP = '{prog:s} -f -v {zip:s}'.format(prog=amc.dRTK['progs']['gzip'], zip=os.path.join(amc.dRTK['dir_root'], amc.dRTK['glab_out']))
-    logger.info('{func:s}: Compressing file {cmp:s}:\n{cmd:s}'.format(func=cFuncName, cmd=colored(runGZIP, 'green'), cmp=colored(amc.dRTK['glab_out'], 'green')))
-    # run the program
-    exeprogram.subProcessDisplayStdErr(cmd=runGZIP, verbose=True)
+    logger.info('{func:s}: Compressing file {cmp:s}'.format(func=cFuncName, cmp=colored(amc.dRTK['glab_out'], 'green')))
+    with report.stage('gzip'):
+        amcompress.compress_files(jobs=[('gzip', os.path.join(amc.dRTK['dir_root'], amc.dRTK['glab_out']))], logger=logger)
 
     # store the json structure
     json_out = amc.dRTK['glab_out'].split('.')[0] + '.json'
@@ -256,6 +254,9 @@ def main(argv) -> bool:
         json.dump(amc.dRTK, f, ensure_ascii=False, indent=4, default=amutils.DT_convertor)
     logger.info('{func:s}: created json file {json:s}'.format(func=cFuncName, json=colored(json_out, 'green')))
 
+    # write the run report next to it
+    report.write(report_name=amc.dRTK['glab_out'].split('.')[0] + '.run.json')
+
     # copy temp log file to the YYDOY directory
     copyfile(log_name, os.path.join(amc.dRTK['dir_root'], '{obs:s}-{prog:s}'.format(obs=amc.dRTK['glab_out'].split('.')[0], prog='output.log')))
     os.remove(log_name)
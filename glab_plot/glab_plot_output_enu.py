@@ -8,7 +8,7 @@ import logging
 from matplotlib import dates
 import numpy as np
 
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 import am_config as amc
 from plot import plot_utils
 from glab import glab_constants as glc
@@ -19,11 +19,13 @@ register_matplotlib_converters()
 __author__ = 'amuls'
 
 
-def plot_glab_position(dfCrd: pd.DataFrame, scale: float, logger: logging.Logger, showplot: bool = False):
+@amprofile.stage_timer(rows='dfCrd')
+def plot_glab_position(dfCrd: pd.DataFrame, scale: float, logger: logging.Logger, showplot: bool = False, dRtk: dict = None):
     """
     plot_glab_position plots the position difference wrt to Nominal a priori position
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
     logger.info('{func:s}: plotting position offset'.format(func=cFuncName))
 
@@ -31,7 +33,7 @@ def plot_glab_position(dfCrd: pd.DataFrame, scale: float, logger: logging.Logger
     plt.style.use('ggplot')
 
     # get info for the plot titles
-    plot_title, proc_options, rx_geod = amc.get_title_info(logger=logger)
+    plot_title, proc_options, rx_geod = amc.get_title_info(logger=logger, dRtk=dRtk)
 
     # subplots
     fig, ax = plt.subplots(nrows=4, ncols=1, sharex=True, figsize=(16.0, 12.0))
@@ -39,7 +41,7 @@ def plot_glab_position(dfCrd: pd.DataFrame, scale: float, logger: logging.Logger
     fig.suptitle('{title:s}'.format(title=plot_title), **glc.title_font)
 
     # plot annotations
-    ax[0].annotate('{conf:s}'.format(conf=amc.dRTK['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
+    ax[0].annotate('{conf:s}'.format(conf=dRtk['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
     ax[0].annotate(proc_options, xy=(1, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
@@ -52,7 +54,7 @@ def plot_glab_position(dfCrd: pd.DataFrame, scale: float, logger: logging.Logger
         axis = ax[i]
 
         # get the statistics for this coordinate
-        crd_stats = amc.dRTK['dgLABng']['stats']['crd'][crd]
+        crd_stats = dRtk['dgLABng']['stats']['crd'][crd]
 
         # color for markers and alpha colors for error bars
         rgb = mpcolors.colorConverter.to_rgb(glc.enu_colors[i])
@@ -129,8 +131,8 @@ def plot_glab_position(dfCrd: pd.DataFrame, scale: float, logger: logging.Logger
         tick.label1.set_horizontalalignment('center')
 
     # save the plot in subdir png of GNSSSystem
-    dir_png = os.path.join(amc.dRTK['dir_root'], amc.dRTK['dgLABng']['dir_glab'], 'png')
-    png_filename = os.path.join(dir_png, '{out:s}-ENU.png'.format(out=amc.dRTK['glab_out'].replace('.', '-')))
+    dir_png = os.path.join(dRtk['dir_root'], dRtk['dgLABng']['dir_glab'], 'png')
+    png_filename = os.path.join(dir_png, '{out:s}-ENU.png'.format(out=dRtk['glab_out'].replace('.', '-')))
     amutils.mkdir_p(dir_png)
     fig.savefig(png_filename, dpi=fig.dpi)
 
@@ -144,18 +146,21 @@ def plot_glab_position(dfCrd: pd.DataFrame, scale: float, logger: logging.Logger
     return
 
 
-def plot_glab_scatter(dfCrd: pd.DataFrame, scale: float, center: str, logger: logging.Logger, showplot: bool = False):
+@amprofile.stage_timer(rows='dfCrd')
+def plot_glab_scatter(dfCrd: pd.DataFrame, scale: float, center: str, logger: logging.Logger, showplot: bool = False, dRtk: dict = None):
     """
     plot_glab_scatter plots the horizontal position difference wrt to Nominal a priori position
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
+
     logger.info('{func:s}: plotting EN scattering'.format(func=cFuncName))
 
     # set up the plot
     plt.style.use('ggplot')
 
     # get info for the plot titles
-    plot_title, proc_options, rx_geod = amc.get_title_info(logger=logger)
+    plot_title, proc_options, rx_geod = amc.get_title_info(logger=logger, dRtk=dRtk)
 
     # subplots
     fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(11.0, 11.0))
@@ -164,7 +169,7 @@ def plot_glab_scatter(dfCrd: pd.DataFrame, scale: float, center: str, logger: lo
     fig.suptitle('{title:s}'.format(title=plot_title, **glc.title_font))
 
     # plot annotations
-    ax.annotate('{conf:s}'.format(conf=amc.dRTK['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
+    ax.annotate('{conf:s}'.format(conf=dRtk['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
     ax.annotate(proc_options, xy=(1, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
@@ -180,8 +185,8 @@ def plot_glab_scatter(dfCrd: pd.DataFrame, scale: float, center: str, logger: lo
     if center == 'origin':
         wavg_E = wavg_N = 0
     else:
-        wavg_E = amc.dRTK['dgLABng']['stats']['crd']['dE0']['wavg']
-        wavg_N = amc.dRTK['dgLABng']['stats']['crd']['dN0']['wavg']
+        wavg_E = dRtk['dgLABng']['stats']['crd']['dE0']['wavg']
+        wavg_N = dRtk['dgLABng']['stats']['crd']['dN0']['wavg']
     circle_center = (wavg_E, wavg_N)
 
     for radius in np.linspace(scale / 5, scale * 2, num=10):
@@ -203,7 +208,7 @@ def plot_glab_scatter(dfCrd: pd.DataFrame, scale: float, center: str, logger: lo
         index4Bin = (dfCrd['PDOP'] > glc.dop_bins[i - 1]) & (dfCrd['PDOP'] <= glc.dop_bins[i])
 
         # get th epercentage of observations within this dop_bin
-        bin_percentage = '{perc:.1f}'.format(perc=amc.dRTK['dgLABng']['stats']['dop_bin'][binInterval]['perc'] * 100)
+        bin_percentage = '{perc:.1f}'.format(perc=dRtk['dgLABng']['stats']['dop_bin'][binInterval]['perc'] * 100)
         ax.plot(dfCrd.loc[index4Bin, 'dE0'], dfCrd.loc[index4Bin, 'dN0'], label=r'{!s} $\leq$ PDOP $<$ {!s} ({:s}%)'.format(glc.dop_bins[i - 1], glc.dop_bins[i], bin_percentage), **markerBins[i - 1])
 
         # print('i = {:d} color = {!s}'.format(i, markerBins[i]['color']))
@@ -221,8 +226,8 @@ def plot_glab_scatter(dfCrd: pd.DataFrame, scale: float, center: str, logger: lo
     ax.set_ylabel('North [m]', fontsize='large')
 
     # save the plot in subdir png of GNSSSystem
-    dir_png = os.path.join(amc.dRTK['dir_root'], amc.dRTK['dgLABng']['dir_glab'], 'png')
-    png_filename = os.path.join(dir_png, '{out:s}-scatter.png'.format(out=amc.dRTK['glab_out'].replace('.', '-')))
+    dir_png = os.path.join(dRtk['dir_root'], dRtk['dgLABng']['dir_glab'], 'png')
+    png_filename = os.path.join(dir_png, '{out:s}-scatter.png'.format(out=dRtk['glab_out'].replace('.', '-')))
     amutils.mkdir_p(dir_png)
     fig.savefig(png_filename, dpi=fig.dpi)
 
@@ -234,11 +239,14 @@ def plot_glab_scatter(dfCrd: pd.DataFrame, scale: float, center: str, logger: lo
         plt.close(fig)
 
 
-def plot_glab_scatter_bin(dfCrd: pd.DataFrame, scale: float, center: str, logger: logging.Logger, showplot: bool = False):
+@amprofile.stage_timer(rows='dfCrd')
+def plot_glab_scatter_bin(dfCrd: pd.DataFrame, scale: float, center: str, logger: logging.Logger, showplot: bool = False, dRtk: dict = None):
     """
     plot_glab_scatter plots the horizontal position difference wrt to Nominal a priori position
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
+
     logger.info('{func:s}: plotting EN scattering'.format(func=cFuncName))
 
     # # select colors for E, N, U coordinate difference
@@ -249,7 +257,7 @@ def plot_glab_scatter_bin(dfCrd: pd.DataFrame, scale: float, center: str, logger
     plt.style.use('ggplot')
 
     # get info for the plot titles
-    plot_title, proc_options, rx_geod = amc.get_title_info(logger=logger)
+    plot_title, proc_options, rx_geod = amc.get_title_info(logger=logger, dRtk=dRtk)
 
     # subplots
     fig, ax = plt.subplots(nrows=2, ncols=3, figsize=(16.0, 11.0))
@@ -258,7 +266,7 @@ def plot_glab_scatter_bin(dfCrd: pd.DataFrame, scale: float, center: str, logger
     fig.suptitle('{title:s}'.format(title=plot_title), **glc.title_font)
 
     # plot annotations
-    ax[0][0].annotate('{conf:s}'.format(conf=amc.dRTK['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
+    ax[0][0].annotate('{conf:s}'.format(conf=dRtk['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
     ax[0][2].annotate(proc_options, xy=(1, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
@@ -284,16 +292,16 @@ def plot_glab_scatter_bin(dfCrd: pd.DataFrame, scale: float, center: str, logger
         axis = ax[i // 3][i % 3]
 
         # get th epercentage of observations within this dop_bin
-        bin_percentage = '{perc:.1f}'.format(perc=amc.dRTK['dgLABng']['stats']['dop_bin'][binInterval]['perc'] * 100)
-        lblBin = r'{!s} $\leq$ PDOP $<$ {!s} ({:s}%, #{:d})'.format(glc.dop_bins[i], glc.dop_bins[i + 1], bin_percentage, amc.dRTK['dgLABng']['stats']['dop_bin'][binInterval]['count'])
+        bin_percentage = '{perc:.1f}'.format(perc=dRtk['dgLABng']['stats']['dop_bin'][binInterval]['perc'] * 100)
+        lblBin = r'{!s} $\leq$ PDOP $<$ {!s} ({:s}%, #{:d})'.format(glc.dop_bins[i], glc.dop_bins[i + 1], bin_percentage, dRtk['dgLABng']['stats']['dop_bin'][binInterval]['count'])
         logger.info('{func:s}: {bin:s}'.format(func=cFuncName, bin=lblBin))
 
         # define center position
         if center == 'origin':
             wavg_E = wavg_N = 0
         else:
-            wavg_E = amc.dRTK['dgLABng']['stats']['crd']['dE0']['wavg']
-            wavg_N = amc.dRTK['dgLABng']['stats']['crd']['dN0']['wavg']
+            wavg_E = dRtk['dgLABng']['stats']['crd']['dE0']['wavg']
+            wavg_N = dRtk['dgLABng']['stats']['crd']['dN0']['wavg']
         circle_center = (wavg_E, wavg_N)
 
         # draw circles for distancd evaluation on plot
@@ -322,8 +330,8 @@ def plot_glab_scatter_bin(dfCrd: pd.DataFrame, scale: float, center: str, logger
             axis.set_ylabel('North [m]', fontsize='large')
 
     # save the plot in subdir png of GNSSSystem
-    dir_png = os.path.join(amc.dRTK['dir_root'], amc.dRTK['dgLABng']['dir_glab'], 'png')
-    png_filename = os.path.join(dir_png, '{out:s}-scatter-bins.png'.format(out=amc.dRTK['glab_out'].replace('.', '-')))
+    dir_png = os.path.join(dRtk['dir_root'], dRtk['dgLABng']['dir_glab'], 'png')
+    png_filename = os.path.join(dir_png, '{out:s}-scatter-bins.png'.format(out=dRtk['glab_out'].replace('.', '-')))
     amutils.mkdir_p(dir_png)
     fig.savefig(png_filename, dpi=fig.dpi)
 
@@ -335,18 +343,21 @@ def plot_glab_scatter_bin(dfCrd: pd.DataFrame, scale: float, center: str, logger
         plt.close(fig)
 
 
-def plot_glab_xdop(dfCrd: pd.DataFrame, logger: logging.Logger, showplot: bool = False):
+@amprofile.stage_timer(rows='dfCrd')
+def plot_glab_xdop(dfCrd: pd.DataFrame, logger: logging.Logger, showplot: bool = False, dRtk: dict = None):
     """
     plot_xdop plot the DOP values vs time
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
+
     logger.info('{func:s}: plotting xDOP'.format(func=cFuncName))
 
     # set up the plot
     plt.style.use('ggplot')
 
     # get info for the plot titles
-    plot_title, proc_options, rx_geod = amc.get_title_info(logger=logger)
+    plot_title, proc_options, rx_geod = amc.get_title_info(logger=logger, dRtk=dRtk)
 
     # subplots
     fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(12.0, 8.0))
@@ -355,7 +366,7 @@ def plot_glab_xdop(dfCrd: pd.DataFrame, logger: logging.Logger, showplot: bool =
     fig.suptitle('{title:s}'.format(title=plot_title), **glc.title_font)
 
     # plot annotations
-    ax.annotate('{conf:s}'.format(conf=amc.dRTK['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
+    ax.annotate('{conf:s}'.format(conf=dRtk['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
     ax.annotate(proc_options, xy=(1, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
@@ -397,8 +408,8 @@ def plot_glab_xdop(dfCrd: pd.DataFrame, logger: logging.Logger, showplot: bool =
         tick.label1.set_horizontalalignment('center')
 
     # save the plot in subdir png of GNSSSystem
-    dir_png = os.path.join(amc.dRTK['dir_root'], amc.dRTK['dgLABng']['dir_glab'], 'png')
-    png_filename = os.path.join(dir_png, '{out:s}-DOP.png'.format(out=amc.dRTK['glab_out'].replace('.', '-')))
+    dir_png = os.path.join(dRtk['dir_root'], dRtk['dgLABng']['dir_glab'], 'png')
+    png_filename = os.path.join(dir_png, '{out:s}-DOP.png'.format(out=dRtk['glab_out'].replace('.', '-')))
     amutils.mkdir_p(dir_png)
     fig.savefig(png_filename, dpi=fig.dpi)
 
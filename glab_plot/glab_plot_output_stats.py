@@ -6,7 +6,7 @@ import os
 import pandas as pd
 import seaborn as sns
 
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 import am_config as amc
 from glab import glab_constants as glc
 # from ampyutils import amutils
@@ -14,11 +14,13 @@ from glab import glab_constants as glc
 __author__ = 'amuls'
 
 
-def plot_glab_statistics(df_dopenu: pd.DataFrame, scale: float, logger: logging.Logger, showplot: bool = False):
+@amprofile.stage_timer(rows='df_dopenu')
+def plot_glab_statistics(df_dopenu: pd.DataFrame, scale: float, logger: logging.Logger, showplot: bool = False, dRtk: dict = None):
     """
     plot_glab_statistics plots the position statitictics according to COP bins
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
     logger.info('{func:s}: plotting position statistics'.format(func=cFuncName))
 
@@ -26,7 +28,7 @@ def plot_glab_statistics(df_dopenu: pd.DataFrame, scale: float, logger: logging.
     plt.style.use('ggplot')
 
     # get info for the plot titles
-    plot_title, proc_options, rx_geod = amc.get_title_info(logger=logger)
+    plot_title, proc_options, rx_geod = amc.get_title_info(logger=logger, dRtk=dRtk)
 
     # create additional column assigning the values of crd diffs to the correct PDOP bin
     dop_bins = []
@@ -72,7 +74,7 @@ def plot_glab_statistics(df_dopenu: pd.DataFrame, scale: float, logger: logging.
     fig.suptitle('{title:s}'.format(title=plot_title), **glc.title_font)
 
     # plot annotations
-    ax_box[0][0].annotate('{conf:s}'.format(conf=amc.dRTK['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
+    ax_box[0][0].annotate('{conf:s}'.format(conf=dRtk['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
     ax_box[0][-1].annotate(proc_options, xy=(1, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
@@ -80,8 +82,8 @@ def plot_glab_statistics(df_dopenu: pd.DataFrame, scale: float, logger: logging.
     ax_hist[-1].annotate(r'$\copyright$ Alain Muls (alain.muls@mil.be)', xy=(1, 0), xycoords='axes fraction', xytext=(0, -70), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', weight='ultrabold', fontsize='x-small')
 
     # save the plot in subdir png of GNSSSystem
-    dir_png = os.path.join(amc.dRTK['dir_root'], amc.dRTK['dgLABng']['dir_glab'], 'png')
-    png_filename = os.path.join(dir_png, '{out:s}-boxhist.png'.format(out=amc.dRTK['glab_out'].replace('.', '-')))
+    dir_png = os.path.join(dRtk['dir_root'], dRtk['dgLABng']['dir_glab'], 'png')
+    png_filename = os.path.join(dir_png, '{out:s}-boxhist.png'.format(out=dRtk['glab_out'].replace('.', '-')))
     amutils.mkdir_p(dir_png)
     fig.savefig(png_filename, dpi=fig.dpi)
 
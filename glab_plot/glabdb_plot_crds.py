@@ -8,7 +8,7 @@ import logging
 from matplotlib import dates
 import numpy as np
 
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 import am_config as amc
 from plot import plot_utils
 from glab import glab_constants as glc
@@ -19,11 +19,13 @@ register_matplotlib_converters()
 __author__ = 'amuls'
 
 
-def plot_glabdb_position(crds: list, prcodes: list, df_crds: pd.DataFrame, logger: logging.Logger, showplot: bool = False):
+@amprofile.stage_timer(rows='df_crds')
+def plot_glabdb_position(crds: list, prcodes: list, df_crds: pd.DataFrame, logger: logging.Logger, showplot: bool = False, dRtk: dict = None):
     """
     plot_glabdb_position plots the crds for all prcodes
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
     logger.info('{func:s}: plotting coordinates per pr-code'.format(func=cFuncName))
 
@@ -33,11 +35,11 @@ def plot_glabdb_position(crds: list, prcodes: list, df_crds: pd.DataFrame, logge
     # subplots
     fig, ax = plt.subplots(nrows=len(crds), ncols=1, sharex=True, figsize=(16.0, 9.0))
 
-    title_txt = 'daily coordinates comparison {yyyy:4d}/{start:03d} - {yyyy:4d}/{end:03d}'.format(start=amc.dRTK['options']['doy_begin'], end=amc.dRTK['options']['doy_last'], yyyy=amc.dRTK['options']['yyyy'])
+    title_txt = 'daily coordinates comparison {yyyy:4d}/{start:03d} - {yyyy:4d}/{end:03d}'.format(start=dRtk['options']['doy_begin'], end=dRtk['options']['doy_last'], yyyy=dRtk['options']['yyyy'])
     fig.suptitle(title_txt, **glc.title_font)
 
     # plot annotations
-    # ax[0].annotate('{conf:s}'.format(conf=amc.dRTK['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
+    # ax[0].annotate('{conf:s}'.format(conf=dRtk['glab_out']), xy=(0, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
     # ax[0].annotate(proc_options, xy=(1, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', weight='ultrabold', fontsize='small')
 
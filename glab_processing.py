@@ -4,14 +4,13 @@ import sys
 import os
 import argparse
 from termcolor import colored
-import json
 import logging
 import pathlib
 from shutil import move
 from string import Template
 
 import am_config as amc
-from ampyutils import amutils, location, exeprogram
+from ampyutils import amutils, location, exeprogram, amcompress
 
 __author__ = 'amuls'
 
@@ -181,41 +180,20 @@ def check_arguments(logger: logging.Logger) -> int:
 
 def uncompress_rnx_files(logger: logging.Logger):
     """
-    uncompress_rnx_files uncompresses RINEX OBS & NAV files
+    uncompress_rnx_files uncompresses RINEX OBS & NAV files in parallel
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # uncompress the RINEX OBS file
-    runCRZ2RNX = '{prog:s} -f {crz:s}'.format(prog=amc.dRTK['progs']['crz2rnx'], crz=os.path.join(amc.dRTK['proc']['dir_rnx'], amc.dRTK['proc']['cmp_obs']))
-    logger.info('{func:s}: Running:\n{cmd:s}'.format(func=cFuncName, cmd=colored(runCRZ2RNX, 'green')))
-
-    # run the program
-    exeprogram.subProcessDisplayStdErr(cmd=runCRZ2RNX, verbose=True)
-
-    # get name of uncompressed file
-    amc.dRTK['proc']['obs'] = amc.dRTK['proc']['cmp_obs'][:-3] + 'O'
-
-    # check if this decompressed file exists
-    path = pathlib.Path(os.path.join(amc.dRTK['proc']['dir_rnx'], amc.dRTK['proc']['obs']))
-    if not path.is_file():
-        logger.info('{func:s}: Failed creating decompressed RINEX observation file {obs:s}'.format(obs=colored(amc.dRTK['proc']['obs'], 'green'), func=cFuncName))
+    # uncompress the RINEX OBS file and all navigation files
+    jobs = [('crz2rnx', os.path.join(amc.dRTK['proc']['dir_rnx'], amc.dRTK['proc']['cmp_obs']))]
+    jobs += [('gunzip', os.path.join(amc.dRTK['proc']['dir_igs'], cmp_nav)) for cmp_nav in amc.dRTK['proc']['cmp_nav']]
+    logger.info('{func:s}: uncompressing {obs:s} and {nr:d} navigation files'.format(obs=colored(amc.dRTK['proc']['cmp_obs'], 'green'), nr=len(jobs) - 1, func=cFuncName))
 
-    # decompress allnavigation files
-    amc.dRTK['proc']['nav'] = []
-    for cmp_nav in amc.dRTK['proc']['cmp_nav']:
-        runGUNZIP = '{prog:s} -f {zip:s}'.format(prog=amc.dRTK['progs']['gunzip'], zip=os.path.join(amc.dRTK['proc']['dir_igs'], cmp_nav))
-        logger.info('{func:s}: Running:\n{cmd:s}'.format(func=cFuncName, cmd=colored(runGUNZIP, 'green')))
+    results = amcompress.compress_files(jobs=jobs, progs={'crz2rnx': amc.dRTK['progs']['crz2rnx']}, logger=logger)
 
-        # run the program
-        exeprogram.subProcessDisplayStdErr(cmd=runGUNZIP, verbose=True)
-
-        # get name of uncompressed file
-        amc.dRTK['proc']['nav'].append(cmp_nav[:-3])
-
-        # check if this decompressed file exists
-        path = pathlib.Path(os.path.join(amc.dRTK['proc']['dir_igs'], amc.dRTK['proc']['nav'][-1]))
-        if not path.is_file():
-            logger.info('{func:s}: Failed creating decompressed RINEX navigation file {nav:s}'.format(nav=colored(amc.dRTK['proc']['nav'], 'green'), func=cFuncName))
+    # get name of uncompressed files
+    amc.dRTK['proc']['obs'] = os.path.basename(results[0].dst)
+    amc.dRTK['proc']['nav'] = [os.path.basename(res.dst) for res in results[1:]]
 
 
 def cleanup_rnx_files(logger: logging.Logger):
@@ -229,11 +207,8 @@ def cleanup_rnx_files(logger: logging.Logger):
     os.remove(os.path.join(amc.dRTK['proc']['dir_rnx'], amc.dRTK['proc']['obs']))
 
     # recompress the navigation files
-    for nav_file in amc.dRTK['proc']['nav']:
-        runGZIP = '{prog:s} -f {zip:s}'.format(prog=amc.dRTK['progs']['gzip'], zip=os.path.join(amc.dRTK['proc']['dir_igs'], nav_file))
-        logger.info('{func:s}: compressing {nav:s} file by:\n{cmd:s}'.format(nav=nav_file, func=cFuncName, cmd=colored(runGZIP, 'green')))
-        # run the program
-        exeprogram.subProcessDisplayStdErr(cmd=runGZIP, verbose=True)
+    logger.info('{func:s}: compressing navigation files {nav!s}'.format(nav=amc.dRTK['proc']['nav'], func=cFuncName))
+    amcompress.compress_files(jobs=[('gzip', os.path.join(amc.dRTK['proc']['dir_igs'], nav_file)) for nav_file in amc.dRTK['proc']['nav']], logger=logger)
 
 
 def create_session_template(logger: logging.Logger):
@@ -290,15 +265,14 @@ def run_glabng_session(logger: logging.Logger):
     logger.info('{func:s}: Running:\n{cmd:s}'.format(func=cFuncName, cmd=colored(runGLABNG, 'green')))
 
     # run the program
-    exeprogram.subProcessDisplayStdOut(cmd=runGLABNG, verbose=True)
+    retCode = exeprogram.subProcessDisplayStdOut(cmd=runGLABNG, verbose=True)
+    if retCode != 0:
+        logger.error('{func:s}: {prog:s} returned error code {err:d}'.format(func=cFuncName, prog=colored(os.path.basename(amc.dRTK['progs']['glabng']), 'red'), err=retCode))
+        sys.exit(amc.E_FAILURE)
 
     # compress the resulting "out" file
-    runGZIP = '{prog:s} -f {zip:s}'.format(prog=amc.dRTK['progs']['gzip'], zip=os.path.join(amc.dRTK['proc']['dir_glab'], amc.dRTK['proc']['glab_out']))
-    logger.info('{func:s}: compressing {out:s} file by:\n{cmd:s}'.format(out=amc.dRTK['proc']['glab_out'], func=cFuncName, cmd=colored(runGZIP, 'green')))
-    # run the program
-    exeprogram.subProcessDisplayStdErr(cmd=runGZIP, verbose=True)
-
-    runGZIP
+    logger.info('{func:s}: compressing {out:s} file'.format(out=amc.dRTK['proc']['glab_out'], func=cFuncName))
+    amcompress.compress_files(jobs=[('gzip', os.path.join(amc.dRTK['proc']['dir_glab'], amc.dRTK['proc']['glab_out']))], logger=logger)
 
 
 def main(argv) -> bool:
@@ -327,8 +301,6 @@ def main(argv) -> bool:
     amc.dRTK['progs'] = {}
     amc.dRTK['progs']['glabng'] = location.locateProg('glabng', logger)
     amc.dRTK['progs']['crz2rnx'] = location.locateProg('crz2rnx', logger)
-    amc.dRTK['progs']['gunzip'] = location.locateProg('gunzip', logger)
-    amc.dRTK['progs']['gzip'] = location.locateProg('gzip', logger)
 
     # uncompress RINEX files
     uncompress_rnx_files(logger=logger)
@@ -343,7 +315,7 @@ def main(argv) -> bool:
     cleanup_rnx_files(logger=logger)
 
     # report to the user
-    logger.info('{func:s}: Project information =\n{json!s}'.format(func=cFuncName, json=json.dumps(amc.dRTK, sort_keys=False, indent=4, default=amutils.DT_convertor)))
+    amc.logJSON(obj=amc.dRTK, objName='Project information', callerName=cFuncName, logger=logger, default=amutils.DT_convertor)
 
     # move the log file to the glab directory
     code_txt = ''
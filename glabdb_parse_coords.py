@@ -4,7 +4,6 @@ import sys
 import os
 import argparse
 from termcolor import colored
-import json
 import logging
 import pathlib
 import pandas as pd
@@ -13,7 +12,6 @@ import datetime
 import am_config as amc
 from glab import glab_constants as glc
 from glab import glabdb_parse, glabdb_statistics
-from glab_plot import glabdb_plot_crds
 from ampyutils import amutils
 
 __author__ = 'amuls'
@@ -212,7 +210,7 @@ def main(argv) -> bool:
     # for crds in ['ENU', 'dENU']:
     for crds in ['ENU']:
         # parse the database file to get the GNSSs and prcodes we need
-        tmp_name = glabdb_parse.db_parse_gnss_codes(db_name=amc.dRTK['options']['glab_db'], crd_types=glc.dgLab['OUTPUT'][crds], logger=logger)
+        tmp_name = glabdb_parse.db_parse_gnss_codes(db_name=amc.dRTK['options']['glab_db'], crd_types=glc.dgLab['OUTPUT'][crds], logger=logger, dRtk=amc.dRTK)
 
         # read into dataframe
         logger.info('{func:s}: reading selected information into dataframe'.format(func=cFuncName))
@@ -242,10 +240,11 @@ def main(argv) -> bool:
             # statistics over the coordinates ENU per prcode selected
             amc.dRTK['stats_{crd:s}'.format(crd=crds)] = glabdb_statistics.crd_statistics(crds=crds, prcodes=amc.dRTK['options']['prcodes'], df_crds=df_crds, logger=logger)
             # plot the mean / std values for all prcodes per ENU coordinates
-            glabdb_plot_crds.plot_glabdb_position(crds=crds, prcodes=amc.dRTK['options']['prcodes'], df_crds=df_crds, logger=logger, showplot=show_plot)
+            from glab_plot import glabdb_plot_crds
+            glabdb_plot_crds.plot_glabdb_position(crds=crds, prcodes=amc.dRTK['options']['prcodes'], df_crds=df_crds, logger=logger, showplot=show_plot, dRtk=amc.dRTK)
 
     # report to the user
-    logger.info('{func:s}: Project information =\n{json!s}'.format(func=cFuncName, json=json.dumps(amc.dRTK, sort_keys=False, indent=4, default=amutils.DT_convertor)))
+    amc.logJSON(obj=amc.dRTK, objName='Project information', callerName=cFuncName, logger=logger, default=amutils.DT_convertor)
 
     return amc.E_SUCCESS
 
@@ -7,10 +7,11 @@ from matplotlib import dates
 import logging
 import am_config as amc
 
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 from plot import plot_utils
 
 
+@amprofile.stage_timer(rows='dfClk')
 def plotClock(dfClk: pd.DataFrame, dRtk: dict, logger: logging.Logger, showplot: bool = False):
     """
     plotClock plots athe clock for all systems
@@ -11,7 +11,7 @@ from matplotlib.gridspec import GridSpec
 from matplotlib import dates
 
 from pandas.plotting import register_matplotlib_converters
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 from plot import plot_utils
 
 register_matplotlib_converters()
@@ -19,6 +19,7 @@ register_matplotlib_converters()
 __author__ = 'amuls'
 
 
+@amprofile.stage_timer(rows='dfENUdist')
 def plot_enu_distribution(dRtk: dict, dfENUdist: pd.DataFrame, dfENUstat: pd.DataFrame, logger: logging.Logger, showplot: bool = False):
     """
     plot_enu_distribution plots the distribution for the ENU coordinates
@@ -83,6 +84,7 @@ def plot_enu_distribution(dRtk: dict, dfENUdist: pd.DataFrame, dfENUstat: pd.Dat
     return
 
 
+@amprofile.stage_timer(rows='dfXDOP')
 def plot_xdop_distribution(dRtk: dict, dfXDOP: pd.DataFrame, dfXDOPdisp: pd.DataFrame, logger: logging.Logger, showplot: bool = False):
     """
     plot_xdop_distribution plots the XDOP values and the distribution XDOPs
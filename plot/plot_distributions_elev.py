@@ -11,7 +11,7 @@ from matplotlib.gridspec import GridSpec
 from matplotlib import dates
 
 from pandas.plotting import register_matplotlib_converters
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 from plot import plot_utils
 
 register_matplotlib_converters()
@@ -19,6 +19,7 @@ register_matplotlib_converters()
 __author__ = 'amuls'
 
 
+@amprofile.stage_timer(rows='df')
 def plot_elev_distribution(dRtk: dict, df: pd.DataFrame, ds:pd.Series, obs_name: str, logger: logging.Logger, showplot: bool = False):
     """
     plot_elev_distribution plots the distribution of CN0 or PRres as function of elevation bins
@@ -10,7 +10,7 @@ import matplotlib.ticker as ticker
 from typing import Tuple
 
 import am_config as amc
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 
 from pandas.plotting import register_matplotlib_converters
 register_matplotlib_converters()
@@ -18,11 +18,14 @@ register_matplotlib_converters()
 __author__ = 'amuls'
 
 
-def plot_rise_set_times(gnss: str, df_rs: pd.DataFrame, logger: logging.Logger, showplot: bool = False):
+@amprofile.stage_timer(rows='df_rs')
+def plot_rise_set_times(gnss: str, df_rs: pd.DataFrame, logger: logging.Logger, showplot: bool = False, dRtk: dict = None):
     """
     plot_rise_set_times plots the rise/set times vs time per SVs as observed / predicted
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
+
     logger.info('{func:s}: plotting rise/set times'.format(func=cFuncName))
     # amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_dt, dfName='df_dt')
 
@@ -36,8 +39,8 @@ def plot_rise_set_times(gnss: str, df_rs: pd.DataFrame, logger: logging.Logger,
 
     # subplots
     fig, ax = plt.subplots(figsize=(16.0, 10.0))
-    print(amc.dRTK['rnx']['times'])
-    fig.suptitle('Rise/Set for {gnss:s} - {marker:s} - {date:s}'.format(gnss=amc.dRTK['rnx']['gnss'][gnss]['name'], marker=amc.dRTK['rnx']['gnss'][gnss]['marker'], date='{date:s} ({yy:02d}/{doy:03d})'.format(date=amc.dRTK['rnx']['times']['DT'][:10], yy=amc.dRTK['rnx']['times']['yy'], doy=amc.dRTK['rnx']['times']['doy'])), fontdict=title_font, fontsize=24)
+    logger.debug('{func:s}: observation times {times!s}'.format(times=dRtk['rnx']['times'], func=cFuncName))
+    fig.suptitle('Rise/Set for {gnss:s} - {marker:s} - {date:s}'.format(gnss=dRtk['rnx']['gnss'][gnss]['name'], marker=dRtk['rnx']['gnss'][gnss]['marker'], date='{date:s} ({yy:02d}/{doy:03d})'.format(date=dRtk['rnx']['times']['DT'][:10], yy=dRtk['rnx']['times']['yy'], doy=dRtk['rnx']['times']['doy'])), fontdict=title_font, fontsize=24)
 
     # draw the rise to set lines per PRN
     for prn in df_rs.index:
@@ -84,9 +87,9 @@ def plot_rise_set_times(gnss: str, df_rs: pd.DataFrame, logger: logging.Logger,
     ax.set_ylabel('PRN', fontdict=title_font)
 
     # save the plot in subdir png of GNSSSystem
-    png_dir = os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss'][gnss]['marker'], 'png')
+    png_dir = os.path.join(dRtk['gfzrnxDir'], dRtk['rnx']['gnss'][gnss]['marker'], 'png')
     amutils.mkdir_p(png_dir)
-    pngName = os.path.join(png_dir, os.path.splitext(amc.dRTK['rnx']['gnss'][gnss]['obstab'])[0] + '-RS.png')
+    pngName = os.path.join(png_dir, os.path.splitext(dRtk['rnx']['gnss'][gnss]['obstab'])[0] + '-RS.png')
     fig.savefig(pngName, dpi=fig.dpi)
 
     logger.info('{func:s}: created plot {plot:s}'.format(func=cFuncName, plot=colored(pngName, 'green')))
@@ -97,11 +100,14 @@ def plot_rise_set_times(gnss: str, df_rs: pd.DataFrame, logger: logging.Logger,
         plt.close(fig)
 
 
-def plot_rise_set_stats(gnss: str, df_arcs: pd.DataFrame, nr_arcs: int, logger: logging.Logger, showplot: bool = False):
+@amprofile.stage_timer(rows='df_arcs')
+def plot_rise_set_stats(gnss: str, df_arcs: pd.DataFrame, nr_arcs: int, logger: logging.Logger, showplot: bool = False, dRtk: dict = None):
     """
     plot_rise_set_stats plots the rise/set statistics per SVs
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
+
     logger.info('{func:s}: plotting observation statistics'.format(func=cFuncName))
     # amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_dt, dfName='df_dt')
 
@@ -118,7 +124,7 @@ def plot_rise_set_stats(gnss: str, df_arcs: pd.DataFrame, nr_arcs: int, logger:
 
     # subplots
     fig, (ax1, ax2) = plt.subplots(figsize=(14.0, 9.0), nrows=2)
-    fig.suptitle('Rise/Set for {gnss:s} - {marker:s} - {date:s}'.format(gnss=amc.dRTK['rnx']['gnss'][gnss]['name'], marker=amc.dRTK['rnx']['gnss'][gnss]['marker'], date='{date:s} ({yy:02d}/{doy:03d})'.format(date=amc.dRTK['rnx']['times']['DT'][:10], yy=amc.dRTK['rnx']['times']['yy'], doy=amc.dRTK['rnx']['times']['doy'])), fontdict=title_font, fontsize=24)
+    fig.suptitle('Rise/Set for {gnss:s} - {marker:s} - {date:s}'.format(gnss=dRtk['rnx']['gnss'][gnss]['name'], marker=dRtk['rnx']['gnss'][gnss]['marker'], date='{date:s} ({yy:02d}/{doy:03d})'.format(date=dRtk['rnx']['times']['DT'][:10], yy=dRtk['rnx']['times']['yy'], doy=dRtk['rnx']['times']['doy'])), fontdict=title_font, fontsize=24)
 
     # creating bar plots for absolute values
     for i_arc, (obs_dx, tle_dx) in enumerate(zip(dx_obs, dx_tle)):
@@ -159,9 +165,9 @@ def plot_rise_set_stats(gnss: str, df_arcs: pd.DataFrame, nr_arcs: int, logger:
     ax2.set_xticklabels(df_arcs['PRN'], rotation=90)
 
     # save the plot in subdir png of GNSSSystem
-    png_dir = os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss'][gnss]['marker'], 'png')
+    png_dir = os.path.join(dRtk['gfzrnxDir'], dRtk['rnx']['gnss'][gnss]['marker'], 'png')
     amutils.mkdir_p(png_dir)
-    pngName = os.path.join(png_dir, os.path.splitext(amc.dRTK['rnx']['gnss'][gnss]['obstab'])[0] + '-obs.png')
+    pngName = os.path.join(png_dir, os.path.splitext(dRtk['rnx']['gnss'][gnss]['obstab'])[0] + '-obs.png')
     fig.savefig(pngName, dpi=fig.dpi)
 
     logger.info('{func:s}: created plot {plot:s}'.format(func=cFuncName, plot=colored(pngName, 'green')))
@@ -9,7 +9,7 @@ import sys
 import logging
 from typing import Tuple
 
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 from plot import plot_utils
 import am_config as amc
 
@@ -19,11 +19,12 @@ register_matplotlib_converters()
 __author__ = 'amuls'
 
 
-def crdDiff(dMarker: dict, dfUTMh: pd.DataFrame, plotCrds: list, logger: logging.Logger) -> Tuple[pd.DataFrame, dict]:
+def crdDiff(dMarker: dict, dfUTMh: pd.DataFrame, plotCrds: list, logger: logging.Logger, dRtk: dict = None) -> Tuple[pd.DataFrame, dict]:
     """
     calculates the differences of UTM,ellH using reference position or mean position
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
     # determine the difference to weighted average or marker position of UTM (N,E), ellH to plot
     dfCrd = pd.DataFrame(columns=plotCrds)
@@ -31,10 +32,10 @@ def crdDiff(dMarker: dict, dfUTMh: pd.DataFrame, plotCrds: list, logger: logging
     # determine the coordinates of used reference (either mean or user determined)
     if [dMarker['UTM.E'], dMarker['UTM.N'], dMarker['ellH']] == [np.NaN, np.NaN, np.NaN]:
         # so no reference position given use mean position
-        originCrds = [float(amc.dRTK['WAvg'][crd]) for crd in plotCrds]
+        originCrds = [float(dRtk['WAvg'][crd]) for crd in plotCrds]
     else:
         # make difference to reference position
-        originCrds = [float(amc.dRTK['marker'][crd]) for crd in plotCrds]
+        originCrds = [float(dRtk['marker'][crd]) for crd in plotCrds]
 
     # subtract origin coordinates from UTMh positions
     dfCrd = dfUTMh.sub(originCrds, axis='columns')
@@ -51,28 +52,30 @@ def crdDiff(dMarker: dict, dfUTMh: pd.DataFrame, plotCrds: list, logger: logging
     return dfCrd, dCrdLim
 
 
-def markerAnnotation(coord: str, coordSD: str) -> str:
+def markerAnnotation(coord: str, coordSD: str, dRtk: dict = None) -> str:
     """
     creates text to annotate with info about reference position
     """
     # cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
     # annotate each subplot with its reference position
-    if [amc.dRTK['marker']['UTM.E'], amc.dRTK['marker']['UTM.N'], amc.dRTK['marker']['ellH']] == [np.NaN, np.NaN, np.NaN]:
+    if [dRtk['marker']['UTM.E'], dRtk['marker']['UTM.N'], dRtk['marker']['ellH']] == [np.NaN, np.NaN, np.NaN]:
         # use the mean UTM/ellH position for the reference point
-        crdRef = amc.dRTK['WAvg'][coord]
-        crdSD = amc.dRTK['WAvg'][coordSD]
+        crdRef = dRtk['WAvg'][coord]
+        crdSD = dRtk['WAvg'][coordSD]
         annotation = r'Mean: {refcrd:.3f}m ($\pm${stddev:.2f}m)'.format(refcrd=crdRef, stddev=crdSD)
     else:
         # we have a reference point
-        crdRef = amc.dRTK['marker'][coord]
-        crdOffset = amc.dRTK['marker'][coord] - amc.dRTK['WAvg'][coord]
-        crdSD = amc.dRTK['WAvg'][coordSD]
+        crdRef = dRtk['marker'][coord]
+        crdOffset = dRtk['marker'][coord] - dRtk['WAvg'][coord]
+        crdSD = dRtk['WAvg'][coordSD]
         annotation = r'Ref: {crd:s} = {refcrd:.3f}m ({offset:.3f}m $\pm${stddev:.2f}m)'.format(crd=coord, refcrd=crdRef, stddev=crdSD, offset=crdOffset)
 
     return annotation
 
 
+@amprofile.stage_timer(rows='dfPos')
 def plotUTMOffset(dRtk: dict, dfPos: pd.DataFrame, dfCrd: pd.DataFrame, dCrdLim: dict, logger: logging.Logger, showplot: bool = False):
     """
     plotUTMOffset plots the offset NEU wrt to reference point
@@ -134,7 +137,7 @@ def plotUTMOffset(dRtk: dict, dfPos: pd.DataFrame, dfCrd: pd.DataFrame, dCrdLim:
         axis.set_ylabel('{crd:s} [m]'.format(crd=crd), fontsize='large', color=colors[i])
 
         # # annotate each subplot with its reference position
-        annotatetxt = markerAnnotation(crd, stdDev2Plot[i])
+        annotatetxt = markerAnnotation(crd, stdDev2Plot[i], dRtk=dRtk)
         axis.annotate(annotatetxt, xy=(1, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', weight='strong', fontsize='large')
 
         # title of sub-plot
@@ -9,11 +9,12 @@ import logging
 import am_config as amc
 
 from plot import plot_utils
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 
 __author__ = 'amuls'
 
 
+@amprofile.stage_timer(rows='dfSVs')
 def plotRTKLibSatsColumn(dCol: dict, dRtk: dict, dfSVs: pd.DataFrame, logger: logging.Logger, showplot: bool = False):
     """
     plotRTKLibSatsColumn plots a data columln from the stas dataframe
@@ -6,8 +6,7 @@ import pandas as pd
 import sys
 import logging
 
-from ampyutils import amutils
-import am_config as amc
+from ampyutils import amutils, amprofile
 
 from pandas.plotting import register_matplotlib_converters
 register_matplotlib_converters()
@@ -15,6 +14,7 @@ register_matplotlib_converters()
 __author__ = 'amuls'
 
 
+@amprofile.stage_timer(rows='dfPos')
 def plotUTMScatter(dRtk: dict, dfPos: pd.DataFrame, dfCrd: dict, dCrdLim: dict, logger: logging.Logger, showplot: bool = False):
     """
     plotUTMScatter plots scatter plot wrt reference position
@@ -38,10 +38,10 @@ def plotUTMScatter(dRtk: dict, dfPos: pd.DataFrame, dfCrd: dict, dCrdLim: dict,
     ax.annotate(r'$\copyright$ Alain Muls (alain.muls@mil.be)', xy=(1, 0), xycoords='axes fraction', xytext=(0, -45), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', weight='strong', fontsize='medium')
 
     # annotate with reference position
-    if [amc.dRTK['marker']['UTM.E'], amc.dRTK['marker']['UTM.N'], amc.dRTK['marker']['ellH']] == [np.NaN, np.NaN, np.NaN]:
-        annotatePosRef = 'E = {east:.3f}, N = {north:.3f}'.format(east=amc.dRTK['WAvg']['UTM.E'], north=amc.dRTK['WAvg']['UTM.N'])
+    if [dRtk['marker']['UTM.E'], dRtk['marker']['UTM.N'], dRtk['marker']['ellH']] == [np.NaN, np.NaN, np.NaN]:
+        annotatePosRef = 'E = {east:.3f}, N = {north:.3f}'.format(east=dRtk['WAvg']['UTM.E'], north=dRtk['WAvg']['UTM.N'])
     else:
-        annotatePosRef = 'E = {east:.3f}, N = {north:.3f}'.format(east=amc.dRTK['marker']['UTM.E'], north=amc.dRTK['marker']['UTM.N'])
+        annotatePosRef = 'E = {east:.3f}, N = {north:.3f}'.format(east=dRtk['marker']['UTM.E'], north=dRtk['marker']['UTM.N'])
 
     ax.annotate(annotatePosRef, xy=(0, 0), xycoords='axes fraction', xytext=(0, -45), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='strong', fontsize='medium')
 
@@ -88,6 +88,7 @@ def plotUTMScatter(dRtk: dict, dfPos: pd.DataFrame, dfCrd: dict, dCrdLim: dict,
         plt.close(fig)
 
 
+@amprofile.stage_timer(rows='dfPos')
 def plotUTMScatterBin(dRtk: dict, dfPos: pd.DataFrame, dfCrd: dict, dCrdLim: dict, logger: logging.Logger, showplot: bool = False):
     """
     plotUTMScatter plots scatter plot (per DOPbin)
@@ -111,10 +112,10 @@ def plotUTMScatterBin(dRtk: dict, dfPos: pd.DataFrame, dfCrd: dict, dCrdLim: dic
     ax[1][2].annotate(r'$\copyright$ Alain Muls (alain.muls@mil.be)', xy=(1, 0), xycoords='axes fraction', xytext=(0, -90), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', weight='strong', fontsize='medium')
 
     # annotate with reference position
-    if [amc.dRTK['marker']['UTM.E'], amc.dRTK['marker']['UTM.N'], amc.dRTK['marker']['ellH']] == [np.NaN, np.NaN, np.NaN]:
-        annotatePosRef = 'E = {east:.3f}, N = {north:.3f}'.format(east=amc.dRTK['WAvg']['UTM.E'], north=amc.dRTK['WAvg']['UTM.N'])
+    if [dRtk['marker']['UTM.E'], dRtk['marker']['UTM.N'], dRtk['marker']['ellH']] == [np.NaN, np.NaN, np.NaN]:
+        annotatePosRef = 'E = {east:.3f}, N = {north:.3f}'.format(east=dRtk['WAvg']['UTM.E'], north=dRtk['WAvg']['UTM.N'])
     else:
-        annotatePosRef = 'E = {east:.3f}, N = {north:.3f}'.format(east=amc.dRTK['marker']['UTM.E'], north=amc.dRTK['marker']['UTM.N'])
+        annotatePosRef = 'E = {east:.3f}, N = {north:.3f}'.format(east=dRtk['marker']['UTM.E'], north=dRtk['marker']['UTM.N'])
 
     ax[1][0].annotate(annotatePosRef, xy=(0, 0), xycoords='axes fraction', xytext=(0, -90), textcoords='offset pixels', horizontalalignment='left', verticalalignment='bottom', weight='strong', fontsize='medium')
 
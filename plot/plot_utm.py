@@ -7,10 +7,9 @@ import pandas as pd
 import sys
 import logging
 
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 from plot import plot_utils
 from rnx2rtkp import rtklibconstants as rtkc
-import am_config as amc
 
 from pandas.plotting import register_matplotlib_converters
 register_matplotlib_converters()
@@ -18,6 +17,7 @@ register_matplotlib_converters()
 __author__ = 'amuls'
 
 
+@amprofile.stage_timer(rows='dfUTM')
 def plot_utm_ellh(dRtk: dict, dfUTM: pd.DataFrame, logger: logging.Logger, showplot: bool = False):
     """
      plots the UTM coordinates
@@ -51,7 +51,7 @@ def plot_utm_ellh(dRtk: dict, dfUTM: pd.DataFrame, logger: logging.Logger, showp
 
     # determine the difference to weighted average or marker position of UTM (N,E), ellH to plot
     dfCrd = pd.DataFrame(columns=crds2Plot[:3])
-    originCrds = [float(amc.dRTK['WAVG'][crd]) for crd in crds2Plot[:3]]
+    originCrds = [float(dRtk['WAVG'][crd]) for crd in crds2Plot[:3]]
     dfCrd = dfUTM[crds2Plot[:3]].sub(originCrds, axis='columns')
     amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfCrd, dfName='dfCrd')
 
@@ -87,7 +87,7 @@ def plot_utm_ellh(dRtk: dict, dfUTM: pd.DataFrame, logger: logging.Logger, showp
             ax[i].legend(loc='best', markerscale=4)
 
             # annotate plot
-            annotatetxt = r'WAvg: {crd:.3f}m $\pm$ {sdcrd:.3f}m'.format(crd=amc.dRTK['WAVG'][crds2Plot[i]], sdcrd=amc.dRTK['WAVG'][stdDevWAvg[i]])
+            annotatetxt = r'WAvg: {crd:.3f}m $\pm$ {sdcrd:.3f}m'.format(crd=dRtk['WAVG'][crds2Plot[i]], sdcrd=dRtk['WAVG'][stdDevWAvg[i]])
             ax[i].annotate(annotatetxt, xy=(1, 1), xycoords='axes fraction', xytext=(0, 0), textcoords='offset pixels', horizontalalignment='right', verticalalignment='bottom', fontweight='bold', fontsize='large')
 
         else:  # last subplot: age of corrections & #SVs
@@ -6,16 +6,13 @@ import argparse
 from termcolor import colored
 import json
 import pandas as pd
-import numpy as np
-import utm
 import logging
-import geopy.distance
 
 import am_config as amc
+from GNSS import geodesic
 from rnx2rtkp import parse_rtkpos_file
 from rnx2rtkp import rtklibconstants as rtkc
-from ampyutils import amutils, df2excel
-from plot import plot_utm
+from ampyutils import amutils, df2excel, amprofile
 
 __author__ = 'amuls'
 
@@ -44,6 +41,8 @@ def treatCmdOpts(argv, ):
     parser.add_argument('-m', '--marker', help='Marker name', required=True, type=str)
     parser.add_argument('-c', '--campaign', help='Campaign name', required=True, type=str)
     parser.add_argument('-e', '--excel', help='create campaign excel file', required=False, action='store_true')
+    parser.add_argument('--quiet', help='quiet (batch) mode: console limited to warnings, no diagnostic dumps (default False)', action='store_true', required=False, default=False)
+    parser.add_argument('--profile', help='profile the run and write the profile next to the run report (one of {choices:s}, default no profiling)'.format(choices='|'.join(amprofile.PROFILERS)), required=False, default=None, choices=amprofile.PROFILERS)
 
     parser.add_argument('-l', '--logging', help='specify logging level console/file (default {:s})'.format(colored('INFO DEBUG', 'green')), nargs=2, required=False, default=['INFO', 'DEBUG'], choices=['CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
 
@@ -51,7 +50,7 @@ def treatCmdOpts(argv, ):
     args = parser.parse_args(argv[1:])
 
     # return arguments
-    return args.pos, args.rootdir, args.subdir, args.quality, args.marker, args.campaign, args.excel, args.logging
+    return args.pos, args.rootdir, args.subdir, args.quality, args.marker, args.campaign, args.excel, args.quiet, args.profile, args.logging
 
 
 def addRTKResult(logger: logging.Logger):
@@ -80,17 +79,10 @@ def addRTKResult(logger: logging.Logger):
     if len(index) > 0:
         dfCampaign.drop(index, inplace=True)
 
-    # calculate the slant distance to Reference if available
-    try:
-        crdWAvg = (amc.dRTK['WAVG']['lat'], amc.dRTK['WAVG']['lon'])
-        crdRefPt = (amc.dRTK['RefPos'][0], amc.dRTK['RefPos'][1])
-
-        distance = geopy.distance.vincenty(crdWAvg, crdRefPt).m
-        DeltaH = amc.dRTK['WAVG']['ellH'] - amc.dRTK['RefPos'][2]
-
-    except ValueError:
-        distance = np.NaN
-        DeltaH = np.NaN
+    # calculate the distance to Reference if available (NaN when no reference position is used)
+    distance, _, _ = geodesic.inverse(amc.dRTK['WAVG']['lat'], amc.dRTK['WAVG']['lon'], amc.dRTK['RefPos'][0], amc.dRTK['RefPos'][1])
+    distance = float(distance)
+    DeltaH = amc.dRTK['WAVG']['ellH'] - amc.dRTK['RefPos'][2]
 
     # add the new info to the csv file
     dfCampaign = dfCampaign.append(pd.Series([amc.dRTK['campaign'],
@@ -160,7 +152,7 @@ def main(argv):
     json.encoder.FLOAT_REPR = lambda o: format(o, '.3f')
 
     # treat command line options
-    posFile, rootDir, subDir, rtkqual, marker, campaign, excel, logLevels = treatCmdOpts(argv)
+    posFile, rootDir, subDir, rtkqual, marker, campaign, excel, quiet, profiler, logLevels = treatCmdOpts(argv)
 
     # store cli parameters
     amc.dRTK = {}
@@ -180,17 +172,16 @@ def main(argv):
         amc.dRTK['xlsName'] = os.path.join(amc.dRTK['rootDir'], '{pos:s}.xlsx'.format(pos=amc.dRTK['campaign']))
 
     # create logging for better debugging
+    amc.setQuiet(quiet or amc.quiet)
     logger, logname = amc.createLoggers(baseName=os.path.basename(__file__), dir=amc.dRTK['posDir'], logLevels=logLevels)
 
-    # change to selected directory if exists
+    # record timing and memory usage of the parse / statistics / plot stages
+    report = amprofile.RunReport(name=os.path.basename(__file__), logger=logger, profiler=profiler)
+
+    # check that the selected directory exists, all files are referenced relative to it
     if not os.path.exists(amc.dRTK['posDir']):
         logger.error('{func:s}: directory {dir:s} does not exists'.format(func=cFuncName, dir=colored(amc.dRTK['posDir'], 'red')))
         sys.exit(amc.E_DIR_NOT_EXIST)
-    else:
-        os.chdir(amc.dRTK['posDir'])
-        print(amc.dRTK['posDir'])
-        print(type(amc.dRTK['posDir']))
-        print('{func:s}: changed to dir {dir!s}'.format(func=cFuncName, dir=colored(amc.dRTK['posDir'], 'green')))
 
     # check wether pos and stat file are present, else exit
     if not os.access(os.path.join(amc.dRTK['posDir'], amc.dRTK['posFile']), os.R_OK):
@@ -198,7 +189,7 @@ def main(argv):
         sys.exit(amc.E_FILE_NOT_EXIST)
 
     # read the position file into a dataframe and add dUTM coordinates
-    dfPos = parse_rtkpos_file.parsePosFile(logger=logger)
+    dfPos = parse_rtkpos_file.parsePosFile(logger=logger, dRtk=amc.dRTK)
 
     # get the indices according to the position mode
     idx = dfPos.index[dfPos['Q'] == amc.dRTK['iQual']]
@@ -222,15 +213,16 @@ def main(argv):
         # print(dWAVG)
         # print('{crd:s} = {sd:.3f}'.format(crd=crd, sd=dWAVG['sd{crd:s}'.format(crd=crd)]))
 
-    # get UTM coordiantes/zone for weigted average
-    dWAVG['UTM.E'], dWAVG['UTM.N'], dWAVG['UTM.Z'], dWAVG['UTM.L'] = utm.from_latlon(dWAVG['lat'], dWAVG['lon'])
+    # get UTM coordiantes/zone for weigted average, in the UTM zone of the track
+    dWAVG['UTM.E'], dWAVG['UTM.N'], dWAVG['UTM.Z'], dWAVG['UTM.L'] = parse_rtkpos_file.utm_position(lla=[dWAVG['lat'], dWAVG['lon'], dWAVG['ellH']], zone=int(dfPos['UTM.Z'].iloc[0]))
     amc.dRTK['WAVG'] = dWAVG
 
     logger.info('{func:s}: weighted averages: {wavg!s}'.format(func=cFuncName, wavg=dWAVG))
 
     amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfPos, dfName='{posf:s}'.format(posf=amc.dRTK['posFile']))
 
-    # create UTM plot
+    # create UTM plot, the plotting stack is only loaded here
+    from plot import plot_utm
     plot_utm.plot_utm_ellh(dRtk=amc.dRTK, dfUTM=dfPos, logger=logger, showplot=True)
 
     # add results to campaign file
@@ -246,7 +238,10 @@ def main(argv):
         df2excel.append_df_to_excel(filename=amc.dRTK['xlsName'], df=dfPos, sheet_name=sheetName, truncate_sheet=True, startrow=0, index=False, float_format="%.9f")
         logger.info('{func:s}: added sheet {sheet:s} to workbook {wb:s}'.format(func=cFuncName, sheet=sheetName, wb=amc.dRTK['xlsName']))
 
-    logger.info('{func:s}: amc.dRTK =\n{settings!s}'.format(func=cFuncName, settings=amc.dRTK))
+    amc.logDiagnostic(logger=logger, msgFunc=lambda: '{func:s}: amc.dRTK =\n{settings!s}'.format(func=cFuncName, settings=amc.dRTK))
+
+    # write the run report next to the csv file
+    report.write(report_name=os.path.join(amc.dRTK['posDir'], '{pos:s}.run.json'.format(pos=amc.dRTK['posFile'])))
 
     # # TEST OK
     # lats = np.array([-31.373988106, -31.373988805])
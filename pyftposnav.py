@@ -4,13 +4,12 @@ import sys
 import os
 import argparse
 from termcolor import colored
-import json
 from json import encoder
 import logging
 from shutil import copyfile
 
 import am_config as amc
-from ampyutils import location, amutils, exeprogram
+from ampyutils import amutils, amdownload
 
 __author__ = 'amuls'
 
@@ -31,6 +30,9 @@ def treatCmdOpts(argv: list):
     parser.add_argument('-y', '--year', help='year (4 digits)', required=True, type=str)
     parser.add_argument('-d', '--doy', help='day of year', required=True, type=int)
 
+    parser.add_argument('-m', '--mirror', help='local mirror of downloaded files (default {:s})'.format(colored(amdownload.MIRROR_DIR, 'green')), required=False, type=str, default=amdownload.MIRROR_DIR)
+    parser.add_argument('-w', '--workers', help='number of concurrent connections to the server (default {:s})'.format(colored(str(amdownload.MAX_CONNECTIONS), 'green')), required=False, type=int, default=amdownload.MAX_CONNECTIONS)
+
     parser.add_argument('-o', '--overwrite', help='overwrite intermediate files (default {:s})'.format(colored('False', 'green')), action='store_true', required=False)
 
     parser.add_argument('-l', '--logging', help='specify logging level console/file (default {:s})'.format(colored('INFO DEBUG', 'green')), nargs=2, required=False, default=['INFO', 'DEBUG'], choices=['CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
@@ -39,7 +41,7 @@ def treatCmdOpts(argv: list):
     args = parser.parse_args(argv[1:])
 
     # return arguments
-    return args.rootdir, args.server, args.year, args.doy, args.overwrite, args.logging
+    return args.rootdir, args.server, args.year, args.doy, args.mirror, args.workers, args.overwrite, args.logging
 
 
 def createRemoteFTPInfo(logger: logging.Logger) -> dict:
@@ -67,31 +69,36 @@ def createRemoteFTPInfo(logger: logging.Logger) -> dict:
     return dRemote
 
 
-def doNcFTPDownload(logger: logging.Logger):
+def doDownload(maxConnections: int, mirrorDir: str, logger: logging.Logger) -> bool:
     """
-    doNcFTPDownload downloads remote files using 'ncftget' program
+    doDownload downloads the remote files concurrently into the local mirror and links them into the download
+    directory, returns whether all files are available
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # locate 'ncftpget' program
-    exeNCFTPGET = location.locateProg('ncftpget', logger)
-
-    # create and change to download directory
+    # create the download directory
     amc.dRTK['local']['YYDOY'] = '{YY:s}{DOY:s}'.format(YY=amc.dRTK['date']['YY'], DOY=amc.dRTK['date']['DoY'])
     amc.dRTK['local']['dir'] = os.path.join(amc.dRTK['local']['root'], amc.dRTK['local']['YYDOY'])
     amutils.mkdir_p(amc.dRTK['local']['dir'])
-    amutils.changeDir(amc.dRTK['local']['dir'])
-    logger.info('{func:s}: changed to local directory {dir:s}'.format(dir=amc.dRTK['local']['dir'], func=cFuncName))
+    logger.info('{func:s}: downloading to local directory {dir:s}'.format(dir=amc.dRTK['local']['dir'], func=cFuncName))
 
+    products = []
     for gnss in amc.dRTK['remote'].keys():
         logger.info('{func:s}: downloading for {gnss:s} RINEX Nav {nav:s}'.format(gnss=gnss, nav=amc.dRTK['remote'][gnss]['rfile'], func=cFuncName))
 
-        cmdNCFTPGET = '{prog:s} -u {user:s} -p {passwd:s} -v  ftp://{host:s}/{rpath}/{rfile:s}'.format(prog=exeNCFTPGET, user=amc.dRTK['ftp']['user'], passwd=amc.dRTK['ftp']['passwd'], host=amc.dRTK['ftp']['server'], rpath=amc.dRTK['remote'][gnss]['rpath'], rfile=amc.dRTK['remote'][gnss]['rfile'])
+        url = 'ftp://{host:s}/{rpath:s}/{rfile:s}'.format(host=amc.dRTK['ftp']['server'], rpath=amc.dRTK['remote'][gnss]['rpath'], rfile=amc.dRTK['remote'][gnss]['rfile'])
+        products.append(amdownload.Product(url=url, local=os.path.join(amc.dRTK['local']['dir'], amc.dRTK['remote'][gnss]['rfile'])))
 
-        logger.info('{func:s}: ... running {cmd:s}'.format(cmd=cmdNCFTPGET, func=cFuncName))
+    with amdownload.DownloadManager(mirror_dir=mirrorDir, max_connections=maxConnections, user=amc.dRTK['ftp']['user'], passwd=amc.dRTK['ftp']['passwd'], logger=logger) as manager:
+        results = manager.fetch_all(products)
 
-        # run the program
-        exeprogram.subProcessDisplayStdErr(cmd=cmdNCFTPGET, verbose=True)
+    for result in results:
+        if result.error is None:
+            logger.info('{func:s}: {file:s} ({size:d} bytes, {origin:s})'.format(file=colored(os.path.basename(result.local), 'green'), size=result.size, origin='from mirror' if result.cached else 'resumed' if result.resumed else 'downloaded', func=cFuncName))
+        else:
+            logger.error('{func:s}: {file:s} not available: {err!s}'.format(file=colored(os.path.basename(result.local), 'red'), err=result.error, func=cFuncName))
+
+    return all(result.error is None for result in results)
 
 
 def main(argv):
@@ -119,7 +126,7 @@ def main(argv):
     amc.dRTK['local'] = dLocal
 
     # treat command line options
-    amc.dRTK['local']['root'], amc.dRTK['ftp']['server'], dDate['year'], dDate['daynr'], overwrite, logLevels = treatCmdOpts(argv)
+    amc.dRTK['local']['root'], amc.dRTK['ftp']['server'], dDate['year'], dDate['daynr'], mirrorDir, maxConnections, overwrite, logLevels = treatCmdOpts(argv)
 
     # create logging for better debugging
     logger, log_name = amc.createLoggers(os.path.basename(__file__), dir=amc.dRTK['local']['root'], logLevels=logLevels)
@@ -131,16 +138,19 @@ def main(argv):
     # create the remote/local directories and filenames to download the individual/combined RINEX Navigation files from
     amc.dRTK['remote'] = createRemoteFTPInfo(logger=logger)
 
-    # download the RINEX navigation files using ncftpget
-    doNcFTPDownload(logger=logger)
+    # download the RINEX navigation files concurrently through the local mirror
+    downloadOK = doDownload(maxConnections=maxConnections, mirrorDir=mirrorDir, logger=logger)
 
     # report to the user
-    logger.info('{func:s}: amc.dRTK =\n{json!s}'.format(func=cFuncName, json=json.dumps(amc.dRTK, sort_keys=False, indent=4)))
+    amc.logJSON(obj=amc.dRTK, objName='amc.dRTK', callerName=cFuncName, logger=logger)
 
     # copy temp log file to the YYDOY directory
     copyfile(log_name, os.path.join(amc.dRTK['local']['dir'], 'pyftposnav.log'))
     os.remove(log_name)
 
+    if not downloadOK:
+        sys.exit(amc.E_FAILURE)
+
 
 if __name__ == "__main__":  # Only run if this file is called directly
     main(sys.argv)
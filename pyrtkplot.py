@@ -8,14 +8,13 @@ import json
 import pandas as pd
 import numpy as np
 import math
-import utm
 from shutil import copyfile
 import logging
 
 import am_config as amc
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
+from GNSS import refframe
 from rnx2rtkp import parse_rtk_files
-from plot import plot_position, plot_scatter, plot_sats_column, plot_clock, plot_distributions_crds, plot_distributions_elev
 from stats import enu_statistics as enu_stat
 
 __author__ = 'amuls'
@@ -42,13 +41,15 @@ def treatCmdOpts(argv):
 
     parser.add_argument('-p', '--plots', help='displays interactive plots (default True)', action='store_true', required=False, default=False)
     parser.add_argument('-o', '--overwrite', help='overwrite intermediate files (default False)', action='store_true', required=False)
+    parser.add_argument('--quiet', help='quiet (batch) mode: console limited to warnings, no diagnostic dumps (default False)', action='store_true', required=False, default=False)
+    parser.add_argument('--profile', help='profile the run and write the profile next to the run report (one of {choices:s}, default no profiling)'.format(choices='|'.join(amprofile.PROFILERS)), required=False, default=None, choices=amprofile.PROFILERS)
     parser.add_argument('-l', '--logging', help='specify logging level console/file (default {:s})'.format(colored('INFO DEBUG', 'green')), nargs=2, required=False, default=['INFO', 'DEBUG'], choices=['CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'])
 
     # drop argv[0]
     args = parser.parse_args(argv[1:])
 
     # return arguments
-    return args.file, args.dir, args.marker, args.plots, args.overwrite, args.logging
+    return args.file, args.dir, args.marker, args.plots, args.overwrite, args.quiet, args.profile, args.logging
 
 
 def store_to_cvs(df: pd.DataFrame, ext: str, dInfo: dict, logger: logging.Logger, index: bool = True):
@@ -57,7 +58,7 @@ def store_to_cvs(df: pd.DataFrame, ext: str, dInfo: dict, logger: logging.Logger
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    csv_name = amc.dRTK['info']['rtkPosFile'] + '.' + ext
+    csv_name = os.path.join(dInfo['info']['dir'], dInfo['info']['rtkPosFile'] + '.' + ext)
     dInfo[ext] = csv_name
     df.to_csv(csv_name, index=index, header=True)
 
@@ -83,19 +84,21 @@ def main(argv):
     np.set_printoptions(precision=4)
 
     # treat command line options
-    rtkPosFile, rtkDir, crdMarker, showPlots, overwrite, logLevels = treatCmdOpts(argv)
+    rtkPosFile, rtkDir, crdMarker, showPlots, overwrite, quiet, profiler, logLevels = treatCmdOpts(argv)
 
     # create logging for better debugging
+    amc.setQuiet(quiet or amc.quiet)
     logger, log_name = amc.createLoggers(baseName=os.path.basename(__file__), dir=rtkDir, logLevels=logLevels)
 
-    # change to selected directory if exists
-    # print('rtkDir = %s' % rtkDir)
+    # record timing and memory usage of the parse / statistics / plot stages
+    report = amprofile.RunReport(name=os.path.basename(__file__), logger=logger, profiler=profiler)
+
+    # check that the selected directory exists, all files are referenced relative to it
     if not os.path.exists(rtkDir):
         logger.error('{func:s}: directory {dir:s} does not exists'.format(func=cFuncName, dir=colored(rtkDir, 'red')))
         sys.exit(amc.E_DIR_NOT_EXIST)
     else:
-        os.chdir(rtkDir)
-        logger.info('{func:s}: changed to dir {dir:s}'.format(func=cFuncName, dir=colored(rtkDir, 'green')))
+        logger.info('{func:s}: using dir {dir:s}'.format(func=cFuncName, dir=colored(rtkDir, 'green')))
 
     # store information
     dInfo = {}
@@ -128,7 +131,10 @@ def main(argv):
         dMarker['UTM.E'] = dMarker['UTM.N'] = np.NaN
         dMarker['UTM.Z'] = dMarker['UTM.L'] = ''
     else:
-        dMarker['UTM.E'], dMarker['UTM.N'], dMarker['UTM.Z'], dMarker['UTM.L'] = utm.from_latlon(dMarker['lat'], dMarker['lon'])
+        # UTM parameters of the marker come from its cached reference frame
+        markerFrame = refframe.get_ref_frame(dMarker['lat'], dMarker['lon'], dMarker['ellH'])
+        dMarker['UTM.E'], dMarker['UTM.N'] = float(markerFrame.utm[0]), float(markerFrame.utm[1])
+        dMarker['UTM.Z'], dMarker['UTM.L'] = markerFrame.utmZone, markerFrame.utmLetter
 
     logger.info('{func:s}: marker coordinates = {crd!s}'.format(func=cFuncName, crd=dMarker))
     amc.dRTK['marker'] = dMarker
@@ -141,20 +147,23 @@ def main(argv):
 
     # read the position file into a dataframe and add dUTM coordinates
     logger.info('{func:s}: parsing RTKLib pos file {pos:s}'.format(pos=amc.dRTK['info']['rtkPosFile'], func=cFuncName))
-    dfPosn = parse_rtk_files.parseRTKLibPositionFile(logger=logger)
+    dfPosn = parse_rtk_files.parseRTKLibPositionFile(logger=logger, dRtk=amc.dRTK)
 
     # calculate the weighted avergae of llh & enu
     amc.dRTK['WAvg'] = parse_rtk_files.weightedAverage(dfPos=dfPosn, logger=logger)
 
     # find difference with reference and ax/min limits for UTM plot
     logger.info('{func:s}: calculating coordinate difference with reference/mean position'.format(func=cFuncName))
-    dfCrd, dCrdLim = plot_position.crdDiff(dMarker=amc.dRTK['marker'], dfUTMh=dfPosn[['UTM.E', 'UTM.N', 'ellH']], plotCrds=['UTM.E', 'UTM.N', 'ellH'], logger=logger)
+    # the plotting stack is only loaded when the plots are made
+    from plot import plot_position, plot_scatter, plot_sats_column, plot_clock, plot_distributions_crds, plot_distributions_elev
+
+    dfCrd, dCrdLim = plot_position.crdDiff(dMarker=amc.dRTK['marker'], dfUTMh=dfPosn[['UTM.E', 'UTM.N', 'ellH']], plotCrds=['UTM.E', 'UTM.N', 'ellH'], logger=logger, dRtk=amc.dRTK)
     # merge dfCrd into dfPosn
     dfPosn[['dUTM.E', 'dUTM.N', 'dEllH']] = dfCrd[['UTM.E', 'UTM.N', 'ellH']]
 
     # work on the statistics file
     # split it in relavant parts
-    dTmpFiles = parse_rtk_files.splitStatusFile(amc.dRTK['info']['rtkStatFile'], logger=logger)
+    dTmpFiles = parse_rtk_files.splitStatusFile(os.path.join(rtkDir, amc.dRTK['info']['rtkStatFile']), logger=logger)
 
     # parse the satellite file (contains Az, El, PRRes, CN0)
     dfSats = parse_rtk_files.parseSatelliteStatistics(dTmpFiles['sat'], logger=logger)
@@ -190,7 +199,7 @@ def main(argv):
     store_to_cvs(df=dfDistENU, ext='ENU.dist', dInfo=amc.dRTK, logger=logger)
     store_to_cvs(df=dfDistXDOP, ext='XDOP.dist', dInfo=amc.dRTK, logger=logger)
 
-    logger.info('{func:s}: dRTK =\n{settings!s}'.format(func=cFuncName, settings=json.dumps(amc.dRTK, sort_keys=False, indent=4)))
+    amc.logJSON(obj=amc.dRTK, objName='dRTK', callerName=cFuncName, logger=logger)
 
     # # store statistics for dfPosn
     # logger.info('{func:s}: creating pandas profile report {ppname:s} for dfPosn, {help:s}'.format(ppname=colored(amc.dRTK['info']['posnstat'], 'green'), help=colored('be patient', 'red'), func=cFuncName))
@@ -249,14 +258,17 @@ def main(argv):
     logger.info('{func:s}: creating Clock plots'.format(func=cFuncName))
     plot_clock.plotClock(dfClk=dfCLKs, dRtk=amc.dRTK, logger=logger, showplot=showPlots)
 
-    logger.info('{func:s}: final amc.dRTK =\n{settings!s}'.format(func=cFuncName, settings=json.dumps(amc.dRTK, sort_keys=False, indent=4)))
+    amc.logJSON(obj=amc.dRTK, objName='final amc.dRTK', callerName=cFuncName, logger=logger)
 
-    jsonName = amc.dRTK['info']['rtkPosFile'] + '.json'
+    jsonName = os.path.join(amc.dRTK['info']['dir'], amc.dRTK['info']['rtkPosFile'] + '.json')
     with open(jsonName, 'w') as f:
         json.dump(amc.dRTK, f, ensure_ascii=False, indent=4)
 
     logger.info('{func:s}: created json file {json:s}'.format(func=cFuncName, json=colored(jsonName, 'green')))
 
+    # write the run report next to it
+    report.write(report_name=os.path.join(amc.dRTK['info']['dir'], amc.dRTK['info']['rtkPosFile'] + '.run.json'))
+
     # copy temp log file to the YYDOY directory
     copyfile(log_name, os.path.join(amc.dRTK['info']['dir'], '{obs:s}-{prog:s}'.format(obs=amc.dRTK['info']['rtkPosFile'].replace(';', '_'), prog='plot.log')))
     os.remove(log_name)
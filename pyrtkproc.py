@@ -4,14 +4,13 @@ import sys
 import os
 import argparse
 from termcolor import colored
-import json
 from json import encoder
 import pandas as pd
 import logging
 from shutil import copyfile
 
 import am_config as amc
-from ampyutils import location, exeprogram, amutils
+from ampyutils import location, exeprogram, amutils, amcompress
 from rnx2rtkp import template_rnx2rtkp
 from rnx2rtkp import rtklibconstants as rtkc
 
@@ -78,16 +77,12 @@ def roverobs_decomp(logger: logging.Logger):
     if amc.dRTK['roverObs'].endswith('D.Z'):
         logger.info('{func:s}: decompressing {comp:s}'.format(comp=amc.dRTK['roverObs'], func=cFuncName))
 
-        cmdCRZ2RNX = '{prog:s} -f {comp:s}'.format(prog=amc.dRTK['exeCRZ2RNX'], comp=amc.dRTK['roverObs'])
-        logger.info('{func:s}: Running:\n{cmd:s}'.format(func=cFuncName, cmd=colored(cmdCRZ2RNX, 'green')))
-
-        # run the program
-        exeprogram.subProcessDisplayStdErr(cmd=cmdCRZ2RNX, verbose=True)
+        amcompress.compress_files(jobs=[('crz2rnx', amc.dRTK['roverObs'])], progs={'crz2rnx': amc.dRTK['exeCRZ2RNX']}, logger=logger)
 
     # name the file to use from now on
     amc.dRTK['rover2proc'] = '{base:s}.{ext:s}'.format(base=amc.dRTK['roverObsParts'][0], ext=amc.dRTK['roverObsParts'][1].replace('D', 'O'))
 
-    logger.info('{func:s}: amc.dRTK = \n{json!s}'.format(func=cFuncName, json=json.dumps(amc.dRTK, sort_keys=False, indent=4)))
+    amc.logJSON(obj=amc.dRTK, objName='amc.dRTK', callerName=cFuncName, logger=logger)
 
 
 def rover_adjust_obstypes(logger: logging.Logger):
@@ -200,7 +195,7 @@ def main(argv):
         logger.error('{func:s}: Program exits with code {error:s}'.format(func=cFuncName, error=colored('{!s}'.format(retCode), 'red')))
         sys.exit(retCode)
 
-    logger.info('{func:s}: amc.dRTK = \n{json!s}'.format(func=cFuncName, json=json.dumps(amc.dRTK, sort_keys=False, indent=4)))
+    amc.logJSON(obj=amc.dRTK, objName='amc.dRTK', callerName=cFuncName, logger=logger)
 
     # decompress roverObs file and adjust observables to allow processing
     roverobs_decomp(logger=logger)
@@ -216,7 +211,7 @@ def main(argv):
     # create the template for this processing
     template_rnx2rtkp.create_rnx2rtkp_template(cfgFile=amc.dRTK['config'], overwrite=overwrite, logger=logger)
 
-    logger.info('{func:s}: amc.dRTK = \n{json!s}'.format(func=cFuncName, json=json.dumps(amc.dRTK, sort_keys=False, indent=4)))
+    amc.logJSON(obj=amc.dRTK, objName='amc.dRTK', callerName=cFuncName, logger=logger)
 
     cmdRNX2RTKP = '{prog:s} -k {conf:s} -o {pos:s} {rover:s} {base:s} {nav:s}'.format(prog=amc.dRTK['exeRNX2RTKP'], conf=amc.dRTK['config'], pos=amc.dRTK['filePos'], rover=amc.dRTK['roverObs'], base=amc.dRTK['baseObs'], nav=' '.join(amc.dRTK['ephems']))
 
@@ -224,9 +219,12 @@ def main(argv):
 
     # run the program
     if logLevels[0] >= amc.dLogLevel['INFO']:
-        exeprogram.subProcessDisplayStdErr(cmd=cmdRNX2RTKP, verbose=True)
+        retCode = exeprogram.subProcessDisplayStdErr(cmd=cmdRNX2RTKP, verbose=True)
     else:
-        exeprogram.subProcessDisplayStdErr(cmd=cmdRNX2RTKP, verbose=False)
+        retCode = exeprogram.subProcessDisplayStdErr(cmd=cmdRNX2RTKP, verbose=False)
+    if retCode != 0:
+        logger.error('{func:s}: {prog:s} returned error code {err:d}'.format(func=cFuncName, prog=colored(os.path.basename(amc.dRTK['exeRNX2RTKP']), 'red'), err=retCode))
+        sys.exit(amc.E_FAILURE)
 
     # inform user
     logger.info('{func:s}: Created position file: {pos:s}'.format(func=cFuncName, pos=colored(amc.dRTK['filePos'], 'blue')))
@@ -4,11 +4,12 @@ import os
 import argparse
 import sys
 import glob
-import shutil
 from termcolor import colored
 from shutil import copyfile
+from concurrent.futures import ProcessPoolExecutor
 
 import am_config as amc
+from sbf import sbf_ops
 
 __author__ = 'amuls'
 
@@ -34,14 +35,36 @@ def treatCmdOpts(argv):
     # create the parser for command line arguments
     parser = argparse.ArgumentParser(description=helpTxt)
 
-    parser.add_argument('-d', '--dir', help='Directory of SBF file (defaults to .)', required=False, default='.')
+    parser.add_argument('-d', '--dir', help='Directory (or directories, one per day, processed in parallel) of SBF files (defaults to .)', required=False, default=['.'], nargs='+')
     parser.add_argument('-o', '--overwrite', help='overwrite daily SBF file (default False)', action='store_true', required=False)
+    parser.add_argument('-w', '--workers', help='number of days processed in parallel (default number of cores)', required=False, type=int, default=os.cpu_count())
 
     parser.add_argument('-l', '--logging', help='specify logging level console/file (default {:s})'.format(colored('INFO DEBUG', 'green')), nargs=2, required=False, default=['INFO', 'DEBUG'], action=logging_action)
 
     args = parser.parse_args()
 
-    return args.dir, args.overwrite, args.logging
+    return args.dir, args.overwrite, args.workers, args.logging
+
+
+def sbf_daily(dirSBF: str, overwrite: bool) -> tuple:
+    """
+    sbf_daily creates the daily SBF file in dirSBF from the hourly SBF files, or else from the six-hourly SBF files,
+    and returns the daily SBF file name (None if no SBF files are found), whether it was created and the SBFCheck
+    of each combined file
+    """
+    # find the files corresponsing to hourly SBF logged data, else serach for 6-hourly data
+    sbfFiles = sorted(glob.glob(os.path.join(dirSBF, r"????[0-9][0-9][0-9][A-X].[0-9][0-9]_")))
+    if len(sbfFiles) == 0:
+        sbfFiles = sorted(glob.glob(os.path.join(dirSBF, r"????[0-9][0-9][0-9][1-4].[0-9][0-9]_")))
+    if len(sbfFiles) == 0:
+        return None, False, {}
+
+    sbfName = os.path.basename(sbfFiles[0])
+    dailySBF = os.path.join(dirSBF, sbfName[:7] + '0' + sbfName[8:])
+    if os.path.isfile(dailySBF) and not overwrite:
+        return dailySBF, False, {}
+
+    return dailySBF, True, sbf_ops.sbf_concatenate(sbf_files=sbfFiles, daily_sbf=dailySBF)
 
 
 def main(argv):
@@ -52,65 +75,52 @@ def main(argv):
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
     # treat command line options
-    dirSBF, overwrite, logLevels = treatCmdOpts(argv)
+    dirSBFs, overwrite, workers, logLevels = treatCmdOpts(argv)
 
     # create logging for better debugging
-    logger, log_name = amc.createLoggers(os.path.basename(__file__), dir=dirSBF, logLevels=logLevels)
+    logger, log_name = amc.createLoggers(os.path.basename(__file__), dir=dirSBFs[0], logLevels=logLevels)
 
-    # change to the directory dirSBF if it exists
-    workDir = os.getcwd()
-    if dirSBF != '.':
-        workDir = os.path.normpath(os.path.join(workDir, dirSBF))
-    logger.info('{func:s}: working directory is {dir:s}'.format(func=cFuncName, dir=workDir))
+    # check the directories of the SBF files
+    workDirs = [os.path.normpath(os.path.join(os.getcwd(), dirSBF)) for dirSBF in dirSBFs]
+    for workDir in workDirs:
+        logger.info('{func:s}: working directory is {dir:s}'.format(func=cFuncName, dir=workDir))
 
-    if not os.path.exists(workDir):
-        logger.error('{func:s}: directory {dir:s} does not exists.'.format(func=cFuncName, dir=colored(workDir, 'red')))
-        sys.exit(amc.E_DIR_NOT_EXIST)
-    else:
-        os.chdir(workDir)
-        logger.info('{func:s}: changed to directory {dir:s}'.format(func=cFuncName, dir=workDir))
+        if not os.path.exists(workDir):
+            logger.error('{func:s}: directory {dir:s} does not exists.'.format(func=cFuncName, dir=colored(workDir, 'red')))
+            sys.exit(amc.E_DIR_NOT_EXIST)
 
-    # find the files corresponsing to hourly SBF logged data, else serach for 6-hourly data
-    hourlySBFs = sorted(glob.glob(r"????[0-9][0-9][0-9][A-X].[0-9][0-9]_"))
-    sixHourlySBFs = sorted(glob.glob(r"????[0-9][0-9][0-9][1-4].[0-9][0-9]_"))
-
-    # combine the files to create the daily SBF file
+    # combine the files to create the daily SBF file, a day per worker process
     logger.info('{func:s}: combine SBF (six-)hourly files to daily SBF file'.format(func=cFuncName))
-    if len(hourlySBFs) > 0:
-        dailySBF = hourlySBFs[0][:7] + '0' + hourlySBFs[0][8:]
-
-        if not os.path.isfile(dailySBF) or overwrite:
-            logger.info('{func:s}: creating daily SBF file {daily:s}'.format(func=cFuncName, daily=colored(dailySBF, 'green')))
-
-            fDaily = open(dailySBF, 'wb')
-            for i, hourlySBF in enumerate(hourlySBFs):
-                fHourly = open(hourlySBF, 'rb')
-                shutil.copyfileobj(fHourly, fDaily, 65536)
-                fHourly.close()
-            fDaily.close()
-        else:
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(workDirs)))) as executor:
+        futures = {workDir: executor.submit(sbf_daily, workDir, overwrite) for workDir in workDirs}
+
+    retCode = amc.E_SUCCESS
+    for workDir, future in futures.items():
+        if future.exception() is not None:
+            logger.error('{func:s}: creating daily SBF file in {dir:s} failed: {err!s}'.format(dir=colored(workDir, 'red'), err=future.exception(), func=cFuncName))
+            retCode = amc.E_FAILURE
+            continue
+
+        dailySBF, created, dChecks = future.result()
+        if dailySBF is None:
+            logger.info('{func:s}: No SBF files found with syntax STATDOYS.YY_ in {dir:s}'.format(dir=workDir, func=cFuncName))
+        elif not created:
             logger.info('{func:s}: reusing daily SBF file {daily:s}'.format(func=cFuncName, daily=colored(dailySBF, 'green')))
-    elif len(sixHourlySBFs) > 0:
-        dailySBF = sixHourlySBFs[0][:7] + '0' + sixHourlySBFs[0][8:]
-
-        if not os.path.isfile(dailySBF) or overwrite:
-            logger.info('{func:s}: creating daily SBF file {daily:s}'.format(func=cFuncName, daily=colored(dailySBF, 'green')))
-
-            fDaily = open(dailySBF, 'wb')
-            for i, sixHourlySBF in enumerate(sixHourlySBFs):
-                fSixHourly = open(sixHourlySBF, 'rb')
-                shutil.copyfileobj(fSixHourly, fDaily, 65536)
-                fSixHourly.close()
-            fDaily.close()
         else:
-            logger.info('{func:s}: reusing daily SBF file {daily:s}'.format(func=cFuncName, daily=colored(dailySBF, 'green')))
-    else:
-        logger.info('{func:s}: No SBF files found with syntax STATDOYS.YY_'.format(func=cFuncName))
-
-    # copy temp log file to the YYDOY directory
-    copyfile(log_name, os.path.join(workDir, 'pysbfdaily.log'))
+            logger.info('{func:s}: created daily SBF file {daily:s}'.format(func=cFuncName, daily=colored(dailySBF, 'green')))
+            for sbfFile, check in dChecks.items():
+                logger.info('{func:s}:    {sbf:s}: {blocks:d} blocks, {size:d} bytes'.format(sbf=os.path.basename(sbfFile), blocks=check.blocks, size=check.size, func=cFuncName))
+                if check.bad_crc > 0 or check.skipped > 0:
+                    logger.warning('{func:s}:    {sbf:s}: skipped {skipped:d} bytes ({crc:d} blocks with CRC error, truncated tail of {tail:d} bytes)'.format(sbf=colored(os.path.basename(sbfFile), 'red'), skipped=check.skipped, crc=check.bad_crc, tail=check.tail, func=cFuncName))
+
+    # copy temp log file to the YYDOY directories
+    for workDir in workDirs:
+        copyfile(log_name, os.path.join(workDir, 'pysbfdaily.log'))
     os.remove(log_name)
 
+    if retCode != amc.E_SUCCESS:
+        sys.exit(retCode)
+
 
 if __name__ == "__main__":
     main(sys.argv)
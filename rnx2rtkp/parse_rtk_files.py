@@ -4,30 +4,34 @@ import sys
 import numpy as np
 import os
 import logging
-import utm
 import tempfile
 from typing import Tuple
 
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
 from GNSS import gpstime
+from GNSS import wgs84
 from rnx2rtkp import rtklibconstants as rtkc
 import am_config as amc
 
 __author__ = 'amuls'
 
 
-def parseRTKLibPositionFile(logger: logging.Logger) -> pd.DataFrame:
+@amprofile.stage_timer()
+def parseRTKLibPositionFile(logger: logging.Logger, dRtk: dict = None) -> pd.DataFrame:
     """
     parse the position file from RTKLIB processing into a dataframe
     """
     # set current function name
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
-    logger.info('{func:s}: parsing RTKLib position file {posf:s}'.format(func=cFuncName, posf=amc.dRTK['info']['rtkPosFile']))
+    posFilePath = os.path.join(dRtk['info']['dir'], dRtk['info']['rtkPosFile'])
+
+    logger.info('{func:s}: parsing RTKLib position file {posf:s}'.format(func=cFuncName, posf=posFilePath))
 
     # check whether the datafile is readable
-    endHeaderLine = amutils.line_num_for_phrase_in_file('%  GPST', amc.dRTK['info']['rtkPosFile'])
-    dfPos = pd.read_csv(amc.dRTK['info']['rtkPosFile'], header=endHeaderLine, delim_whitespace=True)
+    endHeaderLine = amutils.line_num_for_phrase_in_file('%  GPST', posFilePath)
+    dfPos = pd.read_csv(posFilePath, header=endHeaderLine, delim_whitespace=True)
     dfPos = dfPos.rename(columns={'%': 'WNC', 'GPST': 'TOW', 'latitude(deg)': 'lat', 'longitude(deg)': 'lon', 'height(m)': 'ellH', 'sdn(m)': 'sdn', 'sde(m)': 'sde', 'sdu(m)': 'sdu', 'sdne(m)': 'sdne', 'sdeu(m)': 'sdeu', 'sdun(m)': 'sdun', 'age(s)': 'age'})
 
     # convert the GPS time to UTC
@@ -38,23 +42,21 @@ def parseRTKLibPositionFile(logger: logging.Logger) -> pd.DataFrame:
     dTime['date'] = dfPos.DT.iloc[0].strftime('%d %b %Y')
     dTime['start'] = dfPos.DT.iloc[0].strftime('%H:%M:%S')
     dTime['end'] = dfPos.DT.iloc[-1].strftime('%H:%M:%S')
-    amc.dRTK['Time'] = dTime
+    dRtk['Time'] = dTime
 
-    # add UTM coordinates
-    dfPos['UTM.E'], dfPos['UTM.N'], dfPos['UTM.Z'], dfPos['UTM.L'] = utm.from_latlon(dfPos['lat'].to_numpy(), dfPos['lon'].to_numpy())
+    # add UTM coordinates, keeping the full track in the UTM zone of its first position
+    wgs84.WGS84().projectTrack(dfPos)
     logger.info('{func:s}: added UTM coordiantes'.format(func=cFuncName))
 
     # inform user
     amc.logDataframeInfo(df=dfPos, dfName='dfPos', callerName=cFuncName, logger=logger)
     logger.info('{func:s}: dTime = {time!s}'.format(func=cFuncName, time=dTime))
-    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfPos, dfName='{posf:s}'.format(posf=amc.dRTK['info']['rtkPosFile']))
-
-    # put the info of the dfPosn into debug logging
-    logger.debug('{func:s}: dfPos info\n{info!s}'.format(info=dfPos.info(), func=cFuncName))
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfPos, dfName='{posf:s}'.format(posf=dRtk['info']['rtkPosFile']))
 
     return dfPos
 
 
+@amprofile.stage_timer()
 def splitStatusFile(statFileName: str, logger: logging.Logger) -> dict:
     """
     splitStatusFile splits the statistics file into the POS, SAT, CLK & VELACC parts
@@ -70,7 +72,7 @@ def splitStatusFile(statFileName: str, logger: logging.Logger) -> dict:
     dStat = {}
 
     for statPart, linePart in zip(statParts, lineParts):
-        dStat[statPart] = tempfile.NamedTemporaryFile(prefix='{:s}_'.format(statFileName), suffix='_{:s}'.format(statPart), delete=True)
+        dStat[statPart] = tempfile.NamedTemporaryFile(prefix='{:s}_'.format(os.path.basename(statFileName)), suffix='_{:s}'.format(statPart), delete=True)
 
         with open(dStat[statPart].name, 'w') as fTmp:
             fTmp.writelines(line for line in open(statFileName) if linePart in line)
@@ -81,6 +83,7 @@ def splitStatusFile(statFileName: str, logger: logging.Logger) -> dict:
     return dStat
 
 
+@amprofile.stage_timer(rows='dfPos')
 def weightedAverage(dfPos: pd.DataFrame, logger: logging.Logger) -> dict:
     """
     calculates the weighted average of LLH and ENU
@@ -123,6 +126,7 @@ def wavg(group: dict, avg_name: str, weight_name: str) -> float:
         return coordinate.mean()
 
 
+@amprofile.stage_timer()
 def parseSatelliteStatistics(statsSat: tempfile._TemporaryFileWrapper, logger: logging.Logger) -> pd.DataFrame:
     """
     parseSatelliteStatistics reads the SAT statitics file into a dataframe
@@ -134,7 +138,7 @@ def parseSatelliteStatistics(statsSat: tempfile._TemporaryFileWrapper, logger: l
 
     dfSat = pd.read_csv(statsSat.name, header=None, sep=',', usecols=[*range(1, 11)])
     dfSat.columns = rtkc.dRTKPosStat['Res']['useCols']
-    amutils.printHeadTailDataFrame(df=dfSat, name='dfSat range')
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfSat, dfName='dfSat range', level=logging.DEBUG)
 
     # dfSat = pd.read_csv(statsSat.name, header=None, sep=',', names=rtkc.dRTKPosStat['Res']['colNames'], usecols=rtkc.dRTKPosStat['Res']['useCols'])
     # amutils.printHeadTailDataFrame(df=dfSat, name='dfSat usecol')
@@ -154,6 +158,7 @@ def parseSatelliteStatistics(statsSat: tempfile._TemporaryFileWrapper, logger: l
     return dfSat
 
 
+@amprofile.stage_timer(rows='dfSat')
 def parse_sv_residuals(dfSat: pd.DataFrame, logger: logging.Logger) -> dict:
     """
     parse_sv_residuals parses the observed resiudals of the satellites
@@ -214,6 +219,7 @@ def parse_sv_residuals(dfSat: pd.DataFrame, logger: logging.Logger) -> dict:
     return dSVList
 
 
+@amprofile.stage_timer(rows='dfSat')
 def parse_elevation_distribution(dRtk: dict, dfSat: pd.DataFrame, logger: logging.Logger) -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame, pd.Series]:
     """
     parse_elevation_distribution parses the observed resiudals per constellation and per elevation bin of 10 degrees
@@ -282,6 +288,7 @@ def parse_elevation_distribution(dRtk: dict, dfSat: pd.DataFrame, logger: loggin
     return dfCN0dist, dsCN0_per_bin, dfPRresdist, dsPRres_per_bin
 
 
+@amprofile.stage_timer(rows='dfSats')
 def calcDOPs(dfSats: pd.DataFrame, logger: logging.Logger) -> pd.DataFrame:
     """
     calculates the number of SVs used and corresponding DOP values
@@ -369,10 +376,12 @@ def calcDOPs(dfSats: pd.DataFrame, logger: logging.Logger) -> pd.DataFrame:
 
         # print('dfDOPS.iloc[indexTOW] = {!s}'.format(dfDOPs.iloc[indexTOW]))
 
-        # show progress bar
-        progbar(i, len(naTOWs4DOP), 60)
+        # show progress bar (not in quiet mode)
+        if not amc.quiet:
+            progbar(i, len(naTOWs4DOP), 60)
 
-    print()  # empty print statement for ending progbar
+    if not amc.quiet:
+        print()  # empty print statement for ending progbar
     # drop the cos/sin & direction cosines columns from dfSats
     dfSats.drop(['sinEl', 'cosEl', 'sinAz', 'cosAz', 'alpha', 'beta', 'gamma'], axis=1, inplace=True)
 
@@ -382,6 +391,7 @@ def calcDOPs(dfSats: pd.DataFrame, logger: logging.Logger) -> pd.DataFrame:
     return dfDOPs
 
 
+@amprofile.stage_timer()
 def parseClockBias(statsClk: tempfile._TemporaryFileWrapper, logger: logging.Logger) -> pd.DataFrame:
     """
     parse the clock file
@@ -407,7 +417,7 @@ def parseClockBias(statsClk: tempfile._TemporaryFileWrapper, logger: logging.Log
     # read in the satellite status file
     dfCLKs = pd.read_csv(statsClk.name, header=None, sep=',', usecols=[*range(1, 9)])
     dfCLKs.columns = rtkc.dRTKPosStat['Clk']['useCols']
-    amutils.printHeadTailDataFrame(df=dfCLKs, name='dfCLKs range')
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfCLKs, dfName='dfCLKs range', level=logging.DEBUG)
 
     # # read in the satellite status file
     # dfCLKs = pd.read_csv(statsClk.name, header=None, sep=',', names=rtkc.dRTKPosStat['Clk']['colNames'], usecols=rtkc.dRTKPosStat['Clk']['useCols'])
@@ -489,6 +499,7 @@ def getTOWs4DOP(dfNrSVs: pd.DataFrame, logger: logging.Logger) -> np.ndarray:
     return naTOWs4DOP
 
 
+@amprofile.stage_timer(rows='dfPos')
 def addPDOPStatistics(dRtk: dict, dfPos: pd.DataFrame, logger: logging.Logger):
     """
     add the statistics for PDOP bins for E, N and U coordinates
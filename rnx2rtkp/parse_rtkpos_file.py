@@ -1,55 +1,104 @@
 import pandas as pd
+from typing import Tuple
 from termcolor import colored
 import sys
 import numpy as np
 import os
 import logging
 from datetime import datetime
-import utm
 
-from ampyutils import amutils
+from ampyutils import amutils, amprofile
+from ampyutils import nmeautils
 from GNSS import gpstime
+from GNSS import wgs84
+from GNSS import geodesic
 import am_config as amc
 
 
-def parsePosFile(logger: logging.Logger) -> pd.DataFrame:
+@amprofile.stage_timer()
+def parsePosFile(logger: logging.Logger, dRtk: dict = None) -> pd.DataFrame:
     """
-    parses 'posn' file created by pyrtklib.py
+    parses 'posn' file created by pyrtklib.py, either in llh or in NMEA solution format
     """
 
     # set current function name
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
-    posFilePath = os.path.join(amc.dRTK['posDir'], amc.dRTK['posFile'])
+    posFilePath = os.path.join(dRtk['posDir'], dRtk['posFile'])
 
     logger.info('{func:s} parsing rtk-pos file {posf:s}'.format(func=cFuncName, posf=posFilePath))
 
+    if nmeautils.is_nmea_file(posFilePath):
+        dfPos, foundRefPos = readNMEAFile(posFilePath=posFilePath, logger=logger, dRtk=dRtk)
+    else:
+        dfPos, foundRefPos = readPosFile(posFilePath=posFilePath, logger=logger, dRtk=dRtk)
+
+    # check if we have records for this mode in the data, else exit
+    if dfPos.shape[0] == 0:
+        logger.info('{func:s}: found no data in pos-file {pos:s}'.format(func=cFuncName, pos=dRtk['posFile']))
+        sys.exit(amc.E_FAILURE)
+
+    # store total number of observations
+    dRtk['#obs'] = dfPos.shape[0]
+
+    # store number of calculated positions for requested rtk quality
+    dRtk['#obsQual'] = len(dfPos.loc[dfPos['Q'] == dRtk['iQual']])
+
+    amc.logDiagnostic(logger=logger, msgFunc=lambda: '{func:s}: dRtk = \n{drtk!s}'.format(func=cFuncName, drtk=dRtk))
+
+    # convert the time in seconds (NMEA solutions come with their UTC time)
+    if 'DT' not in dfPos.columns:
+        dfPos['DT'] = dfPos.apply(lambda x: gpstime.UTCFromWT(x['WNC'], x['TOW']), axis=1)
+
+    # add UTM coordinates and per-epoch 2D / 3D errors against the reference position
+    add_utm_errors(dfPos=dfPos, ref_lla=dRtk['RefPos'] if foundRefPos else None)
+    if foundRefPos:
+        # the reference position is projected in the UTM zone of the track
+        dRtk['RefPosUTM'] = utm_position(lla=dRtk['RefPos'], zone=int(dfPos['UTM.Z'].iloc[0]))
+        logger.info('{func:s}: reference station coordinates are UTM={utm!s}'.format(func=cFuncName, utm=dRtk['RefPosUTM']))
+        logger.info('{func:s}: added distance to reference position'.format(func=cFuncName))
+
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfPos, dfName='{posf:s}'.format(posf=posFilePath))
+
+    amc.logDataframeInfo(df=dfPos, dfName='dfPos', callerName=cFuncName, logger=logger)
+
+    return dfPos
+
+
+def readPosFile(posFilePath: str, logger: logging.Logger, dRtk: dict = None) -> Tuple[pd.DataFrame, bool]:
+    """
+    readPosFile reads the header info and the positions of a pos file in llh format and returns the positions and
+    whether a reference position is given
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
+
     # looking for start times of observation file
     for line in open(posFilePath):
         rec = line.strip()
         if rec.startswith('% obs start'):
-            amc.dRTK['obsStart'] = datetime.strptime(rec[14:33], '%Y/%m/%d %H:%M:%S')
+            dRtk['obsStart'] = datetime.strptime(rec[14:33], '%Y/%m/%d %H:%M:%S')
             break
     # looking for end times of observation file
     for line in open(posFilePath):
         rec = line.strip()
         if rec.startswith('% obs end'):
-            amc.dRTK['obsEnd'] = datetime.strptime(rec[14:33], '%Y/%m/%d %H:%M:%S')
+            dRtk['obsEnd'] = datetime.strptime(rec[14:33], '%Y/%m/%d %H:%M:%S')
             break
     # looking for ref pos of observation file
     foundRefPos = False
     for line in open(posFilePath):
         rec = line.strip()
         if rec.startswith('% ref pos'):
-            amc.dRTK['RefPos'] = [float(x) for x in rec.split(':')[1].split()]
-            amc.dRTK['RefPosUTM'] = utm.from_latlon(amc.dRTK['RefPos'][0], amc.dRTK['RefPos'][1])
-            logger.info('{func:s}: reference station coordinates are LLH={llh!s} UTM={utm!s}'.format(func=cFuncName, llh=amc.dRTK['RefPos'], utm=amc.dRTK['RefPosUTM']))
+            dRtk['RefPos'] = [float(x) for x in rec.split(':')[1].split()]
+            logger.info('{func:s}: reference station coordinates are LLH={llh!s}'.format(func=cFuncName, llh=dRtk['RefPos']))
             foundRefPos = True
             break
 
     if not foundRefPos:
-        amc.dRTK['RefPos'] = [np.NaN, np.NaN, np.NaN]
-        amc.dRTK['RefPosUTM'] = (np.NaN, np.NaN, np.NaN, np.NaN)
+        dRtk['RefPos'] = [np.NaN, np.NaN, np.NaN]
+        dRtk['RefPosUTM'] = (np.NaN, np.NaN, np.NaN, np.NaN)
         logger.info('{func:s}: no reference station used'.format(func=cFuncName))
 
     # find start of results in rtk file
@@ -57,28 +106,51 @@ def parsePosFile(logger: logging.Logger) -> pd.DataFrame:
     dfPos = pd.read_csv(posFilePath, header=endHeaderLine, delim_whitespace=True)
     dfPos = dfPos.rename(columns={'%': 'WNC', 'GPST': 'TOW', 'latitude(deg)': 'lat', 'longitude(deg)': 'lon', 'height(m)': 'ellH', 'sdn(m)': 'sdn', 'sde(m)': 'sde', 'sdu(m)': 'sdu', 'sdne(m)': 'sdne', 'sdeu(m)': 'sdeu', 'sdun(m)': 'sdun', 'age(s)': 'age'})
 
-    # check if we have records for this mode in the data, else exit
-    if dfPos.shape[0] == 0:
-        logger.info('{func:s}: found no data in pos-file {pos:s}'.format(func=cFuncName, pos=amc.dRTK['posFile']))
-        sys.exit(amc.E_FAILURE)
+    return dfPos, foundRefPos
 
-    # store total number of observations
-    amc.dRTK['#obs'] = dfPos.shape[0]
 
-    # store number of calculated positions for requested rtk quality
-    amc.dRTK['#obsQual'] = len(dfPos.loc[dfPos['Q'] == amc.dRTK['iQual']])
+def readNMEAFile(posFilePath: str, logger: logging.Logger, dRtk: dict = None) -> Tuple[pd.DataFrame, bool]:
+    """
+    readNMEAFile reads the positions of a pos file in NMEA format (dSolFormat 3), which has no header and thus
+    no reference position
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    dRtk = amc.get_session(dRtk)
 
-    logger.info('{func:s}: amc.dRTK = \n{drtk!s}'.format(func=cFuncName, drtk=amc.dRTK))
+    dfPos = nmeautils.nmea_pos(dNMEA=nmeautils.read_nmea(posFilePath))
 
-    # convert the time in seconds
-    dfPos['DT'] = dfPos.apply(lambda x: gpstime.UTCFromWT(x['WNC'], x['TOW']), axis=1)
+    if dfPos.shape[0] > 0:
+        dRtk['obsStart'] = dfPos['DT'].iloc[0].to_pydatetime()
+        dRtk['obsEnd'] = dfPos['DT'].iloc[-1].to_pydatetime()
 
-    # add UTM coordinates
-    dfPos['UTM.E'], dfPos['UTM.N'], dfPos['UTM.Z'], dfPos['UTM.L'] = utm.from_latlon(dfPos['lat'].to_numpy(), dfPos['lon'].to_numpy())
+    dRtk['RefPos'] = [np.nan, np.nan, np.nan]
+    dRtk['RefPosUTM'] = (np.nan, np.nan, np.nan, np.nan)
+    logger.info('{func:s}: read {nr:d} NMEA positions, no reference station used'.format(nr=dfPos.shape[0], func=cFuncName))
 
-    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfPos, dfName='{posf:s}'.format(posf=posFilePath))
+    return dfPos, False
 
-    amc.logDataframeInfo(df=dfPos, dfName='dfPos', callerName=cFuncName, logger=logger)
+
+def utm_position(lla: list, zone: int) -> tuple:
+    """
+    utm_position returns (easting, northing, zone, letter) of a single position (lat, lon, ellH) in the given UTM zone
+    """
+    utm, zones, letters, _ = wgs84.WGS84().lla2utmArray(np.array([lla[:3]], dtype=float), zone=zone)
+
+    return float(utm[0, 0]), float(utm[0, 1]), int(zones[0]), str(letters[0])
+
+
+def add_utm_errors(dfPos: pd.DataFrame, ref_lla: list = None) -> pd.DataFrame:
+    """
+    add_utm_errors adds the UTM coordinates of the positions (lat, lon, ellH) and, when a reference position is given,
+    the per-epoch 2D / 3D errors against it. Used for all position sources (pos, NMEA and UBX files).
+    """
+    # project the full track in one call, keeping it in the UTM zone of its first position
+    wgs84.WGS84().projectTrack(dfPos)
+
+    if ref_lla is not None:
+        dErrors = geodesic.position_errors(lla=dfPos[['lat', 'lon', 'ellH']].to_numpy(), ref_lla=ref_lla)
+        for col in ('Dist2D', 'DeltaH', 'Dist3D'):
+            dfPos[col] = dErrors[col]
 
     return dfPos
 
@@ -45,5 +45,8 @@ def process_rover(dRover, dProj, logger: logging.Logger, overwrite=False):
     sys.exit(6)
 
     # execute script
-    exeprogram.subProcessLogStdErr(command=script, logger=logger)
+    retCode = exeprogram.subProcessLogStdErr(command=script, logger=logger)
+    if retCode != 0:
+        logger.error('{func:s}: {prog:s} returned error code {err:d}'.format(func=cFuncName, prog=colored(os.path.basename(amc.dSettings['PROGS']['rnx2rtkp']), 'red'), err=retCode))
+        sys.exit(amc.E_FAILURE)
     pass
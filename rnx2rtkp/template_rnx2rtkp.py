@@ -1,7 +1,6 @@
 import sys
 import os
 from termcolor import colored
-import json
 from string import Template
 import logging
 
@@ -32,7 +31,7 @@ def create_rnx2rtkp_settings(logger: logging.Logger, overwrite: str = False):
     else:
         amc.dSettings['description'] = '{syst:s}: Processing station {rover:s}'.format(syst=amc.dRTK['GNSS'].upper(), rover=amc.dSettings['roverObs'])
 
-    logger.info('{func:s}: created dSettings =\n{json!s}'.format(func=cFuncName, json=json.dumps(amc.dSettings, sort_keys=False, indent=4)))
+    amc.logJSON(obj=amc.dSettings, objName='created dSettings', callerName=cFuncName, logger=logger)
 
     pass
 
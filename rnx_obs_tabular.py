@@ -7,16 +7,14 @@ from termcolor import colored
 import logging
 import json
 import glob
-import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from shutil import copyfile
 import pandas as pd
-from skyfield import api as sf
 from datetime import datetime, timedelta
 
 import am_config as amc
 from gfzrnx import rnxobs_tabular
 from ampyutils import amutils
-from plot import plot_obstab
 from tle import tle_parser
 
 __author__ = 'amuls'
@@ -57,9 +55,10 @@ def treatCmdOpts(argv: list):
     # create the parser for command line arguments
     parser = argparse.ArgumentParser(description=helpTxt)
     parser.add_argument('-d', '--dir', help='Directory with RINEX files (default {:s})'.format(colored('.', 'green')), required=False, type=str, default='.')
-    parser.add_argument('-g', '--gnss', help='Which GNSS observation tabular to process', choices=['E', 'G'], required=True, type=str)
+    parser.add_argument('-g', '--gnss', help='Which GNSS observation tabular(s) to process, several GNSSs are processed in parallel', choices=['E', 'G'], required=True, type=str, nargs='+')
     parser.add_argument('-c', '--cutoff', help='minimal cutoff angle (default 0 deg)', required=False, default=0, type=int, action=cutoff_action)
     parser.add_argument('-m', '--multiplier', help='multiplier of nominal interval for gap detection', default=30, type=int, action=multiplier_action)
+    parser.add_argument('-t', '--tledir', help='Directory with NORAD / TLE files and the rise / set cache (default {:s})'.format(colored(tle_parser.TLE_DIR, 'green')), required=False, type=str, default=tle_parser.TLE_DIR)
 
     parser.add_argument('-p', '--plots', help='displays interactive plots (default True)', action='store_true', required=False, default=False)
 
@@ -69,7 +68,7 @@ def treatCmdOpts(argv: list):
     args = parser.parse_args(argv[1:])
 
     # return arguments
-    return args.dir, args.gnss, args.cutoff, args.multiplier, args.plots, args.logging
+    return args.dir, sorted(set(args.gnss)), args.cutoff, args.multiplier, os.path.expanduser(args.tledir), args.plots, args.logging
 
 
 def checkValidityArgs(dir_rnx: str, logger: logging.Logger) -> bool:
@@ -103,68 +102,23 @@ def read_json(dir_rnx: str, logger: logging.Logger):
     pass
 
 
-def main(argv):
+def analyse_obstab(gnss: str, dTLEArcs: dict, multiplier: int, showPlots: bool, logger: logging.Logger):
     """
-    pyconvbin converts raw data from SBF/UBlox to RINEX
-
+    analyse_obstab compares for a GNSS the observed arcs in its obstab file with the TLE predicted arcs and writes
+    the results to CSV files and plots in the GNSS marker directory
     """
-    amc.cBaseName = colored(os.path.basename(__file__), 'yellow')
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # treat command line options
-    rnx_dir, gnss, cutoff, multiplier, showPlots, logLevels = treatCmdOpts(argv)
-
-    # create logging for better debugging
-    logger, log_name = amc.createLoggers(os.path.basename(__file__), dir=rnx_dir, logLevels=logLevels)
-
-    logger.info('{func:s}: arguments processed: {args!s}'.format(args=rnx_dir, func=cFuncName))
-
-    # check validity of passed arguments
-    retCode = checkValidityArgs(dir_rnx=rnx_dir, logger=logger)
-    if retCode != amc.E_SUCCESS:
-        logger.error('{func:s}: Program exits with code {error:s}'.format(error=colored('{!s}'.format(retCode), 'red'), func=cFuncName))
-        sys.exit(retCode)
-
-    # store parameters
-    amc.dRTK = {}
-    # get the information from pyconvbin created json file
-    read_json(dir_rnx=rnx_dir, logger=logger)
-
     # load the requested OBSTAB file into a pandas dataframe
-    df_obs = rnxobs_tabular.read_obs_tabular(gnss=gnss, logger=logger)
-    df_obs['gap'] = np.nan
+    df_obs = rnxobs_tabular.read_obs_tabular(gnss=gnss, logger=logger, dRtk=amc.dRTK)
 
     amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_obs, dfName='df_obs')
     # get unique list of PRNs in dataframe
     prn_lst = sorted(df_obs['PRN'].unique())
     logger.info('{func:s}: observed PRNs are {prns!s} (#{total:d})'.format(prns=prn_lst, total=len(prn_lst), func=cFuncName))
 
-    logger.info('{func:s}; getting corresponding NORAD info'.format(func=cFuncName))
-
-    # read the files galileo-NORAD-PRN.t and gps-ops-NORAD-PRN.t
-    dfNORAD = tle_parser.read_norad2prn(logger=logger)
-    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfNORAD, dfName='dfNORAD')
-
-    # get the corresponding NORAD nrs for the given PRNs
-    dNORADs = tle_parser.get_norad_numbers(prns=prn_lst, dfNorad=dfNORAD, logger=logger)
-    logger.info('{func:s}: corresponding NORAD nrs (#{count:d}):'.format(count=len(dNORADs), func=cFuncName))
-
-    # load a time scale and set RMA as Topo
-    # loader = sf.Loader(dir_tle, expire=True)  # loads the needed data files into the tle dir
-    ts = sf.load.timescale()
-    RMA = sf.Topos('50.8438 N', '4.3928 E')
-    logger.info('{func:s}: Earth station RMA @ {topo!s}'.format(topo=colored(RMA, 'green'), func=cFuncName))
-    # get the datetime that corresponds to yydoy
-    date_yydoy = datetime.strptime(amc.dRTK['rnx']['times']['DT'], '%Y-%m-%d %H:%M:%S')
-    yydoy = date_yydoy.strftime('%y%j')
-    logger.info('{func:s}: calculating rise / set times for {date:s} ({yydoy:s})'.format(date=colored(date_yydoy.strftime('%d-%m-%Y'), 'green'), yydoy=yydoy, func=cFuncName))
-
-    t0 = ts.utc(int(date_yydoy.strftime('%Y')), int(date_yydoy.strftime('%m')), int(date_yydoy.strftime('%d')))
-    date_tomorrow = date_yydoy + timedelta(days=1)
-    t1 = ts.utc(int(date_tomorrow.strftime('%Y')), int(date_tomorrow.strftime('%m')), int(date_tomorrow.strftime('%d')))
-
-    # find corresponding TLE record for NORAD nrs
-    df_tles = tle_parser.find_norad_tle_yydoy(dNorads=dNORADs, yydoy=yydoy, logger=logger)
+    # segment the observations of all PRNs into arcs (adds the gap column to df_obs)
+    df_arcs_obs = rnxobs_tabular.obs_arcs(df_obstab=df_obs, nomint_multi=multiplier, logger=logger)
 
     # list of rise / set times by observation / TLEs
     lst_obs_rise = []
@@ -172,10 +126,11 @@ def main(argv):
     # find in observations and by TLEs what the riuse/set times are and number of observations
     for prn in prn_lst:
         # find rise & set times for each SV and store into list dt_obs_rise_set and dt_obs_set
-        nom_interval, dt_obs_rise, dt_obs_set, obs_arc_count = rnxobs_tabular.rise_set_times(prn=prn, df_obstab=df_obs, nomint_multi=multiplier, logger=logger)
+        nom_interval, dt_obs_rise, dt_obs_set, obs_arc_count = rnxobs_tabular.prn_arcs(prn=prn, df_arcs=df_arcs_obs, logger=logger)
 
-        # find rise:set times using TLEs
-        dt_tle_rise, dt_tle_set, dt_tle_cul, tle_arc_count = tle_parser.tle_rise_set_times(prn=prn, df_tle=df_tles, marker=RMA, t0=t0, t1=t1, elev_min=cutoff, obs_int=nom_interval, logger=logger)
+        # TLE rise:set times and theoretical number of observations
+        dt_tle_rise, dt_tle_set, dt_tle_cul = dTLEArcs.get(prn, ([], [], []))
+        tle_arc_count = tle_parser.tle_arc_counts(dt_tle_rise=dt_tle_rise, dt_tle_set=dt_tle_set, obs_int=nom_interval)
 
         # add to list for creating dataframe
         lst_obs_rise.append([dt_obs_rise, dt_obs_set, obs_arc_count, dt_tle_rise, dt_tle_set, dt_tle_cul, tle_arc_count])
@@ -198,18 +153,107 @@ def main(argv):
     csvName = os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss'][gnss]['marker'], 'obs_arcs.csv')
     df_obs_arcs.to_csv(csvName, index=None, header=True)
 
-    # plot the statistics of observed vs TLE predicted
-    plot_obstab.plot_rise_set_times(gnss=gnss, df_rs=df_rise_set, logger=logger, showplot=showPlots)
-    plot_obstab.plot_rise_set_stats(gnss=gnss, df_arcs=df_obs_arcs, nr_arcs=max_arcs, logger=logger, showplot=showPlots)
+    # plot the statistics of observed vs TLE predicted, the plotting stack is only loaded here
+    from plot import plot_obstab
+    plot_obstab.plot_rise_set_times(gnss=gnss, df_rs=df_rise_set, logger=logger, showplot=showPlots, dRtk=amc.dRTK)
+    plot_obstab.plot_rise_set_stats(gnss=gnss, df_arcs=df_obs_arcs, nr_arcs=max_arcs, logger=logger, showplot=showPlots, dRtk=amc.dRTK)
 
     # amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_obs[(df_obs['gap'] > 1.) | (df_obs['gap'].isna())], dfName='df_obs', head=50)
 
+
+def analyse_obstab_worker(gnss: str, dRTK: dict, dTLEArcs: dict, multiplier: int, showPlots: bool, rnx_dir: str, logLevels: list):
+    """
+    analyse_obstab_worker runs analyse_obstab for a GNSS in a worker process with its own logger, whose log file is
+    copied to the GNSS marker directory
+    """
+    amc.dRTK = dRTK
+    logger, log_name = amc.createLoggers('{base:s}-{gnss:s}'.format(base=os.path.basename(__file__), gnss=gnss), dir=rnx_dir, logLevels=logLevels)
+
+    analyse_obstab(gnss=gnss, dTLEArcs=dTLEArcs, multiplier=multiplier, showPlots=showPlots, logger=logger)
+
+    copyfile(log_name, os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss'][gnss]['marker'], 'pyobstab.log'))
+    os.remove(log_name)
+
+
+def main(argv):
+    """
+    rnx_obs_tabular analyses the observation tabular files of one or more GNSSs against the TLE predicted arcs.
+    The NORAD information, TLEs and predicted arcs are determined once for all GNSSs, which are then analysed in
+    parallel worker processes.
+    """
+    amc.cBaseName = colored(os.path.basename(__file__), 'yellow')
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    # treat command line options
+    rnx_dir, gnsss, cutoff, multiplier, tle_dir, showPlots, logLevels = treatCmdOpts(argv)
+
+    # create logging for better debugging
+    logger, log_name = amc.createLoggers(os.path.basename(__file__), dir=rnx_dir, logLevels=logLevels)
+
+    logger.info('{func:s}: arguments processed: {args!s}'.format(args=rnx_dir, func=cFuncName))
+
+    # check validity of passed arguments
+    retCode = checkValidityArgs(dir_rnx=rnx_dir, logger=logger)
+    if retCode != amc.E_SUCCESS:
+        logger.error('{func:s}: Program exits with code {error:s}'.format(error=colored('{!s}'.format(retCode), 'red'), func=cFuncName))
+        sys.exit(retCode)
+
+    # store parameters
+    amc.dRTK = {}
+    # get the information from pyconvbin created json file
+    read_json(dir_rnx=rnx_dir, logger=logger)
+
+    logger.info('{func:s}; getting corresponding NORAD info'.format(func=cFuncName))
+
+    # read the files galileo-NORAD-PRN.t and gps-ops-NORAD-PRN.t
+    dfNORAD = tle_parser.read_norad2prn(logger=logger, dir_tle=tle_dir)
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfNORAD, dfName='dfNORAD')
+
+    # get the NORAD nrs for all PRNs of the requested GNSSs
+    prn_lst = sorted(prn for prn in dfNORAD['PRN'].astype(str).unique() if prn[0] in gnsss)
+    dNORADs = tle_parser.get_norad_numbers(prns=prn_lst, dfNorad=dfNORAD, logger=logger)
+    logger.info('{func:s}: corresponding NORAD nrs (#{count:d}):'.format(count=len(dNORADs), func=cFuncName))
+
+    # get the datetime that corresponds to yydoy
+    date_yydoy = datetime.strptime(amc.dRTK['rnx']['times']['DT'], '%Y-%m-%d %H:%M:%S')
+    yydoy = date_yydoy.strftime('%y%j')
+    logger.info('{func:s}: calculating rise / set times for {date:s} ({yydoy:s})'.format(date=colored(date_yydoy.strftime('%d-%m-%Y'), 'green'), yydoy=yydoy, func=cFuncName))
+
+    t0 = datetime(date_yydoy.year, date_yydoy.month, date_yydoy.day)
+    t1 = t0 + timedelta(days=1)
+
+    # find corresponding TLE record for NORAD nrs
+    df_tles = tle_parser.find_norad_tle_yydoy(dNorads=dNORADs, yydoy=yydoy, logger=logger, dir_tle=tle_dir)
+
+    # find rise:set times using TLEs for all PRNs in one pass
+    logger.info('{func:s}: Earth station RMA @ {topo!s}'.format(topo=colored(tle_parser.RMA_LLA, 'green'), func=cFuncName))
+    dTLEArcs = tle_parser.tle_rise_set_cached(prns=prn_lst, df_tle=df_tles, site_lla=tle_parser.RMA_LLA, t0=t0, t1=t1, elev_min=cutoff, logger=logger, cache_file=os.path.join(tle_dir, tle_parser.TLE_RS_CACHE_NAME))
+
+    if len(gnsss) == 1:
+        analyse_obstab(gnss=gnsss[0], dTLEArcs=dTLEArcs, multiplier=multiplier, showPlots=showPlots, logger=logger)
+        log_copy = 'pyobstab.log'
+    else:
+        # analyse each GNSS in its own worker process
+        logger.info('{func:s}: analysing GNSSs {gnsss!s} in parallel'.format(gnsss=colored(gnsss, 'green'), func=cFuncName))
+        with ProcessPoolExecutor(max_workers=len(gnsss)) as executor:
+            futures = {gnss: executor.submit(analyse_obstab_worker, gnss, amc.dRTK, {prn: arcs for prn, arcs in dTLEArcs.items() if prn[0] == gnss}, multiplier, showPlots, rnx_dir, logLevels) for gnss in gnsss}
+
+        for gnss, future in futures.items():
+            if future.exception() is not None:
+                logger.error('{func:s}: analysis of GNSS {gnss:s} failed: {err!s}'.format(gnss=colored(gnss, 'red'), err=future.exception(), func=cFuncName))
+                retCode = amc.E_FAILURE
+        log_copy = 'pyobstab-shared.log'
+
     # logger.info('{func:s}: amc.dRTK =\n{json!s}'.format(json=json.dumps(amc.dRTK, sort_keys=False, indent=4, default=amutils.DT_convertor), func=cFuncName))
 
-    # copy temp log file to the YYDOY directory
-    copyfile(log_name, os.path.join(os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss'][gnss]['marker']), 'pyobstab.log'))
+    # copy temp log file to the YYDOY directory of each GNSS
+    for gnss in gnsss:
+        copyfile(log_name, os.path.join(os.path.join(amc.dRTK['gfzrnxDir'], amc.dRTK['rnx']['gnss'][gnss]['marker']), log_copy))
     os.remove(log_name)
 
+    if retCode != amc.E_SUCCESS:
+        sys.exit(retCode)
+
 
 if __name__ == "__main__":  # Only run if this file is called directly
     main(sys.argv)
@@ -0,0 +1,289 @@
+import numpy as np
+
+from sbf import sbf_ops
+from GNSS import rnxnav
+
+__author__ = 'amuls'
+
+# block numbers of the decoded SBF blocks
+SBF_BLOCK_NUMS = {'PVTGeodetic': 4007, 'DOP': 4001, 'MeasEpoch': 4027, 'ChannelStatus': 4013}
+
+# number of blocks of a type collected before they are decoded into columns
+SBF_DECODE_BATCH = 20000
+
+# do-not-use value of float fields
+SBF_DNU_FLOAT = -2e10
+
+# SBF signal numbers as used in MeasEpoch
+dSBFSignals = {0: 'GPS L1CA', 1: 'GPS L1P', 2: 'GPS L2P', 3: 'GPS L2C', 4: 'GPS L5', 5: 'GPS L1C',
+               6: 'QZSS L1CA', 7: 'QZSS L2C', 8: 'GLO L1CA', 9: 'GLO L1P', 10: 'GLO L2P', 11: 'GLO L2CA', 12: 'GLO L3',
+               13: 'BDS B1C', 14: 'BDS B2a', 15: 'NavIC L5', 17: 'GAL E1BC', 19: 'GAL E6BC', 20: 'GAL E5a',
+               21: 'GAL E5b', 22: 'GAL E5AltBOC', 23: 'LBand', 24: 'SBAS L1CA', 25: 'SBAS L5', 26: 'QZSS L5',
+               27: 'QZSS L6', 28: 'BDS B1I', 29: 'BDS B2I', 30: 'BDS B3I', 32: 'QZSS L1C', 33: 'QZSS L1S', 34: 'BDS B2b'}
+
+
+def svid_prn(svid: int) -> str:
+    """
+    svid_prn converts an SBF satellite ID into a PRN as used in RINEX (eg 71 -> E01)
+    """
+    for first, last, gnss, prn0 in ((1, 37, 'G', 1), (38, 61, 'R', 1), (63, 68, 'R', 25), (71, 106, 'E', 1),
+                                    (120, 140, 'S', 120), (141, 180, 'C', 1), (181, 187, 'J', 1), (191, 197, 'I', 1),
+                                    (198, 215, 'S', 141), (216, 222, 'I', 8), (223, 245, 'C', 41)):
+        if first <= svid <= last:
+            return '{gnss:s}{prn:02d}'.format(gnss=gnss, prn=svid - first + prn0)
+    return ''
+
+
+# PRN per SBF satellite ID, used as lookup table
+SVID_PRNS = np.array([svid_prn(svid) for svid in range(256)])
+
+
+def _field(raw: np.ndarray, offsets: np.ndarray, dtype) -> np.ndarray:
+    """
+    _field reads the little-endian field of type dtype at the byte offsets in raw for all offsets at once
+    """
+    dtype = np.dtype(dtype).newbyteorder('<')
+    return raw[offsets[:, np.newaxis] + np.arange(dtype.itemsize)].view(dtype).ravel()
+
+
+def _float_field(raw: np.ndarray, offsets: np.ndarray, dtype, scale: float = 1.) -> np.ndarray:
+    """
+    _float_field reads a float field, replacing the do-not-use values by NaN
+    """
+    values = _field(raw, offsets, dtype).astype(np.float64)
+    values[values <= SBF_DNU_FLOAT] = np.nan
+    return values * scale
+
+
+def _time_columns(raw: np.ndarray, offsets: np.ndarray) -> dict:
+    """
+    _time_columns returns the week number, time of week (s) and GPS time of the blocks starting at offsets
+    """
+    tow_ms = _field(raw, offsets + 8, np.uint32)
+    wnc = _field(raw, offsets + 12, np.uint16)
+
+    dt = rnxnav.GPS_EPOCH + wnc.astype('timedelta64[W]') + tow_ms.astype('timedelta64[ms]')
+    dt[(tow_ms == 0xffffffff) | (wnc == 0xffff)] = np.datetime64('NaT')
+
+    return {'WNc': wnc, 'TOW': tow_ms / 1000., 'DT': dt}
+
+
+def _signal_cn0(sig: np.ndarray, cn0: np.ndarray) -> np.ndarray:
+    """
+    _signal_cn0 scales the MeasEpoch C/N0 (dB-Hz), which has an offset of 10 dB-Hz except for GPS L1P and L2P
+    """
+    values = cn0 * 0.25 + np.where((sig == 1) | (sig == 2), 0., 10.)
+    values[cn0 == 255] = np.nan
+    return values
+
+
+def _signal_number(sig_type: np.ndarray, obs_info: np.ndarray) -> np.ndarray:
+    """
+    _signal_number returns the signal number from the type field, extended by the ObsInfo field for numbers above 31
+    """
+    sig = (sig_type & 0x1f).astype(np.int16)
+    return np.where(sig == 31, 32 + ((obs_info >> 3) & 0x1f), sig)
+
+
+def decode_pvtgeodetic(data: bytes, starts: np.ndarray, revs: np.ndarray) -> dict:
+    """
+    decode_pvtgeodetic decodes the PVTGeodetic blocks starting at starts in data into columns
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    dCols = _time_columns(raw, starts)
+
+    dCols['Mode'] = _field(raw, starts + 14, np.uint8) & 0x0f
+    dCols['Error'] = _field(raw, starts + 15, np.uint8)
+    dCols['lat'] = np.degrees(_float_field(raw, starts + 16, np.float64))
+    dCols['lon'] = np.degrees(_float_field(raw, starts + 24, np.float64))
+    dCols['ellH'] = _float_field(raw, starts + 32, np.float64)
+    dCols['undulation'] = _float_field(raw, starts + 40, np.float32)
+    dCols['Vn'] = _float_field(raw, starts + 44, np.float32)
+    dCols['Ve'] = _float_field(raw, starts + 48, np.float32)
+    dCols['Vu'] = _float_field(raw, starts + 52, np.float32)
+    dCols['COG'] = _float_field(raw, starts + 56, np.float32)
+    dCols['RxClkBias'] = _float_field(raw, starts + 60, np.float64)
+    dCols['RxClkDrift'] = _float_field(raw, starts + 68, np.float32)
+    dCols['TimeSystem'] = _field(raw, starts + 72, np.uint8)
+    dCols['Datum'] = _field(raw, starts + 73, np.uint8)
+    dCols['NrSV'] = _field(raw, starts + 74, np.uint8)
+    dCols['SignalInfo'] = _field(raw, starts + 80, np.uint32)
+
+    # horizontal / vertical accuracy (cm) are only present from revision 2 on
+    rev2 = revs >= 2
+    for col, offset in (('HAccuracy', 90), ('VAccuracy', 92)):
+        dCols[col] = np.full(len(starts), np.nan)
+        accuracy = _field(raw, starts[rev2] + offset, np.uint16).astype(np.float64)
+        accuracy[accuracy == 0xffff] = np.nan
+        dCols[col][rev2] = accuracy / 100.
+
+    return dCols
+
+
+def decode_dop(data: bytes, starts: np.ndarray, revs: np.ndarray) -> dict:
+    """
+    decode_dop decodes the DOP blocks starting at starts in data into columns
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    dCols = _time_columns(raw, starts)
+
+    dCols['NrSV'] = _field(raw, starts + 14, np.uint8)
+    for col, offset in (('PDOP', 16), ('TDOP', 18), ('HDOP', 20), ('VDOP', 22)):
+        dop = _field(raw, starts + offset, np.uint16).astype(np.float64)
+        dop[dop == 0] = np.nan
+        dCols[col] = dop / 100.
+    dCols['HPL'] = _float_field(raw, starts + 24, np.float32)
+    dCols['VPL'] = _float_field(raw, starts + 28, np.float32)
+
+    return dCols
+
+
+def decode_measepoch(data: bytes, starts: np.ndarray, revs: np.ndarray) -> dict:
+    """
+    decode_measepoch decodes the Type1 (main signal) and Type2 (other signals of the same satellite) sub-blocks of
+    the MeasEpoch blocks starting at starts in data into one row per signal, in the order of the blocks. Doppler is
+    only given for the main signal.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+
+    # walk the sub-blocks to find their offsets, the only part done per sub-block
+    t1_offsets, t1_blocks = [], []
+    t2_offsets, t2_parents = [], []
+    for blk_idx, start in enumerate(starts.tolist()):
+        sb1_length, sb2_length = data[start + 15], data[start + 16]
+        offset = start + 20
+        for _ in range(data[start + 14]):
+            t1_offsets.append(offset)
+            t1_blocks.append(blk_idx)
+            nr_type2 = data[offset + 19]
+            offset += sb1_length
+            for _ in range(nr_type2):
+                t2_offsets.append(offset)
+                t2_parents.append(len(t1_offsets) - 1)
+                offset += sb2_length
+
+    t1_offsets = np.array(t1_offsets, dtype=np.int64)
+    t1_blocks = np.array(t1_blocks, dtype=np.int64)
+    t2_offsets = np.array(t2_offsets, dtype=np.int64)
+    t2_parents = np.array(t2_parents, dtype=np.int64)
+
+    # main signals
+    sig1 = _signal_number(_field(raw, t1_offsets + 1, np.uint8), _field(raw, t1_offsets + 18, np.uint8))
+    code_msb = (_field(raw, t1_offsets + 3, np.uint8) & 0x0f).astype(np.int64)
+    code_lsb = _field(raw, t1_offsets + 4, np.uint32).astype(np.int64)
+    pr1 = (code_msb * 2**32 + code_lsb) * 0.001
+    pr1[(code_msb == 0) & (code_lsb == 0)] = np.nan
+    doppler = _field(raw, t1_offsets + 8, np.int32).astype(np.float64)
+    doppler[doppler == -2**31] = np.nan
+
+    # other signals, their pseudo-range is an offset to the main signal
+    sig2 = _signal_number(_field(raw, t2_offsets, np.uint8), _field(raw, t2_offsets + 5, np.uint8))
+    offset_msb = (_field(raw, t2_offsets + 3, np.uint8) & 0x07).astype(np.int64)
+    offset_msb = np.where(offset_msb > 3, offset_msb - 8, offset_msb)
+    offset_lsb = _field(raw, t2_offsets + 6, np.uint16).astype(np.int64)
+    pr2 = pr1[t2_parents] + (offset_msb * 65536 + offset_lsb) * 0.001
+    pr2[(offset_msb == -4) & (offset_lsb == 0)] = np.nan
+
+    # combine both in block order
+    blocks = np.concatenate((t1_blocks, t1_blocks[t2_parents]))
+    order = np.argsort(blocks, kind='stable')
+    svid = np.concatenate((_field(raw, t1_offsets + 2, np.uint8), _field(raw, t1_offsets + 2, np.uint8)[t2_parents]))[order]
+
+    dCols = {col: values[blocks[order]] for col, values in _time_columns(raw, starts).items()}
+    dCols['SVID'] = svid
+    dCols['PRN'] = SVID_PRNS[svid]
+    dCols['RxChannel'] = np.concatenate((_field(raw, t1_offsets, np.uint8), _field(raw, t1_offsets, np.uint8)[t2_parents]))[order]
+    dCols['signal'] = np.concatenate((sig1, sig2))[order]
+    dCols['antenna'] = np.concatenate((_field(raw, t1_offsets + 1, np.uint8) >> 5, _field(raw, t2_offsets, np.uint8) >> 5))[order]
+    dCols['PR'] = np.concatenate((pr1, pr2))[order]
+    dCols['Doppler'] = np.concatenate((doppler * 0.0001, np.full(len(t2_offsets), np.nan)))[order]
+    dCols['CN0'] = np.concatenate((_signal_cn0(sig1, _field(raw, t1_offsets + 15, np.uint8)), _signal_cn0(sig2, _field(raw, t2_offsets + 2, np.uint8))))[order]
+    dCols['LockTime'] = np.concatenate((_field(raw, t1_offsets + 16, np.uint16), _field(raw, t2_offsets + 1, np.uint8)))[order]
+
+    return dCols
+
+
+def decode_channelstatus(data: bytes, starts: np.ndarray, revs: np.ndarray) -> dict:
+    """
+    decode_channelstatus decodes the satellite info of the ChannelStatus blocks starting at starts in data into
+    one row per tracked satellite
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+
+    sat_offsets, sat_blocks = [], []
+    for blk_idx, start in enumerate(starts.tolist()):
+        sb1_length, sb2_length = data[start + 15], data[start + 16]
+        offset = start + 20
+        for _ in range(data[start + 14]):
+            sat_offsets.append(offset)
+            sat_blocks.append(blk_idx)
+            offset += sb1_length + data[offset + 9] * sb2_length
+
+    sat_offsets = np.array(sat_offsets, dtype=np.int64)
+    sat_blocks = np.array(sat_blocks, dtype=np.int64)
+
+    dCols = {col: values[sat_blocks] for col, values in _time_columns(raw, starts).items()}
+    dCols['SVID'] = _field(raw, sat_offsets, np.uint8)
+    dCols['PRN'] = SVID_PRNS[dCols['SVID']]
+    dCols['RxChannel'] = _field(raw, sat_offsets + 10, np.uint8)
+
+    az_riseset = _field(raw, sat_offsets + 4, np.uint16)
+    dCols['azimuth'] = (az_riseset & 0x1ff).astype(np.float64)
+    dCols['azimuth'][dCols['azimuth'] == 511] = np.nan
+    dCols['rise_set'] = az_riseset >> 14
+    dCols['elevation'] = _field(raw, sat_offsets + 8, np.int8).astype(np.float64)
+    dCols['elevation'][dCols['elevation'] == -128] = np.nan
+    dCols['health'] = _field(raw, sat_offsets + 6, np.uint16)
+
+    return dCols
+
+
+# decoder per block number
+dSBFDecoders = {SBF_BLOCK_NUMS['PVTGeodetic']: decode_pvtgeodetic,
+                SBF_BLOCK_NUMS['DOP']: decode_dop,
+                SBF_BLOCK_NUMS['MeasEpoch']: decode_measepoch,
+                SBF_BLOCK_NUMS['ChannelStatus']: decode_channelstatus}
+
+
+def _decode_batch(blk_num: int, blocks: list, revs: list) -> dict:
+    """
+    _decode_batch decodes a list of blocks of the same type into columns, an empty list gives zero-length columns
+    """
+    lengths = np.array([len(block) for block in blocks], dtype=np.int64)
+    starts = np.cumsum(lengths) - lengths
+
+    return dSBFDecoders[blk_num](b''.join(blocks), starts, np.array(revs, dtype=np.int64))
+
+
+def read_sbf(sbf_file: str, blocks: list = tuple(SBF_BLOCK_NUMS), batch_size: int = SBF_DECODE_BATCH, chunk_size: int = sbf_ops.SBF_CHUNK_SIZE) -> dict:
+    """
+    read_sbf walks the SBF file by block header and decodes the requested blocks (names of SBF_BLOCK_NUMS) into
+    a dict of columns (numpy arrays) per block name. Blocks are decoded in batches of batch_size blocks, other blocks
+    are skipped without being decoded and blocks with a CRC error are left out.
+    """
+    blk_nums = {SBF_BLOCK_NUMS[name]: name for name in blocks}
+
+    dBatches = {blk_num: ([], []) for blk_num in blk_nums}
+    dDecoded = {blk_num: [] for blk_num in blk_nums}
+
+    with open(sbf_file, 'rb') as fsbf:
+        for _, blk_num, rev, crc_ok, block in sbf_ops.iter_sbf_blocks(fsbf, chunk_size=chunk_size, block_nums=set(blk_nums)):
+            if not crc_ok:
+                continue
+
+            batch, batch_revs = dBatches[blk_num]
+            batch.append(block)
+            batch_revs.append(rev)
+            if len(batch) == batch_size:
+                dDecoded[blk_num].append(_decode_batch(blk_num, batch, batch_revs))
+                dBatches[blk_num] = ([], [])
+
+    dSBF = {}
+    for blk_num, name in blk_nums.items():
+        batch, batch_revs = dBatches[blk_num]
+        if len(batch) > 0 or len(dDecoded[blk_num]) == 0:
+            dDecoded[blk_num].append(_decode_batch(blk_num, batch, batch_revs))
+
+        dSBF[name] = {col: np.concatenate([dCols[col] for dCols in dDecoded[blk_num]]) for col in dDecoded[blk_num][0]}
+
+    return dSBF
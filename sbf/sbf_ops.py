@@ -0,0 +1,159 @@
+import os
+import errno
+import struct
+import binascii
+from collections import namedtuple
+
+__author__ = 'amuls'
+
+# SBF block header: sync '$@', CRC (u2), ID (u2: block number + revision) and block length (u2) incl the header
+SBF_SYNC = b'$@'
+SBF_HEADER = struct.Struct('<HHH')
+SBF_HEADER_SIZE = 8
+
+# size of the chunks read when scanning an SBF file
+SBF_CHUNK_SIZE = 4 * 1024 * 1024
+
+# errors for which the kernel-side copy falls back to copying through user space
+COPY_FALLBACK_ERRNOS = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.ENOTSOCK, errno.EOPNOTSUPP, errno.ENOTSUP)
+
+# result of checking an SBF file
+#   size - file size in bytes
+#   blocks - number of valid blocks
+#   bad_crc - number of blocks with a CRC error
+#   ranges - list of (offset, length) of the consecutive valid blocks
+#   skipped - bytes not belonging to valid blocks (garbage, bad blocks and truncated tail)
+#   tail - bytes following the last valid block (eg a block truncated when logging stopped)
+SBFCheck = namedtuple('SBFCheck', ['size', 'blocks', 'bad_crc', 'ranges', 'skipped', 'tail'])
+
+
+def iter_sbf_blocks(fsbf, chunk_size: int = SBF_CHUNK_SIZE, block_nums: set = None):
+    """
+    iter_sbf_blocks scans the SBF stream fsbf (opened in binary mode) in chunks and yields per block found
+    (offset, block number, block revision, crc ok, block). Bytes between blocks are skipped and the search resyncs
+    on the next sync after a block with an invalid length or CRC. An incomplete block at the end is not yielded.
+    When block_nums is given, other blocks with a valid CRC are stepped over by their length without being copied.
+    """
+    buf = bytearray()
+    base = 0  # offset in the stream of buf[0]
+    pos = 0
+    eof = False
+
+    while not eof:
+        chunk = fsbf.read(chunk_size)
+        eof = not chunk
+
+        del buf[:pos]
+        base += pos
+        pos = 0
+        buf += chunk
+
+        while True:
+            sync = buf.find(SBF_SYNC, pos)
+            if sync < 0:
+                # keep a last '$' which may be the start of a sync in the next chunk
+                pos = max(pos, len(buf) - 1)
+                break
+            pos = sync
+
+            if len(buf) - pos < SBF_HEADER_SIZE:
+                if not eof:
+                    break
+                pos += 1
+                continue
+
+            crc, blk_id, length = SBF_HEADER.unpack_from(buf, pos + 2)
+            if length < SBF_HEADER_SIZE or length % 4:
+                pos += 1
+                continue
+
+            if len(buf) - pos < length:
+                if not eof:
+                    break
+                # truncated block at the end, look for complete blocks inside it
+                pos += 1
+                continue
+
+            # the length is only trusted for a valid CRC, a false sync may announce any length
+            crc_ok = binascii.crc_hqx(memoryview(buf)[pos + 4:pos + length], 0) == crc
+            if block_nums is not None and (blk_id & 0x1fff) not in block_nums:
+                pos += length if crc_ok else 1
+                continue
+
+            yield base + pos, blk_id & 0x1fff, blk_id >> 13, crc_ok, bytes(buf[pos:pos + length])
+
+            pos += length if crc_ok else 1
+
+
+def sbf_check(sbf_file: str, chunk_size: int = SBF_CHUNK_SIZE) -> SBFCheck:
+    """
+    sbf_check validates the sync, length and CRC of the blocks of an SBF file in a streaming pass
+    """
+    ranges = []
+    nr_blocks = bad_crc = 0
+
+    with open(sbf_file, 'rb') as fsbf:
+        for offset, _, _, crc_ok, block in iter_sbf_blocks(fsbf, chunk_size=chunk_size):
+            if not crc_ok:
+                bad_crc += 1
+                continue
+
+            nr_blocks += 1
+            if ranges and ranges[-1][0] + ranges[-1][1] == offset:
+                ranges[-1][1] += len(block)
+            else:
+                ranges.append([offset, len(block)])
+
+    size = os.path.getsize(sbf_file)
+    valid = sum(length for _, length in ranges)
+    tail = size - (ranges[-1][0] + ranges[-1][1]) if ranges else size
+
+    return SBFCheck(size=size, blocks=nr_blocks, bad_crc=bad_crc, ranges=[tuple(rng) for rng in ranges], skipped=size - valid, tail=tail)
+
+
+def copy_range(fd_src: int, fd_dst: int, offset: int, count: int):
+    """
+    copy_range appends count bytes starting at offset of file descriptor fd_src to fd_dst. The copy is done by the
+    kernel (copy_file_range or sendfile) and falls back to reading / writing when these are not supported.
+    """
+    end = offset + count
+    while offset < end:
+        try:
+            if hasattr(os, 'copy_file_range'):
+                copied = os.copy_file_range(fd_src, fd_dst, end - offset, offset)
+            else:
+                copied = os.sendfile(fd_dst, fd_src, offset, end - offset)
+        except OSError as e:
+            if e.errno not in COPY_FALLBACK_ERRNOS:
+                raise
+            copied = os.write(fd_dst, os.pread(fd_src, min(end - offset, SBF_CHUNK_SIZE), offset))
+
+        if copied == 0:
+            raise IOError('unexpected end of file at offset {offset:d}'.format(offset=offset))
+        offset += copied
+
+
+def sbf_concatenate(sbf_files: list, daily_sbf: str, chunk_size: int = SBF_CHUNK_SIZE) -> dict:
+    """
+    sbf_concatenate creates daily_sbf from the valid blocks of the (six-)hourly sbf_files and returns the SBFCheck
+    per file. Invalid blocks, garbage and truncated tails are left out so every part starts on a block boundary.
+    The daily file is written under a temporary name and renamed when complete.
+    """
+    dChecks = {}
+    tmp_daily = '{daily:s}.{pid:d}'.format(daily=daily_sbf, pid=os.getpid())
+
+    try:
+        with open(tmp_daily, 'wb') as fdaily:
+            for sbf_file in sbf_files:
+                dChecks[sbf_file] = sbf_check(sbf_file, chunk_size=chunk_size)
+
+                with open(sbf_file, 'rb') as fsbf:
+                    for offset, length in dChecks[sbf_file].ranges:
+                        copy_range(fd_src=fsbf.fileno(), fd_dst=fdaily.fileno(), offset=offset, count=length)
+
+        os.replace(tmp_daily, daily_sbf)
+    finally:
+        if os.path.exists(tmp_daily):
+            os.remove(tmp_daily)
+
+    return dChecks
@@ -4,19 +4,41 @@ import logging
 from termcolor import colored
 import pandas as pd
 from bisect import bisect_left, bisect_right
-from typing import Tuple
+from typing import Tuple, TYPE_CHECKING
 from datetime import datetime, timedelta, time
-from skyfield import api as sf
-from skyfield.api import EarthSatellite
+from sgp4.api import Satrec, SatrecArray, jday
 import numpy as np
 
+try:
+    import fcntl
+except ImportError:  # not available on Windows, the rise / set cache is then stored without locking
+    fcntl = None
+
 from ampyutils import amutils
+from GNSS import skyview
 import am_config as amc
 
+if TYPE_CHECKING:
+    from skyfield import api as sf
+
+# extension of the epoch / offset index stored next to each NORAD TLE file
+TLE_INDEX_EXT = '.tleidx.npz'
+
+# geodetic coordinates (lat, lon, ellH) of the RMA Earth station used for the TLE predictions
+RMA_LLA = (50.8438, 4.3928, 0.)
+
+# default directory with the NORAD / PRN and TLE files
+TLE_DIR = os.path.join(os.environ.get('HOME', '.'), 'RxTURP/BEGPIOS/tle')
+
+# persistent cache of TLE rise / set results (kept in the TLE directory) and its maximum number of entries (one entry per NORAD / day)
+TLE_RS_CACHE_NAME = 'tle-rise-set-cache.npz'
+TLE_RS_CACHE_FILE = os.path.join(TLE_DIR, TLE_RS_CACHE_NAME)
+TLE_RS_CACHE_SIZE = 10000
+
 
-def read_norad2prn(logger: logging.Logger) -> pd.DataFrame:
+def read_norad2prn(logger: logging.Logger, dir_tle: str = TLE_DIR) -> pd.DataFrame:
     """
-    read_norad2prn reads the files NORAD-PRN.t and gps-ops-NORAD-PRN.t from dir ~/RxTURP/BEGPIOS/tle connecting NORAD number to PRN (period 2018-2020)
+    read_norad2prn reads the files NORAD-PRN.t and gps-ops-NORAD-PRN.t from dir_tle (default ~/RxTURP/BEGPIOS/tle) connecting NORAD number to PRN (period 2018-2020)
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
@@ -24,7 +46,7 @@ def read_norad2prn(logger: logging.Logger) -> pd.DataFrame:
     column_names = ['GNSS', 'SV-ID', 'PRN', 'NORAD', 'launch']
 
     # read the NORAD2PRN file in dataframes
-    norad2prn_file = os.path.join(os.environ['HOME'], 'RxTURP/BEGPIOS/tle', 'gnss-NORAD-PRN.t')
+    norad2prn_file = os.path.join(dir_tle, 'gnss-NORAD-PRN.t')
 
     try:
         dfNorad = pd.read_csv(norad2prn_file, header=None, names=column_names)
@@ -61,7 +83,7 @@ def get_norad_numbers(prns: list, dfNorad: pd.DataFrame, logger: logging.Logger)
     return dNorads
 
 
-def find_norad_tle_yydoy(dNorads: dict, yydoy: str, logger: logging.Logger) -> pd.DataFrame:
+def find_norad_tle_yydoy(dNorads: dict, yydoy: str, logger: logging.Logger, dir_tle: str = TLE_DIR) -> pd.DataFrame:
     """
     find_norad_tle_yydoy finds the corresponding YYDOY entry in the NORAD combined TLEs
     """
@@ -73,16 +95,12 @@ def find_norad_tle_yydoy(dNorads: dict, yydoy: str, logger: logging.Logger) -> p
     # reading the TLE per SV
     for prn, norad in dNorads.items():
         if norad != '':  # no TLE file available for this PRN
-            norad_tle_file = os.path.join(os.environ['HOME'], 'RxTURP/BEGPIOS/tle', 'sat{norad:s}.txt'.format(norad=norad[:-1]))
+            norad_tle_file = os.path.join(dir_tle, 'sat{norad:s}.txt'.format(norad=norad[:-1]))
             logger.info('{func:s}: reading TLE file {name:s} for NORAD ID {norad:s} (PRN={prn:s})'.format(norad=colored(norad, 'green'), prn=colored(prn, 'green'), name=norad_tle_file, func=cFuncName))
 
             try:
-                df_tle_prn = pd.read_csv(norad_tle_file, header=None, delim_whitespace=True)
-                amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_tle_prn, dfName='df_tle_prn')
-
-                # # look into rows with first column 1 (TLE Line 1) for date closest to YYDOY
-
-                tle_line1, tle_line2 = get_closests_tle(df=df_tle_prn[df_tle_prn[0] == 1], col=3, val=int(yydoy), norad_file=norad_tle_file, logger=logger)
+                # look up the TLE with epoch closest to YYDOY through the epoch index of the NORAD file
+                tle_line1, tle_line2 = get_closest_tle(norad_file=norad_tle_file, yydoy=yydoy, logger=logger)
 
                 logger.info('{func:s}:   TLE line 1: {tle1:s}'.format(tle1=colored(tle_line1, 'green'), func=cFuncName))
                 logger.info('{func:s}:   TLE line 2: {tle2:s}'.format(tle2=colored(tle_line2, 'green'), func=cFuncName))
@@ -104,7 +122,7 @@ def find_norad_tle_yydoy(dNorads: dict, yydoy: str, logger: logging.Logger) -> p
     return df_tle
 
 
-def rise_set_yydoy(df_tle: pd.DataFrame, yydoy: str, dir_tle: str, logger: logging.Logger) -> pd.DataFrame:
+def rise_set_yydoy(df_tle: pd.DataFrame, yydoy: str, dir_tle: str, logger: logging.Logger) -> dict:
     """
     rise_set_yydoy calculates the rise/set times for GNSS PRNs
     """
@@ -114,28 +132,11 @@ def rise_set_yydoy(df_tle: pd.DataFrame, yydoy: str, dir_tle: str, logger: loggi
     date_yydoy = datetime.strptime(yydoy, '%y%j')
     logger.info('{func:s}: calculating rise / set times for {date:s} ({yy:s}/{doy:s})'.format(date=colored(date_yydoy.strftime('%d-%m-%Y'), 'green'), yy=yydoy[:2], doy=yydoy[2:], func=cFuncName))
 
-    # load a time scale and set RMA as Topo
-    # loader = sf.Loader(dir_tle, expire=True)  # loads the needed data files into the tle dir
-    ts = sf.load.timescale()
-    RMA = sf.Topos('50.8438 N', '4.3928 E')
-    logger.info('{func:s}: Earth station RMA = {topo!s}'.format(topo=colored(RMA, 'green'), func=cFuncName))
-
-    t0 = ts.utc(int(date_yydoy.strftime('%Y')), int(date_yydoy.strftime('%m')), int(date_yydoy.strftime('%d')))
-    date_tomorrow = date_yydoy + timedelta(days=1)
-    t1 = ts.utc(int(date_tomorrow.strftime('%Y')), int(date_tomorrow.strftime('%m')), int(date_tomorrow.strftime('%d')))
-
-    # go over the PRN / NORADs that have TLE corresponding to the requested date
-    for row, prn in enumerate(df_tle['PRN']):
-        logger.info('{func:s}:   for NORAD {norad:s} ({prn:s})'.format(norad=colored(df_tle['NORAD'][row], 'green'), prn=colored(prn, 'green'), func=cFuncName))
-        # create a EarthSatellites from the TLE lines for this PRN
-        gnss_sv = EarthSatellite(df_tle['TLE1'][row], df_tle['TLE2'][row])
-        logger.info('{func:s}:       created earth satellites {sat!s}'.format(sat=colored(gnss_sv, 'green'), func=cFuncName))
-
-        t, events = gnss_sv.find_events(RMA, t0, t1, altitude_degrees=5.0)
+    # calculate for all PRNs at once the rise / culminate / set times seen from RMA
+    logger.info('{func:s}: Earth station RMA @ {topo!s}'.format(topo=colored(RMA_LLA, 'green'), func=cFuncName))
+    dArcs = tle_rise_set_cached(prns=df_tle['PRN'].tolist(), df_tle=df_tle, site_lla=RMA_LLA, t0=date_yydoy, t1=date_yydoy + timedelta(days=1), elev_min=5.0, logger=logger, cache_file=os.path.join(dir_tle, TLE_RS_CACHE_NAME))
 
-        for ti, event in zip(t, events):
-            name = ('rise above 5d', 'culminate', 'set below 5d')[event]
-            logger.info('{func:s}:         {jpl!s} -- {name!s}'.format(jpl=ti.utc_jpl(), name=name, func=cFuncName))
+    return dArcs
 
 
 def get_closests(df: pd.DataFrame, col: int, val: int) -> Tuple[int, int]:
@@ -147,36 +148,99 @@ def get_closests(df: pd.DataFrame, col: int, val: int) -> Tuple[int, int]:
         return lower_idx, lower_idx
 
 
-def get_closests_tle(df: pd.DataFrame, col: int, val: int, norad_file: str, logger: logging.Logger) -> Tuple[str, str, int]:
+def tle_epoch_key(yyddd: float) -> float:
+    """
+    tle_epoch_key converts a TLE epoch YYDDD.ddd into continuous days since 1970 (TLE years 57-99 are 19xx)
+    """
+    yy = np.floor_divide(yyddd, 1000).astype(int)
+    year = yy + np.where(yy >= 57, 1900, 2000)
+    days_year = (np.asarray(year - 1970).astype('datetime64[Y]').astype('datetime64[D]')).astype(float)
+
+    return days_year + (yyddd - yy * 1000) - 1
+
+
+def tle_epoch_index(norad_file: str, logger: logging.Logger) -> Tuple[np.ndarray, np.ndarray]:
     """
-    get_closests_tle scans the TLE files and returns those closest to epoch
+    tle_epoch_index returns the sorted epoch keys of the TLEs in a NORAD file and the byte offsets of their first line.
+    The index is stored next to the NORAD file and only rebuilt when size or modification time of the file changed.
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    df_sort = df.iloc[(df[col] - val).abs().argsort()[:1]]
-    tle1_idx = df_sort.index.tolist()[0]
+    index_file = os.path.splitext(norad_file)[0] + TLE_INDEX_EXT
+    file_stat = os.stat(norad_file)
+
+    # use the stored index when it corresponds to the current NORAD file
+    try:
+        with np.load(index_file) as idx:
+            if idx['src_size'] == file_stat.st_size and idx['src_mtime_ns'] == file_stat.st_mtime_ns:
+                logger.debug('{func:s}: using TLE index {idx:s}'.format(idx=index_file, func=cFuncName))
+                return idx['epochs'], idx['offsets']
+    except (IOError, ValueError, KeyError):
+        pass
+
+    # (re)build the index by scanning the TLE line 1 records
+    logger.info('{func:s}: building TLE index {idx:s}'.format(idx=index_file, func=cFuncName))
+    epochs = []
+    offsets = []
+    with open(norad_file, 'rb') as fp:
+        offset = 0
+        for line in fp:
+            if line.startswith(b'1 '):
+                epochs.append(float(line[18:32]))
+                offsets.append(offset)
+            offset += len(line)
+
+    epochs = tle_epoch_key(np.array(epochs, dtype=float))
+    offsets = np.array(offsets, dtype=np.int64)
+    order = np.argsort(epochs, kind='mergesort')
+    epochs, offsets = epochs[order], offsets[order]
+
+    # write to a temporary file first so that concurrent readers never see a partial index
+    try:
+        tmp_index_file = '{idx:s}.{pid:d}'.format(idx=index_file, pid=os.getpid())
+        with open(tmp_index_file, 'wb') as fidx:
+            np.savez(fidx, epochs=epochs, offsets=offsets, src_size=file_stat.st_size, src_mtime_ns=file_stat.st_mtime_ns)
+        os.replace(tmp_index_file, index_file)
+    except IOError as e:
+        logger.warning('{func:s}: could not store TLE index {idx:s}: {err!s}'.format(idx=index_file, err=e, func=cFuncName))
+
+    return epochs, offsets
+
+
+def get_closest_tle(norad_file: str, yydoy: str, logger: logging.Logger) -> Tuple[str, str]:
+    """
+    get_closest_tle returns the 2 TLE lines with epoch closest to YYDOY using a binary search in the TLE index
+    and a seek into the NORAD file
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    epochs, offsets = tle_epoch_index(norad_file=norad_file, logger=logger)
+    if len(epochs) == 0:
+        raise IndexError('no TLE records in {file:s}'.format(file=norad_file))
+
+    # select closest of the TLEs just before / after YYDOY
+    val = tle_epoch_key(float(yydoy))
+    pos = np.searchsorted(epochs, val)
+    candidates = [i for i in (pos - 1, pos) if 0 <= i < len(epochs)]
+    closest = min(candidates, key=lambda i: abs(epochs[i] - val))
 
     # read the 2 lines from the file
-    with open(norad_file) as fp:
-        for i, line in enumerate(fp):
-            if i == tle1_idx:
-                tle_line1 = line
-            elif i == tle1_idx + 1:
-                tle_line2 = line
-            elif i > tle1_idx + 1:
-                break
+    with open(norad_file, 'rb') as fp:
+        fp.seek(offsets[closest])
+        tle_line1 = fp.readline().decode('ascii').rstrip('\r\n')
+        tle_line2 = fp.readline().decode('ascii').rstrip('\r\n')
 
-    logger.debug('{func:s}: found TLE1: {tle1!s}'.format(tle1=tle_line1[:-1], func=cFuncName))
-    logger.debug('{func:s}: found TLE2: {tle2!s}'.format(tle2=tle_line2[:-1], func=cFuncName))
+    logger.debug('{func:s}: found TLE1: {tle1!s}'.format(tle1=tle_line1, func=cFuncName))
+    logger.debug('{func:s}: found TLE2: {tle2!s}'.format(tle2=tle_line2, func=cFuncName))
 
-    return tle_line1[:-1], tle_line2[:-1]
+    return tle_line1, tle_line2
 
 
 def take_closest(num: float, collection: list):
     return min(collection, key=lambda x: abs(x - num))
 
 
-def tle_rise_set_times(prn: int, df_tle: pd.DataFrame, marker: sf.Topos, t0: sf.Time, t1: sf.Time, elev_min: int, obs_int: float, logger: logging.Logger) -> Tuple[list, list, list, list]:
+def tle_rise_set_times(prn: int, df_tle: pd.DataFrame, marker: 'sf.Topos', t0: 'sf.Time', t1: 'sf.Time', elev_min: int, obs_int: float, logger: logging.Logger) -> Tuple[list, list, list, list]:
     """
     tle_rise_set_info calculates for a PRN based on TLEs the rise and set times and theoreticlal number of observations.
     """
@@ -194,7 +258,8 @@ def tle_rise_set_times(prn: int, df_tle: pd.DataFrame, marker: sf.Topos, t0: sf.
 
         logger.info('{func:s}:    for NORAD {norad:s} ({prn:s})'.format(norad=colored(df_tle['NORAD'][row], 'green'), prn=colored(prn, 'green'), func=cFuncName))
 
-        # create a EarthSatellites from the TLE lines for this PRN
+        # create a EarthSatellites from the TLE lines for this PRN (skyfield is only loaded for this legacy path)
+        from skyfield.api import EarthSatellite
         gnss_sv = EarthSatellite(df_tle['TLE1'][row], df_tle['TLE2'][row])
         logger.info('{func:s}:       created earth satellite {sat!s}'.format(sat=colored(gnss_sv, 'green'), func=cFuncName))
 
@@ -254,3 +319,236 @@ def tle_rise_set_times(prn: int, df_tle: pd.DataFrame, marker: sf.Topos, t0: sf.
         logger.info('{func:s}: No NARAD TLE file present for {prn:s}'.format(prn=colored(prn, 'red'), func=cFuncName))
 
     return dt_tle_rise, dt_tle_set, dt_tle_cul, tle_arc_count
+
+
+def gmst_rad(jd_ut1: np.ndarray) -> np.ndarray:
+    """
+    gmst_rad returns the Greenwich mean sidereal time (IAU 1982) in radians for (an array of) UT1 julian dates
+    """
+    T = (np.asarray(jd_ut1, dtype=float) - 2451545.0) / 36525.0
+    gmst = -6.2e-6 * T**3 + 0.093104 * T**2 + (876600.0 * 3600 + 8640184.812866) * T + 67310.54841
+
+    return np.radians(gmst / 240.0) % (2 * np.pi)
+
+
+def tle_elevations(sv_array: SatrecArray, jd: np.ndarray, fr: np.ndarray, site_lla: Tuple[float, float, float]) -> np.ndarray:
+    """
+    tle_elevations propagates all satellites of sv_array at the epochs (jd + fr, UTC) in one vectorised SGP4 call and
+    returns their topocentric elevation (degrees) seen from site_lla as an (nSV x nT) matrix
+    """
+    errors, r_teme, _ = sv_array.sgp4(jd, fr)
+
+    # rotate TEME to Earth fixed coordinates (polar motion neglected) and convert to m
+    theta = gmst_rad(jd + fr)
+    cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+    r_ecef = np.stack((cos_theta * r_teme[..., 0] + sin_theta * r_teme[..., 1],
+                       -sin_theta * r_teme[..., 0] + cos_theta * r_teme[..., 1],
+                       r_teme[..., 2]), axis=-1) * 1000.
+
+    _, elev = skyview.azel(site_lla=site_lla, sat_xyz=r_ecef)
+    elev[errors != 0] = np.nan
+
+    return elev
+
+
+def tle_rise_set_batch(prns: list, df_tle: pd.DataFrame, site_lla: Tuple[float, float, float], t0: datetime, t1: datetime, elev_min: float, logger: logging.Logger, step: float = 60.) -> dict:
+    """
+    tle_rise_set_batch calculates the TLE based rise / culminate / set times of all PRNs in one pass. All satellites
+    are propagated on a shared time grid of step seconds, events are detected by sign changes of the elevation
+    above elev_min and refined within the step. Returns a dict with for each PRN the lists (rise, set, culminate)
+    of datetime.time values, using the conventions of tle_rise_set_times.
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    df_prns = df_tle[df_tle['PRN'].isin(prns)].reset_index(drop=True)
+    dArcs = {}
+    if len(df_prns.index) == 0:
+        logger.info('{func:s}: no TLEs available for PRNs {prns!s}'.format(prns=prns, func=cFuncName))
+        return dArcs
+
+    logger.info('{func:s}: propagating {nr:d} SVs with elevation mask {mask:.1f} deg'.format(nr=len(df_prns.index), mask=elev_min, func=cFuncName))
+
+    sv_array = SatrecArray([Satrec.twoline2rv(tle1, tle2) for tle1, tle2 in zip(df_prns['TLE1'], df_prns['TLE2'])])
+
+    # shared time grid (UTC julian date split into day and fraction)
+    jd0, fr0 = jday(t0.year, t0.month, t0.day, t0.hour, t0.minute, t0.second)
+    span = (t1 - t0).total_seconds()
+    secs = np.append(np.arange(0., span, step), span)
+    jd = np.full(secs.shape, jd0)
+    fr = fr0 + secs / 86400.
+
+    # elevation above the mask for all SVs and epochs
+    delev = tle_elevations(sv_array=sv_array, jd=jd, fr=fr, site_lla=site_lla) - elev_min
+    above = delev >= 0
+
+    # rising / setting crossings between consecutive grid epochs
+    sv_cross, i_cross = np.nonzero(above[:, 1:] != above[:, :-1])
+    t_lo, t_hi = secs[i_cross], secs[i_cross + 1]
+    e_lo, e_hi = delev[sv_cross, i_cross], delev[sv_cross, i_cross + 1]
+
+    # refine the crossings by regula falsi, evaluating all crossings of all SVs in one call per iteration
+    for _ in range(3):
+        t_c = t_lo - e_lo * (t_hi - t_lo) / (e_hi - e_lo)
+        e_c = tle_elevations(sv_array=sv_array, jd=np.full(t_c.shape, jd0), fr=fr0 + t_c / 86400., site_lla=site_lla)[sv_cross, np.arange(len(t_c))] - elev_min
+        same_side = np.sign(e_c) == np.sign(e_lo)
+        t_lo, e_lo = np.where(same_side, t_c, t_lo), np.where(same_side, e_c, e_lo)
+        t_hi, e_hi = np.where(same_side, t_hi, t_c), np.where(same_side, e_hi, e_c)
+    t_cross = t_lo - e_lo * (t_hi - t_lo) / (e_hi - e_lo)
+    rising = ~above[sv_cross, i_cross]
+
+    # culminations: local maxima above the mask, refined by a parabola through the 3 surrounding grid points
+    sv_cul, i_cul = np.nonzero((delev[:, 1:-1] > delev[:, :-2]) & (delev[:, 1:-1] >= delev[:, 2:]) & above[:, 1:-1])
+    i_cul += 1
+    e_m, e_0, e_p = delev[sv_cul, i_cul - 1], delev[sv_cul, i_cul], delev[sv_cul, i_cul + 1]
+    denom = e_m - 2 * e_0 + e_p
+    offset = np.where(denom != 0, 0.5 * (e_m - e_p) / np.where(denom != 0, denom, 1.), 0.)
+    t_cul = secs[i_cul] + offset * step
+
+    def to_time(sec: float) -> time:
+        return (t0 + timedelta(seconds=float(sec))).time().replace(microsecond=0)
+
+    midnight = time(hour=0, minute=0, second=0, microsecond=0)
+    for sv_idx, prn in enumerate(df_prns['PRN']):
+        dt_tle_rise = []
+        dt_tle_set = []
+        dt_tle_cul = []
+
+        # build the arcs, starting at t0 when visible at start and ending at t1 when still visible at end
+        sel = sv_cross == sv_idx
+        rise_sec = 0. if above[sv_idx, 0] else None
+        culs = t_cul[sv_cul == sv_idx]
+        for sec, is_rise in zip(t_cross[sel], rising[sel]):
+            if is_rise:
+                rise_sec = sec
+            elif rise_sec is not None:
+                arc_culs = culs[(culs >= rise_sec) & (culs <= sec)]
+                dt_tle_rise.append(to_time(rise_sec))
+                dt_tle_set.append(to_time(sec))
+                dt_tle_cul.append(to_time(arc_culs[0]) if len(arc_culs) else np.nan)
+                rise_sec = None
+        if rise_sec is not None:
+            arc_culs = culs[culs >= rise_sec]
+            dt_tle_rise.append(to_time(rise_sec))
+            dt_tle_set.append(to_time(span))
+            dt_tle_cul.append(to_time(arc_culs[0]) if len(arc_culs) else np.nan)
+
+        # a set time at "00:00:00" is changed to "23:59:59"
+        dt_tle_set = [time(hour=23, minute=59, second=59) if tle_set == midnight else tle_set for tle_set in dt_tle_set]
+
+        dArcs[prn] = (dt_tle_rise, dt_tle_set, dt_tle_cul)
+
+        for i, (stdt, culdt, enddt) in enumerate(zip(dt_tle_rise, dt_tle_cul, dt_tle_set)):
+            str_culdt = 'N/A' if isinstance(culdt, float) else culdt.strftime('%H:%M:%S')
+            logger.info('{func:s}:    {prn:s} arc[{nr:d}]: {stdt:s} -> {culdt:s} -> {enddt:s}'.format(prn=colored(prn, 'green'), nr=i, stdt=colored(stdt.strftime('%H:%M:%S'), 'yellow'), culdt=colored(str_culdt, 'yellow'), enddt=colored(enddt.strftime('%H:%M:%S'), 'yellow'), func=cFuncName))
+
+    return dArcs
+
+
+def rise_set_cache_key(norad: str, tle_line1: str, site_lla: Tuple[float, float, float], t0: datetime, t1: datetime, elev_min: float, step: float) -> str:
+    """
+    rise_set_cache_key returns the key identifying a TLE rise / set computation: NORAD, TLE epoch, site, period,
+    elevation mask and grid step
+    """
+    return '{norad:s}|{epoch:s}|{lat:.6f},{lon:.6f},{h:.1f}|{t0:s}|{t1:s}|{mask:.2f}|{step:.0f}'.format(norad=str(norad), epoch=tle_line1[18:32].strip(), lat=site_lla[0], lon=site_lla[1], h=site_lla[2], t0=t0.isoformat(), t1=t1.isoformat(), mask=elev_min, step=step)
+
+
+def load_rise_set_cache(cache_file: str) -> dict:
+    """
+    load_rise_set_cache reads the rise / set cache into a dict {key: [last_used, arcs]} where arcs is an (N,3) array
+    with rise, set and culmination as seconds of day (-1 when no culmination)
+    """
+    try:
+        with np.load(cache_file) as cache:
+            arcs = np.split(cache['arcs'], np.cumsum(cache['counts'])[:-1])
+            return {key: [last_used, arc] for key, last_used, arc in zip(cache['keys'].tolist(), cache['last_used'], arcs)}
+    except (IOError, ValueError, KeyError):
+        return {}
+
+
+def store_rise_set_cache(cache_file: str, dCache: dict, max_entries: int, logger: logging.Logger):
+    """
+    store_rise_set_cache merges dCache into the rise / set cache on disk, keeping the max_entries most recently used
+    entries. The cache is locked while it is re-read, merged and replaced so that concurrent runs keep each other's entries.
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+        with open('{cache:s}.lock'.format(cache=cache_file), 'w') as flock:
+            if fcntl is not None:
+                fcntl.flock(flock, fcntl.LOCK_EX)
+
+            # add the entries stored by other processes since the cache was loaded
+            dMerged = load_rise_set_cache(cache_file=cache_file)
+            for key, entry in dCache.items():
+                if key not in dMerged or dMerged[key][0] < entry[0]:
+                    dMerged[key] = entry
+
+            keys = sorted(dMerged, key=lambda key: dMerged[key][0], reverse=True)[:max_entries]
+            if len(keys) < len(dMerged):
+                logger.debug('{func:s}: evicting {nr:d} least recently used entries'.format(nr=len(dMerged) - len(keys), func=cFuncName))
+
+            tmp_cache_file = '{cache:s}.{pid:d}'.format(cache=cache_file, pid=os.getpid())
+            with open(tmp_cache_file, 'wb') as fcache:
+                np.savez_compressed(fcache,
+                                    keys=np.array(keys, dtype=str),
+                                    last_used=np.array([dMerged[key][0] for key in keys], dtype=np.float64),
+                                    counts=np.array([len(dMerged[key][1]) for key in keys], dtype=np.int32),
+                                    arcs=np.concatenate([dMerged[key][1] for key in keys] + [np.empty((0, 3), dtype=np.int32)]).astype(np.int32))
+            os.replace(tmp_cache_file, cache_file)
+    except IOError as e:
+        logger.warning('{func:s}: could not store rise / set cache {cache:s}: {err!s}'.format(cache=cache_file, err=e, func=cFuncName))
+
+
+def tle_rise_set_cached(prns: list, df_tle: pd.DataFrame, site_lla: Tuple[float, float, float], t0: datetime, t1: datetime, elev_min: float, logger: logging.Logger, step: float = 60., cache_file: str = TLE_RS_CACHE_FILE, max_entries: int = TLE_RS_CACHE_SIZE) -> dict:
+    """
+    tle_rise_set_cached returns the same dict as tle_rise_set_batch, taking the results from the persistent cache
+    where available and only propagating the PRNs not found in it. The cache is only written when PRNs were missing
+    or entries are to be evicted, least recently used entries are evicted when it holds more than max_entries.
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    df_prns = df_tle[df_tle['PRN'].isin(prns)]
+    dKeys = {prn: rise_set_cache_key(norad=norad, tle_line1=tle1, site_lla=site_lla, t0=t0, t1=t1, elev_min=elev_min, step=step) for prn, norad, tle1 in zip(df_prns['PRN'], df_prns['NORAD'], df_prns['TLE1'])}
+
+    dCache = load_rise_set_cache(cache_file=cache_file)
+    prns_miss = [prn for prn, key in dKeys.items() if key not in dCache]
+    logger.info('{func:s}: rise / set cache hits for {hit:d} of {nr:d} PRNs'.format(hit=len(dKeys) - len(prns_miss), nr=len(dKeys), func=cFuncName))
+
+    def to_seconds(dt) -> int:
+        return -1 if isinstance(dt, float) else dt.hour * 3600 + dt.minute * 60 + dt.second
+
+    def to_time(sec: int):
+        return np.nan if sec < 0 else time(hour=int(sec) // 3600, minute=(int(sec) // 60) % 60, second=int(sec) % 60)
+
+    # compute the missing PRNs and add them to the cache
+    if prns_miss:
+        dArcsMiss = tle_rise_set_batch(prns=prns_miss, df_tle=df_prns, site_lla=site_lla, t0=t0, t1=t1, elev_min=elev_min, logger=logger, step=step)
+        for prn, arcs in dArcsMiss.items():
+            dCache[dKeys[prn]] = [0., np.array([[to_seconds(dt) for dt in arc] for arc in zip(*arcs)], dtype=np.int32).reshape(-1, 3)]
+
+    dArcs = {}
+    now = datetime.now().timestamp()
+    for prn, key in dKeys.items():
+        if key in dCache:
+            dCache[key][0] = now
+            arcs = dCache[key][1]
+            dArcs[prn] = ([to_time(sec) for sec in arcs[:, 0]], [to_time(sec) for sec in arcs[:, 1]], [to_time(sec) for sec in arcs[:, 2]])
+
+    if prns_miss or len(dCache) > max_entries:
+        store_rise_set_cache(cache_file=cache_file, dCache=dCache, max_entries=max_entries, logger=logger)
+
+    return dArcs
+
+
+def tle_arc_counts(dt_tle_rise: list, dt_tle_set: list, obs_int: float) -> list:
+    """
+    tle_arc_counts returns the theoretical number of observations for each TLE arc given the observation interval
+    """
+    tle_arc_count = []
+    for tle_rise, tle_set in zip(dt_tle_rise, dt_tle_set):
+        rise_sec = int(timedelta(hours=tle_rise.hour, minutes=tle_rise.minute, seconds=tle_rise.second).total_seconds())
+        set_sec = int(timedelta(hours=tle_set.hour, minutes=tle_set.minute, seconds=tle_set.second).total_seconds())
+        tle_arc_count.append((set_sec - rise_sec) / obs_int)
+
+    return tle_arc_count
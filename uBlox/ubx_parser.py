@@ -0,0 +1,320 @@
+import struct
+import numpy as np
+import pandas as pd
+
+from GNSS import rnxnav
+from rnx2rtkp import parse_rtkpos_file
+
+__author__ = 'amuls'
+
+# UBX frame: sync 0xb5 0x62, class (u1), id (u1), payload length (u2), payload and checksum (CK_A, CK_B)
+UBX_SYNC = b'\xb5\x62'
+UBX_HEADER = struct.Struct('<BBH')
+UBX_HEADER_SIZE = 6
+UBX_CHECKSUM_SIZE = 2
+
+# size of the chunks read from a file or socket
+UBX_CHUNK_SIZE = 65536
+
+# number of messages of a type collected before they are decoded into columns
+UBX_DECODE_BATCH = 20000
+
+# class and id of the decoded messages
+dUBXMessages = {'NAV-PVT': (0x01, 0x07), 'NAV-SAT': (0x01, 0x35), 'RXM-RAWX': (0x02, 0x15)}
+
+# RINEX system letter per UBX gnssId
+dUBXGNSS = {0: 'G', 1: 'S', 2: 'E', 3: 'C', 5: 'J', 6: 'R', 7: 'I'}
+
+NAV_PVT_DTYPE = np.dtype([('iTOW', '<u4'), ('year', '<u2'), ('month', 'u1'), ('day', 'u1'), ('hour', 'u1'), ('min', 'u1'), ('sec', 'u1'), ('valid', 'u1'),
+                          ('tAcc', '<u4'), ('nano', '<i4'), ('fixType', 'u1'), ('flags', 'u1'), ('flags2', 'u1'), ('numSV', 'u1'),
+                          ('lon', '<i4'), ('lat', '<i4'), ('height', '<i4'), ('hMSL', '<i4'), ('hAcc', '<u4'), ('vAcc', '<u4'),
+                          ('velN', '<i4'), ('velE', '<i4'), ('velD', '<i4'), ('gSpeed', '<i4'), ('headMot', '<i4'), ('sAcc', '<u4'), ('headAcc', '<u4'),
+                          ('pDOP', '<u2'), ('flags3', '<u2'), ('reserved1', 'V4'), ('headVeh', '<i4'), ('magDec', '<i2'), ('magAcc', '<u2')])
+
+NAV_SAT_HEADER_SIZE = 8
+NAV_SAT_DTYPE = np.dtype([('gnssId', 'u1'), ('svId', 'u1'), ('cno', 'u1'), ('elev', 'i1'), ('azim', '<i2'), ('prRes', '<i2'), ('flags', '<u4')])
+
+RXM_RAWX_HEADER_DTYPE = np.dtype([('rcvTow', '<f8'), ('week', '<u2'), ('leapS', 'i1'), ('numMeas', 'u1'), ('recStat', 'u1'), ('version', 'u1'), ('reserved1', 'V2')])
+RXM_RAWX_DTYPE = np.dtype([('prMes', '<f8'), ('cpMes', '<f8'), ('doMes', '<f4'), ('gnssId', 'u1'), ('svId', 'u1'), ('sigId', 'u1'), ('freqId', 'u1'),
+                           ('locktime', '<u2'), ('cno', 'u1'), ('prStdev', 'u1'), ('cpStdev', 'u1'), ('doStdev', 'u1'), ('trkStat', 'u1'), ('reserved2', 'V1')])
+
+
+def ubx_checksum(data: bytes) -> tuple:
+    """
+    ubx_checksum returns the 8-bit Fletcher checksum (CK_A, CK_B) over class, id, length and payload
+    """
+    values = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    return int(values.sum()) & 0xff, int(np.dot(np.arange(len(values), 0, -1), values)) & 0xff
+
+
+def gnss_sv_prn(gnss_id: int, sv_id: int) -> str:
+    """
+    gnss_sv_prn converts the UBX gnssId / svId into a PRN as used in RINEX, empty for unknown satellites
+    """
+    if gnss_id not in dUBXGNSS or sv_id == 255:
+        return ''
+    return '{gnss:s}{prn:02d}'.format(gnss=dUBXGNSS[gnss_id], prn=sv_id - (100 if gnss_id == 1 else 0))
+
+
+# PRN per gnssId and svId, used as lookup table with a last row for the unknown gnssIds
+UBX_MAX_GNSS_ID = 8
+GNSS_SV_PRNS = np.array([[gnss_sv_prn(gnss_id, sv_id) for sv_id in range(256)] for gnss_id in range(UBX_MAX_GNSS_ID + 1)])
+
+
+def _prns(gnss_ids: np.ndarray, sv_ids: np.ndarray) -> np.ndarray:
+    """
+    _prns converts arrays of UBX gnssId / svId into RINEX PRNs
+    """
+    return GNSS_SV_PRNS[np.minimum(gnss_ids, UBX_MAX_GNSS_ID), sv_ids]
+
+
+class UBXStream:
+    """
+    Incremental UBX framer: bytes are fed as they arrive from a file or socket and the complete frames with a valid
+    checksum are returned as (class, id, payload). The search resyncs on the next sync after a frame with a wrong
+    checksum, incomplete frames are kept until more bytes arrive. At the end of the stream (eof) an incomplete frame is
+    a false sync or a truncated frame, the search then resyncs past it.
+        msg_ids - set of (class, id) returned, other valid messages are stepped over (None for all)
+    """
+
+    def __init__(self, msg_ids: set = None):
+        self.msg_ids = msg_ids
+        self.buf = bytearray()
+        self.bad_checksum = 0
+        self.skipped = 0
+
+    def feed(self, data: bytes, eof: bool = False) -> list:
+        buf = self.buf
+        buf += data
+        frames = []
+
+        pos = 0
+        while True:
+            sync = buf.find(UBX_SYNC, pos)
+            if sync < 0:
+                # keep a last 0xb5 which may be the start of a sync
+                sync = max(pos, len(buf) - (0 if eof else 1))
+                self.skipped += sync - pos
+                pos = sync
+                break
+            self.skipped += sync - pos
+            pos = sync
+
+            if len(buf) - pos < UBX_HEADER_SIZE:
+                if not eof:
+                    break
+                self.skipped += 1
+                pos += 1
+                continue
+            msg_cls, msg_id, length = UBX_HEADER.unpack_from(buf, pos + 2)
+            end = pos + UBX_HEADER_SIZE + length + UBX_CHECKSUM_SIZE
+            if len(buf) < end:
+                if not eof:
+                    break
+                # a false sync (or truncated frame) at the end, look for complete frames inside it
+                self.skipped += 1
+                pos += 1
+                continue
+
+            # the length is only trusted for a valid checksum, a false sync may announce any length
+            if ubx_checksum(buf[pos + 2:end - UBX_CHECKSUM_SIZE]) != (buf[end - 2], buf[end - 1]):
+                self.bad_checksum += 1
+                self.skipped += 1
+                pos += 1
+                continue
+
+            if self.msg_ids is not None and (msg_cls, msg_id) not in self.msg_ids:
+                pos = end
+                continue
+
+            frames.append((msg_cls, msg_id, bytes(buf[pos + UBX_HEADER_SIZE:end - UBX_CHECKSUM_SIZE])))
+            pos = end
+
+        del buf[:pos]
+        return frames
+
+
+def iter_ubx_frames(stream, msg_ids: set = None, chunk_size: int = UBX_CHUNK_SIZE):
+    """
+    iter_ubx_frames yields the UBX frames (class, id, payload) read from a binary file object or a connected socket
+    until the end of the stream
+    """
+    read = stream.read if hasattr(stream, 'read') else stream.recv
+    framer = UBXStream(msg_ids=msg_ids)
+
+    while True:
+        chunk = read(chunk_size)
+        for frame in framer.feed(chunk, eof=not chunk):
+            yield frame
+        if not chunk:
+            break
+
+
+def decode_nav_pvt(payloads: list) -> dict:
+    """
+    decode_nav_pvt decodes NAV-PVT payloads into columns, time DT is UTC
+    """
+    pvt = np.frombuffer(b''.join(payload[:NAV_PVT_DTYPE.itemsize] for payload in payloads if len(payload) >= NAV_PVT_DTYPE.itemsize), dtype=NAV_PVT_DTYPE)
+
+    dt = (pvt['year'].astype(np.int64) - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (pvt['month'].astype(np.int64) - 1).astype('timedelta64[M]')
+    dt = dt.astype('datetime64[ns]') + (pvt['day'].astype(np.int64) - 1).astype('timedelta64[D]') + pvt['hour'].astype('timedelta64[h]') + pvt['min'].astype('timedelta64[m]') + pvt['sec'].astype('timedelta64[s]') + pvt['nano'].astype('timedelta64[ns]')
+
+    return {'iTOW': pvt['iTOW'] / 1000.,
+            'DT': dt,
+            'fixType': pvt['fixType'],
+            'gnssFixOK': pvt['flags'] & 0x01,
+            'diffSoln': (pvt['flags'] >> 1) & 0x01,
+            'carrSoln': pvt['flags'] >> 6,
+            'numSV': pvt['numSV'],
+            'lat': pvt['lat'] * 1e-7,
+            'lon': pvt['lon'] * 1e-7,
+            'ellH': pvt['height'] / 1000.,
+            'hMSL': pvt['hMSL'] / 1000.,
+            'hAcc': pvt['hAcc'] / 1000.,
+            'vAcc': pvt['vAcc'] / 1000.,
+            'velN': pvt['velN'] / 1000.,
+            'velE': pvt['velE'] / 1000.,
+            'velD': pvt['velD'] / 1000.,
+            'gSpeed': pvt['gSpeed'] / 1000.,
+            'headMot': pvt['headMot'] * 1e-5,
+            'pDOP': pvt['pDOP'] / 100.}
+
+
+def decode_nav_sat(payloads: list) -> dict:
+    """
+    decode_nav_sat decodes the per satellite info of NAV-SAT payloads into one row per satellite
+    """
+    nr_svs = np.array([payload[5] for payload in payloads], dtype=np.int64)
+    itow = np.array([struct.unpack_from('<I', payload)[0] for payload in payloads], dtype=np.float64) / 1000.
+    sats = np.frombuffer(b''.join(payload[NAV_SAT_HEADER_SIZE:NAV_SAT_HEADER_SIZE + nr * NAV_SAT_DTYPE.itemsize] for payload, nr in zip(payloads, nr_svs)), dtype=NAV_SAT_DTYPE)
+
+    return {'iTOW': np.repeat(itow, nr_svs),
+            'gnssId': sats['gnssId'],
+            'svId': sats['svId'],
+            'PRN': _prns(sats['gnssId'], sats['svId']),
+            'cno': sats['cno'],
+            'elev': sats['elev'],
+            'azim': sats['azim'],
+            'prRes': sats['prRes'] / 10.,
+            'qualityInd': sats['flags'] & 0x07,
+            'svUsed': (sats['flags'] >> 3) & 0x01,
+            'health': (sats['flags'] >> 4) & 0x03}
+
+
+def decode_rxm_rawx(payloads: list) -> dict:
+    """
+    decode_rxm_rawx decodes the measurements of RXM-RAWX payloads into one row per signal, time DT is GPS time
+    """
+    hdrs = np.frombuffer(b''.join(payload[:RXM_RAWX_HEADER_DTYPE.itemsize] for payload in payloads), dtype=RXM_RAWX_HEADER_DTYPE)
+    nr_meas = hdrs['numMeas'].astype(np.int64)
+    meas = np.frombuffer(b''.join(payload[RXM_RAWX_HEADER_DTYPE.itemsize:RXM_RAWX_HEADER_DTYPE.itemsize + nr * RXM_RAWX_DTYPE.itemsize] for payload, nr in zip(payloads, nr_meas)), dtype=RXM_RAWX_DTYPE)
+
+    rcv_tow = np.repeat(hdrs['rcvTow'], nr_meas)
+    week = np.repeat(hdrs['week'], nr_meas)
+
+    # pseudo-range / carrier phase are only valid when flagged in the tracking status
+    pr = np.where(meas['trkStat'] & 0x01, meas['prMes'], np.nan)
+    cp = np.where(meas['trkStat'] & 0x02, meas['cpMes'], np.nan)
+
+    return {'rcvTow': rcv_tow,
+            'week': week,
+            'leapS': np.repeat(hdrs['leapS'], nr_meas),
+            'DT': rnxnav.GPS_EPOCH + week.astype('timedelta64[W]') + np.round(rcv_tow * 1e9).astype('timedelta64[ns]'),
+            'gnssId': meas['gnssId'],
+            'svId': meas['svId'],
+            'PRN': _prns(meas['gnssId'], meas['svId']),
+            'sigId': meas['sigId'],
+            'freqId': meas['freqId'],
+            'prMes': pr,
+            'cpMes': cp,
+            'doMes': meas['doMes'].astype(np.float64),
+            'cno': meas['cno'],
+            'locktime': meas['locktime'],
+            'prStdev': 0.01 * 2.**(meas['prStdev'] & 0x0f),
+            'cpStdev': 0.004 * (meas['cpStdev'] & 0x0f),
+            'doStdev': 0.002 * 2.**(meas['doStdev'] & 0x0f),
+            'trkStat': meas['trkStat']}
+
+
+# decoder per message
+dUBXDecoders = {'NAV-PVT': decode_nav_pvt, 'NAV-SAT': decode_nav_sat, 'RXM-RAWX': decode_rxm_rawx}
+
+
+class UBXDecoder:
+    """
+    Collects the UBX frames of the requested messages (names of dUBXMessages) and decodes them in batches into
+    columns (numpy arrays). Frames can be added as they arrive, columns returns the decoded data so far.
+    """
+
+    def __init__(self, messages: list = tuple(dUBXMessages), batch_size: int = UBX_DECODE_BATCH):
+        self.names = {dUBXMessages[name]: name for name in messages}
+        self.batch_size = batch_size
+        self.batches = {name: [] for name in messages}
+        self.decoded = {name: [] for name in messages}
+
+    @property
+    def msg_ids(self) -> set:
+        return set(self.names)
+
+    def add(self, msg_cls: int, msg_id: int, payload: bytes):
+        name = self.names.get((msg_cls, msg_id))
+        if name is None:
+            return
+
+        self.batches[name].append(payload)
+        if len(self.batches[name]) == self.batch_size:
+            self.decoded[name].append(dUBXDecoders[name](self.batches[name]))
+            self.batches[name] = []
+
+    def columns(self) -> dict:
+        dUBX = {}
+        for name in self.batches:
+            if len(self.batches[name]) > 0 or len(self.decoded[name]) == 0:
+                self.decoded[name].append(dUBXDecoders[name](self.batches[name]))
+                self.batches[name] = []
+            dUBX[name] = {col: np.concatenate([dCols[col] for dCols in self.decoded[name]]) for col in self.decoded[name][0]}
+        return dUBX
+
+
+def read_ubx(source, messages: list = tuple(dUBXMessages), chunk_size: int = UBX_CHUNK_SIZE) -> dict:
+    """
+    read_ubx decodes the requested messages from a UBX file name, binary file object or connected socket into a dict
+    of columns per message name
+    """
+    decoder = UBXDecoder(messages=messages)
+
+    if isinstance(source, str):
+        with open(source, 'rb') as fubx:
+            for frame in iter_ubx_frames(fubx, msg_ids=decoder.msg_ids, chunk_size=chunk_size):
+                decoder.add(*frame)
+    else:
+        for frame in iter_ubx_frames(source, msg_ids=decoder.msg_ids, chunk_size=chunk_size):
+            decoder.add(*frame)
+
+    return decoder.columns()
+
+
+def nav_pvt_pos(dPVT: dict, ref_lla: list = None) -> pd.DataFrame:
+    """
+    nav_pvt_pos converts decoded NAV-PVT columns into a position dataframe with the columns of a parsed RTKLib pos
+    file (see parse_rtkpos_file.parsePosFile), keeping the epochs with a valid fix. The solution type is mapped on
+    the RTKLib quality Q (1 fix, 2 float, 4 DGPS, 5 single) and hAcc / vAcc are used as standard deviations.
+    """
+    valid = (dPVT['gnssFixOK'] == 1) & (dPVT['fixType'] >= 2) & (dPVT['fixType'] <= 4)
+
+    quality = np.select([dPVT['carrSoln'] == 2, dPVT['carrSoln'] == 1, dPVT['diffSoln'] == 1], [1, 2, 4], default=5)
+
+    # GPS week from the UTC time and the GPS time of week, the leap seconds being far less than a week
+    gps_secs = rnxnav.gps_seconds(dPVT['DT'])
+    wnc = np.round((gps_secs - dPVT['iTOW']) / 604800.).astype(np.int64)
+
+    dfPos = pd.DataFrame({'WNC': wnc, 'TOW': dPVT['iTOW'], 'lat': dPVT['lat'], 'lon': dPVT['lon'], 'ellH': dPVT['ellH'],
+                          'Q': quality, 'ns': dPVT['numSV'],
+                          'sdn': dPVT['hAcc'] / np.sqrt(2.), 'sde': dPVT['hAcc'] / np.sqrt(2.), 'sdu': dPVT['vAcc'],
+                          'sdne': 0., 'sdeu': 0., 'sdun': 0., 'age': np.nan, 'ratio': np.nan,
+                          'DT': dPVT['DT']})[valid].reset_index(drop=True)
+
+    if dfPos.shape[0] > 0:
+        parse_rtkpos_file.add_utm_errors(dfPos=dfPos, ref_lla=ref_lla)
+
+    return dfPos